@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class ConfigConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'config'
+
+    def ready(self):
+        from config.fechas import registrar_lookups
+        from config.referencias import conectar_senales
+        registrar_lookups()
+        conectar_senales()
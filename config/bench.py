@@ -0,0 +1,207 @@
+"""
+Suite de rendimiento de las rutas calientes (`manage.py bench`).
+
+Cada escenario se ejecuta `repeticiones` veces (más un calentamiento) dentro
+de una transacción que se revierte, con la caché vaciada antes de cada
+corrida para medir el cálculo y no el acierto de caché. Por escenario se
+registra:
+
+    consultas     número de queries SQL (de la última corrida)
+    p50_ms/p95_ms latencia
+    memoria_kb    pico de memoria Python (tracemalloc, corrida aparte)
+
+`comparar()` contrasta contra un baseline JSON: hay regresión si p95 o la
+memoria crecen más que `umbral` (fracción) y, en latencia, además más de
+PISO_MS; si aumenta el número de consultas; o si un escenario que pasaba
+ahora lanza excepción.
+
+Las vistas se piden con el cliente de pruebas de Django autenticado como
+superusuario; la interpretación de Claude y las narrativas van en modo lote
+(IA_MODO_LOTE) para no salir a la red, y sus solicitudes encoladas se
+revierten con la transacción.
+"""
+
+import json
+import logging
+import math
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+PISO_MS = 5.0
+
+
+class _Revertir(Exception):
+    pass
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[indice]
+
+
+def _vista(cliente, nombre_url, **params):
+    def pedir():
+        respuesta = cliente.get(reverse(nombre_url), params)
+        if respuesta.status_code != 200:
+            raise AssertionError(f'{nombre_url} respondió {respuesta.status_code}')
+    return pedir
+
+
+def escenarios(cliente) -> dict:
+    """{nombre: callable} de las rutas calientes a medir."""
+    from modulos.combustible.ia_service import AnalizadorCombustible
+    from modulos.combustible.models import CargaCombustible
+    from modulos.reportes.motor import GENERADORES
+    from modulos.unidades.services import calcular_reporte_utilidad
+
+    hoy = timezone.localdate()
+    hace_30 = hoy - timedelta(days=30)
+    filtro_fechas = {'fecha_desde': hace_30.isoformat(), 'fecha_hasta': hoy.isoformat()}
+
+    resultado = {
+        'vista.inicio': _vista(cliente, 'inicio'),
+        'dashboard.unidades': _vista(cliente, 'unidades:dashboard'),
+        'dashboard.operadores': _vista(cliente, 'operadores:dashboard'),
+        'dashboard.bitacoras': _vista(cliente, 'bitacoras:dashboard'),
+        'dashboard.combustible': _vista(cliente, 'combustible:dashboard'),
+        'dashboard.combustible_ia': _vista(cliente, 'combustible:ia_dashboard'),
+        'dashboard.taller': _vista(cliente, 'taller:dashboard'),
+        'dashboard.almacen': _vista(cliente, 'almacen:dashboard'),
+        'dashboard.compras': _vista(cliente, 'compras:dashboard'),
+        'dashboard.modulacion': _vista(cliente, 'modulacion:dashboard'),
+        'lista.bitacoras': _vista(cliente, 'bitacoras:list', **filtro_fechas),
+        'lista.combustible': _vista(cliente, 'combustible:lista', estado='COMPLETADO'),
+        'lista.ordenes_taller': _vista(cliente, 'taller:lista_ordenes', estado='COMPLETADA'),
+        'lista.entradas_almacen': _vista(cliente, 'almacen:entrada_list', **filtro_fechas),
+        'lista.movimientos_almacen': _vista(cliente, 'almacen:movimiento_list'),
+        'lista.modulaciones': _vista(cliente, 'modulacion:list'),
+        'servicio.calcular_reporte_utilidad': lambda: calcular_reporte_utilidad(hace_30, hoy),
+    }
+    for tipo_reporte, generador in sorted(GENERADORES.items()):
+        resultado[f'reporte.{tipo_reporte}'] = (
+            lambda generador=generador: generador(hace_30, hoy)
+        )
+
+    carga = (
+        CargaCombustible.objects.filter(estado='COMPLETADO')
+        .select_related('unidad', 'despachador')
+        .order_by('-fecha_hora_inicio')
+        .first()
+    )
+    if carga:
+        resultado['ia.analizar_carga'] = lambda: AnalizadorCombustible().analizar_carga(carga)
+    return resultado
+
+
+def _corrida(funcion):
+    """Ejecuta `funcion` en una transacción revertida. Retorna (segundos, consultas)."""
+    cache.clear()
+    with CaptureQueriesContext(connection) as consultas:
+        inicio = time.perf_counter()
+        try:
+            with transaction.atomic():
+                funcion()
+                raise _Revertir
+        except _Revertir:
+            pass
+        duracion = time.perf_counter() - inicio
+    return duracion, len(consultas)
+
+
+def medir(funcion, repeticiones: int = 10, calentamiento: int = 1) -> dict:
+    for _ in range(calentamiento):
+        _corrida(funcion)
+    tiempos = []
+    consultas = 0
+    for _ in range(repeticiones):
+        segundos, consultas = _corrida(funcion)
+        tiempos.append(segundos * 1000)
+
+    tracemalloc.start()
+    try:
+        _corrida(funcion)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'consultas': consultas,
+        'p50_ms': round(_percentil(tiempos, 50), 2),
+        'p95_ms': round(_percentil(tiempos, 95), 2),
+        'memoria_kb': round(pico / 1024, 1),
+    }
+
+
+def ejecutar(cliente, repeticiones: int = 10, solo=None, progreso=None) -> dict:
+    """
+    Mide los escenarios (filtrados por subcadena `solo`). Retorna {nombre: métricas};
+    un escenario que lanza excepción queda como {'error': ...} y no detiene la suite.
+    """
+    from django.test import override_settings
+
+    # El error ya queda en el resultado; sin el traceback que registra django.request
+    logger_request = logging.getLogger('django.request')
+    nivel_anterior = logger_request.level
+    logger_request.setLevel(logging.CRITICAL)
+    resultados = {}
+    try:
+        with override_settings(IA_MODO_LOTE=['combustible', 'reportes']):
+            for nombre, funcion in escenarios(cliente).items():
+                if solo and not any(s in nombre for s in solo):
+                    continue
+                try:
+                    resultados[nombre] = medir(funcion, repeticiones)
+                except Exception as exc:
+                    resultados[nombre] = {'error': f'{type(exc).__name__}: {exc}'[:300]}
+                if progreso:
+                    progreso(nombre, resultados[nombre])
+    finally:
+        logger_request.setLevel(nivel_anterior)
+    return resultados
+
+
+def comparar(actual: dict, baseline: dict, umbral: float = 0.25) -> list:
+    """Lista de regresiones (texto) de `actual` contra `baseline` ({nombre: métricas})."""
+    regresiones = []
+    for nombre, metricas in actual.items():
+        base = baseline.get(nombre)
+        if not base or 'error' in base:
+            continue
+        if 'error' in metricas:
+            regresiones.append(f"{nombre}: {metricas['error']}")
+            continue
+        if metricas['consultas'] > base['consultas']:
+            regresiones.append(f"{nombre}: consultas {base['consultas']} → {metricas['consultas']}")
+        p95, p95_base = metricas['p95_ms'], base['p95_ms']
+        if p95 > p95_base * (1 + umbral) and p95 - p95_base > PISO_MS:
+            regresiones.append(f"{nombre}: p95 {p95_base} ms → {p95} ms")
+        memoria, memoria_base = metricas['memoria_kb'], base['memoria_kb']
+        if memoria > memoria_base * (1 + umbral) and memoria - memoria_base > 64:
+            regresiones.append(f"{nombre}: memoria {memoria_base} KB → {memoria} KB")
+    return regresiones
+
+
+def guardar_baseline(ruta, resultados: dict):
+    from modulos.unidades.models import Unidad
+
+    contenido = {
+        'generado': timezone.now().isoformat(),
+        'motor_bd': connection.vendor,
+        'unidades': Unidad.objects.count(),
+        'escenarios': resultados,
+    }
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(contenido, archivo, indent=2, ensure_ascii=False, sort_keys=True)
+
+
+def cargar_baseline(ruta) -> dict:
+    with open(ruta, encoding='utf-8') as archivo:
+        return json.load(archivo)
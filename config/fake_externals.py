@@ -0,0 +1,431 @@
+"""
+Servidor local que imita las APIs externas usadas por config/services/*.
+
+Implementa solo el subconjunto que usa BitacoraKasu, para correr pruebas de
+rendimiento y de carga sin red ni credenciales:
+
+  HTTP (un solo puerto, prefijo por servicio)
+    google_maps    GET  /maps/api/distancematrix/json, /maps/api/geocode/json
+    google_vision  POST /vision/v1/images:annotate
+    twilio         POST /twilio/2010-04-01/Accounts/<sid>/Messages.json
+    waha           GET  /waha/api/sessions/<id>
+                   POST /waha/api/sessions/<id>/start
+                   POST /waha/api/sessions/<id>/messages/send-text
+    anthropic      POST /anthropic/v1/messages
+                   POST /anthropic/v1/messages/batches       (termina de inmediato)
+                   GET  /anthropic/v1/messages/batches/<id>[/results]
+
+  SMTP (puerto aparte) — sustituto de SendGrid; acepta AUTH PLAIN y DATA.
+
+  Control
+    GET  /__llamadas__[?servicio=twilio]   llamadas registradas (JSON)
+    POST /__reiniciar__                     borra el registro
+    POST /__config__                        {"latencia_ms": {...}, "errores": {...}}
+
+Cada servicio tiene una latencia (ms, con jitter) y una tasa de error
+configurables; los errores responden 503 (SMTP: 451).
+
+Se levanta con `python manage.py fake_externals` y se activa en la app con
+FAKE_EXTERNALS_URL (ver settings).
+"""
+
+import json
+import random
+import re
+import socketserver
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SERVICIOS = ('google_maps', 'google_vision', 'twilio', 'waha', 'anthropic', 'smtp')
+
+_RUTAS = [
+    ('google_maps', 'GET', re.compile(r'^/maps/api/distancematrix/json$'), '_distance_matrix'),
+    ('google_maps', 'GET', re.compile(r'^/maps/api/geocode/json$'), '_geocode'),
+    ('google_vision', 'POST', re.compile(r'^/vision/v1/images:annotate$'), '_vision'),
+    ('twilio', 'POST', re.compile(r'^/twilio/2010-04-01/Accounts/(?P<sid>[^/]+)/Messages\.json$'), '_twilio_mensaje'),
+    ('waha', 'GET', re.compile(r'^/waha/api/sessions/(?P<sesion>[^/]+)$'), '_waha_sesion'),
+    ('waha', 'POST', re.compile(r'^/waha/api/sessions/(?P<sesion>[^/]+)/start$'), '_waha_start'),
+    ('waha', 'POST', re.compile(r'^/waha/api/sessions/(?P<sesion>[^/]+)/messages/send-text$'), '_waha_texto'),
+    ('anthropic', 'POST', re.compile(r'^/anthropic/v1/messages$'), '_anthropic'),
+    ('anthropic', 'POST', re.compile(r'^/anthropic/v1/messages/batches$'), '_anthropic_lote_crear'),
+    ('anthropic', 'GET', re.compile(r'^/anthropic/v1/messages/batches/(?P<lote>[^/]+)$'), '_anthropic_lote'),
+    ('anthropic', 'GET', re.compile(r'^/anthropic/v1/messages/batches/(?P<lote>[^/]+)/results$'),
+     '_anthropic_lote_resultados'),
+]
+
+
+class Registro:
+    """Configuración de fallas y llamadas registradas, compartida por HTTP y SMTP."""
+
+    def __init__(self, latencia_ms=None, errores=None, jitter=0.2, semilla=None, archivo=None):
+        self.latencia_ms = {s: 0 for s in SERVICIOS}
+        self.errores = {s: 0.0 for s in SERVICIOS}
+        self.latencia_ms.update(latencia_ms or {})
+        self.errores.update(errores or {})
+        self.jitter = jitter
+        self.llamadas = []
+        self.lotes = {}
+        self.archivo = archivo
+        self._random = random.Random(semilla)
+        self._lock = threading.Lock()
+
+    def demora(self, servicio: str) -> float:
+        base = self.latencia_ms.get(servicio, 0) / 1000
+        if not base:
+            return 0.0
+        with self._lock:
+            return max(0.0, base * (1 + self._random.uniform(-self.jitter, self.jitter)))
+
+    def debe_fallar(self, servicio: str) -> bool:
+        tasa = self.errores.get(servicio, 0.0)
+        with self._lock:
+            return tasa > 0 and self._random.random() < tasa
+
+    def registrar(self, servicio: str, metodo: str, ruta: str, cuerpo, estado: int, segundos: float):
+        llamada = {
+            'servicio': servicio,
+            'metodo': metodo,
+            'ruta': ruta,
+            'cuerpo': cuerpo,
+            'estado': estado,
+            'ms': round(segundos * 1000, 1),
+            'ts': time.time(),
+        }
+        with self._lock:
+            self.llamadas.append(llamada)
+            if self.archivo:
+                self.archivo.write(json.dumps(llamada, ensure_ascii=False, default=str) + '\n')
+                self.archivo.flush()
+
+    def filtrar(self, servicio: str | None = None) -> list:
+        with self._lock:
+            return [ll for ll in self.llamadas if servicio is None or ll['servicio'] == servicio]
+
+    def reiniciar(self):
+        with self._lock:
+            self.llamadas.clear()
+            self.lotes.clear()
+
+
+# ---------------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------------
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakeExternals/1.0'
+
+    @property
+    def registro(self) -> Registro:
+        return self.server.registro
+
+    def log_message(self, *args):
+        pass
+
+    def _leer_cuerpo(self):
+        largo = int(self.headers.get('Content-Length') or 0)
+        crudo = self.rfile.read(largo) if largo else b''
+        tipo = self.headers.get('Content-Type', '')
+        if 'json' in tipo and crudo:
+            return json.loads(crudo)
+        if 'x-www-form-urlencoded' in tipo:
+            return {k: v[0] if len(v) == 1 else v for k, v in parse_qs(crudo.decode()).items()}
+        return crudo.decode(errors='replace') if crudo else None
+
+    def _json(self, estado: int, datos):
+        # bytes = respuesta ya serializada (JSONL de resultados de lotes)
+        binario = isinstance(datos, bytes)
+        cuerpo = datos if binario else json.dumps(datos, ensure_ascii=False).encode()
+        self.send_response(estado)
+        self.send_header('Content-Type', 'application/binary' if binario else 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _despachar(self, metodo: str):
+        url = urlparse(self.path)
+        cuerpo = self._leer_cuerpo()
+
+        if url.path.startswith('/__'):
+            return self._control(metodo, url, cuerpo)
+
+        for servicio, metodo_ruta, patron, nombre in _RUTAS:
+            coincide = patron.match(url.path)
+            if metodo == metodo_ruta and coincide:
+                break
+        else:
+            return self._json(404, {'error': f'Ruta no implementada: {metodo} {url.path}'})
+
+        inicio = time.monotonic()
+        time.sleep(self.registro.demora(servicio))
+        if self.registro.debe_fallar(servicio):
+            estado, datos = 503, {'error': 'Falla inyectada por fake_externals'}
+        else:
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            estado, datos = getattr(self, nombre)(params, cuerpo, **coincide.groupdict())
+        self.registro.registrar(servicio, metodo, url.path, cuerpo, estado, time.monotonic() - inicio)
+        self._json(estado, datos)
+
+    def do_GET(self):
+        self._despachar('GET')
+
+    def do_POST(self):
+        self._despachar('POST')
+
+    def _control(self, metodo, url, cuerpo):
+        if url.path == '/__llamadas__':
+            servicio = parse_qs(url.query).get('servicio', [None])[0]
+            return self._json(200, self.registro.filtrar(servicio))
+        if url.path == '/__reiniciar__' and metodo == 'POST':
+            self.registro.reiniciar()
+            return self._json(200, {'ok': True})
+        if url.path == '/__config__' and metodo == 'POST':
+            cuerpo = cuerpo or {}
+            self.registro.latencia_ms.update(cuerpo.get('latencia_ms', {}))
+            self.registro.errores.update(cuerpo.get('errores', {}))
+            return self._json(200, {'latencia_ms': self.registro.latencia_ms, 'errores': self.registro.errores})
+        return self._json(404, {'error': 'Ruta de control desconocida'})
+
+    # --- Google Maps -------------------------------------------------------
+
+    @staticmethod
+    def _km_entre(origen: str, destino: str) -> int:
+        """Distancia determinista a partir de los códigos postales (misma ruta → mismo valor)."""
+        a = int(re.sub(r'\D', '', origen)[:5] or 0)
+        b = int(re.sub(r'\D', '', destino)[:5] or 0)
+        return 20 + abs(a - b) % 1500
+
+    def _distance_matrix(self, params, cuerpo):
+        origen = params.get('origins', '').split(',')[0]
+        destino = params.get('destinations', '').split(',')[0]
+        km = self._km_entre(origen, destino)
+        minutos = int(km * 1.1)
+        return 200, {
+            'status': 'OK',
+            'origin_addresses': [f'{origen}, México'],
+            'destination_addresses': [f'{destino}, México'],
+            'rows': [{'elements': [{
+                'status': 'OK',
+                'distance': {'value': km * 1000, 'text': f'{km:,} km'},
+                'duration': {'value': minutos * 60, 'text': f'{minutos // 60} h {minutos % 60} min'},
+            }]}],
+        }
+
+    def _geocode(self, params, cuerpo):
+        cp = params.get('address', '').split(',')[0]
+        return 200, {
+            'status': 'OK',
+            'results': [{
+                'formatted_address': f'{cp}, México',
+                'geometry': {'location': {'lat': 19.43, 'lng': -99.13}},
+            }],
+        }
+
+    # --- Google Vision -----------------------------------------------------
+
+    def _vision(self, params, cuerpo):
+        imagenes = (cuerpo or {}).get('requests', [])
+        respuestas = []
+        for img in imagenes:
+            contenido = img.get('image', {}).get('content', '')
+            numero = str(zlib.crc32(contenido.encode()) % 10_000_000).zfill(7)
+            respuestas.append({'textAnnotations': [{'description': f'CANDADO\n{numero}\n'}]})
+        return 200, {'responses': respuestas}
+
+    # --- Twilio ------------------------------------------------------------
+
+    def _twilio_mensaje(self, params, cuerpo, sid):
+        cuerpo = cuerpo or {}
+        return 201, {
+            'sid': f'SM{uuid.uuid4().hex}',
+            'account_sid': sid,
+            'from': cuerpo.get('From'),
+            'to': cuerpo.get('To'),
+            'status': 'queued',
+            'num_segments': '1',
+            'direction': 'outbound-api',
+            'api_version': '2010-04-01',
+        }
+
+    # --- WAHA --------------------------------------------------------------
+
+    def _waha_sesion(self, params, cuerpo, sesion):
+        return 200, {'name': sesion, 'status': 'WORKING'}
+
+    def _waha_start(self, params, cuerpo, sesion):
+        return 201, {'name': sesion, 'status': 'STARTING'}
+
+    def _waha_texto(self, params, cuerpo, sesion):
+        return 201, {'id': f'true_{(cuerpo or {}).get("chatId", "")}_{uuid.uuid4().hex[:16]}'}
+
+    # --- Anthropic ---------------------------------------------------------
+
+    @staticmethod
+    def _mensaje_anthropic(cuerpo):
+        prompt = json.dumps(cuerpo.get('messages', []), ensure_ascii=False)
+        return {
+            'id': f'msg_{uuid.uuid4().hex[:24]}',
+            'type': 'message',
+            'role': 'assistant',
+            'model': cuerpo.get('model', 'fake'),
+            'content': [{'type': 'text', 'text': f'[fake_externals] Respuesta simulada ({len(prompt)} caracteres de entrada).'}],
+            'stop_reason': 'end_turn',
+            'stop_sequence': None,
+            'usage': {'input_tokens': len(prompt) // 4, 'output_tokens': 20},
+        }
+
+    def _anthropic(self, params, cuerpo):
+        return 200, self._mensaje_anthropic(cuerpo or {})
+
+    def _lote_json(self, lote_id):
+        lote = self.registro.lotes[lote_id]
+        errores = sum(1 for r in lote['resultados'] if r['result']['type'] == 'errored')
+        ahora = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        return {
+            'id': lote_id,
+            'type': 'message_batch',
+            'processing_status': 'ended',
+            'request_counts': {
+                'processing': 0, 'succeeded': len(lote['resultados']) - errores,
+                'errored': errores, 'canceled': 0, 'expired': 0,
+            },
+            'created_at': lote['creado_en'],
+            'ended_at': ahora,
+            'expires_at': ahora,
+            'archived_at': None,
+            'cancel_initiated_at': None,
+            'results_url': f"http://{self.headers.get('Host')}/anthropic/v1/messages/batches/{lote_id}/results",
+        }
+
+    def _anthropic_lote_crear(self, params, cuerpo):
+        lote_id = f'msgbatch_{uuid.uuid4().hex[:24]}'
+        resultados = []
+        for solicitud in (cuerpo or {}).get('requests', []):
+            # Cada solicitud del lote puede fallar por separado con la tasa de 'anthropic'
+            if self.registro.debe_fallar('anthropic'):
+                resultado = {'type': 'errored', 'error': {
+                    'type': 'error', 'error': {'type': 'api_error', 'message': 'Falla inyectada por fake_externals'},
+                }}
+            else:
+                resultado = {'type': 'succeeded', 'message': self._mensaje_anthropic(solicitud.get('params', {}))}
+            resultados.append({'custom_id': solicitud.get('custom_id'), 'result': resultado})
+        self.registro.lotes[lote_id] = {
+            'creado_en': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'resultados': resultados,
+        }
+        return 200, self._lote_json(lote_id)
+
+    def _anthropic_lote(self, params, cuerpo, lote):
+        if lote not in self.registro.lotes:
+            return 404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': lote}}
+        return 200, self._lote_json(lote)
+
+    def _anthropic_lote_resultados(self, params, cuerpo, lote):
+        if lote not in self.registro.lotes:
+            return 404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': lote}}
+        lineas = [json.dumps(r, ensure_ascii=False) for r in self.registro.lotes[lote]['resultados']]
+        return 200, ('\n'.join(lineas) + '\n').encode()
+
+
+class ServidorHTTP(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, direccion, registro: Registro):
+        self.registro = registro
+        super().__init__(direccion, _Handler)
+
+
+# ---------------------------------------------------------------------------
+# SMTP
+# ---------------------------------------------------------------------------
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """SMTP mínimo: EHLO/HELO, AUTH PLAIN, MAIL, RCPT, DATA, RSET, NOOP, QUIT."""
+
+    def _responder(self, linea: str):
+        self.wfile.write((linea + '\r\n').encode())
+
+    def handle(self):
+        registro = self.server.registro
+        remitente, destinatarios = None, []
+        self._responder('220 fake_externals ESMTP')
+        while True:
+            crudo = self.rfile.readline()
+            if not crudo:
+                return
+            linea = crudo.decode(errors='replace').rstrip('\r\n')
+            comando = linea.split(' ', 1)[0].upper()
+
+            if comando == 'EHLO':
+                self._responder('250-fake_externals')
+                self._responder('250-AUTH PLAIN')
+                self._responder('250 8BITMIME')
+            elif comando == 'HELO':
+                self._responder('250 fake_externals')
+            elif comando == 'AUTH':
+                self._responder('235 2.7.0 Authentication successful')
+            elif comando == 'MAIL':
+                remitente, destinatarios = linea[10:].strip('<> '), []
+                self._responder('250 OK')
+            elif comando == 'RCPT':
+                destinatarios.append(linea[8:].strip('<> '))
+                self._responder('250 OK')
+            elif comando == 'DATA':
+                self._responder('354 End data with <CR><LF>.<CR><LF>')
+                inicio = time.monotonic()
+                partes = []
+                while True:
+                    dato = self.rfile.readline()
+                    if not dato or dato in (b'.\r\n', b'.\n'):
+                        break
+                    partes.append(dato)
+                time.sleep(registro.demora('smtp'))
+                fallo = registro.debe_fallar('smtp')
+                mensaje = b''.join(partes).decode(errors='replace')
+                asunto = re.search(r'^Subject: (.*?)\r?$', mensaje, re.M)
+                registro.registrar(
+                    'smtp', 'DATA', 'smtp',
+                    {'from': remitente, 'to': destinatarios, 'asunto': asunto.group(1) if asunto else ''},
+                    451 if fallo else 250, time.monotonic() - inicio,
+                )
+                self._responder('451 Falla inyectada por fake_externals' if fallo else '250 OK: queued')
+            elif comando in ('RSET', 'NOOP'):
+                self._responder('250 OK')
+            elif comando == 'QUIT':
+                self._responder('221 Bye')
+                return
+            else:
+                self._responder('502 Command not implemented')
+
+
+class ServidorSMTP(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, direccion, registro: Registro):
+        self.registro = registro
+        super().__init__(direccion, _SMTPHandler)
+
+
+def iniciar(host='127.0.0.1', puerto=0, puerto_smtp=0, registro: Registro | None = None):
+    """
+    Levanta ambos servidores en hilos de fondo (útil en pruebas).
+
+    Returns (servidor_http, servidor_smtp, registro). Llamar `detener()` al terminar.
+    """
+    registro = registro or Registro()
+    http = ServidorHTTP((host, puerto), registro)
+    smtp = ServidorSMTP((host, puerto_smtp), registro)
+    for servidor in (http, smtp):
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return http, smtp, registro
+
+
+def detener(*servidores):
+    for servidor in servidores:
+        servidor.shutdown()
+        servidor.server_close()
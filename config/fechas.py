@@ -0,0 +1,118 @@
+"""
+Filtros por fecha local sobre DateTimeField que sí usan los índices.
+
+Con USE_TZ=True, `fecha_hora_inicio__date__gte=desde` se compila a una
+conversión de zona horaria + cast por fila (en PostgreSQL,
+`(fecha_hora_inicio AT TIME ZONE 'America/Mexico_City')::date >= ...`), así
+que los índices B-tree sobre la columna —p. ej. (unidad, -fecha_hora_inicio)—
+no se pueden usar. Aquí el día local se convierte una sola vez a límites
+aware semiabiertos [desde 00:00 local, hasta+1 00:00 local) y la columna se
+compara tal cual.
+
+Lookups registrados en DateTimeField (config.apps):
+
+    CargaCombustible.objects.filter(fecha_hora_inicio__desde_dia=desde)   # >= desde 00:00
+    CargaCombustible.objects.filter(fecha_hora_inicio__hasta_dia=hasta)   # <  hasta+1 00:00
+
+Helpers para construir el filtro completo (aceptan date, 'YYYY-MM-DD' o None):
+
+    qs.filter(rango_dias('fecha_salida', fecha_desde, fecha_hasta))
+    qs.filter(en_dia('fecha_creacion', dia))
+    Count('id', filter=rango_dias('carga__fecha_hora_inicio', desde, hasta))
+
+Una fecha que no se puede interpretar se trata como "sin límite" (los filtros
+de las vistas vienen de request.GET).
+"""
+
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import DateTimeField, Q
+from django.db.models.lookups import GreaterThanOrEqual, LessThan
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+def a_fecha(valor):
+    """date, datetime o 'YYYY-MM-DD' → date local; None si no se puede interpretar."""
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, datetime):
+        return timezone.localdate(valor) if timezone.is_aware(valor) else valor.date()
+    if isinstance(valor, date):
+        return valor
+    try:
+        return parse_date(str(valor).strip())
+    except ValueError:
+        return None
+
+
+def inicio_dia(fecha) -> datetime:
+    """00:00 local del día `fecha`, como datetime aware."""
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def limites_dias(desde=None, hasta=None):
+    """
+    (inicio, fin) aware del rango local [desde, hasta], ambos días inclusive:
+    inicio = desde 00:00, fin = día siguiente a `hasta` 00:00 (exclusivo).
+    Cualquiera de los dos es None si su fecha lo es.
+    """
+    desde, hasta = a_fecha(desde), a_fecha(hasta)
+    return (
+        inicio_dia(desde) if desde else None,
+        inicio_dia(hasta + timedelta(days=1)) if hasta else None,
+    )
+
+
+def rango_dias(campo: str, desde=None, hasta=None) -> Q:
+    """Q de `campo` dentro de los días locales [desde, hasta] (None = sin límite)."""
+    inicio, fin = limites_dias(desde, hasta)
+    filtro = Q()
+    if inicio:
+        filtro &= Q(**{f'{campo}__gte': inicio})
+    if fin:
+        filtro &= Q(**{f'{campo}__lt': fin})
+    return filtro
+
+
+def en_dia(campo: str, dia) -> Q:
+    """Q de `campo` dentro del día local `dia`."""
+    return rango_dias(campo, dia, dia)
+
+
+class _LookupDia:
+    """Convierte el lado derecho (un día local) en su límite aware antes de compararlo."""
+
+    desplazamiento = 0
+
+    def get_prep_lookup(self):
+        if hasattr(self.rhs, 'resolve_expression'):
+            return super().get_prep_lookup()
+        fecha = a_fecha(self.rhs)
+        if fecha is None:
+            raise ValueError(f"{self.lookup_name} requiere una fecha, se recibió {self.rhs!r}")
+        self.rhs = inicio_dia(fecha + timedelta(days=self.desplazamiento))
+        return super().get_prep_lookup()
+
+    def get_rhs_op(self, connection, rhs):
+        return connection.operators[self.operador] % rhs
+
+
+class DesdeDia(_LookupDia, GreaterThanOrEqual):
+    """campo__desde_dia=fecha  →  campo >= fecha 00:00 local."""
+
+    lookup_name = 'desde_dia'
+    operador = 'gte'
+
+
+class HastaDia(_LookupDia, LessThan):
+    """campo__hasta_dia=fecha  →  campo < (fecha + 1) 00:00 local."""
+
+    lookup_name = 'hasta_dia'
+    operador = 'lt'
+    desplazamiento = 1
+
+
+def registrar_lookups():
+    DateTimeField.register_lookup(DesdeDia)
+    DateTimeField.register_lookup(HastaDia)
@@ -0,0 +1,521 @@
+"""
+Flota sintética para pruebas de rendimiento (`manage.py seed_benchmark`).
+
+Genera operadores, unidades, bitácoras, cargas de combustible (con metadatos
+de fotos y candados), alertas, movimientos de almacén, órdenes de trabajo y
+modulaciones con volúmenes parecidos a los de producción por unidad y año
+(VOLUMEN_POR_UNIDAD_ANIO). Todo se inserta con bulk_create; los campos que
+normalmente calculan save() o las señales (ingreso_calculado, costo_calculado,
+tiempo_carga_minutos, PrecioDieselMensual, FactCombustibleDiario,
+RegistroCandado) se llenan aquí mismo.
+
+Los registros sintéticos se reconocen por el prefijo PREFIJO (número
+económico, SKU, folios, nombres), así que `limpiar()` los borra sin tocar
+datos reales. Con la misma semilla se genera exactamente la misma flota.
+"""
+
+import logging
+import random
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.signals import post_delete
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PREFIJO = 'BX'
+USUARIO = 'bx_benchmark'
+
+VOLUMEN_POR_UNIDAD_ANIO = {
+    'ordenes_trabajo': 6,
+    'modulaciones': 40,
+    'entradas_almacen': 4,
+    'salidas_consumible': 12,
+    'asignaciones_directas': 6,
+}
+PRODUCTOS_ALMACEN = 150
+CLIENTES = 30
+
+_CP_DESTINOS = ['06600', '44100', '64000', '76000', '72000', '20000', '78000', '37000', '58000', '28000']
+_ESTADOS_CANDADO = [('NORMAL', 0.95), ('ALTERADO', 0.025), ('VIOLADO', 0.01), ('SIN_CANDADO', 0.015)]
+_ALERTA_CANDADO = {'ALTERADO': 'CANDADO_ALTERADO', 'VIOLADO': 'CANDADO_VIOLADO', 'SIN_CANDADO': 'SIN_CANDADO'}
+_ALERTAS_IA = ['CONSUMO_ATIPICO', 'RENDIMIENTO_ANOMALO', 'TIEMPO_CARGA_ATIPICO', 'FRECUENCIA_IRREGULAR']
+_LOTE = 1000
+
+
+def _elegir_ponderado(rng, opciones):
+    valor = rng.random()
+    for opcion, peso in opciones:
+        valor -= peso
+        if valor <= 0:
+            return opcion
+    return opciones[-1][0]
+
+
+def _foto(carpeta, fecha, nombre):
+    return f'combustible/{carpeta}/{fecha:%Y/%m}/{nombre}.jpg'
+
+
+@contextmanager
+def _sin_borrado_de_archivos():
+    """Las fotos sintéticas no existen en el storage: no intentar borrarlas una por una."""
+    from config.storage_backends import delete_file_on_model_delete
+
+    post_delete.disconnect(delete_file_on_model_delete)
+    try:
+        yield
+    finally:
+        post_delete.connect(delete_file_on_model_delete)
+
+
+def limpiar() -> int:
+    """Borra la flota sintética (todo lo marcado con PREFIJO). Retorna unidades borradas."""
+    from modulos.bitacoras.models import BitacoraViaje, Cliente
+    from modulos.combustible.models import CargaCombustible, Despachador, FactCombustibleDiario
+    from modulos.finanzas.models import PrecioDieselMensual, RecepcionPipa
+    from modulos.modulacion.models import Agencia, Modulacion, TerminalPortuaria
+    from modulos.operadores.models import Operador
+    from modulos.almacen.models import ProductoAlmacen
+    from modulos.taller.models import OrdenTrabajo, TipoMantenimiento
+    from modulos.unidades.models import Unidad
+
+    with transaction.atomic(), _sin_borrado_de_archivos():
+        unidades = Unidad.objects.filter(numero_economico__startswith=PREFIJO)
+        Modulacion.objects.filter(folio__startswith=PREFIJO).delete()
+        BitacoraViaje.objects.filter(unidad__in=unidades).delete()
+        CargaCombustible.objects.filter(unidad__in=unidades).delete()
+        FactCombustibleDiario.objects.filter(unidad__in=unidades).delete()
+        OrdenTrabajo.objects.filter(unidad__in=unidades).delete()
+        Operador.objects.filter(nombre__startswith=f'{PREFIJO} ').delete()
+        Despachador.objects.filter(nombre__startswith=f'{PREFIJO} ').delete()
+        ProductoAlmacen.objects.filter(sku__startswith=f'{PREFIJO}-').delete()
+        User.objects.filter(username=USUARIO).delete()
+        total = unidades.count()
+        unidades.delete()
+        Cliente.objects.filter(nombre__startswith=f'{PREFIJO} ').delete()
+        Agencia.objects.filter(nombre__startswith=f'{PREFIJO} ').delete()
+        TerminalPortuaria.objects.filter(nombre__startswith=f'{PREFIJO} ').delete()
+        TipoMantenimiento.objects.filter(nombre__startswith=f'{PREFIJO} ').delete()
+
+        pipas = RecepcionPipa.objects.filter(proveedor=f'{PREFIJO} sintético')
+        meses = set(pipas.values_list('fecha__year', 'fecha__month'))
+        pipas.delete()
+        for anio, mes in meses:
+            PrecioDieselMensual.recalcular(anio, mes)
+    return total
+
+
+class GeneradorFlota:
+    """
+    Uso:
+        resumen = GeneradorFlota(unidades=50, anios=2, semilla=7).generar()
+        # {'unidades': 50, 'bitacoras': ..., 'cargas': ..., ...}
+    """
+
+    def __init__(self, unidades: int, anios: float, semilla: int = 0, ahora=None):
+        self.n_unidades = unidades
+        self.anios = anios
+        self.rng = random.Random(semilla)
+        self.ahora = ahora or timezone.now()
+        hoy = timezone.localdate(self.ahora)
+        self.desde = hoy - timedelta(days=max(1, round(365 * anios)))
+        self.resumen = defaultdict(int)
+        self._folios = defaultdict(int)
+
+    # ------------------------------------------------------------------
+    # Utilidades
+    # ------------------------------------------------------------------
+
+    def _folio(self, tipo: str) -> str:
+        self._folios[tipo] += 1
+        return f'{PREFIJO}{tipo}{self._folios[tipo]:08d}'
+
+    def _momento_aleatorio(self):
+        segundos = (self.ahora - self._inicio).total_seconds()
+        return self._inicio + timedelta(seconds=self.rng.uniform(0, segundos))
+
+    def _crear(self, modelo, objetos, clave=None):
+        modelo.objects.bulk_create(objetos, batch_size=_LOTE)
+        self.resumen[clave or modelo._meta.model_name] += len(objetos)
+        return objetos
+
+    # ------------------------------------------------------------------
+    # Generación
+    # ------------------------------------------------------------------
+
+    def generar(self) -> dict:
+        self._inicio = timezone.make_aware(datetime.combine(self.desde, time(6, 0)))
+        with transaction.atomic():
+            self._catalogos()
+            self._precios_diesel()
+            self._flota()
+            for unidad in self.unidades:
+                self._operacion_unidad(unidad)
+            self._ordenes_trabajo()
+            self._modulaciones()
+            self._almacen()
+            self._fechas_auto_now_add()
+
+        from modulos.combustible import candados
+        from modulos.combustible.hechos import reconstruir
+        self.resumen['celdas_hechos_combustible'] = reconstruir(self.desde, None)
+        self.resumen['registros_candado'] = candados.reconstruir()
+        logger.info("Flota sintética: %d unidad(es) desde %s — %s", self.n_unidades, self.desde, dict(self.resumen))
+        return dict(self.resumen)
+
+    def _catalogos(self):
+        from modulos.bitacoras.models import Cliente
+        from modulos.combustible.models import Despachador
+        from modulos.finanzas.models import TarifaKilometro
+        from modulos.modulacion.models import Agencia, TerminalPortuaria
+        from modulos.taller.models import TipoMantenimiento
+
+        self.usuario, _ = User.objects.get_or_create(username=USUARIO, defaults={'is_active': False})
+        self.clientes = self._crear(Cliente, [Cliente(nombre=f'{PREFIJO} Cliente {i:03d}') for i in range(CLIENTES)])
+        self.despachadores = self._crear(Despachador, [
+            Despachador(nombre=f'{PREFIJO} Despachador {i:03d}')
+            for i in range(max(3, self.n_unidades // 20))
+        ])
+        self.agencias = self._crear(Agencia, [Agencia(nombre=f'{PREFIJO} Agencia {i}') for i in range(4)])
+        self.terminales = self._crear(
+            TerminalPortuaria, [TerminalPortuaria(nombre=f'{PREFIJO} Terminal {i}') for i in range(3)],
+        )
+        self.tipos_mantenimiento = self._crear(TipoMantenimiento, [
+            TipoMantenimiento(nombre=f'{PREFIJO} {nombre}', tipo=tipo, descripcion=nombre)
+            for nombre, tipo in [
+                ('Servicio 10,000 km', 'PREVENTIVO'), ('Frenos', 'CORRECTIVO'),
+                ('Suspensión', 'CORRECTIVO'), ('Análisis de aceite', 'PREDICTIVO'),
+            ]
+        ])
+        if not TarifaKilometro.objects.exists():
+            TarifaKilometro.objects.create(valor=Decimal('28.00'), vigente_desde=self.desde - timedelta(days=1))
+        self._tarifas = {}
+
+    def _tarifa(self, fecha):
+        from modulos.finanzas.models import TarifaKilometro
+        if fecha not in self._tarifas:
+            tarifa = TarifaKilometro.vigente_en(fecha)
+            self._tarifas[fecha] = tarifa.valor if tarifa else None
+        return self._tarifas[fecha]
+
+    def _precios_diesel(self):
+        from modulos.finanzas.models import PrecioDieselMensual, RecepcionPipa
+
+        pipas = []
+        meses = []
+        fecha = self.desde.replace(day=1)
+        precio = Decimal('22.50')
+        while fecha <= timezone.localdate(self.ahora):
+            meses.append((fecha.year, fecha.month))
+            for dia in (3, 17):
+                litros = Decimal(self.rng.randrange(28000, 32000))
+                precio_pipa = precio + Decimal(str(round(self.rng.uniform(-0.3, 0.3), 2)))
+                pipas.append(RecepcionPipa(
+                    fecha=fecha.replace(day=dia), litros=litros, costo_total=(litros * precio_pipa).quantize(Decimal('0.01')),
+                    proveedor=f'{PREFIJO} sintético',
+                ))
+            precio += Decimal(str(round(self.rng.uniform(-0.1, 0.25), 2)))
+            fecha = (fecha + timedelta(days=32)).replace(day=1)
+        self._crear(RecepcionPipa, pipas)
+        for anio, mes in meses:
+            PrecioDieselMensual.recalcular(anio, mes)
+        self._precio_mes = {
+            (p.anio, p.mes): p.precio_promedio_litro for p in PrecioDieselMensual.objects.all()
+        }
+
+    def _precio_en(self, fecha):
+        candidatos = [clave for clave in self._precio_mes if clave <= (fecha.year, fecha.month)]
+        return self._precio_mes[max(candidatos)] if candidatos else None
+
+    def _flota(self):
+        from modulos.operadores.models import Operador
+        from modulos.unidades.models import Unidad
+
+        tipos = [('FORANEA', 0.6), ('LOCAL', 0.3), ('ESPERANZA', 0.1)]
+        self.unidades = self._crear(Unidad, [
+            Unidad(
+                numero_economico=f'{PREFIJO}{i:04d}',
+                placa=f'{PREFIJO}-{i:05d}',
+                tipo=_elegir_ponderado(self.rng, tipos),
+                marca=self.rng.choice(['Kenworth', 'Freightliner', 'International', 'Volvo']),
+                modelo='T680',
+                año=self.rng.randint(2012, 2025),
+                capacidad_combustible=Decimal(self.rng.choice([600, 800, 1000, 1200])),
+                rendimiento_esperado=Decimal(str(round(self.rng.uniform(2.2, 3.2), 2))),
+                kilometraje_actual=self.rng.randint(50_000, 600_000),
+            )
+            for i in range(1, self.n_unidades + 1)
+        ])
+        operadores = []
+        for i, unidad in enumerate(self.unidades):
+            tipo_operador = {'FORANEA': 'FORANEO', 'LOCAL': 'LOCAL', 'ESPERANZA': 'ESPERANZA'}[unidad.tipo]
+            operadores.append(Operador(nombre=f'{PREFIJO} Operador {i:04d}', tipo=tipo_operador, unidad_asignada=unidad))
+            if self.rng.random() < 0.2:
+                operadores.append(Operador(nombre=f'{PREFIJO} Operador {i:04d}-B', tipo=tipo_operador))
+        self.operadores = self._crear(Operador, operadores)
+        self._operador_de = {op.unidad_asignada_id: op for op in self.operadores if op.unidad_asignada_id}
+        self._km_de = {}
+
+    def _operacion_unidad(self, unidad):
+        """Viajes encadenados; carga de diésel cuando se consumió ~60% del tanque."""
+        from modulos.bitacoras.models import BitacoraViaje
+        from modulos.combustible.models import AlertaCombustible, CargaCombustible, FotoCandadoNuevo
+
+        foranea = unidad.tipo == 'FORANEA'
+        rendimiento = float(unidad.rendimiento_esperado)
+        capacidad = float(unidad.capacidad_combustible)
+        km = unidad.kilometraje_actual
+        momento = self._inicio + timedelta(hours=self.rng.uniform(0, 48))
+        litros_consumidos = 0.0
+        candado = f'{self.rng.randrange(10**6, 10**7)}'
+        operador = self._operador_de[unidad.pk]
+        despachador = self.rng.choice(self.despachadores)
+        bitacoras, cargas, kilometrajes = [], [], []
+
+        while True:
+            distancia = self.rng.uniform(250, 900) if foranea else self.rng.uniform(20, 120)
+            salida = momento
+            llegada = salida + timedelta(hours=distancia / self.rng.uniform(55, 75))
+            if llegada > self.ahora:
+                break
+            km_salida, km = km, km + round(distancia * self.rng.uniform(1.0, 1.06))
+            tarifa = self._tarifa(timezone.localdate(llegada))
+            distancia_calculada = Decimal(str(round(distancia, 2)))
+            bitacoras.append(BitacoraViaje(
+                cliente=self.rng.choice(self.clientes), operador=operador, unidad=unidad,
+                modalidad=self.rng.choice(['SENCILLO', 'FULL'] if foranea else ['LOCAL', 'LOCAL_FULL']),
+                contenedor=f'{PREFIJO}U{self.rng.randrange(10**6, 10**7)}',
+                peso=Decimal(str(round(self.rng.uniform(8, 28), 2))),
+                fecha_carga=salida - timedelta(hours=2), fecha_salida=salida, fecha_llegada=llegada,
+                kilometraje_salida=km_salida, kilometraje_llegada=km,
+                cp_destino=self.rng.choice(_CP_DESTINOS), destino='Destino sintético',
+                distancia_calculada=distancia_calculada,
+                duracion_estimada=round(distancia / 65 * 60),
+                sellos=f'{self.rng.randrange(10**5, 10**6)}',
+                completado=True,
+                ingreso_calculado=(distancia_calculada * tarifa).quantize(Decimal('0.01')) if tarifa else None,
+            ))
+            kilometrajes.append((llegada, km))
+            litros_consumidos += distancia / rendimiento
+
+            if litros_consumidos >= capacidad * 0.6:
+                inicio_carga = llegada + timedelta(minutes=self.rng.uniform(20, 180))
+                if inicio_carga > self.ahora:
+                    break
+                fin_carga = inicio_carga + timedelta(minutes=self.rng.uniform(6, 25))
+                litros = Decimal(str(round(min(capacidad, litros_consumidos * self.rng.uniform(0.95, 1.08)), 2)))
+                estado = 'CANCELADO' if self.rng.random() < 0.02 else 'COMPLETADO'
+                estado_candado = _elegir_ponderado(self.rng, _ESTADOS_CANDADO)
+                precio = self._precio_en(timezone.localdate(inicio_carga))
+                n = len(cargas)
+                carga = CargaCombustible(
+                    despachador=despachador if self.rng.random() < 0.8 else self.rng.choice(self.despachadores),
+                    unidad=unidad, cantidad_litros=litros, kilometraje_actual=km,
+                    nivel_combustible_inicial=self.rng.choice(['VACIO', 'CUARTO', 'MEDIO']),
+                    estado_candado_anterior=estado_candado,
+                    fecha_hora_inicio=inicio_carga,
+                    fecha_hora_fin=fin_carga if estado == 'COMPLETADO' else None,
+                    tiempo_carga_minutos=int((fin_carga - inicio_carga).total_seconds() / 60) if estado == 'COMPLETADO' else None,
+                    foto_numero_economico=_foto('numero_economico', inicio_carga, f'{unidad.numero_economico}_{n}'),
+                    foto_tablero=_foto('tablero', inicio_carga, f'{unidad.numero_economico}_{n}'),
+                    foto_candado_anterior=_foto('candado_anterior', inicio_carga, f'{unidad.numero_economico}_{n}') if foranea else None,
+                    foto_candado_nuevo=_foto('candado_nuevo', inicio_carga, f'{unidad.numero_economico}_{n}') if foranea else None,
+                    foto_ticket=_foto('tickets', inicio_carga, f'{unidad.numero_economico}_{n}'),
+                    tipo_flujo='FORANEO' if foranea else 'LOCAL',
+                    estado=estado,
+                    numero_candado_anterior=candado if foranea else '',
+                    ocr_candado_anterior_ok=foranea and self.rng.random() < 0.9,
+                    costo_calculado=(litros * precio).quantize(Decimal('0.01')) if precio and estado == 'COMPLETADO' else None,
+                )
+                cargas.append(carga)
+                if estado == 'COMPLETADO':
+                    litros_consumidos = 0.0
+                    candado = f'{self.rng.randrange(10**6, 10**7)}'
+            momento = llegada + timedelta(hours=self.rng.uniform(8, 60) if foranea else self.rng.uniform(2, 20))
+
+        self._crear(BitacoraViaje, bitacoras, 'bitacoras')
+        self._crear(CargaCombustible, cargas, 'cargas')
+        self._km_de[unidad.pk] = kilometrajes
+
+        fotos, alertas = [], []
+        for carga in cargas:
+            if carga.tipo_flujo == 'FORANEO':
+                fotos.append(FotoCandadoNuevo(
+                    carga=carga, foto=carga.foto_candado_nuevo.name, descripcion='Tanque 1',
+                    numero_candado=f'{self.rng.randrange(10**6, 10**7)}', ocr_procesado=True,
+                ))
+            if carga.estado != 'COMPLETADO':
+                continue
+            if carga.tipo_flujo == 'FORANEO' and carga.estado_candado_anterior in _ALERTA_CANDADO:
+                alertas.append(AlertaCombustible(
+                    carga=carga, tipo_alerta=_ALERTA_CANDADO[carga.estado_candado_anterior],
+                    mensaje=f'Candado {carga.get_estado_candado_anterior_display().lower()}',
+                    resuelta=self.rng.random() < 0.7,
+                ))
+            if self.rng.random() < 0.04:
+                alertas.append(AlertaCombustible(
+                    carga=carga, tipo_alerta=self.rng.choice(_ALERTAS_IA),
+                    mensaje='Anomalía estadística (sintética)',
+                    score_riesgo=_elegir_ponderado(self.rng, [('BAJO', 0.4), ('MEDIO', 0.35), ('ALTO', 0.2), ('CRITICO', 0.05)]),
+                    datos_estadisticos={'z_score': round(self.rng.uniform(2, 5), 2)},
+                    generada_por_ia=True, resuelta=self.rng.random() < 0.5,
+                ))
+        self._crear(FotoCandadoNuevo, fotos, 'fotos_candado')
+        self._crear(AlertaCombustible, alertas, 'alertas')
+
+    def _cantidad_por_unidad(self, clave) -> int:
+        return max(1, round(VOLUMEN_POR_UNIDAD_ANIO[clave] * self.anios))
+
+    def _ordenes_trabajo(self):
+        from modulos.taller.models import OrdenTrabajo
+
+        ordenes = []
+        for unidad in self.unidades:
+            kilometrajes = self._km_de[unidad.pk] or [(self._inicio, unidad.kilometraje_actual)]
+            for _ in range(self._cantidad_por_unidad('ordenes_trabajo')):
+                ingreso, km = self.rng.choice(kilometrajes)
+                fin = ingreso + timedelta(hours=self.rng.uniform(3, 120))
+                completada = fin < self.ahora and self.rng.random() < 0.9
+                ordenes.append(OrdenTrabajo(
+                    folio=self._folio('OT'), unidad=unidad, operador_reporta=self._operador_de[unidad.pk],
+                    tipo_mantenimiento=self.rng.choice(self.tipos_mantenimiento),
+                    descripcion_problema='Orden sintética',
+                    prioridad=self.rng.choice(['BAJA', 'MEDIA', 'MEDIA', 'ALTA', 'CRITICA']),
+                    fecha_inicio_real=ingreso, fecha_finalizacion=fin if completada else None,
+                    kilometraje_ingreso=km, kilometraje_salida=km if completada else None,
+                    estado='COMPLETADA' if completada else self.rng.choice(['PENDIENTE', 'EN_REPARACION', 'ESPERANDO_PIEZAS']),
+                    costo_estimado_mano_obra=Decimal(self.rng.randrange(500, 8000)),
+                    costo_real_mano_obra=Decimal(self.rng.randrange(500, 9000)) if completada else Decimal('0'),
+                    creada_por=self.usuario,
+                ))
+        self._crear(OrdenTrabajo, ordenes, 'ordenes_trabajo')
+
+    def _modulaciones(self):
+        from modulos.modulacion.models import Modulacion
+
+        estados = [('ENVIADO_BITACORA', 0.5), ('MODULADO', 0.2), ('EN_PATIO_ESPERANZA', 0.1),
+                   ('RETIRADO_TERCERO', 0.1), ('PENDIENTE', 0.1)]
+        modulaciones = []
+        for _ in range(self._cantidad_por_unidad('modulaciones') * self.n_unidades):
+            recepcion = self._momento_aleatorio()
+            modulaciones.append(Modulacion(
+                folio=self._folio('M'), agencia=self.rng.choice(self.agencias),
+                terminal_portuaria=self.rng.choice(self.terminales),
+                tipo_contenedor=self.rng.choice(['20DC', '40DC', '40HC']),
+                peso_toneladas=Decimal(str(round(self.rng.uniform(5, 28), 2))),
+                contenedor=f'{PREFIJO}U{self.rng.randrange(10**6, 10**7)}',
+                cliente=self.rng.choice(self.clientes),
+                origen=self.rng.choice(['HAL9MIL', 'MANUAL']),
+                estado=_elegir_ponderado(self.rng, estados),
+                fecha_recepcion=recepcion,
+            ))
+        self._crear(Modulacion, modulaciones, 'modulaciones')
+
+    def _almacen(self):
+        from modulos.almacen.models import (
+            AsignacionDirectaAlmacen, EntradaAlmacen, ItemEntradaAlmacen, MovimientoAlmacen,
+            ProductoAlmacen, SalidaRapidaConsumible,
+        )
+
+        categorias = ['Filtros', 'Lubricantes', 'Frenos', 'Eléctrico', 'Llantas', 'Consumibles']
+        productos = self._crear(ProductoAlmacen, [
+            ProductoAlmacen(
+                categoria=categorias[i % len(categorias)], sku=f'{PREFIJO}-{i:05d}',
+                descripcion=f'Producto sintético {i}', localidad=f'Pasillo {chr(65 + i % 6)}',
+                cantidad=Decimal('0'), unidad_medida='Pieza',
+                stock_minimo=Decimal(self.rng.randrange(2, 20)), stock_maximo=Decimal(200),
+                costo_unitario=Decimal(str(round(self.rng.uniform(20, 4000), 2))),
+                es_consumible=categorias[i % len(categorias)] in ('Consumibles', 'Lubricantes'),
+            )
+            for i in range(PRODUCTOS_ALMACEN)
+        ], 'productos_almacen')
+        consumibles = [p for p in productos if p.es_consumible]
+
+        # (fecha, producto, cantidad firmada, tipo, entrada)
+        eventos = []
+        entradas, items = [], []
+        for _ in range(self._cantidad_por_unidad('entradas_almacen') * self.n_unidades):
+            fecha = self._momento_aleatorio()
+            entrada = EntradaAlmacen(
+                tipo=self.rng.choice(['ENTRADA_DIRECTA', 'FACTURA']), folio=self._folio('E'),
+                fecha_entrada=fecha, recibido_por=self.usuario,
+                factura_numero=f'F{self.rng.randrange(10**5, 10**6)}',
+            )
+            entradas.append(entrada)
+            for producto in self.rng.sample(productos, 3):
+                cantidad = Decimal(self.rng.randrange(10, 60))
+                items.append(ItemEntradaAlmacen(
+                    entrada=entrada, producto_almacen=producto, cantidad=cantidad,
+                    costo_unitario=producto.costo_unitario,
+                ))
+                eventos.append((fecha, producto, cantidad, 'ENTRADA', entrada))
+        self._crear(EntradaAlmacen, entradas, 'entradas_almacen')
+        self._crear(ItemEntradaAlmacen, items, 'items_entrada_almacen')
+
+        salidas = []
+        for _ in range(self._cantidad_por_unidad('salidas_consumible') * self.n_unidades):
+            fecha = self._momento_aleatorio()
+            producto = self.rng.choice(consumibles)
+            cantidad = Decimal(self.rng.randrange(1, 6))
+            salidas.append(SalidaRapidaConsumible(
+                folio=self._folio('C'), producto=producto, cantidad=cantidad,
+                entregado_por=self.usuario, solicitante='Operador sintético',
+                unidad=self.rng.choice(self.unidades), fecha_salida=fecha,
+            ))
+            eventos.append((fecha, producto, -cantidad, 'SALIDA', None))
+        self._crear(SalidaRapidaConsumible, salidas, 'salidas_consumible')
+
+        asignaciones = []
+        for _ in range(self._cantidad_por_unidad('asignaciones_directas') * self.n_unidades):
+            fecha = self._momento_aleatorio()
+            producto = self.rng.choice(productos)
+            cantidad = Decimal(self.rng.randrange(1, 4))
+            asignaciones.append(AsignacionDirectaAlmacen(
+                folio=self._folio('A'), producto=producto, unidad=self.rng.choice(self.unidades),
+                cantidad=cantidad, motivo='Reparación rápida (sintética)', entregado_por=self.usuario,
+                fecha_asignacion=fecha,
+            ))
+            eventos.append((fecha, producto, -cantidad, 'SALIDA', None))
+        self._crear(AsignacionDirectaAlmacen, asignaciones, 'asignaciones_directas')
+
+        # Existencias coherentes: se recorre la historia en orden y se ajusta si quedaría negativo
+        existencias = {p.pk: Decimal(self.rng.randrange(20, 120)) for p in productos}
+        movimientos = []
+        for fecha, producto, cantidad, tipo, entrada in sorted(eventos, key=lambda e: e[0]):
+            anterior = existencias[producto.pk]
+            if anterior + cantidad < 0:
+                movimientos.append(MovimientoAlmacen(
+                    tipo='AJUSTE', producto_almacen=producto, cantidad=-cantidad,
+                    cantidad_anterior=anterior, cantidad_posterior=anterior - cantidad,
+                    fecha_movimiento=fecha - timedelta(minutes=5), usuario=self.usuario,
+                ))
+                anterior -= cantidad
+            existencias[producto.pk] = anterior + cantidad
+            movimientos.append(MovimientoAlmacen(
+                tipo=tipo, producto_almacen=producto, cantidad=cantidad,
+                cantidad_anterior=anterior, cantidad_posterior=existencias[producto.pk],
+                entrada_almacen=entrada, fecha_movimiento=fecha, usuario=self.usuario,
+            ))
+        self._crear(MovimientoAlmacen, movimientos, 'movimientos_almacen')
+        for producto in productos:
+            producto.cantidad = existencias[producto.pk]
+        ProductoAlmacen.objects.bulk_update(productos, ['cantidad'], batch_size=_LOTE)
+
+    def _fechas_auto_now_add(self):
+        """bulk_create deja auto_now_add en "ahora"; se llevan a la fecha del evento."""
+        from django.db.models import F
+        from modulos.combustible.models import AlertaCombustible, CargaCombustible
+        from modulos.taller.models import OrdenTrabajo
+
+        OrdenTrabajo.objects.filter(folio__startswith=f'{PREFIJO}OT').update(fecha_creacion=F('fecha_inicio_real'))
+        AlertaCombustible.objects.filter(carga__unidad__in=self.unidades).update(
+            fecha_generacion=Subquery(
+                CargaCombustible.objects.filter(pk=OuterRef('carga_id')).values('fecha_hora_inicio')[:1]
+            ),
+        )
@@ -0,0 +1,93 @@
+"""
+Management command: bench
+
+Mide las rutas calientes (config/bench.py): IndexView, dashboards, listas con
+filtros, calcular_reporte_utilidad, cada generador de reportes y
+AnalizadorCombustible.analizar_carga. Registra consultas, p50/p95 y pico de
+memoria, y falla si hay regresiones contra el baseline.
+
+Uso:
+    python manage.py seed_benchmark --unidades 100 --anios 3
+    python manage.py bench --guardar                      # escribe el baseline
+    python manage.py bench                                # compara contra el baseline
+    python manage.py bench --solo dashboard --repeticiones 20 --umbral 0.15
+
+Las escrituras de cada escenario y el usuario de la corrida se revierten;
+aun así, no correr contra la base de producción.
+"""
+
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from config import bench
+
+USUARIO_BENCH = 'bx_bench_admin'
+
+
+class Command(BaseCommand):
+    help = 'Mide las rutas calientes y compara contra un baseline JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--baseline', default=str(Path(settings.BASE_DIR) / 'bench_baseline.json'),
+            help='Archivo JSON del baseline (default: bench_baseline.json en BASE_DIR)',
+        )
+        parser.add_argument('--guardar', action='store_true', help='Escribir los resultados como nuevo baseline')
+        parser.add_argument('--repeticiones', type=int, default=10, help='Corridas medidas por escenario (default: 10)')
+        parser.add_argument('--umbral', type=float, default=0.25, help='Regresión tolerada, fracción (default: 0.25)')
+        parser.add_argument('--solo', action='append', metavar='TEXTO', help='Solo escenarios que contengan TEXTO. Repetible.')
+
+    def handle(self, *args, **options):
+        # ALLOWED_HOSTS con 'testserver' y correo en memoria (locmem)
+        try:
+            setup_test_environment()
+            entorno_propio = True
+        except RuntimeError:  # ya lo preparó el runner de pruebas
+            entorno_propio = False
+        try:
+            # El usuario y su sesión se revierten al terminar: no queda un superusuario en la base
+            with transaction.atomic():
+                usuario, _ = get_user_model().objects.get_or_create(
+                    username=USUARIO_BENCH, defaults={'is_staff': True, 'is_superuser': True},
+                )
+                cliente = Client()
+                cliente.force_login(usuario)
+                resultados = bench.ejecutar(
+                    cliente, options['repeticiones'], options['solo'], progreso=self._imprimir,
+                )
+                transaction.set_rollback(True)
+        finally:
+            if entorno_propio:
+                teardown_test_environment()
+
+        if options['guardar']:
+            bench.guardar_baseline(options['baseline'], resultados)
+            self.stdout.write(self.style.SUCCESS(f"✓ Baseline guardado en {options['baseline']}"))
+            return
+
+        if not Path(options['baseline']).exists():
+            self.stdout.write(self.style.WARNING('Sin baseline para comparar; use --guardar para crearlo.'))
+            return
+        baseline = bench.cargar_baseline(options['baseline'])
+        regresiones = bench.comparar(resultados, baseline['escenarios'], options['umbral'])
+        if regresiones:
+            for regresion in regresiones:
+                self.stderr.write(self.style.ERROR(f'  ✗ {regresion}'))
+            raise CommandError(f'{len(regresiones)} regresión(es) contra {options["baseline"]}.')
+        self.stdout.write(self.style.SUCCESS('✓ Sin regresiones contra el baseline.'))
+
+    def _imprimir(self, nombre, metricas):
+        if 'error' in metricas:
+            self.stdout.write(self.style.WARNING(f"  {nombre:<42} ERROR {metricas['error']}"))
+            return
+        self.stdout.write(
+            f"  {nombre:<42} {metricas['consultas']:>5} q  "
+            f"p50 {metricas['p50_ms']:>9.2f} ms  p95 {metricas['p95_ms']:>9.2f} ms  "
+            f"{metricas['memoria_kb']:>9.1f} KB"
+        )
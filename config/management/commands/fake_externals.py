@@ -0,0 +1,99 @@
+"""
+Management command: fake_externals
+
+Levanta el servidor local que imita Google Maps, Google Vision, Twilio, WAHA,
+Anthropic y el SMTP de SendGrid (config/fake_externals.py), para pruebas de
+rendimiento y de carga sin red.
+
+    python manage.py fake_externals
+    python manage.py fake_externals --latencia 150 --latencia twilio=400 --errores waha=0.1
+    python manage.py fake_externals --registro /tmp/llamadas.jsonl
+
+En otra terminal, arrancar la app con:
+
+    FAKE_EXTERNALS_URL=http://127.0.0.1:8025 FAKE_EXTERNALS_SMTP_PORT=8026 python manage.py runserver
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from config import fake_externals
+
+
+def _parsear_por_servicio(valores, convertir, nombre_opcion) -> dict:
+    """['150', 'twilio=400'] → {'google_maps': 150, ..., 'twilio': 400}."""
+    resultado = {}
+    for valor in valores or []:
+        servicio, _, cifra = valor.rpartition('=')
+        try:
+            numero = convertir(cifra)
+        except ValueError:
+            raise CommandError(f"{nombre_opcion}: valor inválido '{valor}'")
+        if not servicio:
+            resultado.update({s: numero for s in fake_externals.SERVICIOS})
+        elif servicio in fake_externals.SERVICIOS:
+            resultado[servicio] = numero
+        else:
+            raise CommandError(
+                f"{nombre_opcion}: servicio desconocido '{servicio}' "
+                f"(opciones: {', '.join(fake_externals.SERVICIOS)})"
+            )
+    return resultado
+
+
+class Command(BaseCommand):
+    help = 'Servidor local que imita las APIs externas (Maps, Vision, Twilio, WAHA, Anthropic, SMTP).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--puerto', type=int, default=8025, help='Puerto HTTP (default: 8025)')
+        parser.add_argument('--puerto-smtp', type=int, default=8026, help='Puerto SMTP (default: 8026)')
+        parser.add_argument(
+            '--latencia', action='append', metavar='[SERVICIO=]MS',
+            help='Latencia en ms, global o por servicio. Repetible.',
+        )
+        parser.add_argument(
+            '--errores', action='append', metavar='[SERVICIO=]TASA',
+            help='Fracción de llamadas que fallan (0-1), global o por servicio. Repetible.',
+        )
+        parser.add_argument('--jitter', type=float, default=0.2, help='Variación relativa de la latencia (default: 0.2)')
+        parser.add_argument('--semilla', type=int, help='Semilla aleatoria para resultados reproducibles')
+        parser.add_argument('--registro', help='Archivo JSONL donde guardar cada llamada recibida')
+
+    def handle(self, *args, **options):
+        archivo = open(options['registro'], 'a', encoding='utf-8') if options['registro'] else None
+        registro = fake_externals.Registro(
+            latencia_ms=_parsear_por_servicio(options['latencia'], int, '--latencia'),
+            errores=_parsear_por_servicio(options['errores'], float, '--errores'),
+            jitter=options['jitter'],
+            semilla=options['semilla'],
+            archivo=archivo,
+        )
+
+        http, smtp, _ = fake_externals.iniciar(
+            options['host'], options['puerto'], options['puerto_smtp'], registro,
+        )
+        url = f"http://{options['host']}:{http.server_address[1]}"
+
+        self.stdout.write(self.style.SUCCESS(f'fake_externals escuchando en {url} (SMTP :{smtp.server_address[1]})'))
+        for servicio in fake_externals.SERVICIOS:
+            self.stdout.write(
+                f'  {servicio:<14} latencia {registro.latencia_ms[servicio]:>5} ms   '
+                f'errores {registro.errores[servicio]:.0%}'
+            )
+        self.stdout.write('\nPara apuntar la app a este servidor:')
+        self.stdout.write(f'  export FAKE_EXTERNALS_URL={url}')
+        self.stdout.write(f'  export FAKE_EXTERNALS_SMTP_PORT={smtp.server_address[1]}')
+        self.stdout.write(f'\nLlamadas registradas: {url}/__llamadas__   (Ctrl+C para salir)')
+
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            fake_externals.detener(http, smtp)
+            if archivo:
+                archivo.close()
+            self.stdout.write(f'\nfake_externals detenido — {len(registro.llamadas)} llamada(s) atendidas.')
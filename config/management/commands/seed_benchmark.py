@@ -0,0 +1,57 @@
+"""
+Management command: seed_benchmark
+
+Genera una flota sintética realista (config/flota_sintetica.py) para medir
+rendimiento con `manage.py bench`: operadores, unidades, bitácoras, cargas
+con metadatos de fotos, alertas, almacén, órdenes de trabajo y modulaciones.
+
+Uso:
+    python manage.py seed_benchmark --unidades 100 --anios 3
+    python manage.py seed_benchmark --unidades 100 --anios 3 --semilla 7 --limpiar
+    python manage.py seed_benchmark --solo-limpiar
+
+Los registros llevan el prefijo 'BX' y no se mezclan con datos reales.
+No correr contra la base de producción.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from config import flota_sintetica
+
+
+class Command(BaseCommand):
+    help = 'Genera una flota sintética (prefijo BX) para pruebas de rendimiento.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--unidades', type=int, default=50, help='Unidades a generar (default: 50)')
+        parser.add_argument('--anios', type=float, default=2, help='Años de historia hacia atrás (default: 2)')
+        parser.add_argument('--semilla', type=int, default=0, help='Semilla aleatoria (default: 0)')
+        parser.add_argument('--limpiar', action='store_true', help='Borrar la flota sintética existente antes de generar')
+        parser.add_argument('--solo-limpiar', action='store_true', help='Solo borrar la flota sintética')
+
+    def handle(self, *args, **options):
+        from modulos.unidades.models import Unidad
+
+        if options['limpiar'] or options['solo_limpiar']:
+            borradas = flota_sintetica.limpiar()
+            self.stdout.write(f'Flota sintética anterior borrada ({borradas} unidad(es)).')
+            if options['solo_limpiar']:
+                return
+
+        if options['unidades'] < 1 or options['anios'] <= 0:
+            raise CommandError('--unidades y --anios deben ser positivos.')
+        if Unidad.objects.filter(numero_economico__startswith=flota_sintetica.PREFIJO).exists():
+            raise CommandError('Ya existe una flota sintética; use --limpiar para regenerarla.')
+
+        inicio = time.monotonic()
+        resumen = flota_sintetica.GeneradorFlota(
+            unidades=options['unidades'], anios=options['anios'], semilla=options['semilla'],
+        ).generar()
+
+        for clave, total in sorted(resumen.items()):
+            self.stdout.write(f'  {clave:<28} {total:>10,}')
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Flota sintética generada en {time.monotonic() - inicio:.1f} s.'
+        ))
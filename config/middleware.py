@@ -18,7 +18,12 @@ class CurrentUserMiddleware:
     def __call__(self, request):
         _thread_locals.user = getattr(request, 'user', None)
         _thread_locals.ip = self._get_ip(request)
-        return self.get_response(request)
+        try:
+            return self.get_response(request)
+        finally:
+            # El hilo se reutiliza (gunicorn threads, scheduler): no arrastrar el usuario
+            _thread_locals.user = None
+            _thread_locals.ip = None
 
     @staticmethod
     def _get_ip(request):
@@ -0,0 +1,132 @@
+"""
+Caché de listas de referencia: los catálogos chicos que casi todos los
+formularios y listas vuelven a consultar (operadores, unidades, clientes,
+despachadores, equipos, dollys, cajas secas, tipos de mantenimiento,
+categorías de falla, categorías del almacén).
+
+    from config.referencias import referencia_cacheada
+
+    referencia_cacheada(Unidad, {'activa': True}, orden=('numero_economico',))
+    referencia_cacheada(Equipo, {'activo': True}, orden=('numero_economico',),
+                        valores=('id', 'numero_economico'))
+    referencia_cacheada(ProductoAlmacen, valores=('categoria',), plano=True,
+                        distintos=True, orden=('categoria',))
+
+Retorna siempre una lista (instancias, dicts de .values() o valores de
+.values_list()), nunca un QuerySet.
+
+Invalidación por contador de generación: cada modelo de MODELOS tiene una
+clave `referencias:gen:<app.Modelo>` que forma parte de la clave de todas sus
+listas. post_save y post_delete del modelo (conectados en config.apps) la
+incrementan, así que todas las listas de ese modelo dejan de usarse al
+instante —sin tener que conocer sus claves— y caducan solas por TTL.
+QuerySet.update() y bulk_create no disparan señales: después de usarlos,
+llamar invalidar(Modelo).
+
+El backend sale de settings.CACHES (CACHE_BACKEND: locmem, archivo o bd).
+Con locmem cada proceso tiene su propia caché; con archivo o bd se comparte
+entre procesos y la invalidación de uno la ven todos.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+# Modelos cuyas listas se pueden cachear; sus señales invalidan la generación
+MODELOS = (
+    'operadores.Operador',
+    'unidades.Unidad',
+    'bitacoras.Cliente',
+    'combustible.Despachador',
+    'equipos.Equipo',
+    'dollys.Dolly',
+    'caja_seca.CajaSeca',
+    'taller.TipoMantenimiento',
+    'taller.CategoriaFalla',
+    'almacen.ProductoAlmacen',
+)
+
+_PREFIJO = 'referencias'
+
+
+def _clave_generacion(modelo) -> str:
+    return f'{_PREFIJO}:gen:{modelo._meta.label}'
+
+
+def generacion(modelo) -> int:
+    clave = _clave_generacion(modelo)
+    valor = cache.get(clave)
+    if valor is None:
+        # Arranca en el reloj (ms): si la clave se desaloja, la nueva generación
+        # no repite un número ya usado por listas que sigan en caché
+        cache.add(clave, int(time.time() * 1000), timeout=None)
+        valor = cache.get(clave)
+    return valor
+
+
+def invalidar(modelo) -> None:
+    """Descarta todas las listas cacheadas de `modelo`."""
+    clave = _clave_generacion(modelo)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.add(clave, int(time.time() * 1000), timeout=None)
+
+
+def _al_cambiar(sender, **kwargs):
+    invalidar(sender)
+
+
+def conectar_senales():
+    """Conecta post_save/post_delete de MODELOS a invalidar (config.apps)."""
+    from django.apps import apps
+    from django.db.models.signals import post_delete, post_save
+
+    for etiqueta in MODELOS:
+        modelo = apps.get_model(etiqueta)
+        post_save.connect(_al_cambiar, sender=modelo, dispatch_uid=f'referencias_save_{etiqueta}')
+        post_delete.connect(_al_cambiar, sender=modelo, dispatch_uid=f'referencias_delete_{etiqueta}')
+
+
+def referencia_cacheada(modelo, filtro=None, *, orden=(), valores=None, plano=False, distintos=False) -> list:
+    """
+    Lista de `modelo` filtrada por `filtro` (dict o Q), cacheada hasta que
+    cambie cualquier fila del modelo o pasen REFERENCIAS_CACHE_SEGUNDOS.
+
+    orden:     campos de order_by (vacío = ordering del modelo)
+    valores:   campos para .values() (o .values_list() si plano=True)
+    plano:     values_list; flat si hay un solo campo
+    distintos: aplica .distinct()
+    """
+    if modelo._meta.label not in MODELOS:
+        raise ImproperlyConfigured(
+            f'{modelo._meta.label} no está en config.referencias.MODELOS: sus cambios no invalidarían la caché.'
+        )
+
+    firma = repr((filtro if not isinstance(filtro, dict) else sorted(filtro.items()),
+                  tuple(orden), tuple(valores or ()), plano, distintos))
+    clave = '{}:{}:{}:{}'.format(
+        _PREFIJO, modelo._meta.label, generacion(modelo), hashlib.sha1(firma.encode()).hexdigest()[:16],
+    )
+    lista = cache.get(clave)
+    if lista is not None:
+        return lista
+
+    qs = modelo.objects.all()
+    if isinstance(filtro, dict):
+        qs = qs.filter(**filtro)
+    elif filtro is not None:
+        qs = qs.filter(filtro)
+    if orden:
+        qs = qs.order_by(*orden)
+    if valores:
+        qs = qs.values_list(*valores, flat=len(valores) == 1) if plano else qs.values(*valores)
+    if distintos:
+        qs = qs.distinct()
+
+    lista = list(qs)
+    cache.set(clave, lista, getattr(settings, 'REFERENCIAS_CACHE_SEGUNDOS', 3600))
+    return lista
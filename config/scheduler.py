@@ -1,10 +1,22 @@
 """
 Scheduler APScheduler unificado para BitacoraKasu.
 
-Registra un único job diario que ejecuta `generar_reportes`.
+Registra un job diario que ejecuta `generar_reportes`.
 Ese command consulta la BD (ConfiguracionReporte) y solo envía los reportes
 cuyo es_debido() retorne True, evitando duplicados y reportes fuera de fecha.
 
+Registra además dos jobs de intervalo: uno entrega el outbox de notificaciones
+(modulos.notificaciones) y programa los reintentos; el otro vigila la sesión
+WAHA y la reinicia fuera de los requests. Un job nocturno purga la caché de
+respuestas de IA expirada y la bitácora UsoIA vieja; otro envía y consulta
+los lotes de IA (modo lote de IAKasu). Otro nocturno borra las muestras de
+instrumentación y los perfiles de peticiones (modulos.monitoreo) fuera de retención.
+Otro nocturno recalcula el estado de mantenimiento de la flota (taller.mantenimiento)
+y otro rehace los KPIs mensuales del mes en curso y del anterior (reportes.kpis).
+Otro extiende hasta hoy el libro diario del tanque de diésel (finanzas.tanque)
+y otro cruza el diésel de la última semana contra la distancia recorrida
+(combustible.cruce).
+
 Iniciado automáticamente desde modulos/reportes/apps.py al arrancar el servidor.
 """
 import logging
@@ -28,6 +40,102 @@ def _ejecutar_reportes():
         logger.exception('Error ejecutando generar_reportes desde el scheduler')
 
 
+def _procesar_notificaciones():
+    """Entrega las notificaciones pendientes y los reintentos vencidos."""
+    try:
+        from modulos.notificaciones.services import procesar_pendientes
+        procesar_pendientes()
+    except Exception:
+        logger.exception('Error procesando el outbox de notificaciones desde el scheduler')
+
+
+def _verificar_sesion_whatsapp():
+    """Actualiza el estado cacheado de la sesión WAHA y la reinicia si está caída."""
+    try:
+        from modulos.notificaciones.monitor import verificar_sesion
+        verificar_sesion()
+    except Exception:
+        logger.exception('Error verificando la sesión WhatsApp desde el scheduler')
+
+
+def _purgar_ia():
+    """Borra respuestas de IA expiradas y uso de IA fuera de retención."""
+    try:
+        from modulos.ia.services import purgar
+        purgar()
+    except Exception:
+        logger.exception('Error purgando la caché de IA desde el scheduler')
+
+
+def _procesar_lotes_ia():
+    """Envía los prompts en cola a la Batches API y adjunta los resultados listos."""
+    try:
+        from modulos.ia.lotes import procesar_lotes
+        procesar_lotes()
+    except Exception:
+        logger.exception('Error procesando lotes de IA desde el scheduler')
+
+
+def _purgar_artefactos_reportes():
+    """Borra datasets y Excel de reportes fuera de REPORTES_ARTEFACTOS_RETENCION_DIAS."""
+    try:
+        from modulos.reportes.artefactos import purgar_artefactos
+        purgar_artefactos()
+    except Exception:
+        logger.exception('Error purgando artefactos de reportes desde el scheduler')
+
+
+def _purgar_monitoreo():
+    """Borra MuestraRequest y PerfilRequest fuera de retención."""
+    try:
+        from modulos.monitoreo import instrumentacion, perfilado
+        instrumentacion.purgar()
+        perfilado.purgar()
+    except Exception:
+        logger.exception('Error purgando muestras de instrumentación desde el scheduler')
+
+
+def _recalcular_mantenimiento():
+    """Recalcula EstadoMantenimientoUnidad para toda la flota activa."""
+    try:
+        from modulos.taller.mantenimiento import recalcular
+        recalcular()
+    except Exception:
+        logger.exception('Error recalculando el estado de mantenimiento desde el scheduler')
+
+
+def _actualizar_kpis_mensuales():
+    """Reconstruye los KPIs del mes anterior y del actual (días en taller de órdenes abiertas)."""
+    try:
+        from datetime import timedelta
+        from django.utils import timezone
+        from modulos.reportes.kpis import reconstruir
+        hoy = timezone.localdate()
+        reconstruir(desde=hoy.replace(day=1) - timedelta(days=1), hasta=hoy)
+    except Exception:
+        logger.exception('Error actualizando los KPIs mensuales desde el scheduler')
+
+
+def _extender_saldo_tanque():
+    """Agrega al libro del tanque los días sin movimientos hasta hoy."""
+    try:
+        from modulos.finanzas.tanque import extender
+        extender()
+    except Exception:
+        logger.exception('Error extendiendo el saldo del tanque desde el scheduler')
+
+
+def _cruzar_diesel_distancia():
+    """Revisa en toda la flota los intervalos entre cargas que cerraron en la última semana."""
+    try:
+        from datetime import timedelta
+        from django.utils import timezone
+        from modulos.combustible.cruce import revisar
+        revisar(desde=timezone.now() - timedelta(days=7))
+    except Exception:
+        logger.exception('Error cruzando diésel vs distancia desde el scheduler')
+
+
 def iniciar_scheduler():
     """Crea e inicia el BackgroundScheduler. Llamar solo una vez al arrancar."""
     partes = HORA_REVISION.split(':')
@@ -47,6 +155,116 @@ def iniciar_scheduler():
         misfire_grace_time=3600,   # tolera hasta 1 hora de retraso (reinicio del servidor)
     )
 
+    scheduler.add_job(
+        func=_procesar_notificaciones,
+        trigger='interval',
+        seconds=getattr(settings, 'NOTIFICACIONES_INTERVALO_SEGUNDOS', 15),
+        id='procesar_notificaciones',
+        replace_existing=True,
+        jobstore='default',
+        max_instances=1,
+        coalesce=True,
+    )
+
+    scheduler.add_job(
+        func=_verificar_sesion_whatsapp,
+        trigger='interval',
+        seconds=getattr(settings, 'WA_MONITOR_INTERVALO_SEGUNDOS', 30),
+        id='monitor_sesion_whatsapp',
+        replace_existing=True,
+        jobstore='default',
+        max_instances=1,
+        coalesce=True,
+    )
+
+    scheduler.add_job(
+        func=_purgar_ia,
+        trigger='cron',
+        hour=3,
+        minute=30,
+        id='purgar_ia',
+        replace_existing=True,
+        jobstore='default',
+        misfire_grace_time=3600,
+    )
+
+    scheduler.add_job(
+        func=_purgar_artefactos_reportes,
+        trigger='cron',
+        hour=3,
+        minute=45,
+        id='purgar_artefactos_reportes',
+        replace_existing=True,
+        jobstore='default',
+        misfire_grace_time=3600,
+    )
+
+    scheduler.add_job(
+        func=_purgar_monitoreo,
+        trigger='cron',
+        hour=4,
+        minute=0,
+        id='purgar_monitoreo',
+        replace_existing=True,
+        jobstore='default',
+        misfire_grace_time=3600,
+    )
+
+    scheduler.add_job(
+        func=_recalcular_mantenimiento,
+        trigger='cron',
+        hour=4,
+        minute=15,
+        id='recalcular_mantenimiento',
+        replace_existing=True,
+        jobstore='default',
+        misfire_grace_time=3600,
+    )
+
+    scheduler.add_job(
+        func=_actualizar_kpis_mensuales,
+        trigger='cron',
+        hour=4,
+        minute=30,
+        id='actualizar_kpis_mensuales',
+        replace_existing=True,
+        jobstore='default',
+        misfire_grace_time=3600,
+    )
+
+    scheduler.add_job(
+        func=_extender_saldo_tanque,
+        trigger='cron',
+        hour=0,
+        minute=10,
+        id='extender_saldo_tanque',
+        replace_existing=True,
+        jobstore='default',
+        misfire_grace_time=3600,
+    )
+
+    scheduler.add_job(
+        func=_cruzar_diesel_distancia,
+        trigger='cron',
+        hour=0,
+        minute=40,
+        id='cruzar_diesel_distancia',
+        replace_existing=True,
+        jobstore='default',
+        misfire_grace_time=3600,
+    )
+
+    scheduler.add_job(
+        func=_procesar_lotes_ia,
+        trigger='interval',
+        minutes=getattr(settings, 'IA_LOTES_INTERVALO_MINUTOS', 15),
+        id='procesar_lotes_ia',
+        replace_existing=True,
+        jobstore='default',
+        max_instances=1,
+        coalesce=True,
+    )
+
     scheduler.start()
     logger.info(
         'Scheduler iniciado — generar_reportes revisará reportes pendientes '
@@ -3,6 +3,14 @@ IAKasu — Cliente centralizado para Claude API (Anthropic).
 
 Reutilizable por todos los módulos que necesiten IA generativa.
 Implementa prompt caching para reducir costos en prompts de sistema repetidos.
+Las llamadas pasan por el circuit breaker 'anthropic' de config/services/externos.
+
+Además:
+  - Un solo cliente `anthropic.Anthropic` por proceso (pool HTTP compartido).
+  - Caché persistente prompt-hash → respuesta (modulos.ia.RespuestaIA) con TTL
+    IA_CACHE_TTL_HORAS; el mismo prompt no se vuelve a pagar.
+  - Semáforo de proceso: como máximo IA_MAX_CONCURRENCIA llamadas simultáneas.
+  - Cada llamada, servida o no desde caché, queda en modulos.ia.UsoIA.
 
 Modelos disponibles:
   - HAIKU  : claude-haiku-4-5-20251001  → clasificación, tareas simples (bajo costo)
@@ -11,7 +19,7 @@ Modelos disponibles:
 Uso:
     from config.services.claude_service import ClaudeService, Modelo
 
-    claude = ClaudeService()
+    claude = ClaudeService(modulo='combustible')
     respuesta = claude.completar(
         sistema="Eres un analista de flota vehicular.",
         prompt="Analiza este patrón de consumo...",
@@ -20,12 +28,82 @@ Uso:
 """
 
 import logging
+import threading
+import time
+from contextlib import contextmanager
 
 from django.conf import settings
 
+from config.services.externos import ServicioNoDisponible, protegido, registrar_respaldo
+
 logger = logging.getLogger(__name__)
 
 
+_clientes = {}
+_clientes_lock = threading.Lock()
+
+_semaforo = None
+_semaforo_lock = threading.Lock()
+
+# Bloqueos por clave: dos hilos con el mismo prompt esperan uno al otro en
+# lugar de pagar la llamada dos veces; prompts distintos nunca se bloquean.
+# {clave: [Lock, hilos que lo usan]}; la entrada se borra al soltarla el último.
+_bloqueos_clave = {}
+_bloqueos_clave_lock = threading.Lock()
+
+
+@contextmanager
+def _bloqueo_clave(clave: str):
+    with _bloqueos_clave_lock:
+        entrada = _bloqueos_clave.setdefault(clave, [threading.Lock(), 0])
+        entrada[1] += 1
+    try:
+        with entrada[0]:
+            yield
+    finally:
+        with _bloqueos_clave_lock:
+            entrada[1] -= 1
+            if not entrada[1]:
+                del _bloqueos_clave[clave]
+
+
+def _cliente(api_key: str):
+    """Cliente Anthropic compartido por proceso para esta API key / URL / timeout."""
+    import anthropic
+    from config.services.externos import config_servicio
+
+    conexion, lectura = config_servicio('anthropic')['TIMEOUT']
+    base_url = getattr(settings, 'ANTHROPIC_BASE_URL', '') or None
+    llave = (api_key, base_url, conexion, lectura)
+    with _clientes_lock:
+        if llave not in _clientes:
+            # Un solo reintento del SDK: el circuit breaker corta si Anthropic se degrada
+            _clientes[llave] = anthropic.Anthropic(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=anthropic.Timeout(lectura, connect=conexion),
+                max_retries=1,
+            )
+        return _clientes[llave]
+
+
+def _semaforo_llamadas() -> threading.BoundedSemaphore:
+    global _semaforo
+    with _semaforo_lock:
+        if _semaforo is None:
+            _semaforo = threading.BoundedSemaphore(getattr(settings, 'IA_MAX_CONCURRENCIA', 2))
+        return _semaforo
+
+
+def reiniciar():
+    """Descarta clientes y semáforo (tests, o tras cambiar IA_MAX_CONCURRENCIA)."""
+    global _semaforo
+    with _clientes_lock:
+        _clientes.clear()
+    with _semaforo_lock:
+        _semaforo = None
+
+
 class Modelo:
     HAIKU = 'claude-haiku-4-5-20251001'
     SONNET = 'claude-sonnet-4-6'
@@ -37,17 +115,20 @@ class ClaudeService:
 
     El campo `sistema` se marca como cache_control ephemeral para
     aprovechar el prompt caching de Anthropic y reducir costos.
+
+    `modulo` identifica al llamador en la bitácora UsoIA
+    (p. ej. 'combustible', 'reportes').
     """
 
-    def __init__(self):
-        import anthropic
+    def __init__(self, modulo: str = 'general'):
         api_key = getattr(settings, 'ANTHROPIC_API_KEY', None)
         if not api_key:
             raise ValueError(
                 "ANTHROPIC_API_KEY no está configurada en settings. "
                 "Agrégala al .env y a settings.py."
             )
-        self.client = anthropic.Anthropic(api_key=api_key)
+        self.modulo = modulo
+        self.client = _cliente(api_key)
 
     def completar(
         self,
@@ -55,6 +136,7 @@ class ClaudeService:
         sistema: str = '',
         modelo: str = Modelo.HAIKU,
         max_tokens: int = 600,
+        usar_cache: bool = True,
     ) -> str:
         """
         Llama a Claude y retorna el texto de la respuesta.
@@ -64,6 +146,7 @@ class ClaudeService:
             sistema:   Instrucciones del sistema (se cachea si es largo).
             modelo:    Modelo a usar (Modelo.HAIKU o Modelo.SONNET).
             max_tokens: Máximo de tokens en la respuesta.
+            usar_cache: False fuerza una respuesta nueva (la guarda igualmente).
 
         Returns:
             Texto de la respuesta o '' si la llamada falla.
@@ -72,6 +155,31 @@ class ClaudeService:
             logger.debug("ClaudeService: IA_HABILITADA=False, omitiendo llamada.")
             return ''
 
+        from modulos.ia import services as ia
+
+        clave = ia.clave_prompt(modelo, max_tokens, sistema, prompt)
+        with _bloqueo_clave(clave):
+            if usar_cache:
+                inicio = time.monotonic()
+                texto = ia.buscar_respuesta(clave)
+                if texto is not None:
+                    ia.registrar_uso(
+                        self.modulo, modelo, clave=clave, desde_cache=True,
+                        latencia_ms=int((time.monotonic() - inicio) * 1000),
+                    )
+                    return texto
+            return self._llamar(clave, prompt, sistema, modelo, max_tokens)
+
+    def _llamar(self, clave, prompt, sistema, modelo, max_tokens) -> str:
+        from modulos.ia import services as ia
+
+        semaforo = _semaforo_llamadas()
+        if not semaforo.acquire(timeout=getattr(settings, 'IA_ESPERA_MAX_SEGUNDOS', 60)):
+            logger.warning("ClaudeService: sin turno tras IA_ESPERA_MAX_SEGUNDOS, omitiendo llamada.")
+            ia.registrar_uso(self.modulo, modelo, clave=clave, exito=False, error='Sin turno en el semáforo')
+            return ''
+
+        inicio = time.monotonic()
         try:
             kwargs = {
                 'model': modelo,
@@ -89,21 +197,38 @@ class ClaudeService:
                     }
                 ]
 
-            respuesta = self.client.messages.create(**kwargs)
+            with protegido('anthropic'):
+                respuesta = self.client.messages.create(**kwargs)
             texto = respuesta.content[0].text.strip()
 
-            logger.debug(
-                "ClaudeService: modelo=%s tokens_entrada=%s tokens_salida=%s cache_hit=%s",
-                modelo,
-                respuesta.usage.input_tokens,
-                respuesta.usage.output_tokens,
-                getattr(respuesta.usage, 'cache_read_input_tokens', 0),
-            )
-            return texto
-
+        except ServicioNoDisponible:
+            registrar_respaldo('anthropic')
+            logger.warning("ClaudeService: circuito de Anthropic abierto, omitiendo llamada.")
+            ia.registrar_uso(self.modulo, modelo, clave=clave, exito=False, error='Circuito abierto')
+            return ''
         except Exception as exc:
             logger.exception("ClaudeService: error en llamada a Claude API — %s", exc)
+            ia.registrar_uso(
+                self.modulo, modelo, clave=clave, exito=False, error=exc,
+                latencia_ms=int((time.monotonic() - inicio) * 1000),
+            )
             return ''
+        finally:
+            semaforo.release()
+
+        uso = respuesta.usage
+        tokens_entrada = getattr(uso, 'input_tokens', 0) or 0
+        tokens_salida = getattr(uso, 'output_tokens', 0) or 0
+        ia.registrar_uso(
+            self.modulo, modelo, clave=clave,
+            tokens_entrada=tokens_entrada,
+            tokens_salida=tokens_salida,
+            tokens_cache_lectura=getattr(uso, 'cache_read_input_tokens', 0) or 0,
+            latencia_ms=int((time.monotonic() - inicio) * 1000),
+        )
+        if texto:
+            ia.guardar_respuesta(clave, modelo, texto, tokens_entrada, tokens_salida)
+        return texto
 
     def disponible(self) -> bool:
         """Verifica que la API key está configurada y la IA está habilitada."""
@@ -0,0 +1,297 @@
+"""
+Capa compartida para llamadas salientes a servicios externos.
+
+Google Maps, Google Vision, Twilio, WAHA y Anthropic pasan por aquí para:
+
+  - reutilizar conexiones: una `requests.Session` por servicio, con pool de
+    conexiones por host (evita el handshake TLS en cada llamada);
+  - respetar un presupuesto de latencia: timeout (conexión, lectura) por
+    servicio, y las respuestas más lentas que PRESUPUESTO_MS cuentan como fallo;
+  - cortar rápido cuando un proveedor se degrada: circuit breaker por servicio
+    (CERRADO → ABIERTO tras N fallos seguidos → SEMI_ABIERTO tras la espera,
+    donde una sola llamada de prueba decide si vuelve a CERRADO);
+  - exportar métricas por servicio (llamadas, errores, rechazos, latencia).
+
+Configuración en settings.SERVICIOS_EXTERNOS; cada servicio hereda de
+_SERVICIOS_DEFAULT las claves que no defina.
+
+Uso:
+    from config.services.externos import solicitar, ServicioNoDisponible
+
+    resp = solicitar('google_maps', 'GET', url, params=params)
+
+    # Llamadas hechas con un SDK (Twilio, Anthropic):
+    with protegido('twilio'):
+        client.messages.create(...)
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+from modulos.monitoreo import metricas as metricas_prometheus
+from modulos.monitoreo.instrumentacion import registrar_externo
+
+logger = logging.getLogger(__name__)
+
+_SERVICIOS_DEFAULT = {
+    'TIMEOUT': (3.05, 10),        # (conexión, lectura) en segundos
+    'PRESUPUESTO_MS': 8000,       # respuesta más lenta que esto cuenta como fallo
+    'FALLOS_PARA_ABRIR': 5,       # fallos consecutivos que abren el circuito
+    'SEGUNDOS_ABIERTO': 30,       # tiempo en ABIERTO antes de permitir una prueba
+    'POOL': 8,                    # conexiones por host en la sesión compartida
+}
+
+# Límites de los buckets del histograma de latencia (segundos)
+BUCKETS_LATENCIA = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class ServicioNoDisponible(Exception):
+    """El circuito del servicio está abierto: la llamada se rechaza sin salir a la red."""
+
+    def __init__(self, servicio: str):
+        self.servicio = servicio
+        super().__init__(f"Servicio externo '{servicio}' no disponible (circuito abierto)")
+
+
+def config_servicio(servicio: str) -> dict:
+    configurados = getattr(settings, 'SERVICIOS_EXTERNOS', {})
+    return {**_SERVICIOS_DEFAULT, **configurados.get(servicio, {})}
+
+
+# ---------------------------------------------------------------------------
+# Circuit breaker
+# ---------------------------------------------------------------------------
+
+class CircuitBreaker:
+    CERRADO = 'CERRADO'
+    ABIERTO = 'ABIERTO'
+    SEMI_ABIERTO = 'SEMI_ABIERTO'
+
+    def __init__(self, servicio: str):
+        self.servicio = servicio
+        self.estado = self.CERRADO
+        self.fallos_consecutivos = 0
+        self.abierto_desde = 0.0
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+
+    def permitir(self) -> bool:
+        """True si la llamada puede salir. En SEMI_ABIERTO solo deja pasar una."""
+        config = config_servicio(self.servicio)
+        with self._lock:
+            if self.estado == self.CERRADO:
+                return True
+            if self.estado == self.ABIERTO:
+                if time.monotonic() - self.abierto_desde < config['SEGUNDOS_ABIERTO']:
+                    return False
+                self.estado = self.SEMI_ABIERTO
+                self._prueba_en_curso = False
+            if self._prueba_en_curso:
+                return False
+            self._prueba_en_curso = True
+            return True
+
+    def abierto(self) -> bool:
+        """True si hoy rechazaría llamadas (sin consumir la prueba de SEMI_ABIERTO)."""
+        if self.estado != self.ABIERTO:
+            return False
+        return time.monotonic() - self.abierto_desde < config_servicio(self.servicio)['SEGUNDOS_ABIERTO']
+
+    def registrar_exito(self) -> None:
+        with self._lock:
+            if self.estado != self.CERRADO:
+                logger.info("Servicio externo '%s': circuito cerrado.", self.servicio)
+            self.estado = self.CERRADO
+            self.fallos_consecutivos = 0
+            self._prueba_en_curso = False
+
+    def registrar_fallo(self) -> None:
+        config = config_servicio(self.servicio)
+        with self._lock:
+            self.fallos_consecutivos += 1
+            self._prueba_en_curso = False
+            if self.estado == self.SEMI_ABIERTO or self.fallos_consecutivos >= config['FALLOS_PARA_ABRIR']:
+                if self.estado != self.ABIERTO:
+                    logger.warning(
+                        "Servicio externo '%s': circuito abierto tras %s fallo(s).",
+                        self.servicio, self.fallos_consecutivos,
+                    )
+                self.estado = self.ABIERTO
+                self.abierto_desde = time.monotonic()
+
+
+# ---------------------------------------------------------------------------
+# Métricas
+# ---------------------------------------------------------------------------
+
+class MetricasServicio:
+    def __init__(self):
+        self.llamadas = 0
+        self.errores = 0
+        self.lentas = 0
+        self.rechazadas = 0
+        self.respaldos = 0
+        self.latencia_total = 0.0
+        self.buckets = [0] * (len(BUCKETS_LATENCIA) + 1)
+
+    def observar(self, segundos: float) -> None:
+        self.llamadas += 1
+        self.latencia_total += segundos
+        for i, limite in enumerate(BUCKETS_LATENCIA):
+            if segundos <= limite:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+
+_breakers = {}
+_metricas = {}
+_sesiones = {}
+_registro_lock = threading.Lock()
+
+
+def breaker(servicio: str) -> CircuitBreaker:
+    with _registro_lock:
+        if servicio not in _breakers:
+            _breakers[servicio] = CircuitBreaker(servicio)
+        return _breakers[servicio]
+
+
+def _metricas_de(servicio: str) -> MetricasServicio:
+    with _registro_lock:
+        if servicio not in _metricas:
+            _metricas[servicio] = MetricasServicio()
+        return _metricas[servicio]
+
+
+def registrar_respaldo(servicio: str) -> None:
+    """Cuenta una respuesta servida desde caché o en modo degradado."""
+    with _registro_lock:
+        _metricas.setdefault(servicio, MetricasServicio()).respaldos += 1
+
+
+def metricas() -> dict:
+    """Snapshot de métricas por servicio (para el endpoint de métricas y el admin)."""
+    with _registro_lock:
+        snapshot = {}
+        for servicio, m in _metricas.items():
+            b = _breakers.get(servicio)
+            snapshot[servicio] = {
+                'llamadas': m.llamadas,
+                'errores': m.errores,
+                'lentas': m.lentas,
+                'rechazadas': m.rechazadas,
+                'respaldos': m.respaldos,
+                'latencia_total': m.latencia_total,
+                'buckets': list(zip(BUCKETS_LATENCIA + (float('inf'),), m.buckets)),
+                'circuito': b.estado if b else CircuitBreaker.CERRADO,
+            }
+        return snapshot
+
+
+def reiniciar() -> None:
+    """Olvida breakers, métricas y sesiones (pruebas y cambios de configuración)."""
+    with _registro_lock:
+        for sesion in _sesiones.values():
+            sesion.close()
+        _breakers.clear()
+        _metricas.clear()
+        _sesiones.clear()
+
+
+# ---------------------------------------------------------------------------
+# Llamadas
+# ---------------------------------------------------------------------------
+
+def sesion(servicio: str) -> requests.Session:
+    """Sesión compartida del servicio, con pool de conexiones por host."""
+    with _registro_lock:
+        if servicio not in _sesiones:
+            pool = config_servicio(servicio)['POOL']
+            s = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=pool)
+            s.mount('https://', adaptador)
+            s.mount('http://', adaptador)
+            _sesiones[servicio] = s
+        return _sesiones[servicio]
+
+
+@contextmanager
+def protegido(servicio: str):
+    """
+    Ejecuta el bloque bajo el circuit breaker y las métricas del servicio.
+
+    Lanza ServicioNoDisponible sin ejecutar el bloque si el circuito está abierto.
+    Cualquier excepción del bloque cuenta como fallo y se propaga.
+    """
+    b = breaker(servicio)
+    m = _metricas_de(servicio)
+    if not b.permitir():
+        with _registro_lock:
+            m.rechazadas += 1
+        metricas_prometheus.EXTERNO_RECHAZOS.inc(servicio)
+        raise ServicioNoDisponible(servicio)
+
+    inicio = time.monotonic()
+    try:
+        yield
+    except Exception:
+        duracion = time.monotonic() - inicio
+        registrar_externo(duracion)
+        metricas_prometheus.EXTERNO_SEGUNDOS.observar(duracion, servicio)
+        metricas_prometheus.EXTERNO_ERRORES.inc(servicio)
+        with _registro_lock:
+            m.observar(duracion)
+            m.errores += 1
+        b.registrar_fallo()
+        raise
+
+    duracion = time.monotonic() - inicio
+    registrar_externo(duracion)
+    metricas_prometheus.EXTERNO_SEGUNDOS.observar(duracion, servicio)
+    lenta = duracion * 1000 > config_servicio(servicio)['PRESUPUESTO_MS']
+    with _registro_lock:
+        m.observar(duracion)
+        if lenta:
+            m.lentas += 1
+    if lenta:
+        logger.warning(
+            "Servicio externo '%s': respuesta en %.0f ms excede el presupuesto.", servicio, duracion * 1000
+        )
+        b.registrar_fallo()
+    else:
+        b.registrar_exito()
+
+
+def solicitar(servicio: str, metodo: str, url: str, **kwargs) -> requests.Response:
+    """
+    Hace una petición HTTP con la sesión, timeout y breaker del servicio.
+
+    Las respuestas 5xx y 429 cuentan como fallo para el breaker, pero se
+    devuelven al caller igual que cualquier otra respuesta.
+
+    Raises:
+        ServicioNoDisponible: circuito abierto.
+        requests.RequestException: error de red o timeout.
+    """
+    kwargs.setdefault('timeout', tuple(config_servicio(servicio)['TIMEOUT']))
+    respuesta = None
+    try:
+        with protegido(servicio):
+            respuesta = sesion(servicio).request(metodo, url, **kwargs)
+            if respuesta.status_code >= 500 or respuesta.status_code == 429:
+                raise _RespuestaFallida(respuesta)
+    except _RespuestaFallida:
+        pass
+    return respuesta
+
+
+class _RespuestaFallida(Exception):
+    def __init__(self, respuesta):
+        self.respuesta = respuesta
@@ -1,5 +1,22 @@
-import requests
-import os
+
+from django.conf import settings
+from django.core.cache import cache
+
+from config.services.externos import ServicioNoDisponible, registrar_respaldo, solicitar
+
+# Las rutas entre códigos postales casi no cambian: se cachean y se sirven desde
+# caché. Si Google Maps falla o su circuito está abierto y la ruta no está en
+# caché, se responde en modo degradado ('degradado': True) sin esperar timeouts.
+_CACHE_SEGUNDOS = 30 * 24 * 3600
+
+
+def _respuesta_degradada(error):
+    registrar_respaldo('google_maps')
+    return {
+        'success': False,
+        'degradado': True,
+        'error': error,
+    }
 
 
 class GoogleMapsService:
@@ -10,8 +27,9 @@ class GoogleMapsService:
     """
     
     def __init__(self, api_key=None):
-        self.api_key = api_key or os.environ.get('GOOGLE_MAPS_API_KEY')
-        self.base_url = 'https://maps.googleapis.com/maps/api/distancematrix/json'
+        self.api_key = api_key or settings.GOOGLE_MAPS_API_KEY
+        self.api_url = getattr(settings, 'GOOGLE_MAPS_API_URL', 'https://maps.googleapis.com/maps/api').rstrip('/')
+        self.base_url = f'{self.api_url}/distancematrix/json'
     
     def calcular_distancia(self, cp_origen, cp_destino):
         """
@@ -30,6 +48,11 @@ class GoogleMapsService:
                 'error': 'API key no configurada'
             }
         
+        clave_cache = f'google_maps:distancia:{cp_origen}:{cp_destino}'
+        en_cache = cache.get(clave_cache)
+        if en_cache:
+            return en_cache
+
         try:
             params = {
                 'origins': f'{cp_origen},Mexico',
@@ -39,14 +62,14 @@ class GoogleMapsService:
                 'language': 'es'
             }
             
-            response = requests.get(self.base_url, params=params, timeout=10)
+            response = solicitar('google_maps', 'GET', self.base_url, params=params)
             data = response.json()
             
             if data['status'] == 'OK':
                 elemento = data['rows'][0]['elements'][0]
                 
                 if elemento['status'] == 'OK':
-                    return {
+                    resultado = {
                         'success': True,
                         'distancia_km': elemento['distance']['value'] / 1000,
                         'duracion_min': elemento['duration']['value'] / 60,
@@ -55,6 +78,8 @@ class GoogleMapsService:
                         'origen_formateado': data.get('origin_addresses', [''])[0],
                         'destino_formateado': data.get('destination_addresses', [''])[0]
                     }
+                    cache.set(clave_cache, resultado, _CACHE_SEGUNDOS)
+                    return resultado
                 else:
                     return {
                         'success': False,
@@ -65,7 +90,9 @@ class GoogleMapsService:
                     'success': False,
                     'error': f"Error en la API: {data['status']}"
                 }
-                
+
+        except ServicioNoDisponible:
+            return _respuesta_degradada('Google Maps no disponible temporalmente, intenta más tarde')
         except Exception as e:
             return {
                 'success': False,
@@ -101,28 +128,37 @@ class GoogleMapsService:
         Returns:
             dict: Resultado de validación
         """
+        clave_cache = f'google_maps:cp:{cp}:{pais}'
+        en_cache = cache.get(clave_cache)
+        if en_cache:
+            return en_cache
+
         try:
-            url = 'https://maps.googleapis.com/maps/api/geocode/json'
+            url = f'{self.api_url}/geocode/json'
             params = {
                 'address': f'{cp},{pais}',
                 'key': self.api_key
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = solicitar('google_maps', 'GET', url, params=params)
             data = response.json()
             
             if data['status'] == 'OK' and len(data['results']) > 0:
-                return {
+                resultado = {
                     'success': True,
                     'direccion_formateada': data['results'][0]['formatted_address'],
                     'ubicacion': data['results'][0]['geometry']['location']
                 }
+                cache.set(clave_cache, resultado, _CACHE_SEGUNDOS)
+                return resultado
             else:
                 return {
                     'success': False,
                     'error': 'Código postal no encontrado'
                 }
-                
+
+        except ServicioNoDisponible:
+            return _respuesta_degradada('Google Maps no disponible temporalmente, intenta más tarde')
         except Exception as e:
             return {
                 'success': False,
@@ -7,9 +7,10 @@ Fallback: pytesseract local si no hay API key configurada.
 import re
 import base64
 import logging
-import os
 from io import BytesIO
 
+from django.conf import settings
+
 logger = logging.getLogger(__name__)
 
 # Patrón: secuencias de 4 o más dígitos consecutivos (número de serie del candado)
@@ -40,10 +41,15 @@ def _leer_con_vision_api(imagen_bytes: bytes, api_key: str) -> str:
     """
     Envía la imagen a Google Cloud Vision TEXT_DETECTION y devuelve el número.
     Usa requests (ya en requirements.txt), sin SDK adicional.
+
+    Lanza ServicioNoDisponible si el circuito de Vision está abierto; el
+    caller cae a tesseract.
     """
     import requests
+    from config.services.externos import ServicioNoDisponible, solicitar
 
-    url = f'https://vision.googleapis.com/v1/images:annotate?key={api_key}'
+    base = getattr(settings, 'GOOGLE_VISION_API_URL', 'https://vision.googleapis.com/v1').rstrip('/')
+    url = f'{base}/images:annotate?key={api_key}'
     payload = {
         'requests': [{
             'image': {'content': base64.b64encode(imagen_bytes).decode('utf-8')},
@@ -52,7 +58,7 @@ def _leer_con_vision_api(imagen_bytes: bytes, api_key: str) -> str:
     }
 
     try:
-        resp = requests.post(url, json=payload, timeout=15)
+        resp = solicitar('google_vision', 'POST', url, json=payload)
         resp.raise_for_status()
         data = resp.json()
 
@@ -64,6 +70,8 @@ def _leer_con_vision_api(imagen_bytes: bytes, api_key: str) -> str:
         texto_completo = anotaciones[0].get('description', '')
         return _extraer_numero(texto_completo)
 
+    except ServicioNoDisponible:
+        raise
     except requests.exceptions.RequestException as exc:
         logger.error("OCR Vision API: error de red para '%s': %s", exc, exc)
         return ''
@@ -145,7 +153,7 @@ def leer_numero_candado(imagen_field) -> str:
     Extrae el número de candado de un ImageField.
 
     Usa Google Cloud Vision API si GOOGLE_VISION_API_KEY está configurado.
-    Si no, hace fallback a pytesseract local.
+    Si no, o si el circuito de Vision está abierto, hace fallback a pytesseract local.
 
     Devuelve la primera secuencia de 4+ dígitos encontrada, o ''.
     """
@@ -153,19 +161,31 @@ def leer_numero_candado(imagen_field) -> str:
     if imagen_bytes is None:
         return ''
 
-    api_key = os.environ.get('GOOGLE_VISION_API_KEY', '')
+    from modulos.monitoreo.metricas import OCR_SEGUNDOS, cronometrar
+
+    api_key = settings.GOOGLE_VISION_API_KEY
 
     if api_key:
-        numero = _leer_con_vision_api(imagen_bytes, api_key)
-        logger.info(
-            "OCR Vision API — '%s': '%s'",
-            imagen_field.name, numero or '(no detectado)',
-        )
-        return numero
+        from config.services.externos import ServicioNoDisponible, registrar_respaldo
+        try:
+            with cronometrar(OCR_SEGUNDOS, 'vision'):
+                numero = _leer_con_vision_api(imagen_bytes, api_key)
+            logger.info(
+                "OCR Vision API — '%s': '%s'",
+                imagen_field.name, numero or '(no detectado)',
+            )
+            return numero
+        except ServicioNoDisponible:
+            # Circuito abierto: respuesta degradada con tesseract local
+            registrar_respaldo('google_vision')
+            logger.warning("OCR: Vision API no disponible, usando tesseract para '%s'", imagen_field.name)
+            with cronometrar(OCR_SEGUNDOS, 'tesseract'):
+                return _leer_con_tesseract(imagen_bytes, imagen_field.name)
 
     # Sin API key: fallback a tesseract
     logger.warning(
         "OCR: GOOGLE_VISION_API_KEY no configurada, usando tesseract para '%s'",
         imagen_field.name,
     )
-    return _leer_con_tesseract(imagen_bytes, imagen_field.name)
+    with cronometrar(OCR_SEGUNDOS, 'tesseract'):
+        return _leer_con_tesseract(imagen_bytes, imagen_field.name)
@@ -14,9 +14,34 @@ from django.utils import timezone as dj_timezone
 logger = logging.getLogger(__name__)
 
 
+_clientes_twilio = {}
+
+
 def _twilio_client():
+    """Cliente Twilio compartido (pool de conexiones y timeout de config/services/externos)."""
+    from twilio.http.http_client import TwilioHttpClient
     from twilio.rest import Client
-    return Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+    from config.services.externos import config_servicio
+
+    clave = (settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+    if clave not in _clientes_twilio:
+        http_client = TwilioHttpClient(
+            pool_connections=True, timeout=config_servicio('twilio')['TIMEOUT'][1],
+        )
+        cliente = Client(*clave, http_client=http_client)
+        if getattr(settings, 'TWILIO_API_URL', ''):
+            # Servidor alterno (fake_externals en pruebas de carga)
+            cliente.api.base_url = settings.TWILIO_API_URL.rstrip('/')
+        _clientes_twilio[clave] = cliente
+    return _clientes_twilio[clave]
+
+
+def crear_mensaje_wa(**kwargs):
+    """messages.create bajo el circuit breaker 'twilio'. Lanza ServicioNoDisponible si está abierto."""
+    from config.services.externos import protegido
+
+    with protegido('twilio'):
+        return _twilio_client().messages.create(**kwargs)
 
 
 def _numero_wa(celular: str) -> str:
@@ -99,8 +124,7 @@ def _enviar_wa_y_email_cliente(bitacora, cliente, variables: dict) -> dict:
     # ── WhatsApp ──────────────────────────────────────────────────────────────
     if cliente.celular and settings.TWILIO_CONTENT_SID_BITACORA:
         try:
-            client = _twilio_client()
-            client.messages.create(
+            crear_mensaje_wa(
                 from_=settings.TWILIO_WHATSAPP_FROM,
                 to=_numero_wa(cliente.celular),
                 content_sid=settings.TWILIO_CONTENT_SID_BITACORA,
@@ -119,7 +143,7 @@ def _enviar_wa_y_email_cliente(bitacora, cliente, variables: dict) -> dict:
     # ── Email ─────────────────────────────────────────────────────────────────
     if cliente.email:
         try:
-            asunto = f"Programación de contenedores — {bitacora.fecha_salida.strftime('%d/%m/%Y') if bitacora.fecha_salida else ''}"
+            asunto = _asunto_email(bitacora)
             cuerpo = _cuerpo_email(bitacora, variables)
             send_mail(
                 subject=asunto,
@@ -138,12 +162,8 @@ def _enviar_wa_y_email_cliente(bitacora, cliente, variables: dict) -> dict:
     return resultado
 
 
-def enviar_notificacion_bitacora(bitacora, cliente) -> dict:
-    """
-    Envía WhatsApp (template Twilio) + email al cliente con los datos del viaje.
-
-    Returns dict con claves 'wa_ok' (bool) y 'email_ok' (bool).
-    """
+def _variables_bitacora(bitacora) -> dict:
+    """Variables de plantilla {{1}}-{{3}} de la notificación combinada al cliente."""
     operador = bitacora.operador
     unidad = bitacora.unidad
     var1 = _var_info_carga(bitacora)
@@ -161,9 +181,16 @@ def enviar_notificacion_bitacora(bitacora, cliente) -> dict:
     tipo_servicio = 'REPARTO' if bitacora.reparto else 'DIRECTO'
     var3 = f"Servicio {tipo_servicio} ejecutado {obs}."
 
-    variables = {'1': var1, '2': var2, '3': var3}
+    return {'1': var1, '2': var2, '3': var3}
 
-    return _enviar_wa_y_email_cliente(bitacora, cliente, variables)
+
+def enviar_notificacion_bitacora(bitacora, cliente) -> dict:
+    """
+    Envía WhatsApp (template Twilio) + email al cliente con los datos del viaje.
+
+    Returns dict con claves 'wa_ok' (bool) y 'email_ok' (bool).
+    """
+    return _enviar_wa_y_email_cliente(bitacora, cliente, _variables_bitacora(bitacora))
 
 
 def _var_info_carga_contenedor(bitacora, numero) -> str:
@@ -183,8 +210,8 @@ def _var_info_carga_contenedor(bitacora, numero) -> str:
     return f"Contenedor: {contenedor} | Especificaciones: {especificaciones} | Destino Final: CP {cp_destino}"
 
 
-def _enviar_notificacion_contenedor(bitacora, numero, cliente, fecha_entrega) -> dict:
-    """Arma variables para un solo contenedor (con su propio horario de entrega) y envía WA+email."""
+def _variables_contenedor(bitacora, numero, fecha_entrega) -> dict:
+    """Variables de plantilla para un solo contenedor (con su propio horario de entrega)."""
     operador = bitacora.operador
     unidad = bitacora.unidad
     var1 = _var_info_carga_contenedor(bitacora, numero)
@@ -200,7 +227,12 @@ def _enviar_notificacion_contenedor(bitacora, numero, cliente, fecha_entrega) ->
     obs = _sanitizar_texto(bitacora.observaciones or 'SIN CUSTODIA')
     var3 = f"Servicio REPARTO ejecutado (contenedor {numero}) {obs}."
 
-    variables = {'1': var1, '2': var2, '3': var3}
+    return {'1': var1, '2': var2, '3': var3}
+
+
+def _enviar_notificacion_contenedor(bitacora, numero, cliente, fecha_entrega) -> dict:
+    """Arma variables para un solo contenedor (con su propio horario de entrega) y envía WA+email."""
+    variables = _variables_contenedor(bitacora, numero, fecha_entrega)
     return _enviar_wa_y_email_cliente(bitacora, cliente, variables)
 
 
@@ -233,16 +265,8 @@ def enviar_notificaciones_reparto(bitacora) -> dict:
     return resultado
 
 
-def enviar_notificacion_operador(bitacora) -> dict:
-    """
-    Envía WhatsApp (mismo template Twilio que cliente) al operador asignado
-    con los datos de su próximo viaje.
-
-    Returns dict con clave 'wa_ok' (bool).
-    """
-    resultado = {'wa_ok': False}
-    operador = bitacora.operador
-
+def _variables_operador(bitacora) -> dict:
+    """Variables de plantilla de la notificación al operador."""
     var1 = _var_info_carga(bitacora)
 
     # {{2}} — Detalles del Traslado (versión operador: destino + horario de entrega)
@@ -260,13 +284,24 @@ def enviar_notificacion_operador(bitacora) -> dict:
     tipo_servicio = 'REPARTO' if bitacora.reparto else 'DIRECTO'
     var3 = f"Servicio {tipo_servicio} ejecutado {obs}."
 
-    variables = {'1': var1, '2': var2, '3': var3}
+    return {'1': var1, '2': var2, '3': var3}
+
+
+def enviar_notificacion_operador(bitacora) -> dict:
+    """
+    Envía WhatsApp (mismo template Twilio que cliente) al operador asignado
+    con los datos de su próximo viaje.
+
+    Returns dict con clave 'wa_ok' (bool).
+    """
+    resultado = {'wa_ok': False}
+    operador = bitacora.operador
+    variables = _variables_operador(bitacora)
 
     telefono = (operador.telefono or '').strip()
     if telefono and settings.TWILIO_CONTENT_SID_BITACORA:
         try:
-            client = _twilio_client()
-            client.messages.create(
+            crear_mensaje_wa(
                 from_=settings.TWILIO_WHATSAPP_FROM,
                 to=_numero_wa_mx(telefono),
                 content_sid=settings.TWILIO_CONTENT_SID_BITACORA,
@@ -285,6 +320,131 @@ def enviar_notificacion_operador(bitacora) -> dict:
     return resultado
 
 
+# ─── Encolado en el outbox (entrega asíncrona) ──────────────────────────────
+# Las vistas usan estas variantes: registran la notificación en
+# modulos.notificaciones y el worker la entrega fuera del request.
+
+# Un doble clic dentro de esta ventana no duplica el envío; un reenvío posterior sí.
+_VENTANA_DEDUP_MANUAL = 300
+
+
+def _encolar_wa_y_email_cliente(bitacora, cliente, variables: dict, etiqueta: str) -> dict:
+    """Equivalente encolado de _enviar_wa_y_email_cliente. Devuelve qué canales se encolaron."""
+    from modulos.notificaciones.services import clave_dedup, encolar, encolar_email
+
+    resultado = {'wa_encolado': False, 'email_encolado': False}
+
+    if cliente.celular and settings.TWILIO_CONTENT_SID_BITACORA:
+        encolar(
+            'TWILIO_WA', _numero_wa(cliente.celular),
+            {
+                'to': _numero_wa(cliente.celular),
+                'content_sid': settings.TWILIO_CONTENT_SID_BITACORA,
+                'variables': variables,
+            },
+            asunto=f"Bitácora #{bitacora.pk} — {cliente.nombre}",
+            clave_dedup=clave_dedup(
+                'bitacora', bitacora.pk, etiqueta, cliente.pk, 'wa', ventana=_VENTANA_DEDUP_MANUAL
+            ),
+            origen=bitacora,
+        )
+        resultado['wa_encolado'] = True
+    else:
+        if not cliente.celular:
+            logger.warning("Cliente %s sin celular — WA omitido.", cliente.nombre)
+        if not settings.TWILIO_CONTENT_SID_BITACORA:
+            logger.warning("TWILIO_CONTENT_SID_BITACORA no configurado.")
+
+    if cliente.email:
+        encolar_email(
+            [cliente.email], _asunto_email(bitacora), _cuerpo_email(bitacora, variables),
+            clave_dedup=clave_dedup(
+                'bitacora', bitacora.pk, etiqueta, cliente.pk, 'email', ventana=_VENTANA_DEDUP_MANUAL
+            ),
+            origen=bitacora,
+        )
+        resultado['email_encolado'] = True
+    else:
+        logger.warning("Cliente %s sin email — correo omitido.", cliente.nombre)
+
+    return resultado
+
+
+def encolar_notificacion_bitacora(bitacora, cliente) -> dict:
+    """
+    Encola WhatsApp + email al cliente con los datos del viaje.
+
+    Returns dict con claves 'wa_encolado' (bool) y 'email_encolado' (bool).
+    """
+    return _encolar_wa_y_email_cliente(
+        bitacora, cliente, _variables_bitacora(bitacora), etiqueta='cliente'
+    )
+
+
+def encolar_notificaciones_reparto(bitacora) -> dict:
+    """
+    Versión encolada de enviar_notificaciones_reparto: una notificación por
+    contenedor. Returns {'contenedor_1': {...} | None, 'contenedor_2': {...} | None}.
+    """
+    resultado = {'contenedor_1': None, 'contenedor_2': None}
+
+    if bitacora.cliente:
+        resultado['contenedor_1'] = _encolar_wa_y_email_cliente(
+            bitacora, bitacora.cliente,
+            _variables_contenedor(bitacora, 1, bitacora.fecha_hora_entrega),
+            etiqueta='contenedor_1',
+        )
+
+    cliente_2 = bitacora.cliente_2 or bitacora.cliente
+    if cliente_2:
+        resultado['contenedor_2'] = _encolar_wa_y_email_cliente(
+            bitacora, cliente_2,
+            _variables_contenedor(
+                bitacora, 2, bitacora.fecha_hora_entrega_2 or bitacora.fecha_hora_entrega
+            ),
+            etiqueta='contenedor_2',
+        )
+
+    return resultado
+
+
+def encolar_notificacion_operador(bitacora) -> dict:
+    """
+    Encola el WhatsApp al operador asignado.
+
+    Returns dict con clave 'wa_encolado' (bool).
+    """
+    from modulos.notificaciones.services import clave_dedup, encolar
+
+    operador = bitacora.operador
+    telefono = (operador.telefono or '').strip()
+    if not telefono or not settings.TWILIO_CONTENT_SID_BITACORA:
+        if not telefono:
+            logger.warning("Operador %s sin teléfono — WA omitido.", operador.nombre)
+        if not settings.TWILIO_CONTENT_SID_BITACORA:
+            logger.warning("TWILIO_CONTENT_SID_BITACORA no configurado.")
+        return {'wa_encolado': False}
+
+    encolar(
+        'TWILIO_WA', _numero_wa_mx(telefono),
+        {
+            'to': _numero_wa_mx(telefono),
+            'content_sid': settings.TWILIO_CONTENT_SID_BITACORA,
+            'variables': _variables_operador(bitacora),
+        },
+        asunto=f"Bitácora #{bitacora.pk} — operador {operador.nombre}",
+        clave_dedup=clave_dedup(
+            'bitacora', bitacora.pk, 'operador', operador.pk, 'wa', ventana=_VENTANA_DEDUP_MANUAL
+        ),
+        origen=bitacora,
+    )
+    return {'wa_encolado': True}
+
+
+def _asunto_email(bitacora) -> str:
+    return f"Programación de contenedores — {bitacora.fecha_salida.strftime('%d/%m/%Y') if bitacora.fecha_salida else ''}"
+
+
 def _cuerpo_email(bitacora, variables: dict) -> str:
     # El email sí puede usar saltos de línea; reemplazamos los separadores pipe
     def expand(v):
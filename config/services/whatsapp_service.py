@@ -3,15 +3,18 @@ WhatsApp Service — WAHA (WhatsApp HTTP API).
 
 Envía mensajes de texto a los números configurados en WA_ALLOWED_NUMBERS.
 Nunca lanza excepciones hacia el caller; los errores se loggean y se ignoran.
+
+El estado de la sesión lo mantiene el monitor de modulos.notificaciones.monitor;
+si la sesión no está lista, `enviar_mensaje` deja los mensajes en el outbox.
 """
 
 import logging
-import time
 
-import requests
-from requests.exceptions import Timeout, ConnectionError as ReqConnectionError
+from requests.exceptions import Timeout, RequestException
 from django.conf import settings
 
+from config.services.externos import ServicioNoDisponible, solicitar
+
 logger = logging.getLogger(__name__)
 
 
@@ -30,7 +33,7 @@ def _session_url() -> str:
 
 def _session_status() -> str:
     try:
-        r = requests.get(_session_url(), headers=_headers(), timeout=8)
+        r = solicitar('waha', 'GET', _session_url(), headers=_headers(), timeout=(3.05, 8))
         if r.status_code == 200:
             data = r.json()
             # WAHA devuelve 'status' en minúsculas ('ready') o mayúsculas ('WORKING')
@@ -43,57 +46,34 @@ def _session_status() -> str:
         return 'unknown'
 
 
-# Estados que indican sesión activa (varía según versión de WAHA)
-_ESTADOS_ACTIVOS = {'ready', 'working'}
-# Estados que se pueden reiniciar
-_ESTADOS_REINICIABLES = {'disconnected', 'stopped', 'failed'}
-# Estados transitorios — no tocar
-_ESTADOS_TRANSITORIOS = {'initializing', 'authenticating', 'qr_ready', 'starting', 'scan_qr_code'}
+class WhatsAppError(Exception):
+    """Fallo al entregar un mensaje vía WAHA (el outbox lo usa para reintentar)."""
 
 
-def _ensure_session_ready() -> bool:
-    """Verifica que la sesión esté activa; la inicia si está disconnected/stopped.
-
-    Si el estado es 'unknown' (servidor inalcanzable o error de red), intenta
-    enviar de todas formas — el error real aparecerá en el send_text.
+def iniciar_sesion() -> None:
     """
-    status = _session_status()
+    Solicita a WAHA que inicie la sesión, sin esperar a que quede activa.
 
-    if status in _ESTADOS_ACTIVOS:
-        return True
-
-    if status == 'unknown':
-        # No podemos determinar el estado; intentamos enviar de todas formas
-        logger.warning("WhatsApp: no se pudo verificar estado de sesión, intentando enviar de todas formas.")
-        return True
+    Lo usa el monitor de salud (modulos.notificaciones.monitor); el resultado
+    se observa en su siguiente ciclo. Lanza WhatsAppError si WAHA no responde.
+    """
+    try:
+        solicitar('waha', 'POST', f"{_session_url()}/start", headers=_headers(), timeout=(3.05, 10))
+    except Timeout:
+        pass  # WAHA sigue procesando en background
+    except Exception as e:
+        raise WhatsAppError(f"No se pudo solicitar el inicio de sesión: {e}") from e
 
-    if status in _ESTADOS_TRANSITORIOS:
-        logger.warning("Sesión WhatsApp en estado transitorio '%s', no se puede enviar.", status)
-        return False
 
-    if status in _ESTADOS_REINICIABLES:
-        logger.warning("Sesión WhatsApp %s — intentando iniciar...", status)
-        try:
-            # start puede bloquear mientras WAHA inicializa; continuamos con polling
-            requests.post(f"{_session_url()}/start", headers=_headers(), timeout=20)
-        except Timeout:
-            pass  # WAHA sigue procesando en background
-        except Exception as e:
-            logger.error("Error al iniciar sesión WhatsApp: %s", e)
-            return False
-
-        # Polling hasta 60s — WAHA puede tardar hasta ~40s en reconectar
-        for _ in range(30):
-            time.sleep(2)
-            if _session_status() in _ESTADOS_ACTIVOS:
-                logger.info("Sesión WhatsApp reconectada OK.")
-                return True
-
-        logger.error("Sesión WhatsApp no alcanzó estado activo tras iniciar.")
-        return False
+def _ensure_session_ready() -> bool:
+    """Indica si la sesión está lista según el último estado registrado por el monitor.
 
-    logger.warning("Sesión WhatsApp en estado desconocido '%s', intentando enviar de todas formas.", status)
-    return True
+    No hace llamadas HTTP ni espera: el monitor de salud (scheduler) consulta
+    WAHA y reinicia la sesión fuera del request. Si aún no hay verificación,
+    o el estado es 'unknown', se intenta enviar — el error real aparecerá en el send_text.
+    """
+    from modulos.notificaciones.monitor import sesion_lista
+    return sesion_lista()
 
 
 def _construir_chat_id(numero: str) -> str:
@@ -104,11 +84,49 @@ def _construir_chat_id(numero: str) -> str:
     return numero
 
 
+def enviar_texto(numero: str, texto: str) -> None:
+    """
+    Envía un solo mensaje de texto a `numero`. Lanza WhatsAppError si falla.
+
+    No verifica el estado de la sesión; eso queda a cargo del caller
+    (enviar_mensaje o el canal WAHA del outbox de notificaciones).
+    """
+    api_url = getattr(settings, 'WA_API_URL', '').rstrip('/')
+    session_id = getattr(settings, 'WA_SESSION_ID', '')
+    if not api_url or not getattr(settings, 'WA_API_KEY', '') or not session_id:
+        raise WhatsAppError("WA_API_URL, WA_API_KEY o WA_SESSION_ID no configurados.")
+
+    endpoint = f"{api_url}/sessions/{session_id}/messages/send-text"
+    chat_id = _construir_chat_id(numero)
+    try:
+        resp = solicitar(
+            'waha', 'POST', endpoint,
+            json={'chatId': chat_id, 'text': texto},
+            headers=_headers(),
+            timeout=(3.05, 30),  # WAHA bloquea esperando ACK; reintentar causaría duplicados
+        )
+    except ServicioNoDisponible as e:
+        raise WhatsAppError(str(e)) from e
+    except Timeout:
+        # Timeout ≠ fallo: WAHA ya encoló el mensaje. No reintentar (causaría duplicados).
+        logger.warning(
+            "WhatsApp send_text timeout para %s (mensaje probablemente enviado).", chat_id
+        )
+        return
+    except RequestException as e:
+        raise WhatsAppError(f"Sin conexión al enviar a {chat_id}: {e}") from e
+
+    if resp.status_code not in (200, 201):
+        raise WhatsAppError(f"Respuesta {resp.status_code} para {chat_id} — {resp.text[:200]}")
+    logger.info("WhatsApp: mensaje enviado a %s", chat_id)
+
+
 def enviar_mensaje(texto: str, numeros: list[str] | None = None) -> bool:
     """
     Envía un mensaje de texto a los números indicados (o a WA_ALLOWED_NUMBERS si None).
 
-    Returns True si al menos un mensaje fue enviado con éxito.
+    Returns True si al menos un mensaje fue enviado con éxito, o si quedaron en
+    cola del outbox porque la sesión no estaba lista.
     """
     api_url = getattr(settings, 'WA_API_URL', '').rstrip('/')
     api_key = getattr(settings, 'WA_API_KEY', '')
@@ -126,39 +144,22 @@ def enviar_mensaje(texto: str, numeros: list[str] | None = None) -> bool:
         return False
 
     if not _ensure_session_ready():
-        logger.error("WhatsApp no disponible, mensajes no enviados.")
-        return False
-
-    endpoint = f"{api_url}/sessions/{session_id}/messages/send-text"
+        from modulos.notificaciones.services import encolar_whatsapp
+        encolar_whatsapp(texto, numeros, asunto=texto.strip().split('\n', 1)[0][:120])
+        logger.warning(
+            "WhatsApp: sesión no lista, %s mensaje(s) en cola hasta que se reconecte.", len(numeros)
+        )
+        return True
 
     enviados = 0
     for numero in numeros:
-        chat_id = _construir_chat_id(numero)
         try:
-            resp = requests.post(
-                endpoint,
-                json={'chatId': chat_id, 'text': texto},
-                headers=_headers(),
-                timeout=30,  # WAHA bloquea esperando ACK; reintentar causaría duplicados
-            )
-            if resp.status_code in (200, 201):
-                enviados += 1
-                logger.info("WhatsApp: mensaje enviado a %s", chat_id)
-            else:
-                logger.warning(
-                    "WhatsApp: respuesta %s para %s — %s",
-                    resp.status_code, chat_id, resp.text[:200],
-                )
-        except Timeout:
-            # Timeout ≠ fallo: WAHA ya encoló el mensaje. No reintentar (causaría duplicados).
+            enviar_texto(numero, texto)
             enviados += 1
-            logger.warning(
-                "WhatsApp send_text timeout para %s (mensaje probablemente enviado).", chat_id
-            )
-        except ReqConnectionError as e:
-            logger.error("WhatsApp sin conexión al enviar a %s: %s", chat_id, e)
+        except WhatsAppError as exc:
+            logger.error("WhatsApp: %s", exc)
         except Exception as exc:
-            logger.exception("WhatsApp: error al enviar a %s — %s", chat_id, exc)
+            logger.exception("WhatsApp: error al enviar a %s — %s", numero, exc)
 
     return enviados > 0
 
@@ -58,9 +58,15 @@ INSTALLED_APPS = [
     'modulos.caja_seca',
     'modulos.finanzas',
     'modulos.modulacion',
+    'modulos.notificaciones',
+    'modulos.ia',
+    'modulos.monitoreo',
 ]
 
 MIDDLEWARE = [
+    # Primero, para que su medición incluya al resto de la cadena
+    'modulos.monitoreo.middleware.MetricasMiddleware',
+    'modulos.monitoreo.middleware.InstrumentacionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -69,6 +75,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'config.middleware.CurrentUserMiddleware',
+    'modulos.monitoreo.middleware.PerfiladoMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -76,6 +83,19 @@ ROOT_URLCONF = 'config.urls'
 # Google APIs
 GOOGLE_MAPS_API_KEY = os.environ.get('GOOGLE_MAPS_API_KEY', '')
 GOOGLE_VISION_API_KEY = os.environ.get('GOOGLE_VISION_API_KEY', '')
+GOOGLE_MAPS_API_URL = env.str('GOOGLE_MAPS_API_URL', default='https://maps.googleapis.com/maps/api')
+GOOGLE_VISION_API_URL = env.str('GOOGLE_VISION_API_URL', default='https://vision.googleapis.com/v1')
+
+# Servicios externos (config/services/externos.py): timeout (conexión, lectura),
+# presupuesto de latencia y circuit breaker por servicio. Las claves omitidas
+# toman los valores por defecto del módulo.
+SERVICIOS_EXTERNOS = {
+    'google_maps': {'TIMEOUT': (3.05, 5), 'PRESUPUESTO_MS': 4000},
+    'google_vision': {'TIMEOUT': (3.05, 10), 'PRESUPUESTO_MS': 8000},
+    'twilio': {'TIMEOUT': (3.05, 8), 'PRESUPUESTO_MS': 6000},
+    'waha': {'TIMEOUT': (3.05, 20), 'PRESUPUESTO_MS': 15000, 'FALLOS_PARA_ABRIR': 3},
+    'anthropic': {'TIMEOUT': (5, 60), 'PRESUPUESTO_MS': 45000, 'FALLOS_PARA_ABRIR': 3},
+}
 
 TEMPLATES = [
     {
@@ -135,6 +155,38 @@ USE_I18N = True
 USE_TZ = True
 
 
+# Caché compartida (config.referencias, dashboards, Google Maps, estado de WAHA).
+# CACHE_BACKEND: locmem (por proceso, default) | archivo (CACHE_DIR, compartida
+# entre procesos del mismo host) | bd (tabla CACHE_TABLA; crearla con
+# `python manage.py createcachetable`).
+CACHE_BACKEND = env.str('CACHE_BACKEND', default='locmem')
+_CACHES_DISPONIBLES = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bitacorakasu',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    'archivo': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': env.str('CACHE_DIR', default=str(BASE_DIR / '.cache')),
+    },
+    'bd': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': env.str('CACHE_TABLA', default='cache_bitacorakasu'),
+    },
+}
+CACHES = {'default': _CACHES_DISPONIBLES[CACHE_BACKEND]}
+# TTL de las listas de referencia; los cambios por señal las invalidan antes
+REFERENCIAS_CACHE_SEGUNDOS = env.int('REFERENCIAS_CACHE_SEGUNDOS', default=3600)
+# Línea de tiempo de disponibilidad de la flota: TTL y días de historia que cubre
+DISPONIBILIDAD_CACHE_SEGUNDOS = env.int('DISPONIBILIDAD_CACHE_SEGUNDOS', default=300)
+DISPONIBILIDAD_HISTORIA_DIAS = env.int('DISPONIBILIDAD_HISTORIA_DIAS', default=30)
+# Escalones de tarifa por km y precio de diésel; las señales de finanzas los invalidan
+PRECIOS_CACHE_SEGUNDOS = env.int('PRECIOS_CACHE_SEGUNDOS', default=3600)
+# Litros en el tanque de diésel antes del primer movimiento del libro (finanzas.tanque)
+TANQUE_SALDO_INICIAL_LITROS = env.int('TANQUE_SALDO_INICIAL_LITROS', default=0)
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
@@ -194,6 +246,7 @@ DEFAULT_FROM_EMAIL = 'bitacora@transporteskasu.com.mx'
 # IAKasu — Configuración de Inteligencia Artificial
 # ---------------------------------------------------------------------------
 ANTHROPIC_API_KEY = env.str('ANTHROPIC_API_KEY', default='')
+ANTHROPIC_BASE_URL = env.str('ANTHROPIC_BASE_URL', default='')  # vacío = api.anthropic.com
 
 # Toggle global: False desactiva todas las llamadas a Claude API
 IA_HABILITADA = env.bool('IA_HABILITADA', default=True)
@@ -202,6 +255,24 @@ IA_HABILITADA = env.bool('IA_HABILITADA', default=True)
 # Solo se llama cuando la anomalía es ALTO o CRITICO (evita costos en BAJO/MEDIO)
 IA_SCORE_MINIMO_CLAUDE = env.str('IA_SCORE_MINIMO_CLAUDE', default='ALTO')
 
+# Caché de respuestas (modulos.ia.RespuestaIA): mismo prompt → misma respuesta sin llamar a Claude
+IA_CACHE_TTL_HORAS = env.int('IA_CACHE_TTL_HORAS', default=168)
+# Llamadas simultáneas a Claude por proceso; el resto espera turno hasta IA_ESPERA_MAX_SEGUNDOS
+IA_MAX_CONCURRENCIA = env.int('IA_MAX_CONCURRENCIA', default=2)
+IA_ESPERA_MAX_SEGUNDOS = 60
+# Días que se conserva la bitácora UsoIA
+IA_USO_RETENCION_DIAS = env.int('IA_USO_RETENCION_DIAS', default=365)
+
+# Modo lote (Message Batches API, mitad de costo): módulos cuyos prompts no se
+# resuelven en línea sino en lote ('combustible', 'reportes'). Vacío = todo en línea.
+IA_MODO_LOTE = env.list('IA_MODO_LOTE', default=[])
+IA_LOTES_CLIENTE = 'modulos.ia.lotes.ClienteLotesAnthropic'
+IA_LOTES_INTERVALO_MINUTOS = env.int('IA_LOTES_INTERVALO_MINUTOS', default=15)
+IA_LOTES_MAX_SOLICITUDES = 1000
+
+# Segundos que se reutiliza el contexto del dashboard IAKasu de combustible (clave por día)
+COMBUSTIBLE_IA_DASHBOARD_CACHE_SEGUNDOS = env.int('COMBUSTIBLE_IA_DASHBOARD_CACHE_SEGUNDOS', default=300)
+
 # Destinatarios de alertas IA de combustible (score ALTO / CRITICO)
 IA_ALERTAS_COMBUSTIBLE_EMAILS = env.list(
     'IA_ALERTAS_COMBUSTIBLE_EMAILS',
@@ -223,12 +294,17 @@ WA_ADMIN_CHAT = env.str('WA_ADMIN_CHAT', default='')
 WA_WEBHOOK_SECRET = env.str('WA_WEBHOOK_SECRET', default='')
 WA_ALLOWED_NUMBERS = env.list('WA_ALLOWED_NUMBERS', default=[])
 WA_REPORTES_ENABLED = env.bool('WA_REPORTES_ENABLED', default=True)
+# Monitor de salud de la sesión WAHA (modulos.notificaciones.monitor)
+WA_MONITOR_INTERVALO_SEGUNDOS = env.int('WA_MONITOR_INTERVALO_SEGUNDOS', default=30)
+WA_MONITOR_REINICIO_BASE_SEGUNDOS = 60   # espera entre reinicios; se duplica en cada intento fallido
+WA_MONITOR_REINICIO_MAX_SEGUNDOS = 900
 
 # Twilio — WhatsApp templates y notificaciones a clientes
 TWILIO_ACCOUNT_SID = env.str('TWILIO_ACCOUNT_SID', default='')
 TWILIO_AUTH_TOKEN = env.str('TWILIO_AUTH_TOKEN', default='')
 TWILIO_WHATSAPP_FROM = env.str('TWILIO_WHATSAPP_FROM', default='')
 TWILIO_CONTENT_SID_BITACORA = env.str('TWILIO_CONTENT_SID_BITACORA', default='')
+TWILIO_API_URL = env.str('TWILIO_API_URL', default='')  # vacío = api.twilio.com
 
 # Destinatarios de notificaciones de autorización de salidas de almacén.
 # Se puede sobreescribir vía .env: ALMACEN_AUTORIZACION_EMAILS=correo1@x.com,correo2@x.com
@@ -241,6 +317,62 @@ ALMACEN_AUTORIZACION_EMAILS = env.list(
     ]
 )
 
+# ---------------------------------------------------------------------------
+# Outbox de notificaciones (WhatsApp Twilio / WAHA / email)
+# ---------------------------------------------------------------------------
+# Cada canal: clase de entrega, hilos simultáneos y límite de envíos por minuto.
+NOTIFICACIONES_CANALES = {
+    'TWILIO_WA': {
+        'BACKEND': 'modulos.notificaciones.canales.CanalTwilioWhatsApp',
+        'CONCURRENCIA': env.int('NOTIF_TWILIO_CONCURRENCIA', default=2),
+        'POR_MINUTO': env.int('NOTIF_TWILIO_POR_MINUTO', default=60),
+    },
+    'WAHA_WA': {
+        'BACKEND': 'modulos.notificaciones.canales.CanalWahaWhatsApp',
+        'CONCURRENCIA': env.int('NOTIF_WAHA_CONCURRENCIA', default=1),
+        'POR_MINUTO': env.int('NOTIF_WAHA_POR_MINUTO', default=20),
+    },
+    'EMAIL': {
+        'BACKEND': 'modulos.notificaciones.canales.CanalEmail',
+        'CONCURRENCIA': env.int('NOTIF_EMAIL_CONCURRENCIA', default=2),
+        'POR_MINUTO': env.int('NOTIF_EMAIL_POR_MINUTO', default=120),
+    },
+}
+NOTIFICACIONES_MAX_INTENTOS = env.int('NOTIFICACIONES_MAX_INTENTOS', default=6)
+NOTIFICACIONES_REINTENTO_BASE_SEGUNDOS = 30
+NOTIFICACIONES_REINTENTO_MAX_SEGUNDOS = 3600
+# Cada cuánto revisa el scheduler si hay notificaciones pendientes / reintentos
+NOTIFICACIONES_INTERVALO_SEGUNDOS = env.int('NOTIFICACIONES_INTERVALO_SEGUNDOS', default=15)
+# True: además del scheduler, se dispara una entrega en segundo plano tras cada commit
+NOTIFICACIONES_ENTREGA_INMEDIATA = env.bool('NOTIFICACIONES_ENTREGA_INMEDIATA', default=True)
+
+# ---------------------------------------------------------------------------
+# Servidor local de APIs falsas (python manage.py fake_externals)
+# ---------------------------------------------------------------------------
+# Con FAKE_EXTERNALS_URL definido, Google Maps/Vision, Twilio, WAHA, Anthropic y
+# el correo apuntan al servidor local: pruebas de carga sin red ni credenciales.
+FAKE_EXTERNALS_URL = env.str('FAKE_EXTERNALS_URL', default='').rstrip('/')
+if FAKE_EXTERNALS_URL:
+    GOOGLE_MAPS_API_URL = f'{FAKE_EXTERNALS_URL}/maps/api'
+    GOOGLE_VISION_API_URL = f'{FAKE_EXTERNALS_URL}/vision/v1'
+    GOOGLE_MAPS_API_KEY = GOOGLE_MAPS_API_KEY or 'fake'
+    GOOGLE_VISION_API_KEY = GOOGLE_VISION_API_KEY or 'fake'
+    TWILIO_API_URL = f'{FAKE_EXTERNALS_URL}/twilio'
+    TWILIO_ACCOUNT_SID = 'ACfake00000000000000000000000000'
+    TWILIO_AUTH_TOKEN = 'fake'
+    TWILIO_WHATSAPP_FROM = TWILIO_WHATSAPP_FROM or 'whatsapp:+15550000000'
+    TWILIO_CONTENT_SID_BITACORA = TWILIO_CONTENT_SID_BITACORA or 'HXfake000000000000000000000000'
+    WA_API_URL = f'{FAKE_EXTERNALS_URL}/waha/api'
+    WA_API_KEY = 'fake'
+    WA_SESSION_ID = WA_SESSION_ID or 'default'
+    WA_ALLOWED_NUMBERS = WA_ALLOWED_NUMBERS or ['5215550000000']
+    ANTHROPIC_BASE_URL = f'{FAKE_EXTERNALS_URL}/anthropic'
+    ANTHROPIC_API_KEY = 'fake'
+    EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+    EMAIL_HOST = env.str('FAKE_EXTERNALS_SMTP_HOST', default='127.0.0.1')
+    EMAIL_PORT = env.int('FAKE_EXTERNALS_SMTP_PORT', default=8026)
+    EMAIL_USE_TLS = False
+
 # Celery deshabilitado. Los reportes periódicos se ejecutan vía GitHub Actions.
 # CELERY_BROKER_URL = ''
 # CELERY_RESULT_BACKEND = ''
@@ -266,4 +398,40 @@ BITACORAKASU_API_TOKEN = env.str('BITACORAKASU_API_TOKEN', default='')
 # La configuración de reportes vive en la BD (ConfiguracionReporte).
 # El scheduler revisa reportes pendientes diariamente a las 07:00 MX.
 # Para cambiar la hora de revisión, definir REPORTES_HORA_REVISION en .env
-REPORTES_HORA_REVISION = env.str('REPORTES_HORA_REVISION', default='07:00')
\ No newline at end of file
+REPORTES_HORA_REVISION = env.str('REPORTES_HORA_REVISION', default='07:00')
+# Motor de reportes: grupos (tipo_reporte, periodo) en paralelo y tope por grupo
+REPORTES_MAX_HILOS = env.int('REPORTES_MAX_HILOS', default=3)
+REPORTES_TIMEOUT_SEGUNDOS = env.int('REPORTES_TIMEOUT_SEGUNDOS', default=600)
+
+# Dataset y Excel de cada ReporteGenerado (ReportesStorage / MEDIA_ROOT/reportes)
+REPORTES_ARTEFACTOS_RETENCION_DIAS = env.int('REPORTES_ARTEFACTOS_RETENCION_DIAS', default=180)
+
+# ─── Instrumentación por petición (modulos.monitoreo) ──────────────────────────
+# Consultas SQL, tiempo SQL/externo, N+1 y latencia por ruta; ver admin → Monitoreo.
+# False: el middleware se descarta al arrancar (sin costo por petición).
+INSTRUMENTACION_ACTIVA = env.bool('INSTRUMENTACION_ACTIVA', default=False)
+# Fracción de peticiones guardadas en MuestraRequest (las lentas siempre); 0 = solo memoria
+INSTRUMENTACION_MUESTREO = env.float('INSTRUMENTACION_MUESTREO', default=0.05)
+# Peticiones recientes que conserva cada proceso en su buffer circular
+INSTRUMENTACION_BUFFER = env.int('INSTRUMENTACION_BUFFER', default=500)
+# Peticiones con esta duración o más se registran en el log como peticion_lenta
+INSTRUMENTACION_UMBRAL_LENTO_MS = env.int('INSTRUMENTACION_UMBRAL_LENTO_MS', default=1000)
+# Repeticiones de la misma consulta (huella) en una petición para considerarla N+1
+INSTRUMENTACION_UMBRAL_N1 = env.int('INSTRUMENTACION_UMBRAL_N1', default=5)
+INSTRUMENTACION_EXCLUIR = ['/static/', '/media/', '/metrics']
+INSTRUMENTACION_RETENCION_DIAS = env.int('INSTRUMENTACION_RETENCION_DIAS', default=14)
+
+# Perfilado bajo demanda: un superusuario agrega ?_perfil=1 (o X-Perfil: 1) y la
+# petición se ejecuta bajo cProfile; el resultado queda en PerfilRequest (admin).
+PERFILADO_HABILITADO = env.bool('PERFILADO_HABILITADO', default=True)
+PERFILADO_MAX_KB = env.int('PERFILADO_MAX_KB', default=2048)   # pstats más grande se descarta (queda el resumen)
+PERFILADO_MAX_CONSULTAS = 1000                                 # consultas guardadas en la traza SQL
+PERFILADO_RETENCION_DIAS = env.int('PERFILADO_RETENCION_DIAS', default=7)
+PERFILADO_MAX_PERFILES = env.int('PERFILADO_MAX_PERFILES', default=200)
+
+# Endpoint /metrics (Prometheus): latencia por ruta, SQL, servicios externos, OCR,
+# IA, reportes, alertas abiertas y colas. Series en memoria del proceso.
+METRICAS_HABILITADAS = env.bool('METRICAS_HABILITADAS', default=True)
+# Bearer token del scraper; sin token solo un superusuario con sesión puede leerlo
+METRICAS_TOKEN = env.str('METRICAS_TOKEN', default='')
+METRICAS_EXCLUIR = ['/static/', '/media/', '/metrics']
@@ -5,13 +5,32 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+class _MedidoEnMetricas:
+    """Latencia y errores de subidas, lecturas y borrados en Spaces (bitacora_externo_*{servicio="spaces"})."""
+
+    def _save(self, name, content):
+        from modulos.monitoreo import metricas
+        with metricas.cronometrar(metricas.EXTERNO_SEGUNDOS, 'spaces', errores=metricas.EXTERNO_ERRORES):
+            return super()._save(name, content)
+
+    def _open(self, name, mode='rb'):
+        from modulos.monitoreo import metricas
+        with metricas.cronometrar(metricas.EXTERNO_SEGUNDOS, 'spaces', errores=metricas.EXTERNO_ERRORES):
+            return super()._open(name, mode)
+
+    def delete(self, name):
+        from modulos.monitoreo import metricas
+        with metricas.cronometrar(metricas.EXTERNO_SEGUNDOS, 'spaces', errores=metricas.EXTERNO_ERRORES):
+            return super().delete(name)
+
+
 class StaticStorage(S3Boto3Storage):
     """Storage personalizado para archivos estáticos"""
     location = 'static'
     default_acl = 'public-read'
     file_overwrite = True  # Los archivos estáticos pueden sobreescribirse
 
-class MediaStorage(S3Boto3Storage):
+class MediaStorage(_MedidoEnMetricas, S3Boto3Storage):
     """Storage personalizado para archivos media (fotos de tickets)"""
     location = 'media'
     default_acl = None
@@ -39,7 +58,7 @@ class MediaStorage(S3Boto3Storage):
         logger.info(f"💾 Archivo media guardado en Spaces: {saved_name}")
         return saved_name
 
-class ReportesStorage(S3Boto3Storage):
+class ReportesStorage(_MedidoEnMetricas, S3Boto3Storage):
     """Storage específico para archivos de reportes"""
     location = 'reportes'
     default_acl = 'private'
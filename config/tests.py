@@ -0,0 +1,519 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+import requests
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Q, Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from config import bench, fake_externals
+from config.fechas import en_dia, limites_dias, rango_dias
+from config.services import externos
+from config.services.externos import CircuitBreaker, ServicioNoDisponible, solicitar
+from config.services.google_maps import GoogleMapsService
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Responde según `server.modo`: 'ok', 'error' (HTTP 500) o 'lento' (espera `server.demora`)."""
+
+    def _responder(self):
+        self.server.llamadas += 1
+        if self.server.modo == 'lento':
+            time.sleep(self.server.demora)
+        if self.server.modo == 'error':
+            self.send_response(500)
+            self.end_headers()
+            self.wfile.write(b'fallo inyectado')
+            return
+        if self.path.startswith('/maps/distancematrix/json'):
+            cuerpo = {
+                'status': 'OK',
+                'origin_addresses': ['40812, Gro.'],
+                'destination_addresses': ['64000, N.L.'],
+                'rows': [{'elements': [{
+                    'status': 'OK',
+                    'distance': {'value': 1_250_000, 'text': '1,250 km'},
+                    'duration': {'value': 54_000, 'text': '15 h'},
+                }]}],
+            }
+        else:
+            cuerpo = {'ok': True}
+        datos = json.dumps(cuerpo).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    do_GET = _responder
+    do_POST = _responder
+
+    def log_message(self, *args):
+        pass
+
+
+SERVICIOS_PRUEBA = {
+    'stub': {
+        'TIMEOUT': (1, 0.5), 'PRESUPUESTO_MS': 200,
+        'FALLOS_PARA_ABRIR': 3, 'SEGUNDOS_ABIERTO': 0.3,
+    },
+    'google_maps': {
+        'TIMEOUT': (1, 0.5), 'PRESUPUESTO_MS': 200,
+        'FALLOS_PARA_ABRIR': 2, 'SEGUNDOS_ABIERTO': 60,
+    },
+}
+
+
+@override_settings(SERVICIOS_EXTERNOS=SERVICIOS_PRUEBA)
+class ServiciosExternosTests(SimpleTestCase):
+    """Circuit breaker y presupuestos de latencia contra un servidor local con fallas inyectadas."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.servidor = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+        cls.servidor.daemon_threads = True
+        cls.url = f'http://127.0.0.1:{cls.servidor.server_address[1]}'
+        threading.Thread(target=cls.servidor.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        externos.reiniciar()
+        cache.clear()
+        self.servidor.modo = 'ok'
+        self.servidor.demora = 0
+        self.servidor.llamadas = 0
+
+    def test_llamada_exitosa_registra_metricas(self):
+        resp = solicitar('stub', 'GET', f'{self.url}/ping')
+
+        self.assertEqual(resp.status_code, 200)
+        m = externos.metricas()['stub']
+        self.assertEqual(m['llamadas'], 1)
+        self.assertEqual(m['errores'], 0)
+        self.assertEqual(m['circuito'], CircuitBreaker.CERRADO)
+
+    def test_sesion_compartida_por_servicio(self):
+        self.assertIs(externos.sesion('stub'), externos.sesion('stub'))
+        self.assertIsNot(externos.sesion('stub'), externos.sesion('google_maps'))
+
+    def test_errores_5xx_abren_el_circuito_y_se_rechaza_sin_salir_a_la_red(self):
+        self.servidor.modo = 'error'
+        for _ in range(3):
+            self.assertEqual(solicitar('stub', 'GET', f'{self.url}/x').status_code, 500)
+
+        with self.assertRaises(ServicioNoDisponible):
+            solicitar('stub', 'GET', f'{self.url}/x')
+
+        self.assertEqual(self.servidor.llamadas, 3)
+        self.assertEqual(externos.metricas()['stub']['rechazadas'], 1)
+        self.assertEqual(externos.metricas()['stub']['circuito'], CircuitBreaker.ABIERTO)
+
+    def test_semi_abierto_deja_pasar_una_prueba_y_cierra_si_responde(self):
+        self.servidor.modo = 'error'
+        for _ in range(3):
+            solicitar('stub', 'GET', f'{self.url}/x')
+
+        time.sleep(0.35)
+        self.servidor.modo = 'ok'
+        self.assertEqual(solicitar('stub', 'GET', f'{self.url}/x').status_code, 200)
+        self.assertEqual(externos.breaker('stub').estado, CircuitBreaker.CERRADO)
+
+    def test_prueba_fallida_en_semi_abierto_reabre(self):
+        self.servidor.modo = 'error'
+        for _ in range(3):
+            solicitar('stub', 'GET', f'{self.url}/x')
+
+        time.sleep(0.35)
+        solicitar('stub', 'GET', f'{self.url}/x')
+
+        self.assertEqual(externos.breaker('stub').estado, CircuitBreaker.ABIERTO)
+
+    def test_respuesta_lenta_excede_presupuesto_y_cuenta_como_fallo(self):
+        self.servidor.modo = 'lento'
+        self.servidor.demora = 0.3
+
+        resp = solicitar('stub', 'GET', f'{self.url}/x')
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(externos.metricas()['stub']['lentas'], 1)
+        self.assertEqual(externos.breaker('stub').fallos_consecutivos, 1)
+
+    def test_timeout_de_lectura_corta_la_espera(self):
+        self.servidor.modo = 'lento'
+        self.servidor.demora = 1.5
+
+        inicio = time.monotonic()
+        with self.assertRaises(requests.Timeout):
+            solicitar('stub', 'GET', f'{self.url}/x')
+
+        self.assertLess(time.monotonic() - inicio, 1.2)
+        self.assertEqual(externos.metricas()['stub']['errores'], 1)
+
+    def test_google_maps_sirve_cache_y_degrada_con_circuito_abierto(self):
+        with self.settings(GOOGLE_MAPS_API_URL=f'{self.url}/maps'):
+            maps = GoogleMapsService('clave-prueba')
+            primera = maps.calcular_distancia('40812', '64000')
+
+            self.servidor.modo = 'error'
+            for _ in range(2):
+                maps.calcular_distancia('40812', '99999')
+            desde_cache = maps.calcular_distancia('40812', '64000')
+            degradada = maps.calcular_distancia('40812', '11000')
+
+        self.assertTrue(primera['success'])
+        self.assertEqual(primera['distancia_km'], 1250)
+        self.assertEqual(desde_cache, primera)
+        self.assertFalse(degradada['success'])
+        self.assertTrue(degradada['degradado'])
+        # 1 exitosa + 2 fallidas; la ruta en caché y la degradada no salieron a la red
+        self.assertEqual(self.servidor.llamadas, 3)
+
+    @override_settings(WA_API_URL='http://127.0.0.1:9', WA_API_KEY='k', WA_SESSION_ID='default')
+    def test_whatsapp_con_circuito_abierto_lanza_whatsapp_error(self):
+        from config.services.whatsapp_service import WhatsAppError, enviar_texto
+
+        b = externos.breaker('waha')
+        for _ in range(externos.config_servicio('waha')['FALLOS_PARA_ABRIR']):
+            b.registrar_fallo()
+
+        with patch.object(externos.sesion('waha'), 'request') as mock_request:
+            with self.assertRaises(WhatsAppError):
+                enviar_texto('5215550000001', 'hola')
+            mock_request.assert_not_called()
+
+
+class EstadoServiciosExternosViewTests(TestCase):
+    def test_solo_superusuario(self):
+        usuario = get_user_model().objects.create_user(username='normal', password='x')
+        self.client.force_login(usuario)
+        self.assertEqual(self.client.get(reverse('estado_servicios_externos')).status_code, 302)
+
+        admin = get_user_model().objects.create_superuser(username='admin', password='x')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('estado_servicios_externos'))
+        self.assertEqual(response.status_code, 200)
+
+
+class FakeExternalsTests(TestCase):
+    """Los clientes de config/services funcionan de punta a punta contra fake_externals."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.http, cls.smtp, cls.registro = fake_externals.iniciar()
+        cls.url = f'http://127.0.0.1:{cls.http.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        fake_externals.detener(cls.http, cls.smtp)
+        super().tearDownClass()
+
+    def setUp(self):
+        externos.reiniciar()
+        cache.clear()
+        self.registro.reiniciar()
+        self.registro.errores.update({s: 0.0 for s in fake_externals.SERVICIOS})
+        ajustes = self.settings(
+            GOOGLE_MAPS_API_URL=f'{self.url}/maps/api',
+            GOOGLE_VISION_API_URL=f'{self.url}/vision/v1',
+            TWILIO_API_URL=f'{self.url}/twilio',
+            TWILIO_ACCOUNT_SID='ACfake00000000000000000000000000',
+            TWILIO_AUTH_TOKEN='fake',
+            TWILIO_WHATSAPP_FROM='whatsapp:+15550000000',
+            WA_API_URL=f'{self.url}/waha/api', WA_API_KEY='fake', WA_SESSION_ID='default',
+            ANTHROPIC_BASE_URL=f'{self.url}/anthropic', ANTHROPIC_API_KEY='fake', IA_HABILITADA=True,
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def tearDown(self):
+        from config.services import twilio_service
+        twilio_service._clientes_twilio.clear()
+
+    def test_google_maps_y_vision(self):
+        from config.services.ocr_service import _leer_con_vision_api
+
+        resultado = GoogleMapsService('fake').calcular_distancia('40812', '64000')
+        numero = _leer_con_vision_api(b'foto', 'fake')
+
+        self.assertTrue(resultado['success'])
+        self.assertGreater(resultado['distancia_km'], 0)
+        self.assertRegex(numero, r'^\d{7}$')
+        self.assertEqual(
+            [ll['servicio'] for ll in self.registro.llamadas], ['google_maps', 'google_vision']
+        )
+
+    def test_twilio_sdk_usa_el_servidor_local(self):
+        from config.services.twilio_service import crear_mensaje_wa
+
+        mensaje = crear_mensaje_wa(
+            from_='whatsapp:+15550000000', to='whatsapp:+5215550000001',
+            content_sid='HXfake', content_variables='{}',
+        )
+
+        self.assertTrue(mensaje.sid.startswith('SM'))
+        llamada = self.registro.filtrar('twilio')[0]
+        self.assertEqual(llamada['cuerpo']['To'], 'whatsapp:+5215550000001')
+
+    def test_waha_y_anthropic(self):
+        from config.services.claude_service import ClaudeService
+        from config.services.whatsapp_service import _session_status, enviar_texto
+
+        self.assertEqual(_session_status(), 'working')
+        enviar_texto('5215550000001', 'hola')
+        texto = ClaudeService().completar('¿consumo normal?', sistema='Analista')
+
+        self.assertIn('fake_externals', texto)
+        self.assertEqual(
+            self.registro.filtrar('waha')[1]['cuerpo'], {'chatId': '5215550000001@c.us', 'text': 'hola'}
+        )
+
+    def test_lotes_anthropic(self):
+        from modulos.ia.lotes import ClienteLotesAnthropic
+
+        cliente = ClienteLotesAnthropic()
+        lote_id = cliente.crear([
+            {'custom_id': '7', 'params': {
+                'model': 'claude-haiku-4-5-20251001', 'max_tokens': 50,
+                'messages': [{'role': 'user', 'content': 'Resumen semanal'}],
+            }},
+        ])
+
+        self.assertTrue(cliente.terminado(lote_id))
+        resultado, = cliente.resultados(lote_id)
+        self.assertEqual(resultado['custom_id'], '7')
+        self.assertTrue(resultado['exito'])
+        self.assertIn('fake_externals', resultado['texto'])
+
+    def test_smtp_registra_el_correo(self):
+        from django.core.mail import send_mail
+
+        with self.settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.smtp.server_address[1], EMAIL_USE_TLS=False,
+        ):
+            send_mail('Reporte semanal', 'cuerpo', 'bitacora@kasu.mx', ['gerencia@kasu.mx'])
+
+        llamada = self.registro.filtrar('smtp')[0]
+        self.assertEqual(llamada['cuerpo']['to'], ['gerencia@kasu.mx'])
+        self.assertEqual(llamada['cuerpo']['asunto'], 'Reporte semanal')
+
+    def test_errores_inyectados(self):
+        from config.services.whatsapp_service import WhatsAppError, enviar_texto
+
+        self.registro.errores['waha'] = 1.0
+        with self.assertRaises(WhatsAppError):
+            enviar_texto('5215550000001', 'hola')
+        self.assertEqual(self.registro.filtrar('waha')[0]['estado'], 503)
+
+    def test_parseo_de_opciones_del_command(self):
+        from config.management.commands.fake_externals import _parsear_por_servicio
+
+        latencias = _parsear_por_servicio(['100', 'twilio=400'], int, '--latencia')
+
+        self.assertEqual(latencias['google_maps'], 100)
+        self.assertEqual(latencias['twilio'], 400)
+
+
+def _local(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class FiltrosPorFechaLocalTests(TestCase):
+    def setUp(self):
+        from modulos.reportes.models import ConfiguracionReporte
+        self.config = ConfiguracionReporte.objects.create(
+            nombre='r', modulo='ALMACEN', tipo_reporte='ALMACEN_INVENTARIO',
+            frecuencia='DIARIO', destinatarios='a@b.com',
+        )
+
+    def _reporte_en(self, momento):
+        from modulos.reportes.models import ReporteGenerado
+        reporte = ReporteGenerado.objects.create(
+            configuracion=self.config, periodo_inicio=date(2025, 3, 1), periodo_fin=date(2025, 3, 1),
+        )
+        ReporteGenerado.objects.filter(pk=reporte.pk).update(fecha_generacion=momento)
+        return reporte.pk
+
+    def test_limites_semiabiertos_en_hora_local(self):
+        inicio, fin = limites_dias(date(2025, 3, 10), '2025-03-12')
+        self.assertEqual(timezone.localtime(inicio), timezone.make_aware(datetime(2025, 3, 10)))
+        self.assertEqual(timezone.localtime(fin), timezone.make_aware(datetime(2025, 3, 13)))
+        self.assertEqual(limites_dias(None, 'no-es-fecha'), (None, None))
+        self.assertEqual(rango_dias('fecha', '', None), Q())
+
+    def test_bordes_del_dia_local(self):
+        from modulos.reportes.models import ReporteGenerado
+        dentro = [self._reporte_en(_local(2025, 3, 10, 0, 0)), self._reporte_en(_local(2025, 3, 10, 23, 59, 59))]
+        self._reporte_en(_local(2025, 3, 9, 23, 59, 59))
+        self._reporte_en(_local(2025, 3, 11, 0, 0))
+
+        por_q = ReporteGenerado.objects.filter(en_dia('fecha_generacion', date(2025, 3, 10)))
+        por_lookup = ReporteGenerado.objects.filter(
+            fecha_generacion__desde_dia=date(2025, 3, 10), fecha_generacion__hasta_dia='2025-03-10',
+        )
+        self.assertCountEqual(por_q.values_list('pk', flat=True), dentro)
+        self.assertCountEqual(por_lookup.values_list('pk', flat=True), dentro)
+
+    def test_compara_la_columna_sin_convertirla(self):
+        from modulos.reportes.models import ReporteGenerado
+        sql = str(ReporteGenerado.objects.filter(fecha_generacion__desde_dia=date(2025, 3, 10)).query)
+        self.assertNotIn('cast_date', sql.lower())
+        self.assertNotIn('AT TIME ZONE', sql)
+
+    @skipUnless(connection.vendor == 'postgresql', 'EXPLAIN de índices solo aplica en PostgreSQL')
+    def test_explain_usa_indice_unidad_fecha_en_postgresql(self):
+        from modulos.combustible.models import CargaCombustible
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+        plan = CargaCombustible.objects.filter(
+            rango_dias('fecha_hora_inicio', date(2025, 3, 1), date(2025, 3, 31)), unidad_id=1,
+        ).explain()
+        self.assertIn('Index Cond', plan)
+        self.assertRegex(plan, r'Index Cond: .*fecha_hora_inicio')
+
+        plan_date = CargaCombustible.objects.filter(
+            fecha_hora_inicio__date__gte=date(2025, 3, 1), unidad_id=1,
+        ).explain()
+        self.assertNotRegex(plan_date, r'Index Cond: .*fecha_hora_inicio')
+
+
+class SeedBenchmarkTests(TestCase):
+    def test_genera_flota_coherente_y_limpia(self):
+        from modulos.bitacoras.models import BitacoraViaje
+        from modulos.combustible.models import CargaCombustible, FactCombustibleDiario
+        from modulos.unidades.models import Unidad
+
+        call_command('seed_benchmark', unidades=3, anios=0.1, semilla=3, stdout=StringIO())
+
+        unidades = Unidad.objects.filter(numero_economico__startswith='BX')
+        self.assertEqual(unidades.count(), 3)
+        cargas = CargaCombustible.objects.filter(unidad__in=unidades, estado='COMPLETADO')
+        self.assertTrue(cargas.exists())
+        self.assertFalse(cargas.filter(costo_calculado__isnull=True).exists())
+        self.assertFalse(BitacoraViaje.objects.filter(unidad__in=unidades, ingreso_calculado__isnull=True).exists())
+        self.assertEqual(
+            FactCombustibleDiario.objects.filter(unidad__in=unidades).aggregate(t=Sum('cargas'))['t'],
+            cargas.count(),
+        )
+
+        with self.assertRaises(CommandError):
+            call_command('seed_benchmark', unidades=3, anios=0.1, stdout=StringIO())
+
+        call_command('seed_benchmark', solo_limpiar=True, stdout=StringIO())
+        self.assertFalse(Unidad.objects.filter(numero_economico__startswith='BX').exists())
+
+
+class BenchTests(TestCase):
+    def test_comparar_detecta_regresiones(self):
+        base = {'a': {'consultas': 5, 'p50_ms': 10, 'p95_ms': 20, 'memoria_kb': 100}}
+        igual = {'a': {'consultas': 5, 'p50_ms': 11, 'p95_ms': 22, 'memoria_kb': 110}}
+        self.assertEqual(bench.comparar(igual, base), [])
+
+        peor = {'a': {'consultas': 6, 'p50_ms': 30, 'p95_ms': 60, 'memoria_kb': 100}}
+        regresiones = bench.comparar(peor, base)
+        self.assertEqual(len(regresiones), 2)
+        self.assertIn('consultas 5 → 6', regresiones[0])
+
+        self.assertEqual(len(bench.comparar({'a': {'error': 'FieldError: x'}}, base)), 1)
+
+    def test_command_guarda_baseline_y_compara(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'baseline.json')
+            opciones = dict(baseline=ruta, repeticiones=2, solo=['UNIDADES_KILOMETRAJE'], stdout=StringIO())
+            call_command('bench', guardar=True, **opciones)
+            self.assertFalse(get_user_model().objects.filter(username='bx_bench_admin').exists())
+
+            escenarios = bench.cargar_baseline(ruta)['escenarios']
+            self.assertEqual(list(escenarios), ['reporte.UNIDADES_KILOMETRAJE'])
+            self.assertIn('p95_ms', escenarios['reporte.UNIDADES_KILOMETRAJE'])
+
+            escenarios['reporte.UNIDADES_KILOMETRAJE']['consultas'] = 0
+            bench.guardar_baseline(ruta, escenarios)
+            with self.assertRaises(CommandError):
+                call_command('bench', **opciones)
+
+
+class ReferenciaCacheadaTests(TestCase):
+    def setUp(self):
+        from modulos.bitacoras.models import Cliente
+        cache.clear()
+        self.Cliente = Cliente
+        self.activo = Cliente.objects.create(nombre='Bravo', activo=True)
+        Cliente.objects.create(nombre='Inactivo', activo=False)
+
+    def test_segunda_llamada_no_consulta(self):
+        from config.referencias import referencia_cacheada
+        primera = referencia_cacheada(self.Cliente, {'activo': True}, orden=('nombre',))
+        with self.assertNumQueries(0):
+            segunda = referencia_cacheada(self.Cliente, {'activo': True}, orden=('nombre',))
+        self.assertEqual(segunda, primera)
+        self.assertEqual([c.nombre for c in segunda], ['Bravo'])
+
+    def test_save_y_delete_invalidan(self):
+        from config.referencias import referencia_cacheada
+        referencia_cacheada(self.Cliente, {'activo': True}, orden=('nombre',))
+        alfa = self.Cliente.objects.create(nombre='Alfa', activo=True)
+        self.assertEqual(
+            [c.nombre for c in referencia_cacheada(self.Cliente, {'activo': True}, orden=('nombre',))],
+            ['Alfa', 'Bravo'],
+        )
+        alfa.delete()
+        self.assertEqual(
+            [c.nombre for c in referencia_cacheada(self.Cliente, {'activo': True}, orden=('nombre',))],
+            ['Bravo'],
+        )
+
+    def test_update_requiere_invalidar(self):
+        from config.referencias import invalidar, referencia_cacheada
+        referencia_cacheada(self.Cliente, {'activo': True}, valores=('nombre',), plano=True)
+        self.Cliente.objects.filter(pk=self.activo.pk).update(nombre='Charlie')
+        self.assertEqual(
+            referencia_cacheada(self.Cliente, {'activo': True}, valores=('nombre',), plano=True), ['Bravo'],
+        )
+        invalidar(self.Cliente)
+        self.assertEqual(
+            referencia_cacheada(self.Cliente, {'activo': True}, valores=('nombre',), plano=True), ['Charlie'],
+        )
+
+    def test_valores_y_distintos(self):
+        from config.referencias import referencia_cacheada
+        self.Cliente.objects.create(nombre='Bravo', activo=True)
+        self.assertEqual(
+            referencia_cacheada(self.Cliente, {'activo': True}, valores=('id', 'nombre'), orden=('id',))[0],
+            {'id': self.activo.pk, 'nombre': 'Bravo'},
+        )
+        self.assertEqual(
+            referencia_cacheada(
+                self.Cliente, Q(activo=True), orden=('nombre',), valores=('nombre',), plano=True, distintos=True,
+            ),
+            ['Bravo'],
+        )
+
+    def test_modelo_no_registrado(self):
+        from django.core.exceptions import ImproperlyConfigured
+        from config.referencias import referencia_cacheada
+        from modulos.monitoreo.models import MuestraRequest
+        with self.assertRaises(ImproperlyConfigured):
+            referencia_cacheada(MuestraRequest)
@@ -19,7 +19,8 @@ from django.contrib.auth import views as auth_views
 from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
-from .views import IndexView
+from modulos.monitoreo.views import metricas_prometheus
+from .views import IndexView, estado_servicios_externos
 
 
 urlpatterns = [
@@ -27,6 +28,8 @@ urlpatterns = [
     path('login/', auth_views.LoginView.as_view(), name='login'),
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
     path('admin/', admin.site.urls),
+    path('salud/servicios/', estado_servicios_externos, name='estado_servicios_externos'),
+    path('metrics', metricas_prometheus, name='metricas_prometheus'),
     path('unidades/', include('modulos.unidades.urls'),name='dashboard_unidades'),
     path('bitacoras/', include('modulos.bitacoras.urls'), name='dashboard_bitacoras'),
     path('operadores/', include('modulos.operadores.urls'), name='dashboard_operadores'),
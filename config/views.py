@@ -1,10 +1,15 @@
 from django.views.generic import TemplateView
+from django.contrib.auth.decorators import user_passes_test
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import JsonResponse
 from django.utils import timezone
 from django.db.models import Sum, F, Count, Avg
 from datetime import timedelta
 
+from config.fechas import en_dia
+
 from modulos.operadores.models import Operador
+from modulos.unidades import disponibilidad
 from modulos.unidades.models import Unidad
 from modulos.bitacoras.models import BitacoraViaje
 from modulos.combustible.models import CargaCombustible
@@ -40,20 +45,19 @@ class IndexView(LoginRequiredMixin, TemplateView):
         context['viajes_completados'] = BitacoraViaje.objects.filter(completado=True).count()
         context['viajes_en_curso'] = BitacoraViaje.objects.filter(completado=False).count()
         viajes_mes = BitacoraViaje.objects.filter(
-            fecha_salida__gte=hace_30_dias
+            fecha_salida__desde_dia=hace_30_dias
         ).count()
         context['viajes_ultimo_mes'] = viajes_mes
 
         # ========== Estadísticas de Combustible ==========
-        cargas_hoy = CargaCombustible.objects.filter(fecha_hora_inicio__date=hoy)
+        cargas_hoy = CargaCombustible.objects.filter(en_dia('fecha_hora_inicio', hoy))
         context['cargas_hoy'] = cargas_hoy.count()
         context['cargas_completadas_hoy'] = cargas_hoy.filter(estado='COMPLETADO').count()
         context['cargas_en_proceso'] = CargaCombustible.objects.filter(estado='EN_PROCESO').count()
 
         # Alertas de candados
-        context['alertas_candado'] = CargaCombustible.objects.filter(
+        context['alertas_candado'] = cargas_hoy.filter(
             estado_candado_anterior__in=['ALTERADO', 'VIOLADO', 'SIN_CANDADO'],
-            fecha_hora_inicio__date=hoy
         ).count()
 
         # Total de litros cargados
@@ -63,13 +67,13 @@ class IndexView(LoginRequiredMixin, TemplateView):
         context['total_litros_hoy'] = round(float(litros_hoy), 2)
 
         litros_mes = CargaCombustible.objects.filter(
-            fecha_hora_inicio__date__gte=hace_30_dias,
+            fecha_hora_inicio__desde_dia=hace_30_dias,
             estado='COMPLETADO'
         ).aggregate(total=Sum('cantidad_litros'))['total'] or 0
         context['total_litros_mes'] = round(float(litros_mes), 2)
 
         cargas_completadas_mes = CargaCombustible.objects.filter(
-            fecha_hora_inicio__date__gte=hace_30_dias,
+            fecha_hora_inicio__desde_dia=hace_30_dias,
             estado='COMPLETADO'
         ).count()
         context['cargas_completadas_mes'] = cargas_completadas_mes
@@ -82,9 +86,7 @@ class IndexView(LoginRequiredMixin, TemplateView):
             estado='COMPLETADA',
             fecha_finalizacion__gte=hace_30_dias
         ).count()
-        context['unidades_en_taller'] = OrdenTrabajo.objects.filter(
-            estado__in=['EN_DIAGNOSTICO', 'EN_REPARACION', 'EN_PRUEBAS']
-        ).values('unidad').distinct().count()
+        context['unidades_en_taller'] = len(disponibilidad.en_estado(disponibilidad.EN_TALLER))
 
         # ========== Estadísticas de Compras ==========
         context['requisiciones_pendientes'] = Requisicion.objects.filter(
@@ -116,9 +118,7 @@ class IndexView(LoginRequiredMixin, TemplateView):
         labels_dias = []
         for i in range(6, -1, -1):
             dia = hoy - timedelta(days=i)
-            count = BitacoraViaje.objects.filter(
-                fecha_salida__date=dia
-            ).count()
+            count = BitacoraViaje.objects.filter(en_dia('fecha_salida', dia)).count()
             viajes_por_dia.append(count)
             labels_dias.append(dia.strftime('%d/%m'))
         context['viajes_por_dia'] = viajes_por_dia
@@ -129,7 +129,7 @@ class IndexView(LoginRequiredMixin, TemplateView):
         for i in range(6, -1, -1):
             dia = hoy - timedelta(days=i)
             litros = CargaCombustible.objects.filter(
-                fecha_hora_inicio__date=dia,
+                en_dia('fecha_hora_inicio', dia),
                 estado='COMPLETADO'
             ).aggregate(total=Sum('cantidad_litros'))['total'] or 0
             combustible_por_dia.append(round(float(litros), 2))
@@ -167,3 +167,23 @@ class IndexView(LoginRequiredMixin, TemplateView):
         ).select_related('producto_almacen')[:5]
 
         return context
+
+
+@user_passes_test(lambda u: u.is_superuser)
+def estado_servicios_externos(request):
+    """Métricas y estado del circuit breaker de cada servicio externo (solo superusuarios)."""
+    from config.services.externos import metricas
+
+    datos = {}
+    for servicio, m in metricas().items():
+        observadas = m['llamadas']
+        datos[servicio] = {
+            'circuito': m['circuito'],
+            'llamadas': observadas,
+            'errores': m['errores'],
+            'lentas': m['lentas'],
+            'rechazadas': m['rechazadas'],
+            'respaldos': m['respaldos'],
+            'latencia_promedio_ms': round(m['latencia_total'] * 1000 / observadas, 1) if observadas else None,
+        }
+    return JsonResponse(datos)
@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.http import HttpResponse
 from django.urls import path
 from django.utils import timezone
+from config.fechas import rango_dias
 from .models import (
     ProductoAlmacen, EntradaAlmacen, ItemEntradaAlmacen,
     SolicitudSalida, ItemSolicitudSalida, SalidaAlmacen,
@@ -270,10 +271,7 @@ class AuditoriaAlmacenAdmin(admin.ModelAdmin):
             qs = qs.filter(modelo=modelo)
         if usuario:
             qs = qs.filter(usuario__username=usuario)
-        if fecha_desde:
-            qs = qs.filter(fecha__date__gte=fecha_desde)
-        if fecha_hasta:
-            qs = qs.filter(fecha__date__lte=fecha_hasta)
+        qs = qs.filter(rango_dias('fecha', fecha_desde, fecha_hasta))
 
         wb = openpyxl.Workbook()
         ws = wb.active
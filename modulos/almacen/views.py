@@ -10,6 +10,9 @@ from django.http import JsonResponse
 import json
 from datetime import timedelta
 
+from config.fechas import rango_dias
+from config.referencias import referencia_cacheada
+
 from .models import (
     ProductoAlmacen, EntradaAlmacen, ItemEntradaAlmacen,
     SolicitudSalida, ItemSolicitudSalida, SalidaAlmacen,
@@ -134,9 +137,8 @@ class ProductoAlmacenListView(LoginRequiredMixin, ListView):
         context = super().get_context_data(**kwargs)
         context['filtro_form'] = FiltroProductosForm(self.request.GET)
         # Categorías y subcategorías únicas para los selects
-        context['categorias'] = (
-            ProductoAlmacen.objects.values_list('categoria', flat=True)
-            .distinct().order_by('categoria')
+        context['categorias'] = referencia_cacheada(
+            ProductoAlmacen, orden=('categoria',), valores=('categoria',), plano=True, distintos=True,
         )
         context['subcategorias_json'] = self._get_subcategorias_map()
         # Preservar filtros en paginación
@@ -148,10 +150,9 @@ class ProductoAlmacenListView(LoginRequiredMixin, ListView):
     def _get_subcategorias_map(self):
         """Retorna un dict JSON con subcategorías agrupadas por categoría"""
         import json
-        subcats = (
-            ProductoAlmacen.objects.exclude(subcategoria='')
-            .values_list('categoria', 'subcategoria').distinct()
-            .order_by('categoria', 'subcategoria')
+        subcats = referencia_cacheada(
+            ProductoAlmacen, ~Q(subcategoria=''), orden=('categoria', 'subcategoria'),
+            valores=('categoria', 'subcategoria'), plano=True, distintos=True,
         )
         mapa = {}
         for cat, subcat in subcats:
@@ -235,13 +236,11 @@ class ProductoAlmacenDeleteView(LoginRequiredMixin, DeleteView):
 def api_subcategorias(request):
     """API endpoint para obtener subcategorías filtradas por categoría"""
     categoria = request.GET.get('categoria', '')
-    subcategorias = (
-        ProductoAlmacen.objects.filter(categoria=categoria)
-        .exclude(subcategoria='')
-        .values_list('subcategoria', flat=True)
-        .distinct().order_by('subcategoria')
+    subcategorias = referencia_cacheada(
+        ProductoAlmacen, Q(categoria=categoria) & ~Q(subcategoria=''), orden=('subcategoria',),
+        valores=('subcategoria',), plano=True, distintos=True,
     )
-    return JsonResponse({'subcategorias': list(subcategorias)})
+    return JsonResponse({'subcategorias': subcategorias})
 
 
 # ========== EntradaAlmacen Views ==========
@@ -265,10 +264,7 @@ class EntradaAlmacenListView(LoginRequiredMixin, ListView):
         
         if tipo:
             queryset = queryset.filter(tipo=tipo)
-        if fecha_desde:
-            queryset = queryset.filter(fecha_entrada__date__gte=fecha_desde)
-        if fecha_hasta:
-            queryset = queryset.filter(fecha_entrada__date__lte=fecha_hasta)
+        queryset = queryset.filter(rango_dias('fecha_entrada', fecha_desde, fecha_hasta))
         
         return queryset.order_by('-fecha_entrada')
     
@@ -308,9 +304,8 @@ def entrada_directa(request):
     """Entrada directa al almacén sin orden de compra ni de trabajo."""
     from django.db import transaction
 
-    categorias = list(
-        ProductoAlmacen.objects.values_list('categoria', flat=True)
-        .distinct().order_by('categoria')
+    categorias = referencia_cacheada(
+        ProductoAlmacen, orden=('categoria',), valores=('categoria',), plano=True, distintos=True,
     )
 
     if request.method == 'POST':
@@ -462,10 +457,7 @@ class SolicitudSalidaListView(LoginRequiredMixin, ListView):
             queryset = queryset.filter(tipo=tipo)
         if estado:
             queryset = queryset.filter(estado=estado)
-        if fecha_desde:
-            queryset = queryset.filter(fecha_solicitud__date__gte=fecha_desde)
-        if fecha_hasta:
-            queryset = queryset.filter(fecha_solicitud__date__lte=fecha_hasta)
+        queryset = queryset.filter(rango_dias('fecha_solicitud', fecha_desde, fecha_hasta))
         
         return queryset.order_by('-fecha_solicitud')
     
@@ -521,9 +513,9 @@ class SolicitudSalidaCreateView(LoginRequiredMixin, CreateView):
 
 @login_required
 def enviar_notificacion_solicitud(request, pk):
-    """Envía notificación por correo a los autorizadores para revisar la solicitud"""
-    from django.core.mail import send_mail
+    """Encola la notificación por correo a los autorizadores para revisar la solicitud"""
     from django.conf import settings as django_settings
+    from modulos.notificaciones.services import clave_dedup, encolar_email
 
     solicitud = get_object_or_404(SolicitudSalida, pk=pk)
 
@@ -574,20 +566,15 @@ def enviar_notificacion_solicitud(request, pk):
             messages.warning(request, 'No hay destinatarios configurados (ALMACEN_AUTORIZACION_EMAILS).')
             return redirect('almacen:solicitud_detail', pk=pk)
 
-        try:
-            send_mail(
-                subject=asunto,
-                message=cuerpo,
-                from_email=django_settings.DEFAULT_FROM_EMAIL,
-                recipient_list=destinatarios,
-                fail_silently=False,
-            )
-            messages.success(
-                request,
-                f'Notificación enviada a {len(destinatarios)} destinatario(s).'
-            )
-        except Exception as e:
-            messages.error(request, f'Error al enviar el correo: {e}')
+        encolar_email(
+            destinatarios, asunto, cuerpo,
+            clave_dedup=clave_dedup('almacen', 'solicitud', solicitud.pk, 'autorizacion', ventana=300),
+            origen=solicitud,
+        )
+        messages.success(
+            request,
+            f'Notificación en cola para {len(destinatarios)} destinatario(s).'
+        )
 
     return redirect('almacen:solicitud_detail', pk=pk)
 
@@ -1068,10 +1055,10 @@ def asignacion_salida_create(request):
         context = {
             'errors': errors,
             'post': request.POST,
-            'unidades': Unidad.objects.filter(activa=True).order_by('numero_economico'),
-            'equipos': Equipo.objects.filter(activo=True).order_by('numero_economico'),
-            'dollys': Dolly.objects.filter(activo=True).order_by('numero_economico'),
-            'cajas': CajaSeca.objects.filter(activo=True).order_by('numero_economico'),
+            'unidades': referencia_cacheada(Unidad, {'activa': True}, orden=('numero_economico',)),
+            'equipos': referencia_cacheada(Equipo, {'activo': True}, orden=('numero_economico',)),
+            'dollys': referencia_cacheada(Dolly, {'activo': True}, orden=('numero_economico',)),
+            'cajas': referencia_cacheada(CajaSeca, {'activo': True}, orden=('numero_economico',)),
             'tipo_choices': AsignacionSalida.TIPO_CHOICES,
         }
         return render(request, 'almacen/asignacion_salida_form.html', context)
@@ -1082,10 +1069,10 @@ def asignacion_salida_create(request):
     from modulos.caja_seca.models import CajaSeca
 
     context = {
-        'unidades': Unidad.objects.filter(activa=True).order_by('numero_economico'),
-        'equipos': Equipo.objects.filter(activo=True).order_by('numero_economico'),
-        'dollys': Dolly.objects.filter(activo=True).order_by('numero_economico'),
-        'cajas': CajaSeca.objects.filter(activo=True).order_by('numero_economico'),
+        'unidades': referencia_cacheada(Unidad, {'activa': True}, orden=('numero_economico',)),
+        'equipos': referencia_cacheada(Equipo, {'activo': True}, orden=('numero_economico',)),
+        'dollys': referencia_cacheada(Dolly, {'activo': True}, orden=('numero_economico',)),
+        'cajas': referencia_cacheada(CajaSeca, {'activo': True}, orden=('numero_economico',)),
         'tipo_choices': AsignacionSalida.TIPO_CHOICES,
     }
     return render(request, 'almacen/asignacion_salida_form.html', context)
@@ -1227,10 +1214,10 @@ def asignacion_salida_update(request, pk):
             'errors': errors,
             'post': request.POST,
             'items_iniciales': items_iniciales,
-            'unidades': Unidad.objects.filter(activa=True).order_by('numero_economico'),
-            'equipos': Equipo.objects.filter(activo=True).order_by('numero_economico'),
-            'dollys': Dolly.objects.filter(activo=True).order_by('numero_economico'),
-            'cajas': CajaSeca.objects.filter(activo=True).order_by('numero_economico'),
+            'unidades': referencia_cacheada(Unidad, {'activa': True}, orden=('numero_economico',)),
+            'equipos': referencia_cacheada(Equipo, {'activo': True}, orden=('numero_economico',)),
+            'dollys': referencia_cacheada(Dolly, {'activo': True}, orden=('numero_economico',)),
+            'cajas': referencia_cacheada(CajaSeca, {'activo': True}, orden=('numero_economico',)),
             'tipo_choices': AsignacionSalida.TIPO_CHOICES,
         }
         return render(request, 'almacen/asignacion_salida_edit.html', context)
@@ -1250,10 +1237,10 @@ def asignacion_salida_update(request, pk):
     context = {
         'asignacion': asignacion,
         'items_iniciales': items_iniciales,
-        'unidades': Unidad.objects.filter(activa=True).order_by('numero_economico'),
-        'equipos': Equipo.objects.filter(activo=True).order_by('numero_economico'),
-        'dollys': Dolly.objects.filter(activo=True).order_by('numero_economico'),
-        'cajas': CajaSeca.objects.filter(activo=True).order_by('numero_economico'),
+        'unidades': referencia_cacheada(Unidad, {'activa': True}, orden=('numero_economico',)),
+        'equipos': referencia_cacheada(Equipo, {'activo': True}, orden=('numero_economico',)),
+        'dollys': referencia_cacheada(Dolly, {'activo': True}, orden=('numero_economico',)),
+        'cajas': referencia_cacheada(CajaSeca, {'activo': True}, orden=('numero_economico',)),
         'tipo_choices': AsignacionSalida.TIPO_CHOICES,
     }
     return render(request, 'almacen/asignacion_salida_edit.html', context)
@@ -1265,14 +1252,14 @@ def api_activos_por_tipo(request):
     data = []
     if tipo == 'UNIDAD':
         from modulos.unidades.models import Unidad
-        data = list(Unidad.objects.filter(activa=True).order_by('numero_economico').values('id', 'numero_economico'))
+        data = referencia_cacheada(Unidad, {'activa': True}, orden=('numero_economico',), valores=('id', 'numero_economico'))
     elif tipo == 'EQUIPO':
         from modulos.equipos.models import Equipo
-        data = list(Equipo.objects.filter(activo=True).order_by('numero_economico').values('id', 'numero_economico'))
+        data = referencia_cacheada(Equipo, {'activo': True}, orden=('numero_economico',), valores=('id', 'numero_economico'))
     elif tipo == 'DOLLY':
         from modulos.dollys.models import Dolly
-        data = list(Dolly.objects.filter(activo=True).order_by('numero_economico').values('id', 'numero_economico'))
+        data = referencia_cacheada(Dolly, {'activo': True}, orden=('numero_economico',), valores=('id', 'numero_economico'))
     elif tipo == 'CAJA_SECA':
         from modulos.caja_seca.models import CajaSeca
-        data = list(CajaSeca.objects.filter(activo=True).order_by('numero_economico').values('id', 'numero_economico'))
+        data = referencia_cacheada(CajaSeca, {'activo': True}, orden=('numero_economico',), valores=('id', 'numero_economico'))
     return JsonResponse({'activos': data})
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:28
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.functions.math
+import modulos.bitacoras.models
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bitacoras', '0009_bitacoraviaje_cliente_2_and_more'),
+        ('operadores', '0001_initial'),
+        ('unidades', '0002_unidad_control_combustible_total'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bitacoraviaje',
+            name='bajo_rendimiento',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(models.Q(('kilometraje_llegada__gt', 0), ('kilometraje_salida__gt', 0), ('kilometraje_llegada__gt', models.F('kilometraje_salida')), ('diesel_cargado__gt', 0), django.db.models.lookups.GreaterThan(django.db.models.functions.comparison.Cast(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Cast(django.db.models.expressions.CombinedExpression(models.F('kilometraje_llegada'), '-', models.F('kilometraje_salida')), models.FloatField()), '/', django.db.models.functions.comparison.Cast('diesel_cargado', models.FloatField())), 2), models.DecimalField(decimal_places=2, max_digits=10)), models.Value(Decimal('0'))), django.db.models.lookups.LessThan(django.db.models.functions.comparison.Cast(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Cast(django.db.models.expressions.CombinedExpression(models.F('kilometraje_llegada'), '-', models.F('kilometraje_salida')), models.FloatField()), '/', django.db.models.functions.comparison.Cast('diesel_cargado', models.FloatField())), 2), models.DecimalField(decimal_places=2, max_digits=10)), models.Value(Decimal('2.5')))), then=models.Value(True)), default=models.Value(False), output_field=models.BooleanField()), output_field=models.BooleanField(), verbose_name='Bajo rendimiento'),
+        ),
+        migrations.AddField(
+            model_name='bitacoraviaje',
+            name='duracion_horas',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Coalesce(django.db.models.functions.math.Round(modulos.bitacoras.models.HorasEntre('fecha_llegada', 'fecha_salida'), 2), models.Value(Decimal('0')), output_field=models.DecimalField(decimal_places=2, max_digits=10)), output_field=models.DecimalField(decimal_places=2, max_digits=10), verbose_name='Horas de viaje'),
+        ),
+        migrations.AddField(
+            model_name='bitacoraviaje',
+            name='km_recorridos',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(models.Q(('kilometraje_llegada__gt', 0), ('kilometraje_salida__gt', 0)), then=django.db.models.expressions.CombinedExpression(models.F('kilometraje_llegada'), '-', models.F('kilometraje_salida'))), default=models.Value(0), output_field=models.IntegerField()), output_field=models.IntegerField(), verbose_name='Kms recorridos'),
+        ),
+        migrations.AddField(
+            model_name='bitacoraviaje',
+            name='rendimiento_km_lt',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(models.Q(('kilometraje_llegada__gt', 0), ('kilometraje_salida__gt', 0), ('kilometraje_llegada__gt', models.F('kilometraje_salida')), ('diesel_cargado__gt', 0)), then=django.db.models.functions.comparison.Cast(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Cast(django.db.models.expressions.CombinedExpression(models.F('kilometraje_llegada'), '-', models.F('kilometraje_salida')), models.FloatField()), '/', django.db.models.functions.comparison.Cast('diesel_cargado', models.FloatField())), 2), models.DecimalField(decimal_places=2, max_digits=10))), default=models.Value(Decimal('0')), output_field=models.DecimalField(decimal_places=2, max_digits=10)), output_field=models.DecimalField(decimal_places=2, max_digits=10), verbose_name='Rendimiento (km/lt)'),
+        ),
+        migrations.AddField(
+            model_name='bitacoraviaje',
+            name='velocidad_kmh',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(models.Q(('kilometraje_llegada__gt', 0), ('kilometraje_salida__gt', 0), ('kilometraje_llegada__gt', models.F('kilometraje_salida')), django.db.models.lookups.GreaterThan(django.db.models.functions.math.Round(modulos.bitacoras.models.HorasEntre('fecha_llegada', 'fecha_salida'), 2), models.Value(Decimal('0')))), then=django.db.models.functions.comparison.Cast(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Cast(django.db.models.expressions.CombinedExpression(models.F('kilometraje_llegada'), '-', models.F('kilometraje_salida')), models.FloatField()), '/', django.db.models.functions.comparison.Cast(django.db.models.functions.math.Round(modulos.bitacoras.models.HorasEntre('fecha_llegada', 'fecha_salida'), 2), models.FloatField())), 2), models.DecimalField(decimal_places=2, max_digits=10))), default=models.Value(Decimal('0')), output_field=models.DecimalField(decimal_places=2, max_digits=10)), output_field=models.DecimalField(decimal_places=2, max_digits=10), verbose_name='Velocidad promedio (km/h)'),
+        ),
+        migrations.AddIndex(
+            model_name='bitacoraviaje',
+            index=models.Index(fields=['unidad', 'rendimiento_km_lt'], name='bitacora_unidad_rend_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bitacoraviaje',
+            index=models.Index(fields=['operador', 'rendimiento_km_lt'], name='bitacora_operador_rend_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bitacoraviaje',
+            index=models.Index(condition=models.Q(('bajo_rendimiento', True)), fields=['-fecha_salida'], name='bitacora_bajo_rend_idx'),
+        ),
+    ]
@@ -1,7 +1,74 @@
 from django.db import models
+from django.db.models import Case, F, Func, Q, Value, When
+from django.db.models.functions import Cast, Coalesce, Round
+from django.db.models.lookups import GreaterThan, LessThan
+from django.conf import settings
 from django.core.validators import MinValueValidator
 from decimal import Decimal
-import os
+
+# Rendimiento (km/lt) por debajo del cual un viaje genera alerta
+RENDIMIENTO_MINIMO = Decimal('2.5')
+
+
+class HorasEntre(Func):
+    """Horas entre dos DateTimeField (sin redondear); inmutable para columnas generadas."""
+
+    arity = 2
+    output_field = models.DecimalField(max_digits=12, decimal_places=6)
+    template = '(CAST(EXTRACT(EPOCH FROM (%(expressions)s)) AS numeric) / 3600)'
+    arg_joiner = ' - '
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='((julianday(%(expressions)s)) * 24)',
+            arg_joiner=') - julianday(',
+            **extra_context,
+        )
+
+
+# Expresiones SQL de las métricas del viaje: replican las propiedades de
+# BitacoraViaje (mismos casos en 0 y el mismo redondeo a 2 decimales antes de
+# comparar o dividir). Una columna generada no puede leer otra, por eso cada
+# expresión repite las que necesita.
+_METRICA = models.DecimalField(max_digits=10, decimal_places=2)
+_CON_KM = (
+    Q(kilometraje_llegada__gt=0) & Q(kilometraje_salida__gt=0)
+    & Q(kilometraje_llegada__gt=F('kilometraje_salida'))
+)
+_KM_REAL = Cast(F('kilometraje_llegada') - F('kilometraje_salida'), models.FloatField())
+_RENDIMIENTO = Cast(Round(_KM_REAL / Cast('diesel_cargado', models.FloatField()), 2), _METRICA)
+_HORAS = Round(HorasEntre('fecha_llegada', 'fecha_salida'), 2)
+
+EXPRESION_KM = Case(
+    When(Q(kilometraje_llegada__gt=0) & Q(kilometraje_salida__gt=0),
+         then=F('kilometraje_llegada') - F('kilometraje_salida')),
+    default=Value(0),
+    output_field=models.IntegerField(),
+)
+EXPRESION_RENDIMIENTO = Case(
+    When(_CON_KM & Q(diesel_cargado__gt=0), then=_RENDIMIENTO),
+    default=Value(Decimal('0')),
+    output_field=_METRICA,
+)
+EXPRESION_HORAS = Coalesce(_HORAS, Value(Decimal('0')), output_field=_METRICA)
+# Divide entre las horas ya redondeadas, como velocidad_promedio (0 si redondean a 0)
+EXPRESION_VELOCIDAD = Case(
+    When(_CON_KM & GreaterThan(_HORAS, Value(Decimal('0'))),
+         then=Cast(Round(_KM_REAL / Cast(_HORAS, models.FloatField()), 2), _METRICA)),
+    default=Value(Decimal('0')),
+    output_field=_METRICA,
+)
+# Compara el rendimiento redondeado, como alerta_bajo_rendimiento: 2.496 km/lt
+# se muestra como 2.50 y no alerta
+EXPRESION_BAJO_RENDIMIENTO = Case(
+    When(_CON_KM & Q(diesel_cargado__gt=0)
+         & GreaterThan(_RENDIMIENTO, Value(Decimal('0')))
+         & LessThan(_RENDIMIENTO, Value(RENDIMIENTO_MINIMO)),
+         then=Value(True)),
+    default=Value(False),
+    output_field=models.BooleanField(),
+)
 
 
 class Cliente(models.Model):
@@ -248,7 +315,41 @@ class BitacoraViaje(models.Model):
         help_text="distancia_efectiva × tarifa por km vigente al completar el viaje",
         verbose_name="Ingreso calculado",
     )
-    
+
+    # Métricas del viaje calculadas por la BD (columnas generadas) para
+    # filtrar, ordenar y agregar en SQL; las propiedades de abajo calculan lo
+    # mismo en Python y sirven también para instancias sin guardar
+    km_recorridos = models.GeneratedField(
+        expression=EXPRESION_KM,
+        output_field=models.IntegerField(),
+        db_persist=True,
+        verbose_name="Kms recorridos",
+    )
+    rendimiento_km_lt = models.GeneratedField(
+        expression=EXPRESION_RENDIMIENTO,
+        output_field=_METRICA,
+        db_persist=True,
+        verbose_name="Rendimiento (km/lt)",
+    )
+    duracion_horas = models.GeneratedField(
+        expression=EXPRESION_HORAS,
+        output_field=_METRICA,
+        db_persist=True,
+        verbose_name="Horas de viaje",
+    )
+    velocidad_kmh = models.GeneratedField(
+        expression=EXPRESION_VELOCIDAD,
+        output_field=_METRICA,
+        db_persist=True,
+        verbose_name="Velocidad promedio (km/h)",
+    )
+    bajo_rendimiento = models.GeneratedField(
+        expression=EXPRESION_BAJO_RENDIMIENTO,
+        output_field=models.BooleanField(),
+        db_persist=True,
+        verbose_name="Bajo rendimiento",
+    )
+
     # Metadatos
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -262,6 +363,11 @@ class BitacoraViaje(models.Model):
             models.Index(fields=['operador', 'fecha_salida']),
             models.Index(fields=['unidad', 'fecha_salida']),
             models.Index(fields=['completado']),
+            models.Index(fields=['unidad', 'rendimiento_km_lt'], name='bitacora_unidad_rend_idx'),
+            models.Index(fields=['operador', 'rendimiento_km_lt'], name='bitacora_operador_rend_idx'),
+            models.Index(
+                fields=['-fecha_salida'], condition=Q(bajo_rendimiento=True), name='bitacora_bajo_rend_idx',
+            ),
         ]
     
     def __str__(self):
@@ -330,8 +436,8 @@ class BitacoraViaje(models.Model):
     
     @property
     def alerta_bajo_rendimiento(self):
-        """Verifica si el rendimiento está por debajo del umbral (2.5 km/lt)"""
-        return self.rendimiento_combustible > 0 and self.rendimiento_combustible < 2.5
+        """Verifica si el rendimiento está por debajo del umbral (RENDIMIENTO_MINIMO km/lt)"""
+        return self.rendimiento_combustible > 0 and self.rendimiento_combustible < RENDIMIENTO_MINIMO
     
     # ========================================================================
     # VALIDACIONES
@@ -369,7 +475,7 @@ class BitacoraViaje(models.Model):
         from config.services.google_maps import GoogleMapsService
 
         if not api_key:
-            api_key = os.environ.get('GOOGLE_MAPS_API_KEY')
+            api_key = settings.GOOGLE_MAPS_API_KEY
 
         if not api_key:
             return {'status': 'error', 'message': 'No se encontró API key de Google Maps'}
@@ -431,11 +537,9 @@ class BitacoraViaje(models.Model):
 
         # Calcular ingreso del viaje según tarifa vigente al completarse
         if self.completado and self.ingreso_calculado is None:
-            from modulos.finanzas.models import TarifaKilometro
+            from modulos.finanzas import precios
 
-            tarifa = TarifaKilometro.vigente_en(self.fecha_llegada.date())
-            if tarifa and self.distancia_efectiva:
-                self.ingreso_calculado = self.distancia_efectiva * tarifa.valor
+            self.ingreso_calculado = precios.ingreso(self.distancia_efectiva, precios.tarifa_en(self.fecha_llegada))
 
         # Actualizar kilometraje de la unidad al completar el viaje
         if self.completado and self.kilometraje_llegada:
@@ -1,5 +1,5 @@
 import json
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 from io import BytesIO
 from unittest.mock import patch, MagicMock
@@ -8,11 +8,14 @@ import openpyxl
 from django.contrib.auth import get_user_model
 from django.contrib.messages import constants as message_constants
 from django.core.exceptions import ValidationError
+from django.core.cache import cache
 from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 
 from modulos.finanzas.models import TarifaKilometro
+from modulos.notificaciones.models import NotificacionSaliente
+from modulos.notificaciones.services import procesar_pendientes
 from modulos.operadores.models import Operador
 from modulos.unidades.models import Unidad
 
@@ -52,6 +55,9 @@ def _aware(y, m, d, h=8):
 
 class IngresoCalculadoTests(TestCase):
     def setUp(self):
+        # Las tarifas se consultan en la línea de tiempo cacheada (finanzas.precios)
+        cache.clear()
+        self.addCleanup(cache.clear)
         self.unidad = _crear_unidad()
         self.operador = _crear_operador()
 
@@ -334,7 +340,22 @@ class NotificarOperadorViewTests(TestCase):
         )
 
         mensajes = [str(m) for m in response.context['messages']]
-        self.assertTrue(any('Kevin Márquez' in m and 'WhatsApp enviado' in m for m in mensajes))
+        self.assertTrue(any('Kevin Márquez' in m and 'WhatsApp en cola' in m for m in mensajes))
+
+    @override_settings(TWILIO_CONTENT_SID_BITACORA='HXfake000000000000000000000000', TWILIO_WHATSAPP_FROM='whatsapp:+14155238886')
+    @patch('config.services.twilio_service._twilio_client')
+    def test_post_encola_y_el_worker_entrega_via_twilio(self, mock_client_fn):
+        mock_client_fn.return_value.messages = MagicMock()
+
+        self.client.post(reverse('bitacoras:notificar_operador', args=[self.viaje.pk]))
+
+        # El request solo encola; Twilio se llama hasta que corre el worker.
+        mock_client_fn.return_value.messages.create.assert_not_called()
+        procesar_pendientes()
+        self.assertEqual(mock_client_fn.return_value.messages.create.call_count, 1)
+        self.assertEqual(
+            NotificacionSaliente.objects.de_objeto(self.viaje).get().estado, 'ENVIADA'
+        )
 
     def test_post_sin_telefono_muestra_mensaje_de_error_y_no_llama_twilio(self):
         self.operador.telefono = ''
@@ -1006,6 +1027,7 @@ class NotificarClienteRepartoViewTests(TestCase):
         response = self.client.post(
             reverse('bitacoras:notificar_cliente', args=[self.viaje.pk]), follow=True
         )
+        procesar_pendientes()
 
         self.assertEqual(mock_client_fn.return_value.messages.create.call_count, 2)
         mensajes = [str(m) for m in response.context['messages']]
@@ -1035,10 +1057,11 @@ class NotificarClienteRepartoViewTests(TestCase):
         response = self.client.post(
             reverse('bitacoras:notificar_cliente', args=[self.viaje.pk]), follow=True
         )
+        procesar_pendientes()
 
         self.assertEqual(mock_client_fn.return_value.messages.create.call_count, 1)
         mensajes = [str(m) for m in response.context['messages']]
-        self.assertTrue(any('Cliente Uno' in m and 'WhatsApp enviado' in m for m in mensajes))
+        self.assertTrue(any('Cliente Uno' in m and 'WhatsApp en cola' in m for m in mensajes))
 
     @override_settings(TWILIO_CONTENT_SID_BITACORA='')
     @patch('config.services.twilio_service._twilio_client')
@@ -1056,3 +1079,62 @@ class NotificarClienteRepartoViewTests(TestCase):
             f"No debe mostrarse un mensaje de éxito cuando ambas notificaciones fallan: {[str(m) for m in mensajes]}",
         )
         self.assertTrue(any(m.level == message_constants.ERROR for m in mensajes))
+
+
+class MetricasGeneradasTests(TestCase):
+    def setUp(self):
+        self.unidad = _crear_unidad()
+        self.operador = _crear_operador()
+
+    def _viaje(self, km_salida, km_llegada, diesel, horas):
+        return BitacoraViaje.objects.create(
+            operador=self.operador, unidad=self.unidad, modalidad='LOCAL',
+            fecha_carga=_aware(2026, 6, 1), fecha_salida=_aware(2026, 6, 1),
+            fecha_llegada=_aware(2026, 6, 1) + timedelta(hours=horas) if horas else None,
+            kilometraje_salida=km_salida, kilometraje_llegada=km_llegada, diesel_cargado=diesel,
+            destino='Calle Falsa 123',
+        )
+
+    def test_columnas_coinciden_con_las_propiedades(self):
+        casos = [
+            self._viaje(1000, 1550, Decimal('200.00'), 7.5),   # 2.75 km/lt
+            self._viaje(2000, 2300, Decimal('150.00'), 4),     # 2.0 km/lt: bajo rendimiento
+            self._viaje(3000, None, None, None),               # en curso
+        ]
+        for viaje in casos:
+            fila = BitacoraViaje.objects.get(pk=viaje.pk)
+            with self.subTest(viaje=viaje.pk):
+                self.assertEqual(fila.km_recorridos, viaje.kilometros_recorridos)
+                self.assertEqual(float(fila.rendimiento_km_lt), viaje.rendimiento_combustible)
+                self.assertEqual(float(fila.duracion_horas), viaje.horas_viaje)
+                self.assertEqual(float(fila.velocidad_kmh), viaje.velocidad_promedio)
+                self.assertEqual(fila.bajo_rendimiento, viaje.alerta_bajo_rendimiento)
+
+    def test_columnas_redondean_como_las_propiedades_en_los_limites(self):
+        casos = [
+            self._viaje(1000, 3496, Decimal('1000.00'), 10),     # 2.496 km/lt se muestra 2.50: sin alerta
+            self._viaje(1000, 3494, Decimal('1000.00'), 10),     # 2.494 km/lt → 2.49: alerta
+            self._viaje(1000, 1100, Decimal('20.00'), 1.004),    # 1.004 h → 1.00 h: 100 km/h
+            self._viaje(1000, 1010, Decimal('2.00'), 0.004),     # 0.004 h → 0.00 h: velocidad 0
+        ]
+        for viaje in casos:
+            fila = BitacoraViaje.objects.get(pk=viaje.pk)
+            with self.subTest(viaje=viaje.pk):
+                self.assertEqual(float(fila.rendimiento_km_lt), viaje.rendimiento_combustible)
+                self.assertEqual(float(fila.velocidad_kmh), viaje.velocidad_promedio)
+                self.assertEqual(fila.bajo_rendimiento, viaje.alerta_bajo_rendimiento)
+        self.assertEqual(
+            [f.bajo_rendimiento for f in BitacoraViaje.objects.filter(pk__in=[v.pk for v in casos]).order_by('pk')],
+            [False, True, False, False],
+        )
+
+    def test_promedios_y_alertas_en_sql(self):
+        self._viaje(1000, 1550, Decimal('200.00'), 7.5)
+        self._viaje(2000, 2300, Decimal('150.00'), 4)
+
+        self.assertEqual(self.unidad.rendimiento_promedio_real(), 2.38)
+        self.assertEqual(self.operador.promedio_rendimiento(), 2.38)
+        self.assertEqual(
+            self.operador.horas_trabajadas_periodo(_aware(2026, 6, 1, 0), _aware(2026, 6, 2, 0)), 11.5,
+        )
+        self.assertEqual(BitacoraViaje.objects.filter(bajo_rendimiento=True).count(), 1)
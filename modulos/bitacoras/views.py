@@ -1,18 +1,23 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 from django.urls import reverse_lazy, reverse
+from django.db import transaction
 from django.db.models import Q, Sum
 from django.http import JsonResponse, HttpResponse
 from django.utils import timezone
+from modulos.notificaciones.models import NotificacionSaliente
 from .models import BitacoraViaje, Cliente
 from .forms import BitacoraViajeForm, BitacoraViajeCompletarForm, ClienteForm
 from decimal import Decimal
 from datetime import datetime
-import os
+
+from config.fechas import rango_dias
+from config.referencias import referencia_cacheada
 
 
 class BitacoraListView(LoginRequiredMixin, ListView):
@@ -55,12 +60,8 @@ class BitacoraListView(LoginRequiredMixin, ListView):
             queryset = queryset.filter(unidad_id=unidad_id)
 
         fecha_desde = self.request.GET.get('fecha_desde')
-        if fecha_desde:
-            queryset = queryset.filter(fecha_salida__date__gte=fecha_desde)
-
         fecha_hasta = self.request.GET.get('fecha_hasta')
-        if fecha_hasta:
-            queryset = queryset.filter(fecha_salida__date__lte=fecha_hasta)
+        queryset = queryset.filter(rango_dias('fecha_salida', fecha_desde, fecha_hasta))
 
         cliente_id = self.request.GET.get('cliente')
         if cliente_id:
@@ -76,9 +77,9 @@ class BitacoraListView(LoginRequiredMixin, ListView):
         context['viajes_completados'] = BitacoraViaje.objects.filter(completado=True).count()
         context['viajes_en_curso'] = BitacoraViaje.objects.filter(completado=False).count()
         context['modalidad_choices'] = BitacoraViaje.MODALIDAD_CHOICES
-        context['operadores_list'] = Operador.objects.filter(activo=True).order_by('nombre')
-        context['unidades_list'] = Unidad.objects.filter(activa=True).order_by('numero_economico')
-        context['clientes_list'] = Cliente.objects.filter(activo=True).order_by('nombre')
+        context['operadores_list'] = referencia_cacheada(Operador, {'activo': True}, orden=('nombre',))
+        context['unidades_list'] = referencia_cacheada(Unidad, {'activa': True}, orden=('numero_economico',))
+        context['clientes_list'] = referencia_cacheada(Cliente, {'activo': True}, orden=('nombre',))
         return context
 
 
@@ -93,6 +94,7 @@ class BitacoraDetailView(LoginRequiredMixin, DetailView):
         context['es_full'] = bitacora.modalidad in ('FULL', 'LOCAL_FULL')
         context['tiene_distancia'] = bool(bitacora.distancia_calculada)
         context['tiene_distancia_2'] = bool(bitacora.distancia_calculada_2)
+        context['notificaciones'] = NotificacionSaliente.objects.de_objeto(bitacora)[:20]
         return context
 
 
@@ -101,8 +103,8 @@ def _form_context():
     from modulos.operadores.models import Operador
     from modulos.unidades.models import Unidad
     return {
-        'unidades_form': Unidad.objects.filter(activa=True).order_by('numero_economico'),
-        'operadores_form': Operador.objects.filter(activo=True).order_by('nombre'),
+        'unidades_form': referencia_cacheada(Unidad, {'activa': True}, orden=('numero_economico',)),
+        'operadores_form': referencia_cacheada(Operador, {'activo': True}, orden=('nombre',)),
     }
 
 
@@ -140,7 +142,7 @@ class BitacoraCreateView(LoginRequiredMixin, CreateView):
         bitacora.save()
 
         if bitacora.cp_destino:
-            api_key = os.environ.get('GOOGLE_MAPS_API_KEY')
+            api_key = settings.GOOGLE_MAPS_API_KEY
             if api_key:
                 resultado = bitacora.calcular_distancia_google(api_key)
                 if resultado['status'] == 'success':
@@ -234,8 +236,9 @@ def bitacora_dashboard(request):
     bitacoras = BitacoraViaje.objects.select_related('operador', 'unidad')
     completadas = bitacoras.filter(completado=True)
 
-    total_diesel = completadas.aggregate(total=Sum('diesel_cargado'))['total'] or 0
-    total_km = sum(b.kilometros_recorridos for b in completadas if b.kilometros_recorridos)
+    totales = completadas.aggregate(diesel=Sum('diesel_cargado'), km=Sum('km_recorridos'))
+    total_diesel = totales['diesel'] or 0
+    total_km = totales['km'] or 0
 
     context = {
         'total_bitacoras': bitacoras.count(),
@@ -249,9 +252,7 @@ def bitacora_dashboard(request):
         'total_diesel_consumido': total_diesel,
         'total_km_recorridos': total_km,
         'rendimiento_promedio': round(total_km / total_diesel, 2) if total_diesel > 0 else 0,
-        'alertas_bajo_rendimiento': [
-            b for b in completadas if b.alerta_bajo_rendimiento
-        ][:5],
+        'alertas_bajo_rendimiento': completadas.filter(bajo_rendimiento=True)[:5],
     }
     return render(request, 'bitacoras/bitacora_dashboard.html', context)
 
@@ -266,7 +267,7 @@ def calcular_distancia_ajax(request, pk):
         return JsonResponse({'success': False, 'error': 'Método no permitido'})
 
     bitacora = get_object_or_404(BitacoraViaje, pk=pk)
-    api_key = os.environ.get('GOOGLE_MAPS_API_KEY')
+    api_key = settings.GOOGLE_MAPS_API_KEY
 
     if not api_key:
         return JsonResponse({'success': False, 'error': 'API key de Google Maps no configurada'})
@@ -295,7 +296,7 @@ def calcular_distancia_preview_ajax(request):
     if not cp_destino:
         return JsonResponse({'success': False, 'error': 'Falta el código postal destino'})
 
-    api_key = os.environ.get('GOOGLE_MAPS_API_KEY')
+    api_key = settings.GOOGLE_MAPS_API_KEY
     if not api_key:
         return JsonResponse({'success': False, 'error': 'API key no configurada'})
 
@@ -368,36 +369,38 @@ class ClienteDeleteView(LoginRequiredMixin, DeleteView):
 @login_required
 @require_POST
 def enviar_notificacion_cliente(request, pk):
-    """Envía WhatsApp + email al cliente asignado a la bitácora (o a los dos clientes, si el viaje tiene reparto)."""
+    """Encola WhatsApp + email al cliente asignado a la bitácora (o a los dos clientes, si el viaje tiene reparto)."""
     bitacora = get_object_or_404(BitacoraViaje, pk=pk)
 
     if bitacora.reparto:
-        from config.services.twilio_service import enviar_notificaciones_reparto
-        resultados = enviar_notificaciones_reparto(bitacora)
         destinatarios = [(1, bitacora.cliente), (2, bitacora.cliente_2 or bitacora.cliente)]
 
         if not any(cliente for _, cliente in destinatarios):
             messages.error(request, 'Esta bitácora no tiene cliente asignado.')
             return redirect('bitacoras:detail', pk=pk)
 
+        from config.services.twilio_service import encolar_notificaciones_reparto
+        with transaction.atomic():
+            resultados = encolar_notificaciones_reparto(bitacora)
+
         partes = []
-        algun_envio_exitoso = False
+        algun_envio_encolado = False
         for numero, cliente in destinatarios:
             if not cliente:
                 partes.append(f"Contenedor {numero}: sin cliente asignado.")
                 continue
             resultado = resultados[f'contenedor_{numero}']
             envios = []
-            if resultado['wa_ok']:
-                envios.append('WhatsApp enviado')
-            if resultado['email_ok']:
-                envios.append('correo enviado')
-            if resultado['wa_ok'] or resultado['email_ok']:
-                algun_envio_exitoso = True
+            if resultado['wa_encolado']:
+                envios.append('WhatsApp en cola')
+            if resultado['email_encolado']:
+                envios.append('correo en cola')
+            if envios:
+                algun_envio_encolado = True
             estado = ', '.join(envios) if envios else 'no se pudo enviar'
             partes.append(f"Contenedor {numero} → {cliente.nombre}: {estado}.")
 
-        if algun_envio_exitoso:
+        if algun_envio_encolado:
             messages.success(request, ' '.join(partes))
         else:
             messages.error(request, ' '.join(partes))
@@ -407,14 +410,15 @@ def enviar_notificacion_cliente(request, pk):
         messages.error(request, 'Esta bitácora no tiene cliente asignado.')
         return redirect('bitacoras:detail', pk=pk)
 
-    from config.services.twilio_service import enviar_notificacion_bitacora
-    resultado = enviar_notificacion_bitacora(bitacora, bitacora.cliente)
+    from config.services.twilio_service import encolar_notificacion_bitacora
+    with transaction.atomic():
+        resultado = encolar_notificacion_bitacora(bitacora, bitacora.cliente)
 
     partes = []
-    if resultado['wa_ok']:
-        partes.append('WhatsApp enviado')
-    if resultado['email_ok']:
-        partes.append('correo enviado')
+    if resultado['wa_encolado']:
+        partes.append('WhatsApp en cola')
+    if resultado['email_encolado']:
+        partes.append('correo en cola')
 
     if partes:
         messages.success(request, f"Notificación a {bitacora.cliente.nombre}: {', '.join(partes)}.")
@@ -427,14 +431,14 @@ def enviar_notificacion_cliente(request, pk):
 @login_required
 @require_POST
 def enviar_notificacion_operador(request, pk):
-    """Envía WhatsApp al operador asignado a la bitácora."""
+    """Encola el WhatsApp al operador asignado a la bitácora."""
     bitacora = get_object_or_404(BitacoraViaje, pk=pk)
 
-    from config.services.twilio_service import enviar_notificacion_operador as _enviar
-    resultado = _enviar(bitacora)
+    from config.services.twilio_service import encolar_notificacion_operador
+    resultado = encolar_notificacion_operador(bitacora)
 
-    if resultado['wa_ok']:
-        messages.success(request, f"WhatsApp enviado a {bitacora.operador.nombre}.")
+    if resultado['wa_encolado']:
+        messages.success(request, f"WhatsApp en cola para {bitacora.operador.nombre}.")
     else:
         messages.error(request, f"No se pudo enviar el WhatsApp a {bitacora.operador.nombre}. Verifica su teléfono y la configuración de Twilio.")
 
@@ -447,7 +451,7 @@ def enviar_notificacion_operador(request, pk):
 
 @login_required
 def carga_masiva_upload(request):
-    clientes = list(Cliente.objects.filter(activo=True).order_by('nombre'))
+    clientes = referencia_cacheada(Cliente, {'activo': True}, orden=('nombre',))
     context  = {
         'tipo_contenedor_choices': BitacoraViaje.TIPO_CONTENEDOR_CHOICES,
         'clientes': clientes,
@@ -486,17 +490,15 @@ def carga_masiva_upload(request):
 def carga_masiva_preview(request):
     import json as _json
     from modulos.operadores.models import Operador
+    from modulos.unidades import disponibilidad
     from modulos.unidades.models import Unidad
 
-    # Solo unidades foráneas activas sin viaje en curso
-    unidades_en_viaje = set(
-        BitacoraViaje.objects.filter(completado=False).values_list('unidad_id', flat=True)
-    )
-    unidades = list(
-        Unidad.objects.filter(activa=True, tipo__in=['FORANEA', 'ESPERANZA'])
-                      .order_by('numero_economico')
+    # Solo unidades foráneas activas que ahora no estén en viaje ni en taller
+    libres = disponibilidad.disponibles_en(timezone.now())
+    unidades = referencia_cacheada(
+        Unidad, {'activa': True, 'tipo__in': ('FORANEA', 'ESPERANZA')}, orden=('numero_economico',),
     )
-    unidades_disponibles = [u for u in unidades if u.id not in unidades_en_viaje]
+    unidades_disponibles = [u for u in unidades if u.id in libres]
 
     # Mapa unidad_id → operador asignado
     unidad_op_map = {}
@@ -505,10 +507,10 @@ def carga_masiva_preview(request):
         if op:
             unidad_op_map[str(u.id)] = {'id': str(op.id), 'nombre': op.nombre}
 
-    operadores = list(
-        Operador.objects.filter(activo=True, tipo__in=['FORANEO', 'ESPERANZA']).order_by('nombre')
+    operadores = referencia_cacheada(
+        Operador, {'activo': True, 'tipo__in': ('FORANEO', 'ESPERANZA')}, orden=('nombre',),
     )
-    clientes = list(Cliente.objects.filter(activo=True).order_by('nombre'))
+    clientes = referencia_cacheada(Cliente, {'activo': True}, orden=('nombre',))
 
     if request.method == 'GET':
         viajes = request.session.get('carga_masiva_viajes')
@@ -613,10 +615,7 @@ def exportar_excel(request):
 
     fecha_desde = request.GET.get('fecha_desde')
     fecha_hasta = request.GET.get('fecha_hasta')
-    if fecha_desde:
-        queryset = queryset.filter(fecha_salida__date__gte=fecha_desde)
-    if fecha_hasta:
-        queryset = queryset.filter(fecha_salida__date__lte=fecha_hasta)
+    queryset = queryset.filter(rango_dias('fecha_salida', fecha_desde, fecha_hasta))
 
     cliente_id = request.GET.get('cliente')
     if cliente_id:
@@ -4,14 +4,16 @@ from django.urls import path
 from django.shortcuts import render
 from django.http import HttpResponse
 from django.db.models import Sum, Avg, Count, Max, Min, Q
-from django.db.models.functions import TruncDay, TruncMonth
+from django.db.models.functions import TruncMonth
 from datetime import date, timedelta
 import json
 import openpyxl
 from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 
-from .models import Despachador, CargaCombustible, FotoCandadoNuevo, AlertaCombustible
+from .models import (
+    Despachador, CargaCombustible, FotoCandadoNuevo, AlertaCombustible, FactCombustibleDiario, RegistroCandado,
+)
 
 
 @admin.register(Despachador)
@@ -176,7 +178,10 @@ class CargaCombustibleAdmin(admin.ModelAdmin):
     actions = ['marcar_completado', 'exportar_reporte']
 
     def marcar_completado(self, request, queryset):
+        from .hechos import recalcular_cargas
+
         updated = queryset.update(estado='COMPLETADO')
+        recalcular_cargas(queryset)
         self.message_user(request, f'{updated} cargas marcadas como completadas.')
     marcar_completado.short_description = 'Marcar como completadas'
 
@@ -218,40 +223,48 @@ class CargaCombustibleAdmin(admin.ModelAdmin):
         except (ValueError, TypeError):
             hasta = hoy
 
+        # Solo niveles y candados recorren las cargas; lo demás sale de FactCombustibleDiario
         qs = CargaCombustible.objects.filter(
             estado='COMPLETADO',
-            fecha_hora_inicio__date__gte=desde,
-            fecha_hora_inicio__date__lte=hasta,
-        ).select_related('unidad', 'despachador')
-
-        qs_todos = CargaCombustible.objects.filter(
-            fecha_hora_inicio__date__gte=desde,
-            fecha_hora_inicio__date__lte=hasta,
+            fecha_hora_inicio__desde_dia=desde,
+            fecha_hora_inicio__hasta_dia=hasta,
         )
+        hechos = FactCombustibleDiario.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+        hechos_con_cargas = hechos.filter(cargas__gt=0)
 
         # ─── KPIs ─────────────────────────────────────────────────────────────
-        totales = qs.aggregate(
-            total_cargas=Count('id'),
-            total_litros=Sum('cantidad_litros'),
-            promedio_litros=Avg('cantidad_litros'),
-            promedio_tiempo=Avg('tiempo_carga_minutos'),
-            max_litros=Max('cantidad_litros'),
-            min_litros=Min('cantidad_litros'),
+        sumas = hechos.aggregate(
+            cargas=Sum('cargas'),
+            litros=Sum('litros'),
+            tiempo=Sum('tiempo_minutos'),
+            cargas_con_tiempo=Sum('cargas_con_tiempo'),
+            max_litros=Max('litros_max'),
+            min_litros=Min('litros_min'),
+            candado_anomalo=Sum('cargas_candado_anomalo'),
+            canceladas=Sum('cargas_canceladas'),
+            en_proceso=Sum('cargas_en_proceso'),
+            iniciadas=Sum('cargas_iniciadas'),
+            alertas_pendientes=Sum('alertas_pendientes'),
         )
-        for key in ('total_litros', 'promedio_litros', 'promedio_tiempo', 'max_litros', 'min_litros'):
-            totales[key] = round(float(totales[key] or 0), 2)
+        sumas = {k: v or 0 for k, v in sumas.items()}
+        totales = {
+            'total_cargas': sumas['cargas'],
+            'total_litros': round(float(sumas['litros']), 2),
+            'promedio_litros': round(float(sumas['litros']) / sumas['cargas'], 2) if sumas['cargas'] else 0,
+            'promedio_tiempo': (
+                round(sumas['tiempo'] / sumas['cargas_con_tiempo'], 2) if sumas['cargas_con_tiempo'] else 0
+            ),
+            'max_litros': round(float(sumas['max_litros']), 2),
+            'min_litros': round(float(sumas['min_litros']), 2),
+        }
 
         estados_count = {
-            'COMPLETADO': qs_todos.filter(estado='COMPLETADO').count(),
-            'CANCELADO': qs_todos.filter(estado='CANCELADO').count(),
-            'EN_PROCESO': qs_todos.filter(estado='EN_PROCESO').count(),
-            'INICIADO': qs_todos.filter(estado='INICIADO').count(),
+            'COMPLETADO': sumas['cargas'],
+            'CANCELADO': sumas['canceladas'],
+            'EN_PROCESO': sumas['en_proceso'],
+            'INICIADO': sumas['iniciadas'],
         }
-        total_alertas_pendientes = AlertaCombustible.objects.filter(
-            resuelta=False,
-            carga__fecha_hora_inicio__date__gte=desde,
-            carga__fecha_hora_inicio__date__lte=hasta,
-        ).count()
+        total_alertas_pendientes = sumas['alertas_pendientes']
 
         # ─── Nivel inicial ─────────────────────────────────────────────────────
         NIVEL_LABELS = {'VACIO': 'Vacío', 'CUARTO': '1/4', 'MEDIO': '1/2', 'TRES_CUARTOS': '3/4'}
@@ -283,28 +296,25 @@ class CargaCombustibleAdmin(admin.ModelAdmin):
 
         # ─── Cargas por día ────────────────────────────────────────────────────
         cargas_dia = list(
-            qs.annotate(dia=TruncDay('fecha_hora_inicio'))
-            .values('dia')
-            .annotate(total=Count('id'), litros=Sum('cantidad_litros'))
-            .order_by('dia')
+            hechos_con_cargas
+            .values('fecha')
+            .annotate(total=Sum('cargas'), litros=Sum('litros'))
+            .order_by('fecha')
         )
-        dias_labels_json = json.dumps([c['dia'].strftime('%d/%m') for c in cargas_dia])
+        dias_labels_json = json.dumps([c['fecha'].strftime('%d/%m') for c in cargas_dia])
         dias_litros_json = json.dumps([round(float(c['litros']), 2) for c in cargas_dia])
         dias_cargas_json = json.dumps([c['total'] for c in cargas_dia])
 
         # ─── Top 10 unidades ───────────────────────────────────────────────────
         top_unidades = list(
-            qs.values('unidad__numero_economico', 'unidad__placa', 'unidad__tipo')
-            .annotate(
-                total_cargas=Count('id'),
-                total_litros=Sum('cantidad_litros'),
-                promedio_litros=Avg('cantidad_litros'),
-            )
+            hechos_con_cargas
+            .values('unidad__numero_economico', 'unidad__placa', 'unidad__tipo')
+            .annotate(total_cargas=Sum('cargas'), total_litros=Sum('litros'))
             .order_by('-total_litros')[:10]
         )
         for u in top_unidades:
             u['total_litros'] = round(float(u['total_litros'] or 0), 2)
-            u['promedio_litros'] = round(float(u['promedio_litros'] or 0), 2)
+            u['promedio_litros'] = round(u['total_litros'] / u['total_cargas'], 2)
 
         top_unidades_labels_json = json.dumps([u['unidad__numero_economico'] for u in top_unidades])
         top_unidades_litros_json = json.dumps([u['total_litros'] for u in top_unidades])
@@ -325,17 +335,14 @@ class CargaCombustibleAdmin(admin.ModelAdmin):
 
         # ─── Por despachador ───────────────────────────────────────────────────
         por_desp = list(
-            qs.values('despachador__nombre')
-            .annotate(
-                total_cargas=Count('id'),
-                total_litros=Sum('cantidad_litros'),
-                promedio_litros=Avg('cantidad_litros'),
-            )
+            hechos_con_cargas
+            .values('despachador__nombre')
+            .annotate(total_cargas=Sum('cargas'), total_litros=Sum('litros'))
             .order_by('-total_litros')
         )
         for d in por_desp:
             d['total_litros'] = round(float(d['total_litros'] or 0), 2)
-            d['promedio_litros'] = round(float(d['promedio_litros'] or 0), 2)
+            d['promedio_litros'] = round(d['total_litros'] / d['total_cargas'], 2)
 
         desp_labels_json = json.dumps([d['despachador__nombre'] for d in por_desp])
         desp_litros_json = json.dumps([d['total_litros'] for d in por_desp])
@@ -350,10 +357,10 @@ class CargaCombustibleAdmin(admin.ModelAdmin):
         hist_desde = date(anio, mes, 1)
 
         hist_mensual = list(
-            CargaCombustible.objects.filter(estado='COMPLETADO', fecha_hora_inicio__date__gte=hist_desde)
-            .annotate(mes=TruncMonth('fecha_hora_inicio'))
+            FactCombustibleDiario.objects.filter(fecha__gte=hist_desde, cargas__gt=0)
+            .annotate(mes=TruncMonth('fecha'))
             .values('mes')
-            .annotate(total_cargas=Count('id'), total_litros=Sum('cantidad_litros'))
+            .annotate(total_cargas=Sum('cargas'), total_litros=Sum('litros'))
             .order_by('mes')
         )
         for m in hist_mensual:
@@ -367,8 +374,8 @@ class CargaCombustibleAdmin(admin.ModelAdmin):
         ALERTA_LABELS = dict(AlertaCombustible.TIPO_CHOICES)
         alertas_data = list(
             AlertaCombustible.objects.filter(
-                carga__fecha_hora_inicio__date__gte=desde,
-                carga__fecha_hora_inicio__date__lte=hasta,
+                carga__fecha_hora_inicio__desde_dia=desde,
+                carga__fecha_hora_inicio__hasta_dia=hasta,
             )
             .values('tipo_alerta')
             .annotate(
@@ -405,14 +412,12 @@ class CargaCombustibleAdmin(admin.ModelAdmin):
 
         # Tendencia intra-período: primera mitad vs segunda mitad
         mitad = desde + timedelta(days=dias_en_periodo // 2)
-        litros_primera = float(
-            qs.filter(fecha_hora_inicio__date__lt=mitad)
-            .aggregate(t=Sum('cantidad_litros'))['t'] or 0
-        )
-        litros_segunda = float(
-            qs.filter(fecha_hora_inicio__date__gte=mitad)
-            .aggregate(t=Sum('cantidad_litros'))['t'] or 0
+        mitades = hechos.aggregate(
+            primera=Sum('litros', filter=Q(fecha__lt=mitad)),
+            segunda=Sum('litros', filter=Q(fecha__gte=mitad)),
         )
+        litros_primera = float(mitades['primera'] or 0)
+        litros_segunda = float(mitades['segunda'] or 0)
         if litros_primera > 0:
             variacion_interna = round(((litros_segunda - litros_primera) / litros_primera) * 100, 1)
         else:
@@ -430,18 +435,11 @@ class CargaCombustibleAdmin(admin.ModelAdmin):
         # Comparación con período anterior equivalente
         per_ant_hasta = desde - timedelta(days=1)
         per_ant_desde = per_ant_hasta - timedelta(days=dias_en_periodo - 1)
-        litros_periodo_anterior = float(
-            CargaCombustible.objects.filter(
-                estado='COMPLETADO',
-                fecha_hora_inicio__date__gte=per_ant_desde,
-                fecha_hora_inicio__date__lte=per_ant_hasta,
-            ).aggregate(t=Sum('cantidad_litros'))['t'] or 0
-        )
-        cargas_periodo_anterior = CargaCombustible.objects.filter(
-            estado='COMPLETADO',
-            fecha_hora_inicio__date__gte=per_ant_desde,
-            fecha_hora_inicio__date__lte=per_ant_hasta,
-        ).count()
+        periodo_anterior = FactCombustibleDiario.objects.filter(
+            fecha__gte=per_ant_desde, fecha__lte=per_ant_hasta,
+        ).aggregate(litros=Sum('litros'), cargas=Sum('cargas'))
+        litros_periodo_anterior = float(periodo_anterior['litros'] or 0)
+        cargas_periodo_anterior = periodo_anterior['cargas'] or 0
 
         if litros_periodo_anterior > 0:
             variacion_vs_anterior = round(
@@ -497,9 +495,7 @@ class CargaCombustibleAdmin(admin.ModelAdmin):
                 })
 
         # 3. Tasa de anomalías en candados
-        cargas_con_anomalia = qs.filter(
-            estado_candado_anterior__in=['ALTERADO', 'VIOLADO', 'SIN_CANDADO']
-        ).count()
+        cargas_con_anomalia = sumas['candado_anomalo']
         if total_cargas_int > 0:
             tasa_anomalia = round(cargas_con_anomalia / total_cargas_int * 100, 1)
             if tasa_anomalia == 0:
@@ -585,7 +581,7 @@ class CargaCombustibleAdmin(admin.ModelAdmin):
             })
 
         # 6. Tasa de completación
-        total_todas = qs_todos.count()
+        total_todas = sum(estados_count.values())
         if total_todas > 0:
             tasa_completacion = round(total_cargas_int / total_todas * 100, 1)
             canceladas = estados_count['CANCELADO']
@@ -746,9 +742,10 @@ class CargaCombustibleAdmin(admin.ModelAdmin):
 
         qs = CargaCombustible.objects.filter(
             estado='COMPLETADO',
-            fecha_hora_inicio__date__gte=desde,
-            fecha_hora_inicio__date__lte=hasta,
+            fecha_hora_inicio__desde_dia=desde,
+            fecha_hora_inicio__hasta_dia=hasta,
         ).select_related('unidad', 'despachador')
+        hechos_con_cargas = FactCombustibleDiario.objects.filter(fecha__gte=desde, fecha__lte=hasta, cargas__gt=0)
 
         wb = openpyxl.Workbook()
 
@@ -804,27 +801,29 @@ class CargaCombustibleAdmin(admin.ModelAdmin):
         ws1.title = 'Resumen'
         titulo_hoja(ws1, '⛽ Reporte de Combustible — Resumen General', 4)
 
-        totales = qs.aggregate(
-            total_cargas=Count('id'),
-            total_litros=Sum('cantidad_litros'),
-            promedio_litros=Avg('cantidad_litros'),
-            promedio_tiempo=Avg('tiempo_carga_minutos'),
-            max_litros=Max('cantidad_litros'),
-            min_litros=Min('cantidad_litros'),
+        totales = FactCombustibleDiario.objects.filter(fecha__gte=desde, fecha__lte=hasta).aggregate(
+            total_cargas=Sum('cargas'),
+            total_litros=Sum('litros'),
+            tiempo=Sum('tiempo_minutos'),
+            cargas_con_tiempo=Sum('cargas_con_tiempo'),
+            max_litros=Max('litros_max'),
+            min_litros=Min('litros_min'),
+            alertas_pendientes=Sum('alertas_pendientes'),
         )
+        totales = {k: v or 0 for k, v in totales.items()}
 
         kpis = [
-            ('Total cargas completadas', totales['total_cargas'] or 0),
-            ('Total litros cargados', round(float(totales['total_litros'] or 0), 2)),
-            ('Promedio litros por carga', round(float(totales['promedio_litros'] or 0), 2)),
-            ('Carga máxima (litros)', round(float(totales['max_litros'] or 0), 2)),
-            ('Carga mínima (litros)', round(float(totales['min_litros'] or 0), 2)),
-            ('Tiempo promedio de carga (min)', round(float(totales['promedio_tiempo'] or 0), 1)),
-            ('Alertas pendientes en el período', AlertaCombustible.objects.filter(
-                resuelta=False,
-                carga__fecha_hora_inicio__date__gte=desde,
-                carga__fecha_hora_inicio__date__lte=hasta,
-            ).count()),
+            ('Total cargas completadas', totales['total_cargas']),
+            ('Total litros cargados', round(float(totales['total_litros']), 2)),
+            ('Promedio litros por carga', (
+                round(float(totales['total_litros']) / totales['total_cargas'], 2) if totales['total_cargas'] else 0
+            )),
+            ('Carga máxima (litros)', round(float(totales['max_litros']), 2)),
+            ('Carga mínima (litros)', round(float(totales['min_litros']), 2)),
+            ('Tiempo promedio de carga (min)', (
+                round(totales['tiempo'] / totales['cargas_con_tiempo'], 1) if totales['cargas_con_tiempo'] else 0
+            )),
+            ('Alertas pendientes en el período', totales['alertas_pendientes']),
         ]
 
         ws1['A4'] = 'Indicador'
@@ -919,12 +918,12 @@ class CargaCombustibleAdmin(admin.ModelAdmin):
             ws3.column_dimensions[get_column_letter(col)].width = ancho
 
         por_unidad = (
-            qs.values('unidad__numero_economico', 'unidad__placa', 'unidad__tipo')
+            hechos_con_cargas
+            .values('unidad__numero_economico', 'unidad__placa', 'unidad__tipo')
             .annotate(
-                total_cargas=Count('id'),
-                total_litros=Sum('cantidad_litros'),
-                promedio_litros=Avg('cantidad_litros'),
-                max_litros=Max('cantidad_litros'),
+                total_cargas=Sum('cargas'),
+                total_litros=Sum('litros'),
+                max_litros=Max('litros_max'),
             )
             .order_by('-total_litros')
         )
@@ -935,7 +934,7 @@ class CargaCombustibleAdmin(admin.ModelAdmin):
                 u['unidad__tipo'],
                 u['total_cargas'],
                 round(float(u['total_litros'] or 0), 2),
-                round(float(u['promedio_litros'] or 0), 2),
+                round(float(u['total_litros'] or 0) / u['total_cargas'], 2),
                 round(float(u['max_litros'] or 0), 2),
             ]
             for col, val in enumerate(row_data, start=1):
@@ -957,12 +956,13 @@ class CargaCombustibleAdmin(admin.ModelAdmin):
             ws4.column_dimensions[get_column_letter(col)].width = ancho
 
         por_desp = (
-            qs.values('despachador__nombre')
+            hechos_con_cargas
+            .values('despachador__nombre')
             .annotate(
-                total_cargas=Count('id'),
-                total_litros=Sum('cantidad_litros'),
-                promedio_litros=Avg('cantidad_litros'),
-                promedio_tiempo=Avg('tiempo_carga_minutos'),
+                total_cargas=Sum('cargas'),
+                total_litros=Sum('litros'),
+                tiempo=Sum('tiempo_minutos'),
+                cargas_con_tiempo=Sum('cargas_con_tiempo'),
             )
             .order_by('-total_litros')
         )
@@ -971,8 +971,8 @@ class CargaCombustibleAdmin(admin.ModelAdmin):
                 d['despachador__nombre'],
                 d['total_cargas'],
                 round(float(d['total_litros'] or 0), 2),
-                round(float(d['promedio_litros'] or 0), 2),
-                round(float(d['promedio_tiempo'] or 0), 1),
+                round(float(d['total_litros'] or 0) / d['total_cargas'], 2),
+                round(d['tiempo'] / d['cargas_con_tiempo'], 1) if d['cargas_con_tiempo'] else 0,
             ]
             for col, val in enumerate(row_data, start=1):
                 ws4.cell(row=i, column=col).value = val
@@ -994,8 +994,8 @@ class CargaCombustibleAdmin(admin.ModelAdmin):
 
         ALERTA_LABELS = dict(AlertaCombustible.TIPO_CHOICES)
         alertas_qs = AlertaCombustible.objects.filter(
-            carga__fecha_hora_inicio__date__gte=desde,
-            carga__fecha_hora_inicio__date__lte=hasta,
+            carga__fecha_hora_inicio__desde_dia=desde,
+            carga__fecha_hora_inicio__hasta_dia=hasta,
         ).select_related('carga__unidad', 'resuelta_por').order_by('-fecha_generacion')
 
         for i, alerta in enumerate(alertas_qs, start=4):
@@ -1022,3 +1022,47 @@ class CargaCombustibleAdmin(admin.ModelAdmin):
         )
         wb.save(response)
         return response
+
+
+@admin.register(FactCombustibleDiario)
+class FactCombustibleDiarioAdmin(admin.ModelAdmin):
+    list_display = [
+        'fecha', 'unidad', 'despachador', 'tipo_flujo', 'cargas', 'litros', 'costo',
+        'cargas_canceladas', 'alertas', 'alertas_pendientes', 'actualizado_en',
+    ]
+    list_filter = ['tipo_flujo', 'fecha']
+    search_fields = ['unidad__numero_economico', 'despachador__nombre']
+    date_hierarchy = 'fecha'
+    list_select_related = ['unidad', 'despachador']
+    actions = ['reconstruir_dias']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description='Reconstruir los días seleccionados desde las cargas')
+    def reconstruir_dias(self, request, queryset):
+        from .hechos import reconstruir
+
+        fechas = queryset.aggregate(desde=Min('fecha'), hasta=Max('fecha'))
+        celdas = reconstruir(fechas['desde'], fechas['hasta'])
+        self.message_user(request, f'{celdas} celda(s) reconstruida(s) entre {fechas["desde"]} y {fechas["hasta"]}.')
+
+
+@admin.register(RegistroCandado)
+class RegistroCandadoAdmin(admin.ModelAdmin):
+    list_display = ['numero', 'movimiento', 'unidad', 'carga', 'fecha']
+    list_filter = ['movimiento', 'fecha']
+    # Búsqueda exacta para usar el índice por número
+    search_fields = ['=numero', 'unidad__numero_economico']
+    date_hierarchy = 'fecha'
+    list_select_related = ['unidad', 'carga__unidad']
+    raw_id_fields = ['unidad', 'carga']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,80 @@
+"""
+Mantenimiento de RegistroCandado, el índice de números de candado.
+
+Por cada carga COMPLETADO se indexan los números leídos por OCR:
+
+    COLOCADO  numero_candado de sus FotoCandadoNuevo
+    RETIRADO  su numero_candado_anterior
+
+con la unidad y la fecha_hora_inicio de la carga. `registrar(carga)` reescribe
+los renglones de una carga (los borra si ya no está COMPLETADO); lo llaman las
+señales de combustible al guardar la carga y al terminar cada OCR, que escribe
+con .update(). `reconstruir()` rehace el índice entero con dos consultas; lo
+usan la migración que crea la tabla y el comando `reconstruir_indice_candados`.
+
+Las verificaciones que leen el índice están en modulos.combustible.services.
+"""
+
+import logging
+
+from django.db import transaction
+
+from .models import CargaCombustible, FotoCandadoNuevo, RegistroCandado
+
+logger = logging.getLogger(__name__)
+
+
+def _renglones(carga_id, unidad_id, fecha, retirado, colocados) -> list:
+    renglones = [
+        RegistroCandado(
+            numero=numero, unidad_id=unidad_id, carga_id=carga_id,
+            movimiento=RegistroCandado.COLOCADO, fecha=fecha,
+        )
+        for numero in sorted(colocados)
+    ]
+    if retirado:
+        renglones.append(RegistroCandado(
+            numero=retirado, unidad_id=unidad_id, carga_id=carga_id,
+            movimiento=RegistroCandado.RETIRADO, fecha=fecha,
+        ))
+    return renglones
+
+
+def registrar(carga) -> int:
+    """Reescribe los renglones del índice de `carga`. Retorna renglones escritos."""
+    renglones = []
+    if carga.estado == 'COMPLETADO':
+        colocados = set(
+            FotoCandadoNuevo.objects.filter(carga_id=carga.pk).exclude(numero_candado='')
+            .values_list('numero_candado', flat=True)
+        )
+        renglones = _renglones(
+            carga.pk, carga.unidad_id, carga.fecha_hora_inicio, carga.numero_candado_anterior, colocados,
+        )
+    with transaction.atomic():
+        RegistroCandado.objects.filter(carga_id=carga.pk).delete()
+        RegistroCandado.objects.bulk_create(renglones)
+    return len(renglones)
+
+
+def reconstruir() -> int:
+    """Rehace RegistroCandado desde las cargas y fotos existentes. Retorna renglones escritos."""
+    cargas = CargaCombustible.objects.filter(estado='COMPLETADO')
+    colocados = {}
+    fotos = (
+        FotoCandadoNuevo.objects.filter(carga__in=cargas).exclude(numero_candado='')
+        .values_list('carga_id', 'numero_candado')
+    )
+    for carga_id, numero in fotos:
+        colocados.setdefault(carga_id, set()).add(numero)
+
+    renglones = []
+    filas = cargas.values_list('pk', 'unidad_id', 'fecha_hora_inicio', 'numero_candado_anterior')
+    for carga_id, unidad_id, fecha, retirado in filas:
+        renglones.extend(_renglones(carga_id, unidad_id, fecha, retirado, colocados.get(carga_id, ())))
+
+    with transaction.atomic():
+        RegistroCandado.objects.all().delete()
+        RegistroCandado.objects.bulk_create(renglones, batch_size=1000)
+    logger.info("RegistroCandado: %d renglón(es) reconstruido(s)", len(renglones))
+    return len(renglones)
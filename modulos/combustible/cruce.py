@@ -0,0 +1,217 @@
+"""
+Cruce de diésel contra distancia recorrida (alerta DIESEL_VS_DISTANCIA).
+
+Por unidad se recorren juntas, en orden cronológico, sus cargas COMPLETADO y
+sus bitácoras (merge-join con un solo puntero sobre las bitácoras). Con el
+método de tanque lleno, los litros de la carga C(i+1) reponen lo consumido
+desde C(i), así que se comparan contra los kilómetros recorridos en
+[C(i), C(i+1)):
+
+    km       distancia_efectiva de cada viaje, prorrateada por el tiempo del
+             viaje que cae dentro del intervalo (un viaje cargado a medio
+             camino se reparte entre los dos intervalos)
+    esperado km / Unidad.rendimiento_esperado
+    desvío   litros / esperado − 1
+
+Si |desvío| supera TOLERANCIA se crea (o actualiza) la alerta sobre C(i+1);
+si deja de superarla se borra la alerta no resuelta. Los intervalos con un
+viaje abierto o sin distancia, o con menos de KM_MINIMOS, no se evalúan (y
+también retiran su alerta no resuelta). Las resueltas no se tocan.
+
+`revisar(unidades, desde)` hace tres consultas para cualquier número de
+unidades (anclas, cargas, bitácoras) más una de alertas existentes. Las
+señales de combustible la llaman para la unidad al completar una carga o un
+viaje; el comando `cruzar_diesel_distancia` la corre para toda la flota.
+"""
+
+import logging
+from itertools import groupby
+
+from django.db.models import Max
+
+logger = logging.getLogger(__name__)
+
+TIPO_ALERTA = 'DIESEL_VS_DISTANCIA'
+
+# Desvío relativo a partir del cual se alerta, y a partir del cual el riesgo es ALTO
+TOLERANCIA = 0.25
+TOLERANCIA_ALTA = 0.5
+# Intervalos con menos kilómetros atribuidos no se evalúan (el error de captura domina)
+KM_MINIMOS = 50
+
+
+class Intervalo:
+    """Litros de la carga `cierre` contra los km recorridos desde `apertura`."""
+
+    def __init__(self, apertura, cierre, km, viajes, completo):
+        self.apertura = apertura
+        self.cierre = cierre
+        self.km = km
+        self.viajes = viajes
+        self.completo = completo
+
+    def desvio(self, rendimiento):
+        esperado = self.km / rendimiento
+        return float(self.cierre['cantidad_litros']) / esperado - 1, esperado
+
+
+def intervalos(cargas, viajes):
+    """
+    Merge-join de las cargas y los viajes de una unidad, ambos ordenados por
+    fecha: un Intervalo por cada par de cargas consecutivas.
+    """
+    # Un viaje sin llegada no puede seguir abierto después de que salió el siguiente
+    for viaje, siguiente in zip(viajes, viajes[1:] + [None]):
+        viaje['hasta'] = viaje['fecha_llegada'] or (siguiente['fecha_salida'] if siguiente else None)
+
+    j = 0
+    for apertura, cierre in zip(cargas, cargas[1:]):
+        inicio, fin = apertura['fecha_hora_inicio'], cierre['fecha_hora_inicio']
+        # Los viajes que terminaron antes de la apertura ya no tocan este ni los siguientes intervalos
+        while j < len(viajes) and viajes[j]['hasta'] and viajes[j]['hasta'] <= inicio:
+            j += 1
+        km, ids, completo = 0.0, [], True
+        k = j
+        while k < len(viajes) and viajes[k]['fecha_salida'] < fin:
+            viaje = viajes[k]
+            k += 1
+            salida, llegada = viaje['fecha_salida'], viaje['fecha_llegada']
+            if viaje['hasta'] and viaje['hasta'] <= inicio:
+                continue
+            if llegada is None or viaje['distancia'] is None:
+                completo = False
+                continue
+            duracion = (llegada - salida).total_seconds()
+            dentro = (min(llegada, fin) - max(salida, inicio)).total_seconds()
+            km += float(viaje['distancia']) * (dentro / duracion if duracion > 0 else 1)
+            ids.append(viaje['id'])
+        yield Intervalo(apertura, cierre, km, ids, completo)
+
+
+def _distancia(distancia, distancia_2):
+    """Igual que BitacoraViaje.distancia_efectiva, sobre valores ya leídos."""
+    if distancia and distancia_2:
+        return max(distancia, distancia_2)
+    return distancia
+
+
+def revisar(unidades=None, desde=None) -> dict:
+    """
+    Evalúa los intervalos que cierran en o después de `desde` (datetime; None
+    = toda la historia) de las unidades dadas (None = flota). Retorna
+    {'evaluados', 'creadas', 'actualizadas', 'borradas'}.
+    """
+    from modulos.bitacoras.models import BitacoraViaje
+    from modulos.unidades.models import Unidad
+
+    from .models import AlertaCombustible, CargaCombustible
+
+    cargas = CargaCombustible.objects.filter(estado='COMPLETADO')
+    viajes = BitacoraViaje.objects.all()
+    datos_unidades = Unidad.objects.all()
+    if unidades is not None:
+        unidades = list(unidades)
+        cargas = cargas.filter(unidad_id__in=unidades)
+        viajes = viajes.filter(unidad_id__in=unidades)
+        datos_unidades = datos_unidades.filter(pk__in=unidades)
+
+    # Ancla por unidad: la última carga antes de `desde` abre el primer intervalo a evaluar
+    anclas = {}
+    if desde is not None:
+        anclas = dict(
+            cargas.filter(fecha_hora_inicio__lt=desde).values('unidad_id')
+            .annotate(t=Max('fecha_hora_inicio')).order_by().values_list('unidad_id', 't')
+        )
+        piso = min([desde, *anclas.values()])
+        cargas = cargas.filter(fecha_hora_inicio__gte=piso)
+        # Un viaje que salió antes del piso puede seguir en curso dentro del primer intervalo
+        viajes = viajes.exclude(fecha_llegada__lte=piso)
+
+    datos_unidades = {
+        pk: (numero, rendimiento)
+        for pk, numero, rendimiento in datos_unidades.values_list('pk', 'numero_economico', 'rendimiento_esperado')
+    }
+    filas_cargas = cargas.order_by('unidad_id', 'fecha_hora_inicio', 'pk').values(
+        'id', 'unidad_id', 'fecha_hora_inicio', 'cantidad_litros',
+    )
+    filas_viajes = {
+        unidad: list(grupo)
+        for unidad, grupo in groupby(
+            (
+                {**fila, 'distancia': _distancia(fila.pop('distancia_calculada'), fila.pop('distancia_calculada_2'))}
+                for fila in viajes.order_by('unidad_id', 'fecha_salida', 'pk').values(
+                    'id', 'unidad_id', 'fecha_salida', 'fecha_llegada',
+                    'distancia_calculada', 'distancia_calculada_2',
+                )
+            ),
+            key=lambda fila: fila['unidad_id'],
+        )
+    }
+
+    hallazgos, cierres, evaluados = {}, set(), 0
+    for unidad, grupo in groupby(filas_cargas, key=lambda fila: fila['unidad_id']):
+        numero, rendimiento = datos_unidades.get(unidad, (None, None))
+        if not rendimiento:
+            continue
+        lista = list(grupo)
+        ancla = anclas.get(unidad)
+        if desde is not None:
+            lista = [c for c in lista if c['fecha_hora_inicio'] >= (ancla or desde)]
+        for intervalo in intervalos(lista, filas_viajes.get(unidad, [])):
+            cierres.add(intervalo.cierre['id'])
+            if not intervalo.completo or intervalo.km < KM_MINIMOS:
+                continue
+            evaluados += 1
+            desvio, esperado = intervalo.desvio(float(rendimiento))
+            if abs(desvio) > TOLERANCIA:
+                hallazgos[intervalo.cierre['id']] = _alerta(numero, float(rendimiento), intervalo, esperado, desvio)
+
+    # Una alerta cuyo intervalo ya no se puede evaluar (viaje reabierto, carga borrada) se retira
+    resumen = {'evaluados': evaluados, 'creadas': 0, 'actualizadas': 0, 'borradas': 0}
+    existentes = {
+        alerta.carga_id: alerta
+        for alerta in AlertaCombustible.objects.filter(tipo_alerta=TIPO_ALERTA, carga__in=cargas)
+        if alerta.carga_id in cierres
+    }
+    for carga_id in cierres:
+        alerta, campos = existentes.get(carga_id), hallazgos.get(carga_id)
+        if alerta and alerta.resuelta:
+            continue
+        if campos and alerta is None:
+            AlertaCombustible.objects.create(carga_id=carga_id, tipo_alerta=TIPO_ALERTA, **campos)
+            resumen['creadas'] += 1
+        elif campos and alerta.datos_estadisticos != campos['datos_estadisticos']:
+            for campo, valor in campos.items():
+                setattr(alerta, campo, valor)
+            alerta.save()
+            resumen['actualizadas'] += 1
+        elif not campos and alerta:
+            alerta.delete()
+            resumen['borradas'] += 1
+
+    if unidades is None:
+        logger.info("Cruce diésel vs distancia: %s", resumen)
+    return resumen
+
+
+def _alerta(numero, rendimiento, intervalo, esperado, desvio) -> dict:
+    litros = float(intervalo.cierre['cantidad_litros'])
+    sentido = 'MÁS' if desvio > 0 else 'MENOS'
+    return {
+        'mensaje': (
+            f"Unidad {numero}: se cargaron {litros:,.2f} L para {intervalo.km:,.0f} km recorridos en "
+            f"{len(intervalo.viajes)} viaje(s) desde la carga del "
+            f"{intervalo.apertura['fecha_hora_inicio'].strftime('%d/%m/%Y')}; a {rendimiento} km/L se "
+            f"esperaban {esperado:,.2f} L ({abs(desvio):.0%} {sentido} de lo esperado)."
+        ),
+        'score_riesgo': 'ALTO' if abs(desvio) > TOLERANCIA_ALTA else 'MEDIO',
+        'datos_estadisticos': {
+            'carga_apertura': intervalo.apertura['id'],
+            'viajes': intervalo.viajes,
+            'km': round(intervalo.km, 1),
+            'litros': round(litros, 2),
+            'litros_esperados': round(esperado, 2),
+            'rendimiento_esperado': rendimiento,
+            'desvio': round(desvio, 4),
+        },
+    }
@@ -0,0 +1,158 @@
+"""
+Mantenimiento de FactCombustibleDiario.
+
+Cada celda (fecha, unidad, despachador, tipo_flujo) se recalcula completa a
+partir de sus cargas y alertas cuando una de ellas cambia. Recalcular la celda
+—en vez de sumar deltas— es idempotente: el wizard y el análisis IA guardan la
+misma carga varias veces y el post_save se dispara en cada una.
+
+`reconstruir()` rehace un rango de fechas (o toda la tabla) con dos consultas
+agrupadas; lo usa el comando `reconstruir_hechos_combustible`.
+"""
+
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from config.fechas import en_dia
+
+from .models import AlertaCombustible, CargaCombustible, FactCombustibleDiario
+
+logger = logging.getLogger(__name__)
+
+ESTADOS_CANDADO_ANOMALO = ['ALTERADO', 'VIOLADO', 'SIN_CANDADO']
+
+_COMPLETADA = Q(estado='COMPLETADO')
+
+MEDIDAS_CARGAS = {
+    'cargas': Count('id', filter=_COMPLETADA),
+    'litros': Sum('cantidad_litros', filter=_COMPLETADA),
+    'litros_max': Max('cantidad_litros', filter=_COMPLETADA),
+    'litros_min': Min('cantidad_litros', filter=_COMPLETADA),
+    'costo': Sum('costo_calculado', filter=_COMPLETADA),
+    'tiempo_minutos': Sum('tiempo_carga_minutos', filter=_COMPLETADA),
+    'cargas_con_tiempo': Count('tiempo_carga_minutos', filter=_COMPLETADA),
+    'cargas_candado_anomalo': Count(
+        'id', filter=_COMPLETADA & Q(estado_candado_anterior__in=ESTADOS_CANDADO_ANOMALO),
+    ),
+    'cargas_iniciadas': Count('id', filter=Q(estado='INICIADO')),
+    'cargas_en_proceso': Count('id', filter=Q(estado='EN_PROCESO')),
+    'cargas_canceladas': Count('id', filter=Q(estado='CANCELADO')),
+}
+
+MEDIDAS_ALERTAS = {
+    'alertas': Count('id'),
+    'alertas_pendientes': Count('id', filter=Q(resuelta=False)),
+    'alertas_ia': Count('id', filter=Q(generada_por_ia=True)),
+    'cargas_con_alerta_ia': Count('carga', filter=Q(generada_por_ia=True), distinct=True),
+}
+
+# Sum() sobre cero filas completadas devuelve None
+_CEROS = {'litros': Decimal('0'), 'costo': Decimal('0'), 'tiempo_minutos': 0}
+
+
+def clave_carga(fecha_hora_inicio, unidad_id, despachador_id, tipo_flujo):
+    """Celda de la tabla de hechos a la que pertenece una carga."""
+    if fecha_hora_inicio is None:
+        return None
+    return (timezone.localdate(fecha_hora_inicio), unidad_id, despachador_id, tipo_flujo)
+
+
+def _agregar(cargas_qs, alertas_qs) -> dict:
+    """{(fecha, unidad_id, despachador_id, tipo_flujo): campos} para los querysets dados."""
+    celdas = {}
+    filas_cargas = (
+        cargas_qs
+        .annotate(dia=TruncDate('fecha_hora_inicio'))
+        .values('dia', 'unidad_id', 'despachador_id', 'tipo_flujo')
+        .annotate(**MEDIDAS_CARGAS)
+        .order_by()
+    )
+    for fila in filas_cargas:
+        clave = (fila.pop('dia'), fila.pop('unidad_id'), fila.pop('despachador_id'), fila.pop('tipo_flujo'))
+        campos = {campo: 0 for campo in MEDIDAS_ALERTAS}
+        for campo, valor in fila.items():
+            campos[campo] = _CEROS[campo] if valor is None and campo in _CEROS else valor
+        celdas[clave] = campos
+
+    filas_alertas = (
+        alertas_qs
+        .annotate(dia=TruncDate('carga__fecha_hora_inicio'))
+        .values('dia', 'carga__unidad_id', 'carga__despachador_id', 'carga__tipo_flujo')
+        .annotate(**MEDIDAS_ALERTAS)
+        .order_by()
+    )
+    for fila in filas_alertas:
+        clave = (fila.pop('dia'), fila.pop('carga__unidad_id'), fila.pop('carga__despachador_id'),
+                 fila.pop('carga__tipo_flujo'))
+        if clave in celdas:
+            celdas[clave].update(fila)
+    return celdas
+
+
+def recalcular_celda(fecha, unidad_id, despachador_id, tipo_flujo):
+    """Recalcula (o borra, si quedó vacía) una celda de FactCombustibleDiario."""
+    filtro = dict(unidad_id=unidad_id, despachador_id=despachador_id, tipo_flujo=tipo_flujo)
+    celdas = _agregar(
+        CargaCombustible.objects.filter(en_dia('fecha_hora_inicio', fecha), **filtro),
+        AlertaCombustible.objects.filter(
+            en_dia('carga__fecha_hora_inicio', fecha),
+            **{f'carga__{campo}': valor for campo, valor in filtro.items()},
+        ),
+    )
+    campos = celdas.get((fecha, unidad_id, despachador_id, tipo_flujo))
+    if campos is None:
+        FactCombustibleDiario.objects.filter(fecha=fecha, **filtro).delete()
+        return None
+    hecho, _ = FactCombustibleDiario.objects.update_or_create(fecha=fecha, defaults=campos, **filtro)
+    return hecho
+
+
+def recalcular_cargas(cargas_qs) -> int:
+    """Recalcula las celdas tocadas por un queryset de cargas (p. ej. tras un .update()). Retorna celdas."""
+    claves = {
+        clave_carga(*valores)
+        for valores in cargas_qs.values_list('fecha_hora_inicio', 'unidad_id', 'despachador_id', 'tipo_flujo')
+    }
+    claves.discard(None)
+    for clave in claves:
+        recalcular_celda(*clave)
+    return len(claves)
+
+
+def reconstruir(desde=None, hasta=None) -> int:
+    """
+    Reconstruye FactCombustibleDiario en [desde, hasta] (fechas locales;
+    None = sin límite). Retorna el número de celdas escritas.
+    """
+    cargas = CargaCombustible.objects.all()
+    alertas = AlertaCombustible.objects.all()
+    hechos = FactCombustibleDiario.objects.all()
+    if desde:
+        cargas = cargas.filter(fecha_hora_inicio__desde_dia=desde)
+        alertas = alertas.filter(carga__fecha_hora_inicio__desde_dia=desde)
+        hechos = hechos.filter(fecha__gte=desde)
+    if hasta:
+        cargas = cargas.filter(fecha_hora_inicio__hasta_dia=hasta)
+        alertas = alertas.filter(carga__fecha_hora_inicio__hasta_dia=hasta)
+        hechos = hechos.filter(fecha__lte=hasta)
+
+    celdas = _agregar(cargas, alertas)
+    with transaction.atomic():
+        hechos.delete()
+        FactCombustibleDiario.objects.bulk_create(
+            [
+                FactCombustibleDiario(
+                    fecha=fecha, unidad_id=unidad_id, despachador_id=despachador_id,
+                    tipo_flujo=tipo_flujo, **campos,
+                )
+                for (fecha, unidad_id, despachador_id, tipo_flujo), campos in celdas.items()
+            ],
+            batch_size=1000,
+        )
+    logger.info("FactCombustibleDiario: %d celda(s) reconstruida(s) (%s → %s)", len(celdas), desde, hasta)
+    return len(celdas)
@@ -19,6 +19,8 @@ from datetime import timedelta
 
 from django.utils import timezone
 
+from modulos.monitoreo.metricas import IA_ANALISIS_SEGUNDOS, medido
+
 logger = logging.getLogger(__name__)
 
 # Scores que activan la llamada a Claude API (configurado en settings.IA_SCORE_MINIMO_CLAUDE)
@@ -82,6 +84,15 @@ NIVEL_A_PORCENTAJE = {
 # Clase principal
 # ---------------------------------------------------------------------------
 
+def aplicar_interpretacion(carga_id, texto: str) -> None:
+    """Adjunta la interpretación resuelta en lote a las alertas IA de la carga."""
+    from modulos.combustible.models import AlertaCombustible
+
+    AlertaCombustible.objects.filter(
+        carga_id=carga_id, generada_por_ia=True, analisis_ia='',
+    ).update(analisis_ia=texto)
+
+
 class AnalizadorCombustible:
     """
     Analiza una carga recién completada contra el historial de su unidad
@@ -97,6 +108,7 @@ class AnalizadorCombustible:
         # }
     """
 
+    @medido(IA_ANALISIS_SEGUNDOS, 'combustible')
     def analizar_carga(self, carga) -> dict:
         """
         Punto de entrada principal. Retorna dict con anomalías detectadas,
@@ -146,9 +158,13 @@ class AnalizadorCombustible:
 
         Solo se invoca cuando score_riesgo está en _SCORES_CON_CLAUDE.
         Retorna '' si IA está deshabilitada o si la llamada falla.
+
+        Con 'combustible' en IA_MODO_LOTE no llama a Claude: encola el prompt
+        y `aplicar_interpretacion` completa las alertas cuando termina el lote.
         """
         from django.conf import settings
         from config.services.claude_service import ClaudeService, Modelo
+        from modulos.ia import lotes
 
         if not getattr(settings, 'IA_HABILITADA', True):
             return ''
@@ -158,11 +174,13 @@ class AnalizadorCombustible:
         if orden_scores.index(score_riesgo) < orden_scores.index(score_minimo):
             return ''
 
-        try:
-            claude = ClaudeService()
-        except ValueError:
-            logger.warning("IAKasu: ANTHROPIC_API_KEY no configurada, omitiendo interpretación.")
-            return ''
+        en_lote = lotes.en_modo_lote('combustible')
+        if not en_lote:
+            try:
+                claude = ClaudeService(modulo='combustible')
+            except ValueError:
+                logger.warning("IAKasu: ANTHROPIC_API_KEY no configurada, omitiendo interpretación.")
+                return ''
 
         # Construir resumen de anomalías para el prompt
         resumen_anomalias = '\n'.join(
@@ -195,6 +213,12 @@ class AnalizadorCombustible:
             f"Genera el análisis ejecutivo:"
         )
 
+        if en_lote:
+            return lotes.encolar(
+                'combustible', 'modulos.combustible.ia_service.aplicar_interpretacion', carga.pk,
+                prompt=prompt, sistema=SISTEMA_ANALISTA, modelo=Modelo.SONNET, max_tokens=300,
+            )
+
         return claude.completar(
             prompt=prompt,
             sistema=SISTEMA_ANALISTA,
@@ -0,0 +1,55 @@
+"""
+Management command para cruzar los litros cargados contra los kilómetros de
+las bitácoras de toda la flota y generar las alertas DIESEL_VS_DISTANCIA.
+
+Uso:
+    python manage.py cruzar_diesel_distancia
+    python manage.py cruzar_diesel_distancia --desde 2025-01-01
+    python manage.py cruzar_diesel_distancia --desde 2025-01-01 --unidad ECO-014
+
+Solo se evalúan los intervalos entre cargas que cierran a partir de --desde.
+Las señales ya revisan la unidad al completar una carga o un viaje; el
+comando es para la carga inicial, para cambios hechos con .update() o tras
+ajustar el rendimiento esperado de las unidades.
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from config.fechas import inicio_dia
+from modulos.combustible.cruce import revisar
+from modulos.unidades.models import Unidad
+
+
+def _fecha(valor):
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Formato de fecha inválido: '{valor}'. Use YYYY-MM-DD (ej: 2025-01-01)")
+
+
+class Command(BaseCommand):
+    help = "Cruza diésel cargado contra distancia recorrida y genera alertas DIESEL_VS_DISTANCIA"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=str, metavar='YYYY-MM-DD', help='Primer día de cierre a evaluar.')
+        parser.add_argument('--unidad', type=str, metavar='ECO', help='Número económico de una sola unidad.')
+
+    def handle(self, *args, **options):
+        desde = _fecha(options['desde'])
+        unidades = None
+        if options['unidad']:
+            unidades = list(
+                Unidad.objects.filter(numero_economico=options['unidad']).values_list('pk', flat=True)
+            )
+            if not unidades:
+                raise CommandError(f"No existe la unidad '{options['unidad']}'.")
+
+        resumen = revisar(unidades, inicio_dia(desde) if desde else None)
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {resumen['evaluados']} intervalo(s) evaluado(s): {resumen['creadas']} alerta(s) nueva(s), "
+            f"{resumen['actualizadas']} actualizada(s), {resumen['borradas']} retirada(s)."
+        ))
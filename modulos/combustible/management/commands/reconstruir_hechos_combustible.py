@@ -0,0 +1,45 @@
+"""
+Management command para reconstruir FactCombustibleDiario desde las cargas y alertas.
+
+Uso:
+    python manage.py reconstruir_hechos_combustible
+    python manage.py reconstruir_hechos_combustible --desde 2025-01-01
+    python manage.py reconstruir_hechos_combustible --desde 2025-01-01 --hasta 2025-01-31
+
+Las señales mantienen la tabla al día; el rebuild es para la carga inicial,
+para cargas editadas con .update() o importaciones masivas.
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from modulos.combustible.hechos import reconstruir
+
+
+def _fecha(valor):
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Formato de fecha inválido: '{valor}'. Use YYYY-MM-DD (ej: 2025-01-01)")
+
+
+class Command(BaseCommand):
+    help = "Reconstruye la tabla de hechos diaria de combustible (FactCombustibleDiario)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=str, metavar='YYYY-MM-DD', help='Primera fecha a reconstruir (inclusive).')
+        parser.add_argument('--hasta', type=str, metavar='YYYY-MM-DD', help='Última fecha a reconstruir (inclusive).')
+
+    def handle(self, *args, **options):
+        desde, hasta = _fecha(options['desde']), _fecha(options['hasta'])
+        if desde and hasta and desde > hasta:
+            raise CommandError("--desde no puede ser posterior a --hasta.")
+
+        celdas = reconstruir(desde, hasta)
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {celdas} celda(s) de FactCombustibleDiario reconstruida(s) "
+            f"({desde or 'inicio'} → {hasta or 'hoy'})."
+        ))
@@ -0,0 +1,46 @@
+"""
+Management command para reconstruir RegistroCandado (índice de números de candado)
+desde las cargas completadas y sus fotos de candado nuevo.
+
+Uso:
+    python manage.py reconstruir_indice_candados
+    python manage.py reconstruir_indice_candados --verificar
+
+Las señales y el OCR mantienen el índice al día; el rebuild es para cargas o
+fotos editadas con .update() o importaciones masivas. Con --verificar corre
+además verificar_ciclo_candados() sobre cada carga indexada (solo crea
+alertas que falten).
+"""
+
+from django.core.management.base import BaseCommand
+
+from modulos.combustible.candados import reconstruir
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de números de candado (RegistroCandado)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Verifica ciclo y reuso de candados de cada carga indexada.',
+        )
+
+    def handle(self, *args, **options):
+        from modulos.combustible.models import CargaCombustible
+        from modulos.combustible.services import verificar_ciclo_candados
+
+        renglones = reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"✓ {renglones} renglón(es) de RegistroCandado reconstruido(s)."))
+
+        if options['verificar']:
+            cargas = (
+                CargaCombustible.objects.filter(registros_candado__isnull=False)
+                .distinct().select_related('unidad').order_by('fecha_hora_inicio')
+            )
+            total = 0
+            for carga in cargas.iterator():
+                verificar_ciclo_candados(carga)
+                total += 1
+            self.stdout.write(self.style.SUCCESS(f"✓ {total} carga(s) verificada(s)."))
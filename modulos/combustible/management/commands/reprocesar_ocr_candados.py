@@ -101,9 +101,11 @@ class Command(BaseCommand):
     def _procesar_candados_anteriores(self, fecha_desde, dry_run, reprocesar_todos):
         """
         Procesa foto_candado_anterior de CargaCombustible completadas.
-        Actualiza numero_candado_anterior y ejecuta verificar_ciclo_candados().
+        Actualiza numero_candado_anterior, el índice RegistroCandado y ejecuta
+        verificar_ciclo_candados().
         """
         from config.services.ocr_service import leer_numero_candado
+        from modulos.combustible import candados
         from modulos.combustible.models import CargaCombustible
         from modulos.combustible.services import verificar_ciclo_candados
 
@@ -115,7 +117,7 @@ class Command(BaseCommand):
             qs = qs.filter(ocr_candado_anterior_ok=False)
 
         if fecha_desde:
-            qs = qs.filter(fecha_hora_inicio__date__gte=fecha_desde)
+            qs = qs.filter(fecha_hora_inicio__desde_dia=fecha_desde)
 
         total = qs.count()
         self.stdout.write(
@@ -148,6 +150,7 @@ class Command(BaseCommand):
                 carga.numero_candado_anterior = numero
                 carga.ocr_candado_anterior_ok = True
 
+                candados.registrar(carga)
                 if numero:
                     self.stdout.write(self.style.SUCCESS(f"OK → '{numero}'"))
                     verificar_ciclo_candados(carga)
@@ -169,10 +172,13 @@ class Command(BaseCommand):
     def _procesar_candados_nuevos(self, fecha_desde, dry_run, reprocesar_todos):
         """
         Procesa fotos de FotoCandadoNuevo.
-        Actualiza numero_candado y ocr_procesado.
+        Actualiza numero_candado y ocr_procesado; si la carga está completada,
+        reescribe sus renglones de RegistroCandado y verifica el reuso.
         """
         from config.services.ocr_service import leer_numero_candado
+        from modulos.combustible import candados
         from modulos.combustible.models import FotoCandadoNuevo
+        from modulos.combustible.services import verificar_ciclo_candados
 
         qs = FotoCandadoNuevo.objects.exclude(foto='').select_related('carga__unidad')
 
@@ -180,7 +186,7 @@ class Command(BaseCommand):
             qs = qs.filter(ocr_procesado=False)
 
         if fecha_desde:
-            qs = qs.filter(carga__fecha_hora_inicio__date__gte=fecha_desde)
+            qs = qs.filter(carga__fecha_hora_inicio__desde_dia=fecha_desde)
 
         total = qs.count()
         self.stdout.write(
@@ -212,6 +218,9 @@ class Command(BaseCommand):
 
                 if numero:
                     self.stdout.write(self.style.SUCCESS(f"OK → '{numero}'"))
+                    if foto.carga.estado == 'COMPLETADO':
+                        candados.registrar(foto.carga)
+                        verificar_ciclo_candados(foto.carga)
                 else:
                     self.stdout.write(self.style.WARNING("OK → (no detectado)"))
 
@@ -0,0 +1,117 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:46
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def llenar_hechos(apps, schema_editor):
+    CargaCombustible = apps.get_model('combustible', 'CargaCombustible')
+    AlertaCombustible = apps.get_model('combustible', 'AlertaCombustible')
+    FactCombustibleDiario = apps.get_model('combustible', 'FactCombustibleDiario')
+
+    completada = Q(estado='COMPLETADO')
+    filas_cargas = (
+        CargaCombustible.objects
+        .annotate(dia=TruncDate('fecha_hora_inicio'))
+        .values('dia', 'unidad_id', 'despachador_id', 'tipo_flujo')
+        .annotate(
+            cargas=Count('id', filter=completada),
+            litros=Sum('cantidad_litros', filter=completada),
+            litros_max=Max('cantidad_litros', filter=completada),
+            litros_min=Min('cantidad_litros', filter=completada),
+            costo=Sum('costo_calculado', filter=completada),
+            tiempo_minutos=Sum('tiempo_carga_minutos', filter=completada),
+            cargas_con_tiempo=Count('tiempo_carga_minutos', filter=completada),
+            cargas_candado_anomalo=Count(
+                'id', filter=completada & Q(estado_candado_anterior__in=['ALTERADO', 'VIOLADO', 'SIN_CANDADO']),
+            ),
+            cargas_iniciadas=Count('id', filter=Q(estado='INICIADO')),
+            cargas_en_proceso=Count('id', filter=Q(estado='EN_PROCESO')),
+            cargas_canceladas=Count('id', filter=Q(estado='CANCELADO')),
+        )
+        .order_by()
+    )
+    celdas = {}
+    for fila in filas_cargas:
+        clave = (fila.pop('dia'), fila.pop('unidad_id'), fila.pop('despachador_id'), fila.pop('tipo_flujo'))
+        fila['litros'] = fila['litros'] or Decimal('0')
+        fila['costo'] = fila['costo'] or Decimal('0')
+        fila['tiempo_minutos'] = fila['tiempo_minutos'] or 0
+        celdas[clave] = fila
+
+    filas_alertas = (
+        AlertaCombustible.objects
+        .annotate(dia=TruncDate('carga__fecha_hora_inicio'))
+        .values('dia', 'carga__unidad_id', 'carga__despachador_id', 'carga__tipo_flujo')
+        .annotate(
+            alertas=Count('id'),
+            alertas_pendientes=Count('id', filter=Q(resuelta=False)),
+            alertas_ia=Count('id', filter=Q(generada_por_ia=True)),
+            cargas_con_alerta_ia=Count('carga', filter=Q(generada_por_ia=True), distinct=True),
+        )
+        .order_by()
+    )
+    for fila in filas_alertas:
+        clave = (fila.pop('dia'), fila.pop('carga__unidad_id'), fila.pop('carga__despachador_id'),
+                 fila.pop('carga__tipo_flujo'))
+        if clave in celdas:
+            celdas[clave].update(fila)
+
+    FactCombustibleDiario.objects.bulk_create(
+        [
+            FactCombustibleDiario(
+                fecha=fecha, unidad_id=unidad_id, despachador_id=despachador_id, tipo_flujo=tipo_flujo, **campos,
+            )
+            for (fecha, unidad_id, despachador_id, tipo_flujo), campos in celdas.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('combustible', '0012_cargacombustible_costo_calculado'),
+        ('unidades', '0002_unidad_control_combustible_total'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FactCombustibleDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('tipo_flujo', models.CharField(choices=[('FORANEO', 'Foráneo / Completo'), ('LOCAL', 'Local / Simplificado')], max_length=10, verbose_name='Tipo de flujo')),
+                ('cargas', models.PositiveIntegerField(default=0, verbose_name='Cargas completadas')),
+                ('litros', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Litros')),
+                ('litros_max', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True, verbose_name='Carga máxima (L)')),
+                ('litros_min', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True, verbose_name='Carga mínima (L)')),
+                ('costo', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Costo')),
+                ('tiempo_minutos', models.PositiveIntegerField(default=0, verbose_name='Tiempo de carga total (min)')),
+                ('cargas_con_tiempo', models.PositiveIntegerField(default=0, verbose_name='Cargas con tiempo registrado')),
+                ('cargas_candado_anomalo', models.PositiveIntegerField(default=0, help_text='Candado anterior ALTERADO, VIOLADO o SIN_CANDADO', verbose_name='Cargas con candado anómalo')),
+                ('cargas_iniciadas', models.PositiveIntegerField(default=0, verbose_name='Cargas iniciadas')),
+                ('cargas_en_proceso', models.PositiveIntegerField(default=0, verbose_name='Cargas en proceso')),
+                ('cargas_canceladas', models.PositiveIntegerField(default=0, verbose_name='Cargas canceladas')),
+                ('alertas', models.PositiveIntegerField(default=0, verbose_name='Alertas')),
+                ('alertas_pendientes', models.PositiveIntegerField(default=0, verbose_name='Alertas pendientes')),
+                ('alertas_ia', models.PositiveIntegerField(default=0, verbose_name='Alertas IA')),
+                ('cargas_con_alerta_ia', models.PositiveIntegerField(default=0, verbose_name='Cargas con alerta IA')),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('despachador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hechos_combustible', to='combustible.despachador', verbose_name='Despachador')),
+                ('unidad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hechos_combustible', to='unidades.unidad', verbose_name='Unidad')),
+            ],
+            options={
+                'verbose_name': 'Hecho diario de combustible',
+                'verbose_name_plural': 'Hechos diarios de combustible',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['fecha'], name='combustible_fecha_3a1af0_idx'), models.Index(fields=['unidad', 'fecha'], name='combustible_unidad__995f68_idx')],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'unidad', 'despachador', 'tipo_flujo'), name='fact_combustible_diario_unico')],
+            },
+        ),
+        migrations.RunPython(llenar_hechos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('combustible', '0013_fact_combustible_diario'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='alertacombustible',
+            name='tipo_alerta',
+            field=models.CharField(choices=[('CANDADO_ALTERADO', 'Candado Alterado'), ('CANDADO_VIOLADO', 'Candado Violado'), ('SIN_CANDADO', 'Sin Candado'), ('EXCESO_COMBUSTIBLE', 'Exceso de Combustible'), ('CANDADO_NO_COINCIDE', 'Candado no coincide con carga anterior'), ('KILOMETRAJE_MENOR', 'Kilometraje menor al anterior'), ('CONSUMO_ATIPICO', 'Consumo atípico vs. historial'), ('RENDIMIENTO_ANOMALO', 'Rendimiento fuera del rango histórico'), ('TIEMPO_CARGA_ATIPICO', 'Tiempo de carga inusual'), ('NIVEL_INCONSISTENTE', 'Nivel inicial inconsistente con litros cargados'), ('PATRON_DESPACHADOR', 'Patrón anómalo en despachador'), ('FRECUENCIA_IRREGULAR', 'Frecuencia de carga irregular vs. historial'), ('DIESEL_VS_DISTANCIA', 'Diésel no corresponde a la distancia recorrida')], max_length=30, verbose_name='Tipo de alerta'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def llenar_registros(apps, schema_editor):
+    CargaCombustible = apps.get_model('combustible', 'CargaCombustible')
+    FotoCandadoNuevo = apps.get_model('combustible', 'FotoCandadoNuevo')
+    RegistroCandado = apps.get_model('combustible', 'RegistroCandado')
+
+    cargas = {
+        pk: (unidad_id, fecha)
+        for pk, unidad_id, fecha in CargaCombustible.objects.filter(estado='COMPLETADO')
+        .values_list('pk', 'unidad_id', 'fecha_hora_inicio')
+    }
+    renglones = {}
+    fotos = FotoCandadoNuevo.objects.exclude(numero_candado='').values_list('carga_id', 'numero_candado')
+    for carga_id, numero in fotos:
+        if carga_id in cargas:
+            renglones[(carga_id, 'COLOCADO', numero)] = cargas[carga_id]
+    retirados = (
+        CargaCombustible.objects.filter(estado='COMPLETADO').exclude(numero_candado_anterior='')
+        .values_list('pk', 'numero_candado_anterior')
+    )
+    for carga_id, numero in retirados:
+        renglones[(carga_id, 'RETIRADO', numero)] = cargas[carga_id]
+
+    RegistroCandado.objects.bulk_create(
+        [
+            RegistroCandado(numero=numero, unidad_id=unidad_id, carga_id=carga_id, movimiento=movimiento, fecha=fecha)
+            for (carga_id, movimiento, numero), (unidad_id, fecha) in renglones.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('combustible', '0014_alerta_diesel_vs_distancia'),
+        ('unidades', '0002_unidad_control_combustible_total'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='alertacombustible',
+            name='tipo_alerta',
+            field=models.CharField(choices=[('CANDADO_ALTERADO', 'Candado Alterado'), ('CANDADO_VIOLADO', 'Candado Violado'), ('SIN_CANDADO', 'Sin Candado'), ('EXCESO_COMBUSTIBLE', 'Exceso de Combustible'), ('CANDADO_NO_COINCIDE', 'Candado no coincide con carga anterior'), ('KILOMETRAJE_MENOR', 'Kilometraje menor al anterior'), ('CANDADO_REUTILIZADO', 'Número de candado reutilizado'), ('CONSUMO_ATIPICO', 'Consumo atípico vs. historial'), ('RENDIMIENTO_ANOMALO', 'Rendimiento fuera del rango histórico'), ('TIEMPO_CARGA_ATIPICO', 'Tiempo de carga inusual'), ('NIVEL_INCONSISTENTE', 'Nivel inicial inconsistente con litros cargados'), ('PATRON_DESPACHADOR', 'Patrón anómalo en despachador'), ('FRECUENCIA_IRREGULAR', 'Frecuencia de carga irregular vs. historial'), ('DIESEL_VS_DISTANCIA', 'Diésel no corresponde a la distancia recorrida')], max_length=30, verbose_name='Tipo de alerta'),
+        ),
+        migrations.CreateModel(
+            name='RegistroCandado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.CharField(max_length=50, verbose_name='Número de candado')),
+                ('movimiento', models.CharField(choices=[('COLOCADO', 'Colocado'), ('RETIRADO', 'Retirado')], max_length=10, verbose_name='Movimiento')),
+                ('fecha', models.DateTimeField(help_text='fecha_hora_inicio de la carga', verbose_name='Fecha')),
+                ('carga', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='registros_candado', to='combustible.cargacombustible', verbose_name='Carga de combustible')),
+                ('unidad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='registros_candado', to='unidades.unidad', verbose_name='Unidad')),
+            ],
+            options={
+                'verbose_name': 'Registro de candado',
+                'verbose_name_plural': 'Registros de candado',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['numero', '-fecha'], name='combustible_numero_d5f47d_idx'), models.Index(fields=['unidad', 'movimiento', '-fecha'], name='combustible_unidad__b34956_idx')],
+                'constraints': [models.UniqueConstraint(fields=('carga', 'movimiento', 'numero'), name='registro_candado_unico')],
+            },
+        ),
+        migrations.RunPython(llenar_registros, migrations.RunPython.noop),
+    ]
@@ -225,11 +225,9 @@ class CargaCombustible(models.Model):
 
         # Calcular costo de la carga según precio de diésel mensual vigente
         if self.estado == 'COMPLETADO' and self.costo_calculado is None:
-            from modulos.finanzas.models import PrecioDieselMensual
+            from modulos.finanzas import precios
 
-            precio = PrecioDieselMensual.vigente_en(self.fecha_hora_inicio.date())
-            if precio:
-                self.costo_calculado = self.cantidad_litros * precio.precio_promedio_litro
+            self.costo_calculado = precios.costo(self.cantidad_litros, precios.diesel_en(self.fecha_hora_inicio))
 
         super().save(*args, **kwargs)
 
@@ -267,6 +265,7 @@ class AlertaCombustible(models.Model):
         ('EXCESO_COMBUSTIBLE', 'Exceso de Combustible'),
         ('CANDADO_NO_COINCIDE', 'Candado no coincide con carga anterior'),
         ('KILOMETRAJE_MENOR', 'Kilometraje menor al anterior'),
+        ('CANDADO_REUTILIZADO', 'Número de candado reutilizado'),
         # Alertas generadas por análisis estadístico IA
         ('CONSUMO_ATIPICO', 'Consumo atípico vs. historial'),
         ('RENDIMIENTO_ANOMALO', 'Rendimiento fuera del rango histórico'),
@@ -274,6 +273,8 @@ class AlertaCombustible(models.Model):
         ('NIVEL_INCONSISTENTE', 'Nivel inicial inconsistente con litros cargados'),
         ('PATRON_DESPACHADOR', 'Patrón anómalo en despachador'),
         ('FRECUENCIA_IRREGULAR', 'Frecuencia de carga irregular vs. historial'),
+        # Cruce de litros cargados contra km de las bitácoras (modulos.combustible.cruce)
+        ('DIESEL_VS_DISTANCIA', 'Diésel no corresponde a la distancia recorrida'),
     ]
 
     SCORE_RIESGO_CHOICES = [
@@ -382,4 +383,143 @@ class FotoCandadoNuevo(models.Model):
         ordering = ['created_at']
 
     def __str__(self):
-        return f"Foto candado - Carga {self.carga_id} - {self.descripcion or self.id}"
\ No newline at end of file
+        return f"Foto candado - Carga {self.carga_id} - {self.descripcion or self.id}"
+
+class RegistroCandado(models.Model):
+    """
+    Índice de números de candado leídos por OCR: un renglón por número
+    colocado (FotoCandadoNuevo.numero_candado) o retirado
+    (CargaCombustible.numero_candado_anterior) en cada carga COMPLETADO.
+
+    Permite verificar el ciclo de candados y detectar un número que aparece
+    en otra unidad o que vuelve a usarse con una sola consulta indexada.
+    Se mantiene en modulos.combustible.candados y se puede reconstruir con
+    `python manage.py reconstruir_indice_candados`.
+    """
+
+    COLOCADO = 'COLOCADO'
+    RETIRADO = 'RETIRADO'
+    MOVIMIENTO_CHOICES = [
+        (COLOCADO, 'Colocado'),
+        (RETIRADO, 'Retirado'),
+    ]
+
+    numero = models.CharField(max_length=50, verbose_name="Número de candado")
+    unidad = models.ForeignKey(
+        Unidad,
+        on_delete=models.CASCADE,
+        related_name='registros_candado',
+        verbose_name="Unidad"
+    )
+    carga = models.ForeignKey(
+        CargaCombustible,
+        on_delete=models.CASCADE,
+        related_name='registros_candado',
+        verbose_name="Carga de combustible"
+    )
+    movimiento = models.CharField(
+        max_length=10,
+        choices=MOVIMIENTO_CHOICES,
+        verbose_name="Movimiento"
+    )
+    fecha = models.DateTimeField(
+        verbose_name="Fecha",
+        help_text="fecha_hora_inicio de la carga"
+    )
+
+    class Meta:
+        verbose_name = "Registro de candado"
+        verbose_name_plural = "Registros de candado"
+        ordering = ['-fecha']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['carga', 'movimiento', 'numero'],
+                name='registro_candado_unico',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['numero', '-fecha']),
+            models.Index(fields=['unidad', 'movimiento', '-fecha']),
+        ]
+
+    def __str__(self):
+        return f"{self.numero} · {self.get_movimiento_display()} · Carga {self.carga_id}"
+
+
+class FactCombustibleDiario(models.Model):
+    """
+    Tabla de hechos diaria de combustible: una fila por (fecha, unidad,
+    despachador, tipo_flujo) con conteos, litros, costo, tiempo y alertas.
+
+    Los dashboards y reportes de combustible agregan sobre esta tabla en lugar
+    de recorrer CargaCombustible con TruncMonth / __date. Se mantiene al
+    completar cargas y al crear o resolver alertas (modulos.combustible.hechos)
+    y se puede reconstruir con `python manage.py reconstruir_hechos_combustible`.
+
+    `fecha` es la fecha local (America/Mexico_City) de fecha_hora_inicio.
+    Las medidas de litros/costo/tiempo cuentan solo cargas COMPLETADO.
+    """
+
+    fecha = models.DateField(verbose_name="Fecha")
+    unidad = models.ForeignKey(
+        Unidad,
+        on_delete=models.CASCADE,
+        related_name='hechos_combustible',
+        verbose_name="Unidad"
+    )
+    despachador = models.ForeignKey(
+        Despachador,
+        on_delete=models.CASCADE,
+        related_name='hechos_combustible',
+        verbose_name="Despachador"
+    )
+    tipo_flujo = models.CharField(
+        max_length=10,
+        choices=CargaCombustible.TIPO_FLUJO_CHOICES,
+        verbose_name="Tipo de flujo"
+    )
+
+    # Cargas completadas
+    cargas = models.PositiveIntegerField(default=0, verbose_name="Cargas completadas")
+    litros = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Litros")
+    litros_max = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True, verbose_name="Carga máxima (L)")
+    litros_min = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True, verbose_name="Carga mínima (L)")
+    costo = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Costo")
+    tiempo_minutos = models.PositiveIntegerField(default=0, verbose_name="Tiempo de carga total (min)")
+    cargas_con_tiempo = models.PositiveIntegerField(default=0, verbose_name="Cargas con tiempo registrado")
+    cargas_candado_anomalo = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Cargas con candado anómalo",
+        help_text="Candado anterior ALTERADO, VIOLADO o SIN_CANDADO"
+    )
+
+    # Cargas en otros estados
+    cargas_iniciadas = models.PositiveIntegerField(default=0, verbose_name="Cargas iniciadas")
+    cargas_en_proceso = models.PositiveIntegerField(default=0, verbose_name="Cargas en proceso")
+    cargas_canceladas = models.PositiveIntegerField(default=0, verbose_name="Cargas canceladas")
+
+    # Alertas de las cargas del día
+    alertas = models.PositiveIntegerField(default=0, verbose_name="Alertas")
+    alertas_pendientes = models.PositiveIntegerField(default=0, verbose_name="Alertas pendientes")
+    alertas_ia = models.PositiveIntegerField(default=0, verbose_name="Alertas IA")
+    cargas_con_alerta_ia = models.PositiveIntegerField(default=0, verbose_name="Cargas con alerta IA")
+
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Hecho diario de combustible"
+        verbose_name_plural = "Hechos diarios de combustible"
+        ordering = ['-fecha']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fecha', 'unidad', 'despachador', 'tipo_flujo'],
+                name='fact_combustible_diario_unico',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['fecha']),
+            models.Index(fields=['unidad', 'fecha']),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} · {self.unidad_id} · {self.despachador_id} · {self.tipo_flujo}"
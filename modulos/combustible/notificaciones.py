@@ -1,8 +1,9 @@
 """
 IAKasu — Notificaciones de alertas de combustible por email.
 
-Envía un email a la gerencia cuando el analizador estadístico detecta
-anomalías con score ALTO o CRITICO en una carga de combustible.
+Encola un email a la gerencia (y un resumen por WhatsApp) cuando el
+analizador estadístico detecta anomalías con score ALTO o CRITICO en una
+carga de combustible. La entrega la hace el outbox de modulos.notificaciones.
 
 Destinatarios configurados en settings.IA_ALERTAS_COMBUSTIBLE_EMAILS.
 """
@@ -10,11 +11,10 @@ Destinatarios configurados en settings.IA_ALERTAS_COMBUSTIBLE_EMAILS.
 import logging
 
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.urls import reverse
 
-from config.services.whatsapp_service import enviar_mensaje as _wa_enviar
+from modulos.notificaciones.services import encolar_email, encolar_whatsapp
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +28,7 @@ ASUNTO_POR_SCORE = {
 
 def enviar_alerta_ia_combustible(carga, anomalias_qs, score_riesgo: str, analisis_ia: str = ''):
     """
-    Envía un email de alerta IA a los destinatarios configurados.
+    Encola un email de alerta IA a los destinatarios configurados.
 
     Args:
         carga:        Instancia de CargaCombustible recién analizada.
@@ -64,30 +64,27 @@ def enviar_alerta_ia_combustible(carga, anomalias_qs, score_riesgo: str, analisi
 
         texto_plano = _generar_texto_plano(carga, anomalias_lista, score_riesgo, analisis_ia)
 
-        email = EmailMultiAlternatives(
-            subject=asunto,
-            body=texto_plano,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=destinatarios,
+        encolar_email(
+            destinatarios, asunto, texto_plano, html,
+            clave_dedup=f"combustible:carga:{carga.pk}:alerta_ia:{score_riesgo}:email",
+            origen=carga,
         )
-        email.attach_alternative(html, 'text/html')
-        email.send(fail_silently=False)
 
         logger.info(
-            "IAKasu: alerta IA [%s] enviada a %s — carga #%s unidad %s",
+            "IAKasu: alerta IA [%s] encolada para %s — carga #%s unidad %s",
             score_riesgo,
             destinatarios,
             carga.pk,
             carga.unidad.numero_economico,
         )
 
-        # Envío paralelo por WhatsApp
+        # Aviso paralelo por WhatsApp
         _enviar_alerta_whatsapp(carga, anomalias_lista, score_riesgo, analisis_ia)
 
     except Exception as exc:
         # El email nunca debe romper el flujo principal
         logger.exception(
-            "IAKasu: error enviando alerta IA para carga #%s — %s",
+            "IAKasu: error encolando alerta IA para carga #%s — %s",
             carga.pk, exc,
         )
 
@@ -103,7 +100,7 @@ def _construir_url_detalle(carga) -> str:
 
 
 def _enviar_alerta_whatsapp(carga, anomalias, score_riesgo, analisis_ia) -> None:
-    """Envía resumen de alerta IA por WhatsApp a WA_ALLOWED_NUMBERS."""
+    """Encola resumen de alerta IA por WhatsApp a WA_ALLOWED_NUMBERS."""
     try:
         emoji = '🔴' if score_riesgo == 'CRITICO' else '🟠'
         fecha = carga.fecha_hora_inicio.strftime('%d/%m/%Y %H:%M')
@@ -126,11 +123,16 @@ def _enviar_alerta_whatsapp(carga, anomalias, score_riesgo, analisis_ia) -> None
                 lineas.append(f"• [{a.get_tipo_alerta_display()}] {a.mensaje}")
 
         mensaje = '\n'.join(lineas)
-        _wa_enviar(mensaje)
+        encolar_whatsapp(
+            mensaje,
+            asunto=f"Alerta IA {score_riesgo} — unidad {carga.unidad.numero_economico}",
+            clave_dedup=f"combustible:carga:{carga.pk}:alerta_ia:{score_riesgo}:wa",
+            origen=carga,
+        )
 
     except Exception as exc:
         logger.exception(
-            "IAKasu: error enviando alerta WhatsApp para carga #%s — %s",
+            "IAKasu: error encolando alerta WhatsApp para carga #%s — %s",
             carga.pk, exc,
         )
 
@@ -2,64 +2,117 @@
 
 import logging
 
+from config.fechas import a_fecha
+
 logger = logging.getLogger(__name__)
 
 
 def verificar_ciclo_candados(carga):
     """
-    Compara los números de candado nuevo de la carga anterior de la misma unidad
-    con el número de candado anterior retirado en la carga actual.
+    Verifica los candados de una carga COMPLETADO contra el índice
+    RegistroCandado (modulos.combustible.candados), con consultas
+    indexadas:
+
+    - Ciclo: el número de candado anterior retirado debe ser uno de los
+      colocados en la carga COMPLETADO inmediata anterior de la misma unidad.
+      Si no, genera CANDADO_NO_COINCIDE. Si esa carga no tiene candados
+      colocados registrados (OCR pendiente o sin fotos) no se verifica: no
+      se compara contra cargas más viejas.
+    - Reuso: un candado nuevo cuyo número ya estaba en el índice, o un
+      candado retirado que se colocó en otra unidad o que ya se había
+      retirado antes, genera CANDADO_REUTILIZADO.
 
-    Si no coinciden, genera AlertaCombustible de tipo CANDADO_NO_COINCIDE.
-    No hace nada si faltan datos OCR en alguno de los dos registros.
+    Los renglones de la propia carga deben estar ya en el índice
+    (candados.registrar). No hace nada si faltan datos OCR. Solo mira
+    registros anteriores a la carga, así que reprocesar cargas viejas da el
+    mismo resultado.
     """
-    from .models import CargaCombustible, AlertaCombustible
+    from django.db.models import Q
+
+    from .models import AlertaCombustible, CargaCombustible, RegistroCandado
 
-    # Solo verificar cuando la carga esté completada y tenga número de candado anterior
-    if carga.estado != 'COMPLETADO' or not carga.numero_candado_anterior:
+    if carga.estado != 'COMPLETADO':
         return
 
-    # Carga anterior completada de la misma unidad
-    carga_anterior = (
+    numero_retirado = carga.numero_candado_anterior
+
+    # Ciclo: colocados en la carga COMPLETADO inmediata anterior de la unidad
+    anterior = (
         CargaCombustible.objects
-        .filter(unidad=carga.unidad, estado='COMPLETADO')
+        .filter(unidad_id=carga.unidad_id, estado='COMPLETADO', fecha_hora_inicio__lt=carga.fecha_hora_inicio)
         .exclude(pk=carga.pk)
-        .order_by('-fecha_hora_inicio')
-        .prefetch_related('fotos_candado_nuevo')
-        .first()
+        .order_by('-fecha_hora_inicio').values_list('pk', 'fecha_hora_inicio').first()
+    ) if numero_retirado else None
+    if anterior:
+        carga_anterior_id, fecha_anterior = anterior
+        numeros_nuevos_anterior = set(
+            RegistroCandado.objects
+            .filter(carga_id=carga_anterior_id, movimiento=RegistroCandado.COLOCADO)
+            .values_list('numero', flat=True)
+        )
+        if numeros_nuevos_anterior and numero_retirado not in numeros_nuevos_anterior:
+            AlertaCombustible.objects.get_or_create(
+                carga=carga,
+                tipo_alerta='CANDADO_NO_COINCIDE',
+                defaults={
+                    'mensaje': (
+                        f"Unidad {carga.unidad.numero_economico}: el candado retirado "
+                        f"({numero_retirado}) no coincide con los candados colocados "
+                        f"en la carga anterior "
+                        f"({', '.join(sorted(numeros_nuevos_anterior))}). "
+                        f"Carga anterior folio #{carga_anterior_id} del "
+                        f"{a_fecha(fecha_anterior).strftime('%d/%m/%Y')}."
+                    )
+                }
+            )
+            logger.warning(
+                "Ciclo de candado no coincide — unidad %s: retirado=%s anterior=%s",
+                carga.unidad.numero_economico,
+                numero_retirado,
+                numeros_nuevos_anterior,
+            )
+
+    # Reuso: historia de los números de la carga (incluidos sus propios renglones) en una búsqueda por número
+    historia = (
+        RegistroCandado.objects
+        .filter(numero__in=carga.registros_candado.values('numero'))
+        .filter(Q(carga_id=carga.pk) | Q(fecha__lt=carga.fecha_hora_inicio))
+        .order_by('-fecha')
+        .values_list('numero', 'movimiento', 'unidad_id', 'unidad__numero_economico', 'carga_id', 'fecha')
     )
-    if not carga_anterior:
-        return
+    colocados, ultimo = set(), {}
+    for numero, movimiento, unidad_id, unidad, carga_id, fecha in historia:
+        if carga_id == carga.pk:
+            if movimiento == RegistroCandado.COLOCADO:
+                colocados.add(numero)
+        else:
+            ultimo.setdefault(numero, (movimiento, unidad_id, unidad, carga_id, fecha))
 
-    # Números de candados nuevos colocados en la carga anterior
-    numeros_nuevos_anterior = {
-        foto.numero_candado
-        for foto in carga_anterior.fotos_candado_nuevo.all()
-        if foto.numero_candado
-    }
-    if not numeros_nuevos_anterior:
-        return
+    hallazgos = []
+    for numero in sorted(ultimo):
+        movimiento, unidad_id, unidad, carga_id, fecha = ultimo[numero]
+        donde = f"en la unidad {unidad} (carga folio #{carga_id} del {a_fecha(fecha).strftime('%d/%m/%Y')})"
+        if numero in colocados:
+            accion = 'colocado' if movimiento == RegistroCandado.COLOCADO else 'retirado'
+            hallazgos.append(f"el candado nuevo {numero} ya se había {accion} {donde}")
+        elif movimiento == RegistroCandado.RETIRADO:
+            hallazgos.append(f"el candado retirado {numero} ya se había retirado {donde}")
+        elif unidad_id != carga.unidad_id:
+            hallazgos.append(f"el candado retirado {numero} se colocó {donde}")
 
-    # Comparar
-    numero_retirado = carga.numero_candado_anterior
-    if numero_retirado not in numeros_nuevos_anterior:
+    if hallazgos:
         AlertaCombustible.objects.get_or_create(
             carga=carga,
-            tipo_alerta='CANDADO_NO_COINCIDE',
+            tipo_alerta='CANDADO_REUTILIZADO',
             defaults={
                 'mensaje': (
-                    f"Unidad {carga.unidad.numero_economico}: el candado retirado "
-                    f"({numero_retirado}) no coincide con los candados colocados "
-                    f"en la carga anterior "
-                    f"({', '.join(sorted(numeros_nuevos_anterior))}). "
-                    f"Carga anterior folio #{carga_anterior.pk} del "
-                    f"{carga_anterior.fecha_hora_inicio.strftime('%d/%m/%Y')}."
+                    f"Unidad {carga.unidad.numero_economico}: {'; '.join(hallazgos)}. "
+                    f"Un número de candado no debe aparecer en más de un ciclo."
                 )
             }
         )
         logger.warning(
-            "Ciclo de candado no coincide — unidad %s: retirado=%s anterior=%s",
+            "Candado reutilizado — unidad %s: %s",
             carga.unidad.numero_economico,
-            numero_retirado,
-            numeros_nuevos_anterior,
+            hallazgos,
         )
@@ -1,8 +1,13 @@
 import logging
 
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
+from modulos.bitacoras.models import BitacoraViaje
+
+from . import candados, cruce
+from .hechos import clave_carga, recalcular_celda
 from .models import CargaCombustible, AlertaCombustible, FotoCandadoNuevo
 
 logger = logging.getLogger(__name__)
@@ -41,6 +46,99 @@ def procesar_ocr_foto_candado_nuevo(sender, instance, created, **kwargs):
     _procesar_ocr_foto_nueva(instance)
 
 
+@receiver(post_save, sender=CargaCombustible)
+def indexar_candados_carga(sender, instance, created, raw=False, **kwargs):
+    """
+    Mantiene RegistroCandado y verifica el ciclo de candados de la carga.
+    Va después de generar_alertas_combustible para ver el OCR del candado anterior.
+    """
+    if raw or instance.tipo_flujo == 'LOCAL' or (created and instance.estado != 'COMPLETADO'):
+        return
+    _indexar_candados(instance)
+
+
+# ---------------------------------------------------------------------------
+# Tabla de hechos diaria (FactCombustibleDiario)
+# ---------------------------------------------------------------------------
+
+_CAMPOS_CELDA = ('fecha_hora_inicio', 'unidad_id', 'despachador_id', 'tipo_flujo')
+
+
+@receiver(pre_save, sender=CargaCombustible)
+def recordar_celda_hecho(sender, instance, raw=False, **kwargs):
+    """Guarda la celda previa de la carga: si cambia de día/unidad/despachador, hay que recalcular ambas."""
+    if raw or not instance.pk:
+        return
+    anterior = CargaCombustible.objects.filter(pk=instance.pk).values_list(*_CAMPOS_CELDA).first()
+    instance._celda_hecho_anterior = clave_carga(*anterior) if anterior else None
+
+
+@receiver(post_save, sender=CargaCombustible)
+def actualizar_hecho_carga(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _recalcular_hecho(
+        clave_carga(*(getattr(instance, campo) for campo in _CAMPOS_CELDA)),
+        getattr(instance, '_celda_hecho_anterior', None),
+    )
+
+
+@receiver(post_delete, sender=CargaCombustible)
+def quitar_hecho_carga(sender, instance, **kwargs):
+    _recalcular_hecho(clave_carga(*(getattr(instance, campo) for campo in _CAMPOS_CELDA)))
+
+
+@receiver(post_save, sender=AlertaCombustible)
+@receiver(post_delete, sender=AlertaCombustible)
+def actualizar_hecho_alerta(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    carga = CargaCombustible.objects.filter(pk=instance.carga_id).values_list(*_CAMPOS_CELDA).first()
+    if carga:
+        _recalcular_hecho(clave_carga(*carga))
+
+
+def _recalcular_hecho(*claves):
+    try:
+        # Savepoint propio: un error aquí no deja rota la transacción de quien guarda la carga
+        with transaction.atomic():
+            for clave in {c for c in claves if c}:
+                recalcular_celda(*clave)
+    except Exception:
+        # La tabla de hechos nunca debe romper el registro de la carga; se repara con el rebuild
+        logger.exception("No se pudo actualizar FactCombustibleDiario para %s", claves)
+
+
+# ---------------------------------------------------------------------------
+# Cruce diésel vs distancia (modulos.combustible.cruce)
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=CargaCombustible)
+def cruzar_carga_con_viajes(sender, instance, raw=False, **kwargs):
+    if raw or instance.estado != 'COMPLETADO':
+        return
+    _cruzar_al_confirmar(instance.unidad_id, instance.fecha_hora_inicio)
+
+
+@receiver(post_save, sender=BitacoraViaje)
+def cruzar_viaje_con_cargas(sender, instance, raw=False, **kwargs):
+    if raw or not instance.completado:
+        return
+    _cruzar_al_confirmar(instance.unidad_id, instance.fecha_salida)
+
+
+def _cruzar_al_confirmar(unidad_id, desde):
+    """Revisa los intervalos de la unidad que cierran desde `desde`, al confirmar la transacción."""
+    def revisar():
+        try:
+            cruce.revisar([unidad_id], desde)
+        except Exception:
+            # El cruce nunca debe romper el registro de origen; se repara con el comando
+            logger.exception("No se pudo cruzar diésel vs distancia de la unidad %s", unidad_id)
+
+    transaction.on_commit(revisar)
+
+
 # ---------------------------------------------------------------------------
 # Funciones privadas de verificación
 # ---------------------------------------------------------------------------
@@ -123,9 +221,8 @@ def _verificar_kilometraje_menor(carga):
 # ---------------------------------------------------------------------------
 
 def _procesar_ocr_candado_anterior(carga):
-    """Lee el número del candado anterior por OCR y verifica el ciclo."""
+    """Lee el número del candado anterior por OCR (indexar_candados_carga verifica el ciclo)."""
     from config.services.ocr_service import leer_numero_candado
-    from .services import verificar_ciclo_candados
 
     numero = leer_numero_candado(carga.foto_candado_anterior)
     CargaCombustible.objects.filter(pk=carga.pk).update(
@@ -140,8 +237,6 @@ def _procesar_ocr_candado_anterior(carga):
         carga.pk, carga.unidad.numero_economico, numero or '(no detectado)',
     )
 
-    verificar_ciclo_candados(carga)
-
 
 def _procesar_ocr_foto_nueva(foto):
     """Lee el número del candado nuevo por OCR."""
@@ -156,6 +251,17 @@ def _procesar_ocr_foto_nueva(foto):
         "OCR candado nuevo — carga #%s '%s': '%s'",
         foto.carga_id, foto.descripcion or foto.pk, numero or '(no detectado)',
     )
+    # La carga puede completarse antes o después de la foto
+    if numero and foto.carga.estado == 'COMPLETADO':
+        _indexar_candados(foto.carga)
+
+
+def _indexar_candados(carga):
+    """Reescribe los renglones de la carga en RegistroCandado y verifica ciclo y reuso."""
+    from .services import verificar_ciclo_candados
+
+    candados.registrar(carga)
+    verificar_ciclo_candados(carga)
 
 
 # ---------------------------------------------------------------------------
@@ -1,13 +1,18 @@
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.utils import timezone
 
 from modulos.finanzas.models import RecepcionPipa
 from modulos.unidades.models import Unidad
 
-from .models import Despachador, CargaCombustible
+from . import cruce
+from .models import AlertaCombustible, Despachador, CargaCombustible, FactCombustibleDiario
+from .views import contexto_ia_dashboard
 
 
 def _crear_unidad(numero_economico='ECO-001'):
@@ -29,8 +34,23 @@ def _aware(y, m, d, h=8):
     return timezone.make_aware(datetime(y, m, d, h))
 
 
+class _SinAnalizadorIAMixin:
+    """Caché limpia y sin el analizador de anomalías de las señales: solo cuentan las alertas que crea la prueba."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        parche = patch('modulos.combustible.signals._analizar_anomalias_ia')
+        parche.start()
+        self.addCleanup(parche.stop)
+
+
 class CostoCalculadoTests(TestCase):
     def setUp(self):
+        # Los precios se consultan en la línea de tiempo cacheada (finanzas.precios)
+        cache.clear()
+        self.addCleanup(cache.clear)
         self.unidad = _crear_unidad()
         self.despachador = _crear_despachador()
 
@@ -78,3 +98,329 @@ class CostoCalculadoTests(TestCase):
         carga.save()
 
         self.assertIsNone(carga.costo_calculado)
+
+
+@override_settings(IA_HABILITADA=False)
+class FactCombustibleDiarioTests(TestCase):
+    def setUp(self):
+        self.unidad = _crear_unidad()
+        self.despachador = _crear_despachador()
+
+    def _completar(self, **overrides):
+        datos = dict(
+            despachador=self.despachador, unidad=self.unidad, cantidad_litros=Decimal('100.00'),
+            kilometraje_actual=1000, nivel_combustible_inicial='MEDIO', estado_candado_anterior='NORMAL',
+            fecha_hora_inicio=_aware(2026, 6, 1), tipo_flujo='LOCAL', estado='COMPLETADO',
+        )
+        datos.update(overrides)
+        return CargaCombustible.objects.create(**datos)
+
+    def _hecho(self, **filtro):
+        return FactCombustibleDiario.objects.get(**filtro)
+
+    def test_carga_completada_se_acumula_en_su_dia_local(self):
+        self._completar(fecha_hora_inicio=_aware(2026, 6, 1, 23), tiempo_carga_minutos=None)
+        self._completar(cantidad_litros=Decimal('60.00'), estado_candado_anterior='VIOLADO', tipo_flujo='FORANEO')
+        self._completar(cantidad_litros=Decimal('40.00'), estado='CANCELADO')
+
+        local = self._hecho(tipo_flujo='LOCAL')
+        self.assertEqual(local.fecha, date(2026, 6, 1))
+        self.assertEqual((local.cargas, local.litros, local.cargas_canceladas), (1, Decimal('100.00'), 1))
+        foraneo = self._hecho(tipo_flujo='FORANEO')
+        self.assertEqual((foraneo.cargas, foraneo.cargas_candado_anomalo), (1, 1))
+        self.assertEqual(foraneo.alertas, 1)  # CANDADO_VIOLADO
+
+    def test_guardar_varias_veces_no_duplica(self):
+        carga = self._completar()
+        carga.notas = 'revisada'
+        carga.save()
+        carga.save()
+
+        self.assertEqual(self._hecho().cargas, 1)
+
+    def test_cambiar_de_dia_recalcula_ambas_celdas(self):
+        carga = self._completar()
+        carga.fecha_hora_inicio = _aware(2026, 6, 2)
+        carga.save()
+
+        self.assertEqual(list(FactCombustibleDiario.objects.values_list('fecha', 'cargas')), [(date(2026, 6, 2), 1)])
+
+        carga.delete()
+        self.assertFalse(FactCombustibleDiario.objects.exists())
+
+    def test_resolver_alerta_actualiza_pendientes(self):
+        carga = self._completar(estado_candado_anterior='ALTERADO', tipo_flujo='FORANEO')
+        self.assertEqual(self._hecho().alertas_pendientes, 1)
+
+        carga.alertas.get().resolver(usuario=None)
+
+        hecho = self._hecho()
+        self.assertEqual((hecho.alertas, hecho.alertas_pendientes), (1, 0))
+
+    def test_error_en_la_tabla_de_hechos_no_rompe_el_guardado(self):
+        from django.db import DatabaseError, transaction
+
+        with patch('modulos.combustible.signals.recalcular_celda', side_effect=DatabaseError('x')), \
+                self.assertLogs('modulos.combustible.signals', 'ERROR'):
+            with transaction.atomic():
+                carga = self._completar()
+                carga.observaciones_candado = 'Revisada'
+                carga.save()
+
+        self.assertTrue(CargaCombustible.objects.filter(pk=carga.pk, observaciones_candado='Revisada').exists())
+
+    def test_reconstruir_equivale_al_mantenimiento_incremental(self):
+        from django.core.management import call_command
+
+        self._completar(estado_candado_anterior='SIN_CANDADO', tipo_flujo='FORANEO')
+        self._completar(fecha_hora_inicio=_aware(2026, 6, 3), cantidad_litros=Decimal('80.00'))
+        campos = ['fecha', 'unidad_id', 'despachador_id', 'tipo_flujo', 'cargas', 'litros', 'alertas',
+                  'alertas_pendientes', 'cargas_candado_anomalo']
+        incremental = list(FactCombustibleDiario.objects.order_by('fecha').values(*campos))
+
+        FactCombustibleDiario.objects.update(cargas=0, litros=0)
+        call_command('reconstruir_hechos_combustible', stdout=StringIO())
+
+        self.assertEqual(list(FactCombustibleDiario.objects.order_by('fecha').values(*campos)), incremental)
+
+    def test_estadisticas_del_admin_leen_de_la_tabla_de_hechos(self):
+        from django.contrib.auth.models import User
+        from django.urls import reverse
+
+        self._completar(fecha_hora_inicio=timezone.now())
+        self._completar(fecha_hora_inicio=timezone.now(), cantidad_litros=Decimal('50.00'))
+        self.client.force_login(User.objects.create_superuser('admin', 'a@kasu.mx', 'x'))
+
+        respuesta = self.client.get(reverse('admin:combustible_cargacombustible_estadisticas'))
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['totales']['total_cargas'], 2)
+        self.assertEqual(respuesta.context['totales']['total_litros'], 150.0)
+        self.assertEqual(respuesta.context['top_unidades'][0]['promedio_litros'], 75.0)
+
+    def test_dashboard_cuenta_candados_anomalos_de_cargas_en_cualquier_estado(self):
+        from django.contrib.auth.models import User
+        from django.urls import reverse
+
+        self._completar(fecha_hora_inicio=timezone.now(), estado_candado_anterior='ALTERADO')
+        self._completar(fecha_hora_inicio=timezone.now(), estado_candado_anterior='VIOLADO', estado='EN_PROCESO')
+        self._completar(fecha_hora_inicio=timezone.now())
+        self.client.force_login(User.objects.create_superuser('admin', 'a@kasu.mx', 'x'))
+
+        respuesta = self.client.get(reverse('combustible:dashboard'))
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['alertas_candado'], 2)
+
+
+@override_settings(IA_HABILITADA=False)
+class IADashboardCombustibleTests(_SinAnalizadorIAMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        despachador = _crear_despachador()
+        ahora = timezone.now()
+        for i, tipos in enumerate([['CONSUMO_ATIPICO', 'CONSUMO_ATIPICO', 'RENDIMIENTO_ANOMALO'],
+                                   ['TIEMPO_CARGA_ATIPICO'], ['NIVEL_INCONSISTENTE', 'CONSUMO_ATIPICO']]):
+            unidad = _crear_unidad(f'ECO-{i}')
+            for j, tipo in enumerate(tipos):
+                carga = CargaCombustible.objects.create(
+                    despachador=despachador, unidad=unidad, cantidad_litros=Decimal('100.00'),
+                    kilometraje_actual=1000 + j, nivel_combustible_inicial='MEDIO',
+                    estado_candado_anterior='NORMAL', fecha_hora_inicio=ahora - timedelta(days=j * 8),
+                    tipo_flujo='LOCAL', estado='COMPLETADO',
+                )
+                AlertaCombustible.objects.create(
+                    carga=carga, tipo_alerta=tipo, mensaje='-', generada_por_ia=True,
+                    score_riesgo='CRITICO' if i == 2 else 'ALTO',
+                )
+
+    def test_numero_fijo_de_consultas(self):
+        with self.assertNumQueries(8):
+            contexto = contexto_ia_dashboard(timezone.localdate())
+
+        por_unidad = {u['carga__unidad__numero_economico']: u for u in contexto['unidades_riesgo']}
+        self.assertEqual(por_unidad['ECO-0']['tipo_frecuente'], 'Consumo atípico vs. historial')
+        self.assertEqual(por_unidad['ECO-0']['total_alertas'], 3)
+        self.assertEqual(contexto['unidades_riesgo'][0]['carga__unidad__numero_economico'], 'ECO-2')
+        self.assertEqual(contexto['cargas_90d'], 6)
+        self.assertEqual(contexto['total_alertas_ia'], 6)
+
+    def test_contexto_se_cachea_por_dia(self):
+        from django.contrib.auth.models import User
+        from django.urls import reverse
+
+        self.client.force_login(User.objects.create_superuser('admin', 'a@kasu.mx', 'x'))
+        url = reverse('combustible:ia_dashboard')
+
+        with patch('modulos.combustible.views.contexto_ia_dashboard', wraps=contexto_ia_dashboard) as calcular:
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.assertEqual(calcular.call_count, 1)
+
+
+@override_settings(IA_HABILITADA=False)
+class CruceDieselDistanciaTests(_SinAnalizadorIAMixin, TestCase):
+    """Unidad a 3 km/L; cargas del 1, 3 y 5 de junio a las 8:00."""
+
+    def setUp(self):
+        from modulos.operadores.models import Operador
+
+        super().setUp()
+        self.unidad = _crear_unidad()
+        self.despachador = _crear_despachador()
+        self.operador = Operador.objects.create(nombre='Luis Ramos', tipo='FORANEO')
+
+    def _viaje(self, salida, llegada, km):
+        from modulos.bitacoras.models import BitacoraViaje
+
+        with self.captureOnCommitCallbacks(execute=True):
+            return BitacoraViaje.objects.create(
+                operador=self.operador, unidad=self.unidad, modalidad='SENCILLO',
+                fecha_carga=salida, fecha_salida=salida, fecha_llegada=llegada,
+                distancia_calculada=Decimal(km), destino='Manzanillo', completado=True,
+            )
+
+    def _carga(self, inicio, litros):
+        with self.captureOnCommitCallbacks(execute=True):
+            return CargaCombustible.objects.create(
+                despachador=self.despachador, unidad=self.unidad, cantidad_litros=Decimal(litros),
+                kilometraje_actual=1000, nivel_combustible_inicial='LLENO', estado_candado_anterior='NORMAL',
+                fecha_hora_inicio=inicio, tipo_flujo='FORANEO', estado='COMPLETADO',
+            )
+
+    def _alertas(self):
+        return AlertaCombustible.objects.filter(tipo_alerta='DIESEL_VS_DISTANCIA')
+
+    def test_reparte_viaje_entre_intervalos_y_alerta_el_exceso(self):
+        self._carga(_aware(2026, 6, 1), '150.00')
+        self._viaje(_aware(2026, 6, 1, 10), _aware(2026, 6, 2, 10), '300')
+        # 36 h de viaje, 12 h antes de la carga del día 3: 200 km al primer intervalo, 400 al segundo
+        self._viaje(_aware(2026, 6, 2, 20), _aware(2026, 6, 4, 8), '600')
+        exceso = self._carga(_aware(2026, 6, 3), '300.00')    # 500 km → 166.67 L esperados
+        normal = self._carga(_aware(2026, 6, 5), '140.00')    # 400 km → 133.33 L esperados
+
+        alerta = self._alertas().get()
+        self.assertEqual(alerta.carga, exceso)
+        self.assertEqual(alerta.score_riesgo, 'ALTO')
+        self.assertEqual(alerta.datos_estadisticos['km'], 500.0)
+        self.assertEqual(alerta.datos_estadisticos['litros_esperados'], 166.67)
+        self.assertFalse(normal.alertas.filter(tipo_alerta='DIESEL_VS_DISTANCIA').exists())
+
+        # Toda la flota: unidades, bitácoras, cargas y alertas existentes, sin consultas por viaje
+        with self.assertNumQueries(4):
+            resumen = cruce.revisar()
+        self.assertEqual(resumen, {'evaluados': 2, 'creadas': 0, 'actualizadas': 0, 'borradas': 0})
+
+        # Corregir los litros retira la alerta en la siguiente revisión
+        CargaCombustible.objects.filter(pk=exceso.pk).update(cantidad_litros=Decimal('170.00'))
+        self.assertEqual(cruce.revisar()['borradas'], 1)
+        self.assertFalse(self._alertas().exists())
+
+    def test_intervalo_con_viaje_abierto_no_se_evalua(self):
+        from django.core.management import call_command
+
+        self._carga(_aware(2026, 6, 1), '150.00')
+        viaje = self._viaje(_aware(2026, 6, 1, 10), _aware(2026, 6, 2, 10), '300')
+        viaje.fecha_llegada = None
+        viaje.save()
+        self._carga(_aware(2026, 6, 3), '300.00')
+        self.assertFalse(self._alertas().exists())
+
+        salida = StringIO()
+        call_command('cruzar_diesel_distancia', '--desde', '2026-06-01', stdout=salida)
+
+        self.assertIn('0 intervalo(s) evaluado(s)', salida.getvalue())
+        self.assertFalse(self._alertas().exists())
+
+
+@override_settings(IA_HABILITADA=False)
+class RegistroCandadoTests(_SinAnalizadorIAMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.unidad = _crear_unidad()
+        self.otra = _crear_unidad('ECO-002')
+        self.despachador = _crear_despachador()
+
+    def _carga(self, dia, retirado='', colocados=(), unidad=None):
+        """Flujo del wizard: la carga se crea, se suben las fotos ya leídas y al final se completa."""
+        from .models import FotoCandadoNuevo
+
+        carga = CargaCombustible.objects.create(
+            despachador=self.despachador, unidad=unidad or self.unidad, cantidad_litros=Decimal('100.00'),
+            kilometraje_actual=1000, nivel_combustible_inicial='MEDIO', estado_candado_anterior='NORMAL',
+            fecha_hora_inicio=_aware(2026, 6, dia), tipo_flujo='FORANEO', estado='EN_PROCESO',
+            numero_candado_anterior=retirado, ocr_candado_anterior_ok=True,
+        )
+        for numero in colocados:
+            FotoCandadoNuevo.objects.create(carga=carga, foto='candado.jpg', numero_candado=numero, ocr_procesado=True)
+        carga.estado = 'COMPLETADO'
+        carga.save()
+        return carga
+
+    def _tipos(self, carga):
+        return set(carga.alertas.values_list('tipo_alerta', flat=True))
+
+    def test_ciclo_de_la_unidad_se_verifica_contra_el_indice(self):
+        from .models import RegistroCandado
+
+        self._carga(1, colocados=['1111', '1112'])
+        correcta = self._carga(2, retirado='1112', colocados=['2222'])
+        incorrecta = self._carga(3, retirado='1111', colocados=['3333'])
+
+        self.assertEqual(
+            set(correcta.registros_candado.values_list('numero', 'movimiento')),
+            {('1112', RegistroCandado.RETIRADO), ('2222', RegistroCandado.COLOCADO)},
+        )
+        self.assertEqual(self._tipos(correcta), set())
+        # '1111' es de un ciclo anterior de la misma unidad: no coincide, pero no es reuso
+        self.assertEqual(self._tipos(incorrecta), {'CANDADO_NO_COINCIDE'})
+        self.assertIn('2222', incorrecta.alertas.get().mensaje)
+
+        # Ciclo (carga anterior y sus colocados) y reuso: consultas indexadas
+        from .services import verificar_ciclo_candados
+
+        with self.assertNumQueries(3):
+            verificar_ciclo_candados(correcta)
+
+    def test_carga_anterior_sin_colocados_no_verifica_el_ciclo(self):
+        self._carga(1, colocados=['1111'])
+        self._carga(2, retirado='1111', colocados=[])
+        siguiente = self._carga(3, retirado='2222', colocados=['3333'])
+
+        # La carga 2 no registró candados nuevos: no se compara contra la carga 1
+        self.assertNotIn('CANDADO_NO_COINCIDE', self._tipos(siguiente))
+
+    def test_detecta_reuso_en_otra_unidad_y_numero_ya_retirado(self):
+        self._carga(1, colocados=['1111'])
+        self._carga(2, retirado='1111', colocados=['2222'])
+
+        otra_unidad = self._carga(3, retirado='2222', unidad=self.otra)
+        repetido = self._carga(4, retirado='2222', colocados=['1111'])
+
+        self.assertIn('CANDADO_REUTILIZADO', self._tipos(otra_unidad))
+        self.assertIn('unidad ECO-001', otra_unidad.alertas.get(tipo_alerta='CANDADO_REUTILIZADO').mensaje)
+        mensaje = repetido.alertas.get(tipo_alerta='CANDADO_REUTILIZADO').mensaje
+        self.assertIn('el candado nuevo 1111 ya se había retirado', mensaje)
+        self.assertIn('el candado retirado 2222 ya se había retirado en la unidad ECO-002', mensaje)
+
+    def test_reconstruir_equivale_al_mantenimiento_incremental(self):
+        from django.core.management import call_command
+
+        from .models import RegistroCandado
+
+        self._carga(1, colocados=['1111'])
+        cancelada = self._carga(2, retirado='1111', colocados=['2222'])
+        cancelada.estado = 'CANCELADO'
+        cancelada.save()
+        self._carga(3, retirado='1111', colocados=['3333'], unidad=self.otra)
+        campos = ['numero', 'unidad_id', 'carga_id', 'movimiento', 'fecha']
+        incremental = list(RegistroCandado.objects.order_by('carga_id', 'movimiento', 'numero').values(*campos))
+        self.assertEqual(len(incremental), 3)
+
+        RegistroCandado.objects.all().delete()
+        call_command('reconstruir_indice_candados', stdout=StringIO())
+
+        self.assertEqual(
+            list(RegistroCandado.objects.order_by('carga_id', 'movimiento', 'numero').values(*campos)), incremental,
+        )
@@ -2,6 +2,8 @@ import json
 from collections import defaultdict
 from datetime import timedelta
 
+from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import ListView, DetailView, View
 from django.contrib import messages
@@ -9,11 +11,13 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy, reverse
 from django.utils import timezone
-from django.db.models import Sum, Count, Avg, Q
+from django.db.models import Sum, Count, Q
 from django.http import JsonResponse, Http404
 
+from modulos.notificaciones.models import NotificacionSaliente
 from modulos.unidades.models import Unidad
-from .models import CargaCombustible, Despachador, FotoCandadoNuevo, AlertaCombustible
+from .models import CargaCombustible, Despachador, FotoCandadoNuevo, AlertaCombustible, FactCombustibleDiario
+from .hechos import ESTADOS_CANDADO_ANOMALO
 from .forms import (
     Paso1Form, Paso2Form, Paso3Form, Paso4Form, Paso5Form, Paso6Form
 )
@@ -352,6 +356,7 @@ class CargaCombustibleDetailView(LoginRequiredMixin, DetailView):
         context['score_riesgo_ia'] = next(
             (a.score_riesgo for a in context['alertas_ia'] if a.score_riesgo), ''
         )
+        context['notificaciones'] = NotificacionSaliente.objects.de_objeto(self.object)
         return context
 
 
@@ -415,27 +420,28 @@ def dashboard_combustible(request):
     hoy = timezone.localdate()
     inicio_mes = hoy.replace(day=1)
 
-    cargas_mes = CargaCombustible.objects.filter(
-        fecha_hora_inicio__date__gte=inicio_mes
+    mes = FactCombustibleDiario.objects.filter(fecha__gte=inicio_mes).aggregate(
+        completadas=Sum('cargas'),
+        litros=Sum('litros'),
+        otras=Sum('cargas_iniciadas') + Sum('cargas_en_proceso') + Sum('cargas_canceladas'),
     )
-    cargas_completadas_mes = cargas_mes.filter(estado='COMPLETADO')
+    mes = {k: v or 0 for k, v in mes.items()}
 
     alertas_ia_pendientes = AlertaCombustible.objects.filter(
         generada_por_ia=True, resuelta=False
     )
 
     context = {
-        'total_cargas_mes': cargas_mes.count(),
-        'cargas_completadas_mes': cargas_completadas_mes.count(),
+        'total_cargas_mes': mes['completadas'] + mes['otras'],
+        'cargas_completadas_mes': mes['completadas'],
         'cargas_en_proceso': CargaCombustible.objects.filter(
             estado__in=['INICIADO', 'EN_PROCESO']
         ).count(),
-        'total_litros_mes': cargas_completadas_mes.aggregate(
-            total=Sum('cantidad_litros')
-        )['total'] or 0,
+        'total_litros_mes': mes['litros'],
+        # Cargas en cualquier estado: la tabla de hechos solo cuenta el candado de las COMPLETADO
         'alertas_candado': CargaCombustible.objects.filter(
-            estado_candado_anterior__in=['ALTERADO', 'VIOLADO', 'SIN_CANDADO'],
-            fecha_hora_inicio__date__gte=inicio_mes
+            estado_candado_anterior__in=ESTADOS_CANDADO_ANOMALO,
+            fecha_hora_inicio__desde_dia=inicio_mes,
         ).count(),
         'ultimas_cargas': CargaCombustible.objects.select_related(
             'despachador', 'unidad'
@@ -456,30 +462,44 @@ def ia_dashboard_combustible(request):
     if not request.user.is_superuser:
         raise Http404
 
+    # Número fijo de consultas (ver contexto_ia_dashboard); el resultado se
+    # comparte entre superusuarios durante unos minutos, con clave por día.
     hoy = timezone.localdate()
+    context = cache.get_or_set(
+        f'combustible:ia_dashboard:{hoy.isoformat()}',
+        lambda: contexto_ia_dashboard(hoy),
+        getattr(settings, 'COMBUSTIBLE_IA_DASHBOARD_CACHE_SEGUNDOS', 300),
+    )
+    return render(request, 'combustible/ia_dashboard.html', context)
+
+
+def contexto_ia_dashboard(hoy) -> dict:
+    """
+    Contexto del dashboard IAKasu en 8 consultas: KPIs, cargas 90 días,
+    una por gráfica, unidades en riesgo y despachadores.
+    """
     hace_30 = hoy - timedelta(days=29)
     hace_90 = hoy - timedelta(days=89)
 
     alertas_ia = AlertaCombustible.objects.filter(generada_por_ia=True)
+    alertas_ia_90d = alertas_ia.filter(fecha_generacion__desde_dia=hace_90)
+    tipo_labels_map = dict(AlertaCombustible.TIPO_CHOICES)
 
     # ------------------------------------------------------------------
     # KPIs globales
     # ------------------------------------------------------------------
-    total_alertas_ia = alertas_ia.count()
-    alertas_pendientes = alertas_ia.filter(resuelta=False).count()
-    alertas_criticas   = alertas_ia.filter(resuelta=False, score_riesgo='CRITICO').count()
-    alertas_altas      = alertas_ia.filter(resuelta=False, score_riesgo='ALTO').count()
-
-    cargas_90d = CargaCombustible.objects.filter(
-        estado='COMPLETADO',
-        fecha_hora_inicio__date__gte=hace_90,
-    ).count()
-    cargas_con_anomalia_90d = (
-        CargaCombustible.objects
-        .filter(estado='COMPLETADO', fecha_hora_inicio__date__gte=hace_90,
-                alertas__generada_por_ia=True)
-        .distinct().count()
+    kpis = alertas_ia.aggregate(
+        total=Count('id'),
+        pendientes=Count('id', filter=Q(resuelta=False)),
+        criticas=Count('id', filter=Q(resuelta=False, score_riesgo='CRITICO')),
+        altas=Count('id', filter=Q(resuelta=False, score_riesgo='ALTO')),
     )
+
+    hechos_90d = FactCombustibleDiario.objects.filter(fecha__gte=hace_90).aggregate(
+        cargas=Sum('cargas'), con_anomalia=Sum('cargas_con_alerta_ia'),
+    )
+    cargas_90d = hechos_90d['cargas'] or 0
+    cargas_con_anomalia_90d = hechos_90d['con_anomalia'] or 0
     pct_cargas_con_anomalia = (
         round(cargas_con_anomalia_90d / cargas_90d * 100, 1) if cargas_90d else 0
     )
@@ -489,14 +509,13 @@ def ia_dashboard_combustible(request):
     # ------------------------------------------------------------------
     alertas_30d = (
         alertas_ia
-        .filter(fecha_generacion__date__gte=hace_30)
+        .filter(fecha_generacion__desde_dia=hace_30)
         .values('fecha_generacion__date', 'score_riesgo')
         .annotate(total=Count('id'))
         .order_by('fecha_generacion__date')
     )
 
     dias_labels = [(hace_30 + timedelta(days=i)).strftime('%d/%m') for i in range(30)]
-    dias_fechas = [(hace_30 + timedelta(days=i)) for i in range(30)]
 
     scores_series = {
         'CRITICO': defaultdict(int),
@@ -522,13 +541,11 @@ def ia_dashboard_combustible(request):
     # Gráfica 2 — Distribución por tipo de anomalía (dona)
     # ------------------------------------------------------------------
     tipos_dist = (
-        alertas_ia
-        .filter(fecha_generacion__date__gte=hace_90)
+        alertas_ia_90d
         .values('tipo_alerta')
         .annotate(total=Count('id'))
         .order_by('-total')
     )
-    tipo_labels_map = dict(AlertaCombustible.TIPO_CHOICES)
     chart_tipos = {
         'labels': [tipo_labels_map.get(r['tipo_alerta'], r['tipo_alerta']) for r in tipos_dist],
         'data':   [r['total'] for r in tipos_dist],
@@ -538,8 +555,7 @@ def ia_dashboard_combustible(request):
     # Gráfica 3 — Top 8 unidades con más alertas IA (barras)
     # ------------------------------------------------------------------
     top_unidades_qs = (
-        alertas_ia
-        .filter(fecha_generacion__date__gte=hace_90)
+        alertas_ia_90d
         .values('carga__unidad__numero_economico')
         .annotate(total=Count('id'))
         .order_by('-total')[:8]
@@ -552,60 +568,70 @@ def ia_dashboard_combustible(request):
     # ------------------------------------------------------------------
     # Gráfica 4 — Tendencia de consumo semanal (litros promedio, 12 semanas)
     # ------------------------------------------------------------------
-    semanas_labels = []
-    semanas_litros = []
-    for i in range(11, -1, -1):
-        inicio_sem = hoy - timedelta(days=hoy.weekday()) - timedelta(weeks=i)
-        fin_sem    = inicio_sem + timedelta(days=6)
-        avg = CargaCombustible.objects.filter(
-            estado='COMPLETADO',
-            fecha_hora_inicio__date__gte=inicio_sem,
-            fecha_hora_inicio__date__lte=fin_sem,
-        ).aggregate(avg=Avg('cantidad_litros'))['avg']
-        semanas_labels.append(inicio_sem.strftime('%d/%m'))
-        semanas_litros.append(round(float(avg), 1) if avg else 0)
-
+    lunes_actual = hoy - timedelta(days=hoy.weekday())
+    semanas = [lunes_actual - timedelta(weeks=i) for i in range(11, -1, -1)]
+    por_semana = defaultdict(lambda: [0, 0])
+    for fecha, cargas, litros in (
+        FactCombustibleDiario.objects
+        .filter(fecha__gte=semanas[0], fecha__lte=lunes_actual + timedelta(days=6), cargas__gt=0)
+        .values_list('fecha', 'cargas', 'litros')
+    ):
+        acumulado = por_semana[fecha - timedelta(days=fecha.weekday())]
+        acumulado[0] += cargas
+        acumulado[1] += float(litros)
     chart_consumo_semanal = {
-        'labels': semanas_labels,
-        'data':   semanas_litros,
+        'labels': [inicio_sem.strftime('%d/%m') for inicio_sem in semanas],
+        'data': [
+            round(por_semana[s][1] / por_semana[s][0], 1) if por_semana[s][0] else 0
+            for s in semanas
+        ],
     }
 
     # ------------------------------------------------------------------
     # Tabla — Unidades con anomalías recientes (90 días)
+    # Una sola consulta por (unidad, tipo): los totales y el tipo más
+    # frecuente de cada unidad se obtienen en Python.
     # ------------------------------------------------------------------
-    unidades_riesgo = (
-        alertas_ia
-        .filter(fecha_generacion__date__gte=hace_90, resuelta=False)
+    por_unidad_tipo = (
+        alertas_ia_90d
+        .filter(resuelta=False)
         .values(
             'carga__unidad__pk',
             'carga__unidad__numero_economico',
             'carga__unidad__tipo',
+            'tipo_alerta',
         )
         .annotate(
-            total_alertas=Count('id'),
+            total=Count('id'),
             criticas=Count('id', filter=Q(score_riesgo='CRITICO')),
             altas=Count('id', filter=Q(score_riesgo='ALTO')),
         )
-        .order_by('-criticas', '-altas', '-total_alertas')[:15]
+        .order_by('-total', 'tipo_alerta')
     )
-
-    # Tipo más frecuente por unidad
-    tipo_frecuente = {}
-    for row in unidades_riesgo:
+    unidades = {}
+    for row in por_unidad_tipo:
         pk = row['carga__unidad__pk']
-        tipo_top = (
-            alertas_ia
-            .filter(carga__unidad__pk=pk, fecha_generacion__date__gte=hace_90, resuelta=False)
-            .values('tipo_alerta')
-            .annotate(n=Count('id'))
-            .order_by('-n')
-            .first()
-        )
-        if tipo_top:
-            tipo_frecuente[pk] = tipo_labels_map.get(tipo_top['tipo_alerta'], tipo_top['tipo_alerta'])
-
+        if pk not in unidades:
+            # Primera fila de la unidad = su tipo más frecuente (orden por -total)
+            unidades[pk] = {
+                'carga__unidad__pk': pk,
+                'carga__unidad__numero_economico': row['carga__unidad__numero_economico'],
+                'carga__unidad__tipo': row['carga__unidad__tipo'],
+                'total_alertas': 0,
+                'criticas': 0,
+                'altas': 0,
+                'tipo_frecuente': tipo_labels_map.get(row['tipo_alerta'], row['tipo_alerta']),
+            }
+        unidad = unidades[pk]
+        unidad['total_alertas'] += row['total']
+        unidad['criticas'] += row['criticas']
+        unidad['altas'] += row['altas']
+
+    unidades_riesgo = sorted(
+        unidades.values(),
+        key=lambda u: (-u['criticas'], -u['altas'], -u['total_alertas']),
+    )[:15]
     for row in unidades_riesgo:
-        row['tipo_frecuente'] = tipo_frecuente.get(row['carga__unidad__pk'], '—')
         row['score_display'] = (
             'CRITICO' if row['criticas'] else
             'ALTO'    if row['altas']    else
@@ -616,20 +642,19 @@ def ia_dashboard_combustible(request):
     # Panel — Despachadores con mayor concentración de alertas IA
     # ------------------------------------------------------------------
     despachadores_alerta = (
-        alertas_ia
-        .filter(fecha_generacion__date__gte=hace_90)
+        alertas_ia_90d
         .values('carga__despachador__nombre')
         .annotate(total=Count('id'), criticas=Count('id', filter=Q(score_riesgo='CRITICO')))
         .filter(total__gte=2)
         .order_by('-criticas', '-total')[:5]
     )
 
-    context = {
+    return {
         # KPIs
-        'total_alertas_ia': total_alertas_ia,
-        'alertas_pendientes': alertas_pendientes,
-        'alertas_criticas': alertas_criticas,
-        'alertas_altas': alertas_altas,
+        'total_alertas_ia': kpis['total'],
+        'alertas_pendientes': kpis['pendientes'],
+        'alertas_criticas': kpis['criticas'],
+        'alertas_altas': kpis['altas'],
         'pct_cargas_con_anomalia': pct_cargas_con_anomalia,
         'cargas_90d': cargas_90d,
         # Gráficas (JSON para Chart.js)
@@ -641,7 +666,6 @@ def ia_dashboard_combustible(request):
         'hay_datos_tipos': bool(chart_tipos['data']),
         'hay_datos_top_unidades': bool(chart_top_unidades['data']),
         # Tablas
-        'unidades_riesgo': list(unidades_riesgo),
+        'unidades_riesgo': unidades_riesgo,
         'despachadores_alerta': list(despachadores_alerta),
     }
-    return render(request, 'combustible/ia_dashboard.html', context)
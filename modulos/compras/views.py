@@ -8,6 +8,8 @@ from django.contrib import messages
 from django.urls import reverse_lazy
 from datetime import timedelta
 
+from config.fechas import rango_dias
+
 from .models import (
     Proveedor, Producto, Requisicion, ItemRequisicion, 
     OrdenCompra, RecepcionAlmacen, Inventario
@@ -108,10 +110,7 @@ class RequisicionListView(LoginRequiredMixin, ListView):
         
         if estado:
             queryset = queryset.filter(estado=estado)
-        if fecha_desde:
-            queryset = queryset.filter(fecha_solicitud__date__gte=fecha_desde)
-        if fecha_hasta:
-            queryset = queryset.filter(fecha_solicitud__date__lte=fecha_hasta)
+        queryset = queryset.filter(rango_dias('fecha_solicitud', fecha_desde, fecha_hasta))
         
         return queryset.order_by('-fecha_solicitud')
 
@@ -138,10 +137,7 @@ class OrdenCompraListView(LoginRequiredMixin, ListView):
             queryset = queryset.filter(estado=estado)
         if proveedor:
             queryset = queryset.filter(proveedor_id=proveedor)
-        if fecha_desde:
-            queryset = queryset.filter(fecha_creacion__date__gte=fecha_desde)
-        if fecha_hasta:
-            queryset = queryset.filter(fecha_creacion__date__lte=fecha_hasta)
+        queryset = queryset.filter(rango_dias('fecha_creacion', fecha_desde, fecha_hasta))
         
         return queryset.order_by('-fecha_creacion')
 
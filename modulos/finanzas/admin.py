@@ -1,6 +1,8 @@
+import json
+
 from django.contrib import admin
 
-from .models import TarifaKilometro, RecepcionPipa, PrecioDieselMensual
+from .models import TarifaKilometro, RecepcionPipa, PrecioDieselMensual, SaldoTanqueDiario
 
 
 @admin.register(TarifaKilometro)
@@ -36,3 +38,51 @@ class PrecioDieselMensualAdmin(admin.ModelAdmin):
 
     def has_delete_permission(self, request, obj=None):
         return False
+
+
+@admin.register(SaldoTanqueDiario)
+class SaldoTanqueDiarioAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/finanzas/saldotanquediario/change_list.html'
+
+    list_display = [
+        'fecha', 'saldo_inicial', 'pipas', 'litros_recibidos', 'cargas', 'litros_despachados',
+        'saldo_final', 'litros_medidos', 'diferencia',
+    ]
+    date_hierarchy = 'fecha'
+    ordering = ['-fecha']
+    fields = [
+        'fecha', 'saldo_inicial', 'pipas', 'litros_recibidos', 'cargas', 'litros_despachados',
+        'saldo_final', 'litros_medidos', 'diferencia', 'actualizado_en',
+    ]
+    readonly_fields = [campo for campo in fields if campo != 'litros_medidos']
+
+    # Días de la gráfica (los más recientes dentro de los filtros aplicados)
+    DIAS_GRAFICA = 90
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        respuesta = super().changelist_view(request, extra_context)
+        try:
+            qs = respuesta.context_data['cl'].queryset
+        except (AttributeError, KeyError):
+            return respuesta
+        filas = list(reversed(qs.order_by('-fecha').values(
+            'fecha', 'litros_recibidos', 'litros_despachados', 'saldo_final', 'litros_medidos',
+        )[:self.DIAS_GRAFICA]))
+
+        def serie(campo):
+            return json.dumps([float(f[campo]) if f[campo] is not None else None for f in filas])
+
+        respuesta.context_data['grafica'] = {
+            'etiquetas': json.dumps([f['fecha'].strftime('%d/%m') for f in filas]),
+            'recibidos': serie('litros_recibidos'),
+            'despachados': serie('litros_despachados'),
+            'saldo': serie('saldo_final'),
+            'medidos': serie('litros_medidos'),
+        } if filas else None
+        return respuesta
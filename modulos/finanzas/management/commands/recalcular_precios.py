@@ -0,0 +1,59 @@
+"""
+Management command para recalcular ingreso_calculado de bitácoras y
+costo_calculado de cargas con la tarifa por km y el precio de diésel
+vigentes.
+
+Uso:
+    python manage.py recalcular_precios
+    python manage.py recalcular_precios --desde 2025-01-01
+    python manage.py recalcular_precios --desde 2025-01-01 --hasta 2025-06-30 --solo diesel
+
+Solo se escriben las filas cuyo valor cambia. Las señales de finanzas ya
+recalculan el tramo afectado al cambiar una tarifa o un precio mensual; el
+comando sirve para la carga inicial (cargas que quedaron sin precio porque
+la pipa del mes se registró tarde) y para cambios hechos con .update().
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from modulos.finanzas import precios
+
+
+def _fecha(valor):
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Formato de fecha inválido: '{valor}'. Use YYYY-MM-DD (ej: 2025-01-01)")
+
+
+class Command(BaseCommand):
+    help = "Recalcula ingresos de bitácoras y costos de cargas con los precios vigentes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=str, metavar='YYYY-MM-DD', help='Primer día a recalcular.')
+        parser.add_argument('--hasta', type=str, metavar='YYYY-MM-DD', help='Último día a recalcular.')
+        parser.add_argument(
+            '--solo', choices=[precios.TARIFA, precios.DIESEL],
+            help='Recalcular solo ingresos (tarifa) o solo costos (diesel).',
+        )
+
+    def handle(self, *args, **options):
+        desde, hasta = _fecha(options['desde']), _fecha(options['hasta'])
+        if desde and hasta and desde > hasta:
+            raise CommandError("--desde no puede ser posterior a --hasta.")
+
+        ingresos = costos = 0
+        if options['solo'] != precios.DIESEL:
+            precios.invalidar(precios.TARIFA)
+            ingresos = precios.recalcular_ingresos(desde, hasta)
+        if options['solo'] != precios.TARIFA:
+            precios.invalidar(precios.DIESEL)
+            costos = precios.recalcular_costos(desde, hasta)
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {ingresos} bitácora(s) y {costos} carga(s) actualizada(s) "
+            f"({desde or 'inicio'} → {hasta or 'hoy'})."
+        ))
@@ -0,0 +1,42 @@
+"""
+Management command para reconstruir SaldoTanqueDiario desde RecepcionPipa y
+CargaCombustible.
+
+Uso:
+    python manage.py reconstruir_saldo_tanque
+    python manage.py reconstruir_saldo_tanque --desde 2025-01-01
+
+Con --desde solo se reescriben los días a partir de esa fecha, tomando como
+saldo inicial el saldo final del día anterior. Las mediciones físicas
+(litros_medidos) se conservan. Las señales mantienen el libro al día; el
+rebuild es para la carga inicial y para cambios hechos con .update().
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from modulos.finanzas.tanque import recalcular
+
+
+def _fecha(valor):
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Formato de fecha inválido: '{valor}'. Use YYYY-MM-DD (ej: 2025-01-01)")
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el libro diario del tanque de diésel (pipas vs cargas)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=str, metavar='YYYY-MM-DD', help='Primer día a reescribir.')
+
+    def handle(self, *args, **options):
+        desde = _fecha(options['desde'])
+        dias = recalcular(desde)
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {dias} día(s) de SaldoTanqueDiario reconstruido(s) desde {desde or 'el primer movimiento'}."
+        ))
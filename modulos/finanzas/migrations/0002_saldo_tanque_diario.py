@@ -0,0 +1,80 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:53
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def llenar_saldos(apps, schema_editor):
+    """Libro completo desde el primer movimiento hasta hoy, como `reconstruir_saldo_tanque`."""
+    RecepcionPipa = apps.get_model('finanzas', 'RecepcionPipa')
+    CargaCombustible = apps.get_model('combustible', 'CargaCombustible')
+    SaldoTanqueDiario = apps.get_model('finanzas', 'SaldoTanqueDiario')
+
+    movimientos = {}
+
+    def dia(fecha):
+        return movimientos.setdefault(fecha, {
+            'pipas': 0, 'litros_recibidos': Decimal('0'), 'cargas': 0, 'litros_despachados': Decimal('0'),
+        })
+
+    for fila in RecepcionPipa.objects.values('fecha').annotate(n=Count('id'), litros=Sum('litros')).order_by():
+        dia(fila['fecha']).update(pipas=fila['n'], litros_recibidos=fila['litros'] or Decimal('0'))
+    filas = (
+        CargaCombustible.objects.filter(estado='COMPLETADO')
+        .annotate(fecha=TruncDate('fecha_hora_inicio')).values('fecha')
+        .annotate(n=Count('id'), litros=Sum('cantidad_litros')).order_by()
+    )
+    for fila in filas:
+        dia(fila['fecha']).update(cargas=fila['n'], litros_despachados=fila['litros'] or Decimal('0'))
+    if not movimientos:
+        return
+
+    saldo = Decimal(getattr(settings, 'TANQUE_SALDO_INICIAL_LITROS', 0))
+    vacio = {'pipas': 0, 'litros_recibidos': Decimal('0'), 'cargas': 0, 'litros_despachados': Decimal('0')}
+    fecha, hasta = min(movimientos), max([timezone.localdate(), *movimientos])
+    renglones = []
+    while fecha <= hasta:
+        movimiento = movimientos.get(fecha, vacio)
+        final = saldo + movimiento['litros_recibidos'] - movimiento['litros_despachados']
+        renglones.append(SaldoTanqueDiario(fecha=fecha, saldo_inicial=saldo, saldo_final=final, **movimiento))
+        saldo, fecha = final, fecha + timedelta(days=1)
+    SaldoTanqueDiario.objects.bulk_create(renglones, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('combustible', '0001_initial'),
+        ('finanzas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoTanqueDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True, verbose_name='Fecha')),
+                ('saldo_inicial', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Saldo inicial (L)')),
+                ('pipas', models.PositiveIntegerField(default=0, verbose_name='Pipas recibidas')),
+                ('litros_recibidos', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Litros recibidos')),
+                ('cargas', models.PositiveIntegerField(default=0, verbose_name='Cargas despachadas')),
+                ('litros_despachados', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Litros despachados')),
+                ('saldo_final', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Saldo final (L)')),
+                ('litros_medidos', models.DecimalField(blank=True, decimal_places=2, help_text='Medición física del tanque al cierre del día', max_digits=12, null=True, verbose_name='Litros medidos')),
+                ('diferencia', models.DecimalField(blank=True, decimal_places=2, help_text='Litros medidos − saldo final (negativo = faltante)', max_digits=12, null=True, verbose_name='Diferencia (L)')),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Saldo Diario del Tanque',
+                'verbose_name_plural': 'Saldos Diarios del Tanque',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.RunPython(llenar_saldos, migrations.RunPython.noop),
+    ]
@@ -116,3 +116,51 @@ class PrecioDieselMensual(models.Model):
                 'precio_promedio_litro': precio_promedio,
             },
         )
+
+
+class SaldoTanqueDiario(models.Model):
+    """
+    Libro diario del tanque de diésel: pipas recibidas (RecepcionPipa) contra
+    litros despachados (CargaCombustible COMPLETADO, por día local de
+    fecha_hora_inicio). Lo mantiene modulos.finanzas.tanque; solo
+    `litros_medidos` se captura a mano.
+
+    El saldo en libros nunca se ajusta con la medición: `diferencia` acumula
+    la merma (o el sobrante) desde el inicio del libro, y su cambio entre dos
+    mediciones es la merma de ese periodo.
+    """
+
+    fecha = models.DateField(unique=True, verbose_name="Fecha")
+    saldo_inicial = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Saldo inicial (L)")
+    pipas = models.PositiveIntegerField(default=0, verbose_name="Pipas recibidas")
+    litros_recibidos = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Litros recibidos")
+    cargas = models.PositiveIntegerField(default=0, verbose_name="Cargas despachadas")
+    litros_despachados = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, verbose_name="Litros despachados"
+    )
+    saldo_final = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Saldo final (L)")
+    litros_medidos = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True,
+        help_text="Medición física del tanque al cierre del día",
+        verbose_name="Litros medidos",
+    )
+    diferencia = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True,
+        help_text="Litros medidos − saldo final (negativo = faltante)",
+        verbose_name="Diferencia (L)",
+    )
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Saldo Diario del Tanque"
+        verbose_name_plural = "Saldos Diarios del Tanque"
+        ordering = ['-fecha']
+
+    def __str__(self):
+        return f"Tanque {self.fecha}: {self.saldo_final} L"
+
+    def save(self, *args, **kwargs):
+        self.diferencia = (
+            self.litros_medidos - Decimal(self.saldo_final) if self.litros_medidos is not None else None
+        )
+        super().save(*args, **kwargs)
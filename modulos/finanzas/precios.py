@@ -0,0 +1,185 @@
+"""
+Líneas de tiempo de precios: tarifa por kilómetro y precio mensual de diésel.
+
+Las dos fuentes son escalones (un valor vigente desde una fecha hasta el
+siguiente), así que se cargan una sola vez como listas ordenadas y cada
+consulta es un bisect, sin ir a la BD por bitácora o carga guardada:
+
+    precios.tarifa_en(fecha)   # $/km de la TarifaKilometro activa vigente, o None
+    precios.diesel_en(fecha)   # $/L del PrecioDieselMensual vigente (el último mes con pipas), o None
+
+Las fechas se toman en día local. Las listas viven en la caché de Django
+(PRECIOS_CACHE_SEGUNDOS) y las señales de finanzas las invalidan al guardar o
+borrar una TarifaKilometro o un PrecioDieselMensual.
+
+Recálculo retroactivo: al cambiar un escalón, `tramo_afectado()` da el rango
+de días cuyo precio pudo cambiar (desde el escalón hasta el siguiente) y
+`recalcular_ingresos()` / `recalcular_costos()` reescriben con bulk_update
+solo las bitácoras completadas / cargas COMPLETADO de ese rango cuyo valor
+cambia. Como bulk_update no dispara señales, después recalculan las celdas
+de KPIs mensuales y de FactCombustibleDiario que tocaron.
+"""
+
+import logging
+from bisect import bisect_right
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from config.fechas import a_fecha, rango_dias
+
+from .models import PrecioDieselMensual, TarifaKilometro
+
+logger = logging.getLogger(__name__)
+
+TARIFA = 'tarifa'
+DIESEL = 'diesel'
+
+_CENTAVO = Decimal('0.01')
+
+
+class Escalones:
+    """Valores vigentes desde cada fecha, ordenados: [(vigente_desde, valor), ...]."""
+
+    def __init__(self, escalones):
+        self.fechas = [fecha for fecha, _ in escalones]
+        self.valores = [valor for _, valor in escalones]
+
+    def vigente_en(self, fecha):
+        if fecha is None:
+            return None
+        i = bisect_right(self.fechas, fecha) - 1
+        return self.valores[i] if i >= 0 else None
+
+    def siguiente(self, fecha):
+        """Primer escalón posterior a `fecha` (None si no hay)."""
+        i = bisect_right(self.fechas, fecha)
+        return self.fechas[i] if i < len(self.fechas) else None
+
+
+def _cargar_tarifas():
+    filas = TarifaKilometro.objects.filter(activo=True).order_by('vigente_desde', 'pk')
+    return Escalones(list(filas.values_list('vigente_desde', 'valor')))
+
+
+def _cargar_diesel():
+    filas = PrecioDieselMensual.objects.order_by('anio', 'mes').values_list('anio', 'mes', 'precio_promedio_litro')
+    return Escalones([(date(anio, mes, 1), precio) for anio, mes, precio in filas])
+
+
+_FUENTES = {TARIFA: _cargar_tarifas, DIESEL: _cargar_diesel}
+
+
+def linea(fuente) -> Escalones:
+    """Escalones cacheados de `fuente` (TARIFA o DIESEL)."""
+    clave = f'precios:{fuente}'
+    escalones = cache.get(clave)
+    if escalones is None:
+        escalones = _FUENTES[fuente]()
+        cache.set(clave, escalones, getattr(settings, 'PRECIOS_CACHE_SEGUNDOS', 3600))
+    return escalones
+
+
+def invalidar(fuente) -> None:
+    cache.delete(f'precios:{fuente}')
+
+
+def tarifa_en(fecha):
+    return linea(TARIFA).vigente_en(a_fecha(fecha))
+
+
+def diesel_en(fecha):
+    return linea(DIESEL).vigente_en(a_fecha(fecha))
+
+
+def tramo_afectado(fuente, *fechas):
+    """
+    (desde, hasta) de los días cuyo precio pudo cambiar al mover, editar o
+    borrar los escalones que empiezan en `fechas` (valores anteriores y
+    nuevos); hasta=None si llega al presente.
+    """
+    fechas = [f for f in fechas if f]
+    siguiente = linea(fuente).siguiente(max(fechas))
+    return min(fechas), siguiente - timedelta(days=1) if siguiente else None
+
+
+def ingreso(distancia, tarifa):
+    return (distancia * tarifa).quantize(_CENTAVO) if tarifa and distancia else None
+
+
+def costo(litros, precio):
+    return (litros * precio).quantize(_CENTAVO) if precio and litros is not None else None
+
+
+def recalcular_ingresos(desde=None, hasta=None) -> int:
+    """
+    Reescribe ingreso_calculado de las bitácoras completadas que llegaron en
+    [desde, hasta] (días locales; None = sin límite) y cuyo valor cambia con
+    la tarifa vigente. Retorna bitácoras actualizadas.
+    """
+    from modulos.bitacoras.models import BitacoraViaje
+    from modulos.reportes import kpis
+
+    tarifas = linea(TARIFA)
+    bitacoras = BitacoraViaje.objects.filter(
+        rango_dias('fecha_llegada', desde, hasta), completado=True, fecha_llegada__isnull=False,
+    ).only(
+        'operador_id', 'unidad_id', 'fecha_salida', 'fecha_llegada',
+        'distancia_calculada', 'distancia_calculada_2', 'ingreso_calculado',
+    )
+    cambiadas = []
+    for bitacora in bitacoras.iterator():
+        nuevo = ingreso(bitacora.distancia_efectiva, tarifas.vigente_en(a_fecha(bitacora.fecha_llegada)))
+        if nuevo != bitacora.ingreso_calculado:
+            bitacora.ingreso_calculado = nuevo
+            cambiadas.append(bitacora)
+
+    with transaction.atomic():
+        BitacoraViaje.objects.bulk_update(cambiadas, ['ingreso_calculado'], batch_size=500)
+        kpis.recalcular(
+            operadores={(b.operador_id, kpis.mes_de(b.fecha_salida)) for b in cambiadas},
+            unidades={(b.unidad_id, kpis.mes_de(b.fecha_salida)) for b in cambiadas},
+        )
+    if cambiadas:
+        logger.info("Ingresos recalculados: %d bitácora(s) (%s → %s)", len(cambiadas), desde, hasta)
+    return len(cambiadas)
+
+
+def recalcular_costos(desde=None, hasta=None) -> int:
+    """
+    Reescribe costo_calculado de las cargas COMPLETADO iniciadas en
+    [desde, hasta] (días locales; None = sin límite) cuyo valor cambia con el
+    precio de diésel vigente. Retorna cargas actualizadas.
+    """
+    from modulos.combustible import hechos
+    from modulos.combustible.models import CargaCombustible
+    from modulos.reportes import kpis
+
+    precios = linea(DIESEL)
+    cargas = CargaCombustible.objects.filter(
+        rango_dias('fecha_hora_inicio', desde, hasta), estado='COMPLETADO',
+    ).only(
+        'unidad_id', 'despachador_id', 'tipo_flujo', 'fecha_hora_inicio', 'cantidad_litros', 'costo_calculado',
+    )
+    cambiadas = []
+    for carga in cargas.iterator():
+        nuevo = costo(carga.cantidad_litros, precios.vigente_en(a_fecha(carga.fecha_hora_inicio)))
+        if nuevo != carga.costo_calculado:
+            carga.costo_calculado = nuevo
+            cambiadas.append(carga)
+
+    with transaction.atomic():
+        CargaCombustible.objects.bulk_update(cambiadas, ['costo_calculado'], batch_size=500)
+        celdas = {
+            hechos.clave_carga(c.fecha_hora_inicio, c.unidad_id, c.despachador_id, c.tipo_flujo)
+            for c in cambiadas
+        }
+        for celda in celdas:
+            hechos.recalcular_celda(*celda)
+        kpis.recalcular(unidades={(c.unidad_id, kpis.mes_de(c.fecha_hora_inicio)) for c in cambiadas})
+    if cambiadas:
+        logger.info("Costos de diésel recalculados: %d carga(s) (%s → %s)", len(cambiadas), desde, hasta)
+    return len(cambiadas)
@@ -1,7 +1,17 @@
+import logging
+from datetime import date
+
+from django.db import transaction
 from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 
-from .models import RecepcionPipa, PrecioDieselMensual
+from config.fechas import a_fecha
+from modulos.combustible.models import CargaCombustible
+
+from . import precios, tanque
+from .models import RecepcionPipa, PrecioDieselMensual, TarifaKilometro
+
+logger = logging.getLogger(__name__)
 
 
 @receiver(pre_save, sender=RecepcionPipa)
@@ -27,3 +37,100 @@ def recalcular_precio_mensual_al_guardar(sender, instance, **kwargs):
 @receiver(post_delete, sender=RecepcionPipa)
 def recalcular_precio_mensual_al_borrar(sender, instance, **kwargs):
     PrecioDieselMensual.recalcular(instance.fecha.year, instance.fecha.month)
+
+
+# ─── Recálculo retroactivo de ingresos y costos (modulos.finanzas.precios) ───
+
+def _recalcular_al_confirmar(fuente, *fechas):
+    """Invalida los escalones de `fuente` y recalcula su tramo afectado al confirmar."""
+    precios.invalidar(fuente)
+
+    def recalcular():
+        precios.invalidar(fuente)
+        try:
+            desde, hasta = precios.tramo_afectado(fuente, *fechas)
+            if fuente == precios.TARIFA:
+                precios.recalcular_ingresos(desde, hasta)
+            else:
+                precios.recalcular_costos(desde, hasta)
+        except Exception:
+            # El cambio de precio no debe fallar; el comando recalcular_precios lo repara
+            logger.exception("No se pudo recalcular %s desde %s", fuente, fechas)
+
+    transaction.on_commit(recalcular)
+
+
+@receiver(pre_save, sender=TarifaKilometro)
+def guardar_tarifa_anterior(sender, instance, **kwargs):
+    instance._vigente_desde_anterior = (
+        sender.objects.filter(pk=instance.pk).values_list('vigente_desde', flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=TarifaKilometro)
+@receiver(post_delete, sender=TarifaKilometro)
+def recalcular_ingresos_por_tarifa(sender, instance, **kwargs):
+    _recalcular_al_confirmar(
+        precios.TARIFA, instance.vigente_desde, getattr(instance, '_vigente_desde_anterior', None),
+    )
+
+
+@receiver(pre_save, sender=PrecioDieselMensual)
+def guardar_mes_anterior(sender, instance, **kwargs):
+    anterior = sender.objects.filter(pk=instance.pk).values_list('anio', 'mes').first() if instance.pk else None
+    instance._mes_anterior = date(*anterior, 1) if anterior else None
+
+
+@receiver(post_save, sender=PrecioDieselMensual)
+@receiver(post_delete, sender=PrecioDieselMensual)
+def recalcular_costos_por_precio(sender, instance, **kwargs):
+    _recalcular_al_confirmar(
+        precios.DIESEL, date(instance.anio, instance.mes, 1), getattr(instance, '_mes_anterior', None),
+    )
+
+
+# ─── Libro del tanque (modulos.finanzas.tanque) ──────────────────────────────
+
+def _recalcular_tanque_al_confirmar(*fechas):
+    """Recalcula SaldoTanqueDiario desde la fecha más antigua tocada, al confirmar."""
+    fechas = [a_fecha(f) for f in fechas if f]
+    if not fechas:
+        return
+    desde = min(fechas)
+
+    def recalcular():
+        try:
+            tanque.recalcular(desde)
+        except Exception:
+            # El libro nunca debe romper el registro de origen; se repara con el rebuild
+            logger.exception("No se pudo recalcular el saldo del tanque desde %s", desde)
+
+    transaction.on_commit(recalcular)
+
+
+@receiver(post_save, sender=RecepcionPipa)
+@receiver(post_delete, sender=RecepcionPipa)
+def recalcular_tanque_por_pipa(sender, instance, **kwargs):
+    _recalcular_tanque_al_confirmar(instance.fecha, getattr(instance, '_fecha_anterior', None))
+
+
+@receiver(pre_save, sender=CargaCombustible)
+def guardar_carga_anterior(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._tanque_anterior = (
+            sender.objects.filter(pk=instance.pk).values_list('fecha_hora_inicio', 'estado').first()
+            if instance.pk else None
+        )
+
+
+@receiver(post_save, sender=CargaCombustible)
+@receiver(post_delete, sender=CargaCombustible)
+def recalcular_tanque_por_carga(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    fechas = [instance.fecha_hora_inicio] if instance.estado == 'COMPLETADO' else []
+    anterior = getattr(instance, '_tanque_anterior', None)
+    if anterior and anterior[1] == 'COMPLETADO':
+        fechas.append(anterior[0])
+    _recalcular_tanque_al_confirmar(*fechas)
@@ -0,0 +1,127 @@
+"""
+Mantenimiento de SaldoTanqueDiario: saldo corrido del tanque de diésel.
+
+Cada día del libro es
+
+    saldo_inicial = saldo_final del día anterior (TANQUE_SALDO_INICIAL_LITROS el primero)
+    saldo_final   = saldo_inicial + litros de RecepcionPipa − litros de cargas COMPLETADO
+
+así que un cambio en el día D solo altera D y los días siguientes.
+`recalcular(desde)` parte del saldo_final del último renglón anterior a
+`desde`, agrega pipas y cargas de ahí en adelante con una consulta agrupada
+por fuente y reescribe solo esos renglones (conserva litros_medidos). Sin
+renglón previo rehace el libro completo desde el primer movimiento.
+
+Las señales de finanzas recalculan desde la fecha más antigua que toca cada
+pipa o carga guardada o borrada; el job nocturno del scheduler extiende el
+libro hasta hoy y el comando `reconstruir_saldo_tanque` lo rehace entero.
+"""
+
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from config.fechas import a_fecha
+
+from .models import RecepcionPipa, SaldoTanqueDiario
+
+logger = logging.getLogger(__name__)
+
+
+def _movimientos(desde=None) -> dict:
+    """{fecha: {pipas, litros_recibidos, cargas, litros_despachados}} desde `desde`."""
+    from modulos.combustible.models import CargaCombustible
+
+    pipas = RecepcionPipa.objects.all()
+    cargas = CargaCombustible.objects.filter(estado='COMPLETADO')
+    if desde:
+        pipas = pipas.filter(fecha__gte=desde)
+        cargas = cargas.filter(fecha_hora_inicio__desde_dia=desde)
+
+    movimientos = {}
+
+    def dia(fecha):
+        return movimientos.setdefault(fecha, {
+            'pipas': 0, 'litros_recibidos': Decimal('0'), 'cargas': 0, 'litros_despachados': Decimal('0'),
+        })
+
+    for fila in pipas.values('fecha').annotate(n=Count('id'), litros=Sum('litros')).order_by():
+        dia(fila['fecha']).update(pipas=fila['n'], litros_recibidos=fila['litros'] or Decimal('0'))
+    filas = (
+        cargas.annotate(fecha=TruncDate('fecha_hora_inicio')).values('fecha')
+        .annotate(n=Count('id'), litros=Sum('cantidad_litros')).order_by()
+    )
+    for fila in filas:
+        dia(fila['fecha']).update(cargas=fila['n'], litros_despachados=fila['litros'] or Decimal('0'))
+    return movimientos
+
+
+def _primer_movimiento():
+    from modulos.combustible.models import CargaCombustible
+
+    fechas = [
+        RecepcionPipa.objects.aggregate(f=Min('fecha'))['f'],
+        CargaCombustible.objects.filter(estado='COMPLETADO').aggregate(f=Min('fecha_hora_inicio'))['f'],
+    ]
+    fechas = [a_fecha(f) for f in fechas if f]
+    return min(fechas) if fechas else None
+
+
+def recalcular(desde=None) -> int:
+    """
+    Reescribe los renglones del libro desde `desde` (None = todo) hasta hoy o
+    el último movimiento. Retorna renglones escritos.
+    """
+    anterior = None
+    if desde:
+        anterior = SaldoTanqueDiario.objects.filter(fecha__lt=desde).order_by('-fecha').first()
+    if anterior:
+        # Si el libro no llegaba hasta `desde`, se rellena el hueco
+        desde = anterior.fecha + timedelta(days=1)
+        saldo = anterior.saldo_final
+    else:
+        desde = _primer_movimiento()
+        saldo = Decimal(getattr(settings, 'TANQUE_SALDO_INICIAL_LITROS', 0))
+        if desde is None:
+            SaldoTanqueDiario.objects.all().delete()
+            return 0
+
+    movimientos = _movimientos(desde)
+    hasta = max([timezone.localdate(), *movimientos])
+    # Sin renglón previo el libro se rehace entero (también lo anterior al primer movimiento)
+    reescritos = SaldoTanqueDiario.objects.filter(fecha__gte=desde) if anterior else SaldoTanqueDiario.objects.all()
+    medidos = dict(reescritos.filter(litros_medidos__isnull=False).values_list('fecha', 'litros_medidos'))
+
+    renglones = []
+    vacio = {'pipas': 0, 'litros_recibidos': Decimal('0'), 'cargas': 0, 'litros_despachados': Decimal('0')}
+    fecha = desde
+    while fecha <= hasta:
+        dia = movimientos.get(fecha, vacio)
+        final = saldo + dia['litros_recibidos'] - dia['litros_despachados']
+        medido = medidos.get(fecha)
+        renglones.append(SaldoTanqueDiario(
+            fecha=fecha, saldo_inicial=saldo, saldo_final=final, litros_medidos=medido,
+            diferencia=medido - final if medido is not None else None, **dia,
+        ))
+        saldo, fecha = final, fecha + timedelta(days=1)
+
+    with transaction.atomic():
+        reescritos.delete()
+        SaldoTanqueDiario.objects.bulk_create(renglones, batch_size=1000)
+    logger.info("SaldoTanqueDiario: %d día(s) recalculado(s) desde %s", len(renglones), desde)
+    return len(renglones)
+
+
+def extender() -> int:
+    """Agrega los días que falten hasta hoy (job nocturno). Retorna renglones escritos."""
+    ultimo = SaldoTanqueDiario.objects.order_by('-fecha').values_list('fecha', flat=True).first()
+    hoy = timezone.localdate()
+    if ultimo and ultimo >= hoy:
+        return 0
+    return recalcular(ultimo + timedelta(days=1) if ultimo else None)
@@ -1,9 +1,19 @@
-from datetime import date
+from datetime import date, datetime
+from io import StringIO
 from decimal import Decimal
 
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
 
-from .models import TarifaKilometro, RecepcionPipa, PrecioDieselMensual
+from modulos.bitacoras.models import BitacoraViaje
+from modulos.combustible.models import CargaCombustible, Despachador
+from modulos.operadores.models import Operador
+from modulos.unidades.models import Unidad
+
+from . import precios, tanque
+from .models import TarifaKilometro, RecepcionPipa, PrecioDieselMensual, SaldoTanqueDiario
 
 
 class TarifaKilometroVigenteEnTests(TestCase):
@@ -124,3 +134,121 @@ class PrecioDieselMensualVigenteEnTests(TestCase):
         resultado = PrecioDieselMensual.vigente_en(date(2026, 1, 1))
 
         self.assertIsNone(resultado)
+
+
+class RecalculoPreciosTests(TestCase):
+    def setUp(self):
+        self.unidad = Unidad.objects.create(
+            numero_economico='ECO-001', placa='ABC-123', tipo='FORANEA', año=2020,
+            capacidad_combustible=Decimal('200.00'), rendimiento_esperado=Decimal('3.00'),
+        )
+        self.operador = Operador.objects.create(nombre='Juan Pérez', tipo='FORANEO')
+        self.despachador = Despachador.objects.create(nombre='Pedro López')
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def _aware(self, y, m, d, h=8):
+        return timezone.make_aware(datetime(y, m, d, h))
+
+    def _viaje(self, llegada):
+        return BitacoraViaje.objects.create(
+            operador=self.operador, unidad=self.unidad, modalidad='SENCILLO', destino='Manzanillo',
+            fecha_carga=llegada, fecha_salida=llegada, fecha_llegada=llegada, distancia_calculada=Decimal('500.00'),
+        )
+
+    def _carga(self, inicio):
+        return CargaCombustible.objects.create(
+            despachador=self.despachador, unidad=self.unidad, cantidad_litros=Decimal('100.00'),
+            kilometraje_actual=1000, nivel_combustible_inicial='MEDIO', estado_candado_anterior='NORMAL',
+            fecha_hora_inicio=inicio, tipo_flujo='LOCAL', estado='COMPLETADO',
+        )
+
+    def test_consulta_de_precios_sin_ir_a_la_bd(self):
+        TarifaKilometro.objects.create(valor=Decimal('10.00'), vigente_desde=date(2026, 1, 1))
+        precios.tarifa_en(date(2026, 3, 1))
+        with self.assertNumQueries(0):
+            self.assertEqual(precios.tarifa_en(self._aware(2026, 5, 1)), Decimal('10.00'))
+            self.assertIsNone(precios.tarifa_en(date(2025, 12, 31)))
+
+    def test_pipa_tardia_pone_precio_a_las_cargas_del_mes_y_siguientes(self):
+        abril = self._carga(self._aware(2026, 4, 20))
+        mayo = self._carga(self._aware(2026, 5, 10))
+        junio = self._carga(self._aware(2026, 6, 10))
+        self.assertIsNone(mayo.costo_calculado)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RecepcionPipa.objects.create(fecha=date(2026, 5, 28), litros=Decimal('1000.00'), costo_total=Decimal('25000.00'))
+
+        for carga, costo in ((abril, None), (mayo, Decimal('2500.00')), (junio, Decimal('2500.00'))):
+            carga.refresh_from_db()
+            self.assertEqual(carga.costo_calculado, costo)
+
+    def test_cambio_de_tarifa_recalcula_solo_su_tramo(self):
+        enero = TarifaKilometro.objects.create(valor=Decimal('10.00'), vigente_desde=date(2026, 1, 1))
+        TarifaKilometro.objects.create(valor=Decimal('12.00'), vigente_desde=date(2026, 6, 1))
+        marzo, julio = self._viaje(self._aware(2026, 3, 5)), self._viaje(self._aware(2026, 7, 5))
+        self.assertEqual((marzo.ingreso_calculado, julio.ingreso_calculado), (Decimal('5000.00'), Decimal('6000.00')))
+
+        self.assertEqual(precios.tramo_afectado(precios.TARIFA, date(2026, 1, 1)), (date(2026, 1, 1), date(2026, 5, 31)))
+        enero.valor = Decimal('11.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            enero.save()
+
+        marzo.refresh_from_db()
+        julio.refresh_from_db()
+        self.assertEqual((marzo.ingreso_calculado, julio.ingreso_calculado), (Decimal('5500.00'), Decimal('6000.00')))
+
+
+class SaldoTanqueDiarioTests(TestCase):
+    def setUp(self):
+        self.unidad = Unidad.objects.create(
+            numero_economico='ECO-001', placa='ABC-123', tipo='LOCAL', año=2020,
+            capacidad_combustible=Decimal('200.00'), rendimiento_esperado=Decimal('3.00'),
+        )
+        self.despachador = Despachador.objects.create(nombre='Pedro López')
+
+    def _carga(self, dia, litros, hora=8):
+        return CargaCombustible.objects.create(
+            despachador=self.despachador, unidad=self.unidad, cantidad_litros=litros,
+            kilometraje_actual=1000, nivel_combustible_inicial='MEDIO', estado_candado_anterior='NORMAL',
+            fecha_hora_inicio=timezone.make_aware(datetime(2026, 6, dia, hora)), tipo_flujo='LOCAL',
+            estado='COMPLETADO',
+        )
+
+    def _saldo(self, dia):
+        return SaldoTanqueDiario.objects.get(fecha=date(2026, 6, dia))
+
+    def test_saldo_corrido_por_dia_local(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            RecepcionPipa.objects.create(fecha=date(2026, 6, 1), litros=Decimal('1000.00'), costo_total=Decimal('25000.00'))
+            self._carga(1, Decimal('100.00'))
+            self._carga(2, Decimal('150.00'), hora=22)  # 3 de junio en UTC, 2 en local
+            self._carga(4, Decimal('200.00'))
+
+        self.assertEqual(SaldoTanqueDiario.objects.order_by('fecha').first().fecha, date(2026, 6, 1))
+        dia1, dia2, dia3, dia4 = (self._saldo(d) for d in (1, 2, 3, 4))
+        self.assertEqual((dia1.pipas, dia1.litros_recibidos, dia1.cargas, dia1.saldo_final), (1, 1000, 1, 900))
+        self.assertEqual((dia2.saldo_inicial, dia2.litros_despachados, dia2.saldo_final), (900, 150, 750))
+        self.assertEqual((dia3.cargas, dia3.saldo_final), (0, 750))
+        self.assertEqual(dia4.saldo_final, 550)
+        self.assertTrue(SaldoTanqueDiario.objects.filter(fecha=timezone.localdate()).exists())
+
+    def test_edicion_tardia_solo_reescribe_desde_su_fecha(self):
+        RecepcionPipa.objects.create(fecha=date(2026, 6, 1), litros=Decimal('1000.00'), costo_total=Decimal('25000.00'))
+        carga = self._carga(3, Decimal('100.00'))
+        call_command('reconstruir_saldo_tanque', stdout=StringIO())
+        medido = self._saldo(5)
+        medido.litros_medidos = Decimal('880.00')
+        medido.save()
+        self.assertEqual(medido.diferencia, Decimal('-20.00'))
+        dia2 = self._saldo(2)
+
+        carga.cantidad_litros = Decimal('130.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            carga.save()
+
+        self.assertEqual(self._saldo(2).pk, dia2.pk)
+        self.assertEqual(self._saldo(3).saldo_final, 870)
+        medido = self._saldo(5)
+        self.assertEqual((medido.saldo_final, medido.litros_medidos, medido.diferencia), (870, 880, 10))
+        self.assertEqual(tanque.extender(), 0)
@@ -0,0 +1,106 @@
+from django.contrib import admin, messages
+
+from .lotes import procesar_lotes
+from .models import LoteIA, RespuestaIA, SolicitudIA, UsoIA
+from .services import purgar
+
+
+@admin.register(UsoIA)
+class UsoIAAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/ia/usoia/change_list.html'
+
+    list_display = [
+        'creado_en', 'modulo', 'modelo', 'tokens_entrada', 'tokens_salida',
+        'tokens_cache_lectura', 'desde_cache', 'en_lote', 'latencia_ms', 'exito',
+    ]
+    list_filter = ['modulo', 'modelo', 'desde_cache', 'en_lote', 'exito']
+    search_fields = ['modulo', 'clave', 'error']
+    readonly_fields = [
+        'modulo', 'modelo', 'tokens_entrada', 'tokens_salida', 'tokens_cache_lectura',
+        'desde_cache', 'en_lote', 'latencia_ms', 'exito', 'error', 'clave', 'creado_en',
+    ]
+    date_hierarchy = 'creado_en'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        respuesta = super().changelist_view(request, extra_context)
+        try:
+            qs = respuesta.context_data['cl'].queryset
+        except (AttributeError, KeyError):
+            return respuesta
+        # El resumen respeta los filtros y la jerarquía de fechas aplicados
+        resumen = list(qs.order_by().resumen_por_modulo())
+        respuesta.context_data['resumen_modulos'] = resumen
+        respuesta.context_data['resumen_total'] = {
+            campo: sum(fila[campo] or 0 for fila in resumen)
+            for campo in ('llamadas', 'aciertos_cache', 'resueltas_en_lote', 'errores', 'tokens_entrada', 'tokens_salida')
+        }
+        return respuesta
+
+
+@admin.register(RespuestaIA)
+class RespuestaIAAdmin(admin.ModelAdmin):
+    list_display = ['clave_corta', 'modelo', 'tokens_entrada', 'tokens_salida', 'usos', 'creada_en', 'expira_en']
+    list_filter = ['modelo']
+    search_fields = ['clave', 'texto']
+    readonly_fields = ['clave', 'modelo', 'texto', 'tokens_entrada', 'tokens_salida', 'usos', 'creada_en', 'expira_en']
+    actions = ['purgar_expiradas']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description='Hash')
+    def clave_corta(self, obj):
+        return obj.clave[:12]
+
+    @admin.action(description='Purgar respuestas expiradas y uso fuera de retención')
+    def purgar_expiradas(self, request, queryset):
+        respuestas, usos = purgar()
+        messages.success(request, f'{respuestas} respuesta(s) y {usos} registro(s) de uso borrados.')
+
+
+@admin.register(LoteIA)
+class LoteIAAdmin(admin.ModelAdmin):
+    list_display = ['lote_id', 'estado', 'total_solicitudes', 'completadas', 'errores', 'enviado_en', 'terminado_en']
+    list_filter = ['estado']
+    readonly_fields = [
+        'lote_id', 'estado', 'total_solicitudes', 'completadas', 'errores',
+        'enviado_en', 'consultado_en', 'terminado_en',
+    ]
+    actions = ['procesar_ahora']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Enviar pendientes y consultar lotes ahora')
+    def procesar_ahora(self, request, queryset):
+        conteo = procesar_lotes()
+        messages.success(
+            request,
+            f"{conteo['enviadas']} solicitud(es) enviadas, {conteo['lotes_terminados']} lote(s) terminados.",
+        )
+
+
+@admin.register(SolicitudIA)
+class SolicitudIAAdmin(admin.ModelAdmin):
+    list_display = ['id', 'modulo', 'objeto_id', 'modelo', 'estado', 'lote', 'creada_en', 'completada_en']
+    list_filter = ['estado', 'modulo', 'modelo']
+    search_fields = ['objeto_id', 'clave', 'prompt']
+    readonly_fields = [
+        'modulo', 'aplicar_con', 'objeto_id', 'clave', 'modelo', 'max_tokens', 'sistema', 'prompt',
+        'estado', 'lote', 'texto', 'error', 'creada_en', 'completada_en',
+    ]
+    actions = ['reencolar']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Volver a encolar (solicitudes con error)')
+    def reencolar(self, request, queryset):
+        total = queryset.filter(estado='ERROR').update(estado='PENDIENTE', lote=None, error='')
+        messages.success(request, f'{total} solicitud(es) devueltas a la cola.')
@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class IaConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'modulos.ia'
+    verbose_name = 'IAKasu'
@@ -0,0 +1,314 @@
+"""
+Modo lote de IAKasu: prompts tolerantes a latencia vía Message Batches API.
+
+Los módulos listados en IA_MODO_LOTE (p. ej. 'combustible', 'reportes') no
+llaman a Claude en línea: registran una SolicitudIA con `encolar()` y siguen.
+El worker `procesar_lotes()` —scheduler cada IA_LOTES_INTERVALO_MINUTOS o
+`python manage.py procesar_lotes_ia`— hace dos cosas:
+
+  1. Envía las solicitudes pendientes en un solo lote (hasta
+     IA_LOTES_MAX_SOLICITUDES). Las que ya están en la caché de respuestas
+     se resuelven sin enviarse.
+  2. Consulta los lotes en proceso; al terminar, guarda cada respuesta en la
+     caché, la registra en UsoIA y la adjunta a su destino llamando a
+     `aplicar_con(objeto_id, texto)`.
+
+El cliente de lotes es intercambiable (IA_LOTES_CLIENTE): en producción
+ClienteLotesAnthropic; en pruebas ClienteLotesMemoria o fake_externals.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from config.services.externos import ServicioNoDisponible, protegido
+
+from . import services as ia
+from .models import LoteIA, SolicitudIA
+
+logger = logging.getLogger(__name__)
+
+
+def en_modo_lote(modulo: str) -> bool:
+    return modulo in getattr(settings, 'IA_MODO_LOTE', [])
+
+
+# ---------------------------------------------------------------------------
+# Clientes de lotes
+# ---------------------------------------------------------------------------
+
+class ClienteLotes:
+    """
+    Interfaz mínima de la Batches API.
+
+    `resultados()` produce dicts con: custom_id, exito, texto, tokens_entrada,
+    tokens_salida, error.
+    """
+
+    def crear(self, solicitudes: list) -> str:
+        """solicitudes: [{'custom_id': str, 'params': {...messages.create...}}] → id del lote."""
+        raise NotImplementedError
+
+    def terminado(self, lote_id: str) -> bool:
+        raise NotImplementedError
+
+    def resultados(self, lote_id: str):
+        raise NotImplementedError
+
+
+class ClienteLotesAnthropic(ClienteLotes):
+
+    def __init__(self):
+        from config.services.claude_service import _cliente
+        api_key = getattr(settings, 'ANTHROPIC_API_KEY', None)
+        if not api_key:
+            raise ValueError("ANTHROPIC_API_KEY no está configurada en settings.")
+        self.client = _cliente(api_key)
+
+    def crear(self, solicitudes: list) -> str:
+        with protegido('anthropic'):
+            lote = self.client.messages.batches.create(requests=solicitudes)
+        return lote.id
+
+    def terminado(self, lote_id: str) -> bool:
+        with protegido('anthropic'):
+            lote = self.client.messages.batches.retrieve(lote_id)
+        return lote.processing_status == 'ended'
+
+    def resultados(self, lote_id: str):
+        with protegido('anthropic'):
+            respuestas = list(self.client.messages.batches.results(lote_id))
+        for r in respuestas:
+            if r.result.type == 'succeeded':
+                mensaje = r.result.message
+                yield {
+                    'custom_id': r.custom_id,
+                    'exito': True,
+                    'texto': mensaje.content[0].text.strip() if mensaje.content else '',
+                    'tokens_entrada': mensaje.usage.input_tokens,
+                    'tokens_salida': mensaje.usage.output_tokens,
+                }
+            else:
+                error = getattr(r.result, 'error', None)
+                yield {'custom_id': r.custom_id, 'exito': False, 'error': f'{r.result.type}: {error or ""}'}
+
+
+class ClienteLotesMemoria(ClienteLotes):
+    """
+    Lotes en memoria para pruebas: terminan en la siguiente consulta.
+    Un prompt que contenga '_fallar' produce un resultado con error.
+    """
+
+    lotes = {}
+
+    def crear(self, solicitudes: list) -> str:
+        lote_id = f'msgbatch_memoria_{len(self.lotes) + 1}'
+        self.lotes[lote_id] = solicitudes
+        return lote_id
+
+    def terminado(self, lote_id: str) -> bool:
+        return lote_id in self.lotes
+
+    def resultados(self, lote_id: str):
+        for s in self.lotes[lote_id]:
+            prompt = s['params']['messages'][0]['content']
+            if '_fallar' in prompt:
+                yield {'custom_id': s['custom_id'], 'exito': False, 'error': 'errored: falla simulada'}
+            else:
+                yield {
+                    'custom_id': s['custom_id'], 'exito': True,
+                    'texto': f'[lote] {prompt[:40]}',
+                    'tokens_entrada': len(prompt) // 4, 'tokens_salida': 10,
+                }
+
+
+def _cliente_lotes() -> ClienteLotes:
+    ruta = getattr(settings, 'IA_LOTES_CLIENTE', 'modulos.ia.lotes.ClienteLotesAnthropic')
+    return import_string(ruta)()
+
+
+# ---------------------------------------------------------------------------
+# Encolado
+# ---------------------------------------------------------------------------
+
+def encolar(modulo: str, aplicar_con: str, objeto_id, prompt: str, sistema: str = '',
+            modelo: str = '', max_tokens: int = 600) -> str:
+    """
+    Registra un prompt para el siguiente lote. Si la respuesta ya está en la
+    caché se adjunta de inmediato y no se encola nada.
+
+    Retorna el texto cacheado, o '' si la solicitud quedó en cola.
+    """
+    from config.services.claude_service import Modelo
+
+    modelo = modelo or Modelo.HAIKU
+    clave = ia.clave_prompt(modelo, max_tokens, sistema, prompt)
+
+    texto = ia.buscar_respuesta(clave)
+    if texto is not None:
+        ia.registrar_uso(modulo, modelo, clave=clave, desde_cache=True)
+        _aplicar(aplicar_con, objeto_id, texto)
+        return texto
+
+    SolicitudIA.objects.get_or_create(
+        aplicar_con=aplicar_con,
+        objeto_id=str(objeto_id),
+        clave=clave,
+        defaults={
+            'modulo': modulo,
+            'modelo': modelo,
+            'max_tokens': max_tokens,
+            'sistema': sistema,
+            'prompt': prompt,
+        },
+    )
+    return ''
+
+
+def _aplicar(aplicar_con: str, objeto_id, texto: str):
+    try:
+        import_string(aplicar_con)(objeto_id, texto)
+    except Exception:
+        logger.exception("IAKasu lotes: no se pudo adjuntar el resultado con %s (objeto %s)", aplicar_con, objeto_id)
+        return False
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Worker
+# ---------------------------------------------------------------------------
+
+def _params(solicitud: SolicitudIA) -> dict:
+    params = {
+        'model': solicitud.modelo,
+        'max_tokens': solicitud.max_tokens,
+        'messages': [{'role': 'user', 'content': solicitud.prompt}],
+    }
+    if solicitud.sistema:
+        params['system'] = [
+            {'type': 'text', 'text': solicitud.sistema, 'cache_control': {'type': 'ephemeral'}},
+        ]
+    return params
+
+
+def enviar_pendientes(cliente: ClienteLotes = None):
+    """Envía las solicitudes PENDIENTE en un lote. Retorna el LoteIA creado o None."""
+    limite = getattr(settings, 'IA_LOTES_MAX_SOLICITUDES', 1000)
+    pendientes = list(SolicitudIA.objects.filter(estado='PENDIENTE').order_by('creada_en')[:limite])
+
+    a_enviar = []
+    for solicitud in pendientes:
+        texto = ia.buscar_respuesta(solicitud.clave)
+        if texto is None:
+            a_enviar.append(solicitud)
+            continue
+        ia.registrar_uso(solicitud.modulo, solicitud.modelo, clave=solicitud.clave, desde_cache=True)
+        _completar(solicitud, texto)
+
+    if not a_enviar:
+        return None
+
+    # Un solo request por prompt: varias solicitudes con la misma clave comparten respuesta
+    unicas = {}
+    for solicitud in a_enviar:
+        unicas.setdefault(solicitud.clave, solicitud)
+
+    cliente = cliente or _cliente_lotes()
+    lote_id = cliente.crear([
+        {'custom_id': clave, 'params': _params(s)} for clave, s in unicas.items()
+    ])
+    with transaction.atomic():
+        lote = LoteIA.objects.create(lote_id=lote_id, total_solicitudes=len(a_enviar))
+        SolicitudIA.objects.filter(pk__in=[s.pk for s in a_enviar]).update(estado='ENVIADA', lote=lote)
+    logger.info("IAKasu lotes: lote %s enviado con %d solicitud(es)", lote_id, len(a_enviar))
+    return lote
+
+
+def _completar(solicitud: SolicitudIA, texto: str):
+    aplicado = _aplicar(solicitud.aplicar_con, solicitud.objeto_id, texto)
+    solicitud.texto = texto
+    solicitud.estado = 'COMPLETADA' if aplicado else 'ERROR'
+    solicitud.error = '' if aplicado else 'No se pudo adjuntar el resultado'
+    solicitud.completada_en = timezone.now()
+    solicitud.save(update_fields=['texto', 'estado', 'error', 'completada_en'])
+    return aplicado
+
+
+def consultar_lote(lote: LoteIA, cliente: ClienteLotes = None) -> bool:
+    """Si el lote terminó, adjunta sus resultados. Retorna True cuando terminó."""
+    cliente = cliente or _cliente_lotes()
+    lote.consultado_en = timezone.now()
+    if not cliente.terminado(lote.lote_id):
+        lote.save(update_fields=['consultado_en'])
+        return False
+
+    por_clave = {}
+    for solicitud in lote.solicitudes.filter(estado='ENVIADA'):
+        por_clave.setdefault(solicitud.clave, []).append(solicitud)
+
+    completadas = errores = 0
+    for resultado in cliente.resultados(lote.lote_id):
+        grupo = por_clave.pop(resultado['custom_id'], [])
+        if not grupo:
+            continue
+        primera = grupo[0]
+        if resultado['exito'] and resultado.get('texto'):
+            ia.registrar_uso(
+                primera.modulo, primera.modelo, clave=primera.clave, en_lote=True,
+                tokens_entrada=resultado.get('tokens_entrada', 0),
+                tokens_salida=resultado.get('tokens_salida', 0),
+            )
+            ia.guardar_respuesta(
+                primera.clave, primera.modelo, resultado['texto'],
+                resultado.get('tokens_entrada', 0), resultado.get('tokens_salida', 0),
+            )
+            for solicitud in grupo:
+                if _completar(solicitud, resultado['texto']):
+                    completadas += 1
+                else:
+                    errores += 1
+        else:
+            error = resultado.get('error') or 'Respuesta vacía'
+            ia.registrar_uso(primera.modulo, primera.modelo, clave=primera.clave, en_lote=True,
+                             exito=False, error=error)
+            SolicitudIA.objects.filter(pk__in=[s.pk for s in grupo]).update(estado='ERROR', error=error[:300])
+            errores += len(grupo)
+
+    # Solicitudes sin resultado (no debería ocurrir): quedan en error
+    sin_resultado = [s.pk for grupo in por_clave.values() for s in grupo]
+    if sin_resultado:
+        SolicitudIA.objects.filter(pk__in=sin_resultado).update(estado='ERROR', error='Sin resultado en el lote')
+        errores += len(sin_resultado)
+
+    lote.estado = 'TERMINADO'
+    lote.completadas = completadas
+    lote.errores = errores
+    lote.terminado_en = timezone.now()
+    lote.save(update_fields=['estado', 'completadas', 'errores', 'consultado_en', 'terminado_en'])
+    logger.info("IAKasu lotes: lote %s terminado — %d completada(s), %d error(es)", lote.lote_id, completadas, errores)
+    return True
+
+
+def procesar_lotes(cliente: ClienteLotes = None) -> dict:
+    """Envía pendientes y consulta lotes en proceso. Retorna contadores."""
+    conteo = {'enviadas': 0, 'lotes_terminados': 0}
+    if not getattr(settings, 'IA_HABILITADA', True):
+        return conteo
+
+    try:
+        cliente = cliente or _cliente_lotes()
+        for lote in LoteIA.objects.filter(estado='EN_PROCESO').order_by('enviado_en'):
+            if consultar_lote(lote, cliente):
+                conteo['lotes_terminados'] += 1
+        lote = enviar_pendientes(cliente)
+        if lote:
+            conteo['enviadas'] = lote.total_solicitudes
+    except ServicioNoDisponible:
+        logger.warning("IAKasu lotes: circuito de Anthropic abierto, se reintentará en el siguiente ciclo.")
+    except ValueError as exc:
+        # Sin ANTHROPIC_API_KEY u otra configuración inválida
+        logger.warning("IAKasu lotes: %s", exc)
+    return conteo
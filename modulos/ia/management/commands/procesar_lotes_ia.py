@@ -0,0 +1,41 @@
+"""
+Management command: procesar_lotes_ia
+
+Envía a la Message Batches API los prompts de IAKasu en cola (modo lote) y
+adjunta los resultados de los lotes terminados. El scheduler lo ejecuta cada
+IA_LOTES_INTERVALO_MINUTOS; también puede correrse a mano:
+
+    python manage.py procesar_lotes_ia
+    python manage.py procesar_lotes_ia --esperar   # hasta que no quede nada en proceso
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from modulos.ia.lotes import procesar_lotes
+from modulos.ia.models import LoteIA, SolicitudIA
+
+
+class Command(BaseCommand):
+    help = 'Envía los prompts de IA en cola en un lote y adjunta los resultados listos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--esperar', action='store_true',
+            help='Repite cada --intervalo segundos hasta que no haya lotes en proceso ni solicitudes pendientes',
+        )
+        parser.add_argument('--intervalo', type=int, default=60, help='Segundos entre consultas (con --esperar)')
+
+    def handle(self, *args, **options):
+        while True:
+            conteo = procesar_lotes()
+            en_proceso = LoteIA.objects.filter(estado='EN_PROCESO').count()
+            pendientes = SolicitudIA.objects.filter(estado='PENDIENTE').count()
+            self.stdout.write(
+                f"Enviadas: {conteo['enviadas']}  Lotes terminados: {conteo['lotes_terminados']}  "
+                f"En proceso: {en_proceso}  Pendientes: {pendientes}"
+            )
+            if not options['esperar'] or not (en_proceso or pendientes):
+                break
+            time.sleep(options['intervalo'])
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RespuestaIA',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=64, unique=True, verbose_name='Hash del prompt')),
+                ('modelo', models.CharField(max_length=60, verbose_name='Modelo')),
+                ('texto', models.TextField(verbose_name='Respuesta')),
+                ('tokens_entrada', models.PositiveIntegerField(default=0, verbose_name='Tokens de entrada')),
+                ('tokens_salida', models.PositiveIntegerField(default=0, verbose_name='Tokens de salida')),
+                ('usos', models.PositiveIntegerField(default=0, verbose_name='Aciertos de caché')),
+                ('creada_en', models.DateTimeField(auto_now_add=True, verbose_name='Creada en')),
+                ('expira_en', models.DateTimeField(db_index=True, verbose_name='Expira en')),
+            ],
+            options={
+                'verbose_name': 'Respuesta IA en caché',
+                'verbose_name_plural': 'Respuestas IA en caché',
+                'ordering': ['-creada_en'],
+            },
+        ),
+        migrations.CreateModel(
+            name='UsoIA',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modulo', models.CharField(max_length=60, verbose_name='Módulo')),
+                ('modelo', models.CharField(max_length=60, verbose_name='Modelo')),
+                ('tokens_entrada', models.PositiveIntegerField(default=0, verbose_name='Tokens de entrada')),
+                ('tokens_salida', models.PositiveIntegerField(default=0, verbose_name='Tokens de salida')),
+                ('tokens_cache_lectura', models.PositiveIntegerField(default=0, help_text='cache_read_input_tokens reportados por Anthropic', verbose_name='Tokens leídos de prompt caching')),
+                ('desde_cache', models.BooleanField(default=False, verbose_name='Servida desde caché')),
+                ('latencia_ms', models.PositiveIntegerField(default=0, verbose_name='Latencia (ms)')),
+                ('exito', models.BooleanField(default=True, verbose_name='Éxito')),
+                ('error', models.CharField(blank=True, max_length=300, verbose_name='Error')),
+                ('clave', models.CharField(blank=True, max_length=64, verbose_name='Hash del prompt')),
+                ('creado_en', models.DateTimeField(auto_now_add=True, verbose_name='Fecha')),
+            ],
+            options={
+                'verbose_name': 'Uso de IA',
+                'verbose_name_plural': 'Uso de IA',
+                'ordering': ['-creado_en'],
+                'indexes': [models.Index(fields=['-creado_en'], name='ia_usoia_creado__f4c377_idx'), models.Index(fields=['modulo', 'creado_en'], name='ia_usoia_modulo_e23257_idx')],
+            },
+        ),
+    ]
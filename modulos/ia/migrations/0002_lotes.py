@@ -0,0 +1,65 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ia', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoteIA',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lote_id', models.CharField(max_length=100, unique=True, verbose_name='ID del lote (Anthropic)')),
+                ('estado', models.CharField(choices=[('EN_PROCESO', 'En proceso'), ('TERMINADO', 'Terminado'), ('ERROR', 'Error')], default='EN_PROCESO', max_length=10, verbose_name='Estado')),
+                ('total_solicitudes', models.PositiveIntegerField(default=0, verbose_name='Solicitudes')),
+                ('completadas', models.PositiveIntegerField(default=0, verbose_name='Completadas')),
+                ('errores', models.PositiveIntegerField(default=0, verbose_name='Errores')),
+                ('enviado_en', models.DateTimeField(auto_now_add=True, verbose_name='Enviado en')),
+                ('consultado_en', models.DateTimeField(blank=True, null=True, verbose_name='Última consulta')),
+                ('terminado_en', models.DateTimeField(blank=True, null=True, verbose_name='Terminado en')),
+            ],
+            options={
+                'verbose_name': 'Lote de IA',
+                'verbose_name_plural': 'Lotes de IA',
+                'ordering': ['-enviado_en'],
+            },
+        ),
+        migrations.AddField(
+            model_name='usoia',
+            name='en_lote',
+            field=models.BooleanField(default=False, verbose_name='Resuelta en lote'),
+        ),
+        migrations.CreateModel(
+            name='SolicitudIA',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modulo', models.CharField(max_length=60, verbose_name='Módulo')),
+                ('aplicar_con', models.CharField(max_length=200, verbose_name='Función que adjunta el resultado')),
+                ('objeto_id', models.CharField(max_length=100, verbose_name='ID destino')),
+                ('clave', models.CharField(max_length=64, verbose_name='Hash del prompt')),
+                ('modelo', models.CharField(max_length=60, verbose_name='Modelo')),
+                ('max_tokens', models.PositiveIntegerField(default=600)),
+                ('sistema', models.TextField(blank=True, verbose_name='Sistema')),
+                ('prompt', models.TextField(verbose_name='Prompt')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente de envío'), ('ENVIADA', 'En lote'), ('COMPLETADA', 'Completada'), ('ERROR', 'Error')], default='PENDIENTE', max_length=10, verbose_name='Estado')),
+                ('texto', models.TextField(blank=True, verbose_name='Respuesta')),
+                ('error', models.CharField(blank=True, max_length=300, verbose_name='Error')),
+                ('creada_en', models.DateTimeField(auto_now_add=True, verbose_name='Creada en')),
+                ('completada_en', models.DateTimeField(blank=True, null=True, verbose_name='Completada en')),
+                ('lote', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='solicitudes', to='ia.loteia', verbose_name='Lote')),
+            ],
+            options={
+                'verbose_name': 'Solicitud de IA en lote',
+                'verbose_name_plural': 'Solicitudes de IA en lote',
+                'ordering': ['-creada_en'],
+                'indexes': [models.Index(fields=['estado', 'creada_en'], name='ia_solicitu_estado_992621_idx')],
+                'constraints': [models.UniqueConstraint(fields=('aplicar_con', 'objeto_id', 'clave'), name='solicitudia_unica_por_destino')],
+            },
+        ),
+    ]
@@ -0,0 +1,164 @@
+from django.db import models
+from django.db.models import Avg, Count, Q, Sum
+
+
+class RespuestaIA(models.Model):
+    """
+    Caché persistente de respuestas de Claude, indexada por el hash del prompt.
+
+    La clave combina modelo, max_tokens, sistema y prompt: el mismo análisis
+    de una carga o la misma narrativa de un resumen idéntico no se paga dos veces.
+    """
+
+    clave = models.CharField(max_length=64, unique=True, verbose_name='Hash del prompt')
+    modelo = models.CharField(max_length=60, verbose_name='Modelo')
+    texto = models.TextField(verbose_name='Respuesta')
+    tokens_entrada = models.PositiveIntegerField(default=0, verbose_name='Tokens de entrada')
+    tokens_salida = models.PositiveIntegerField(default=0, verbose_name='Tokens de salida')
+    usos = models.PositiveIntegerField(default=0, verbose_name='Aciertos de caché')
+    creada_en = models.DateTimeField(auto_now_add=True, verbose_name='Creada en')
+    expira_en = models.DateTimeField(db_index=True, verbose_name='Expira en')
+
+    class Meta:
+        verbose_name = 'Respuesta IA en caché'
+        verbose_name_plural = 'Respuestas IA en caché'
+        ordering = ['-creada_en']
+
+    def __str__(self):
+        return f"{self.modelo} · {self.clave[:12]}"
+
+
+class UsoIAQuerySet(models.QuerySet):
+
+    def resumen_por_modulo(self):
+        """Totales de tokens, aciertos de caché y latencia agrupados por módulo."""
+        return (
+            self.values('modulo')
+            .annotate(
+                llamadas=Count('id'),
+                aciertos_cache=Count('id', filter=Q(desde_cache=True)),
+                errores=Count('id', filter=Q(exito=False)),
+                tokens_entrada=Sum('tokens_entrada'),
+                tokens_salida=Sum('tokens_salida'),
+                tokens_cache_anthropic=Sum('tokens_cache_lectura'),
+                resueltas_en_lote=Count('id', filter=Q(en_lote=True)),
+                latencia_promedio_ms=Avg('latencia_ms', filter=Q(desde_cache=False, en_lote=False)),
+            )
+            .order_by('modulo')
+        )
+
+
+class UsoIA(models.Model):
+    """
+    Bitácora de uso de Claude: una fila por llamada a ClaudeService.completar,
+    incluidas las servidas desde la caché de respuestas.
+    """
+
+    modulo = models.CharField(max_length=60, verbose_name='Módulo')
+    modelo = models.CharField(max_length=60, verbose_name='Modelo')
+    tokens_entrada = models.PositiveIntegerField(default=0, verbose_name='Tokens de entrada')
+    tokens_salida = models.PositiveIntegerField(default=0, verbose_name='Tokens de salida')
+    tokens_cache_lectura = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Tokens leídos de prompt caching',
+        help_text='cache_read_input_tokens reportados por Anthropic',
+    )
+    desde_cache = models.BooleanField(default=False, verbose_name='Servida desde caché')
+    en_lote = models.BooleanField(default=False, verbose_name='Resuelta en lote')
+    latencia_ms = models.PositiveIntegerField(default=0, verbose_name='Latencia (ms)')
+    exito = models.BooleanField(default=True, verbose_name='Éxito')
+    error = models.CharField(max_length=300, blank=True, verbose_name='Error')
+    clave = models.CharField(max_length=64, blank=True, verbose_name='Hash del prompt')
+    creado_en = models.DateTimeField(auto_now_add=True, verbose_name='Fecha')
+
+    objects = UsoIAQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Uso de IA'
+        verbose_name_plural = 'Uso de IA'
+        ordering = ['-creado_en']
+        indexes = [
+            models.Index(fields=['-creado_en']),
+            models.Index(fields=['modulo', 'creado_en']),
+        ]
+
+    def __str__(self):
+        origen = 'caché' if self.desde_cache else 'lote' if self.en_lote else f'{self.latencia_ms} ms'
+        return f"{self.modulo} · {self.modelo} ({origen})"
+
+
+class LoteIA(models.Model):
+    """Lote enviado a la Message Batches API de Anthropic (50 % del costo, sin bloquear)."""
+
+    ESTADO_CHOICES = [
+        ('EN_PROCESO', 'En proceso'),
+        ('TERMINADO',  'Terminado'),
+        ('ERROR',      'Error'),
+    ]
+
+    lote_id = models.CharField(max_length=100, unique=True, verbose_name='ID del lote (Anthropic)')
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='EN_PROCESO', verbose_name='Estado')
+    total_solicitudes = models.PositiveIntegerField(default=0, verbose_name='Solicitudes')
+    completadas = models.PositiveIntegerField(default=0, verbose_name='Completadas')
+    errores = models.PositiveIntegerField(default=0, verbose_name='Errores')
+    enviado_en = models.DateTimeField(auto_now_add=True, verbose_name='Enviado en')
+    consultado_en = models.DateTimeField(null=True, blank=True, verbose_name='Última consulta')
+    terminado_en = models.DateTimeField(null=True, blank=True, verbose_name='Terminado en')
+
+    class Meta:
+        verbose_name = 'Lote de IA'
+        verbose_name_plural = 'Lotes de IA'
+        ordering = ['-enviado_en']
+
+    def __str__(self):
+        return f"{self.lote_id} ({self.get_estado_display()})"
+
+
+class SolicitudIA(models.Model):
+    """
+    Prompt pendiente de resolverse en modo lote.
+
+    Cuando llega la respuesta se invoca `aplicar_con(objeto_id, texto)` —ruta
+    importable registrada por el módulo que encoló— para adjuntarla a su
+    destino (AlertaCombustible, ReporteGenerado...).
+    """
+
+    ESTADO_CHOICES = [
+        ('PENDIENTE',  'Pendiente de envío'),
+        ('ENVIADA',    'En lote'),
+        ('COMPLETADA', 'Completada'),
+        ('ERROR',      'Error'),
+    ]
+
+    modulo = models.CharField(max_length=60, verbose_name='Módulo')
+    aplicar_con = models.CharField(max_length=200, verbose_name='Función que adjunta el resultado')
+    objeto_id = models.CharField(max_length=100, verbose_name='ID destino')
+    clave = models.CharField(max_length=64, verbose_name='Hash del prompt')
+    modelo = models.CharField(max_length=60, verbose_name='Modelo')
+    max_tokens = models.PositiveIntegerField(default=600)
+    sistema = models.TextField(blank=True, verbose_name='Sistema')
+    prompt = models.TextField(verbose_name='Prompt')
+
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='PENDIENTE', verbose_name='Estado')
+    lote = models.ForeignKey(
+        LoteIA, null=True, blank=True, on_delete=models.SET_NULL,
+        related_name='solicitudes', verbose_name='Lote',
+    )
+    texto = models.TextField(blank=True, verbose_name='Respuesta')
+    error = models.CharField(max_length=300, blank=True, verbose_name='Error')
+    creada_en = models.DateTimeField(auto_now_add=True, verbose_name='Creada en')
+    completada_en = models.DateTimeField(null=True, blank=True, verbose_name='Completada en')
+
+    class Meta:
+        verbose_name = 'Solicitud de IA en lote'
+        verbose_name_plural = 'Solicitudes de IA en lote'
+        ordering = ['-creada_en']
+        constraints = [
+            models.UniqueConstraint(fields=['aplicar_con', 'objeto_id', 'clave'], name='solicitudia_unica_por_destino'),
+        ]
+        indexes = [
+            models.Index(fields=['estado', 'creada_en']),
+        ]
+
+    def __str__(self):
+        return f"{self.modulo} → {self.objeto_id} ({self.get_estado_display()})"
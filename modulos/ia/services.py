@@ -0,0 +1,88 @@
+"""
+Caché de respuestas y contabilidad de uso de Claude (IAKasu).
+
+`config.services.claude_service.ClaudeService` consulta aquí antes de llamar
+a Anthropic y registra cada llamada en `UsoIA`. Los errores de base de datos
+se registran en el log y nunca rompen la llamada a la IA; cada operación va
+en su propio savepoint para que un error tampoco deje abortada la transacción
+de quien llama (las señales que analizan cargas corren dentro de una).
+"""
+
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import RespuestaIA, UsoIA
+
+logger = logging.getLogger(__name__)
+
+
+def clave_prompt(modelo: str, max_tokens: int, sistema: str, prompt: str) -> str:
+    """sha256 de todo lo que determina la respuesta de Claude."""
+    contenido = json.dumps([modelo, max_tokens, sistema, prompt], ensure_ascii=False)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+def buscar_respuesta(clave: str):
+    """Texto cacheado vigente para `clave`, o None."""
+    try:
+        with transaction.atomic():
+            texto = (
+                RespuestaIA.objects
+                .filter(clave=clave, expira_en__gt=timezone.now())
+                .values_list('texto', flat=True)
+                .first()
+            )
+            if texto is not None:
+                RespuestaIA.objects.filter(clave=clave).update(usos=F('usos') + 1)
+        return texto
+    except DatabaseError:
+        logger.exception('IAKasu: no se pudo leer la caché de respuestas')
+        return None
+
+
+def guardar_respuesta(clave: str, modelo: str, texto: str, tokens_entrada=0, tokens_salida=0):
+    ttl = timedelta(hours=getattr(settings, 'IA_CACHE_TTL_HORAS', 168))
+    try:
+        with transaction.atomic():
+            RespuestaIA.objects.update_or_create(
+                clave=clave,
+                defaults={
+                    'modelo': modelo,
+                    'texto': texto,
+                    'tokens_entrada': tokens_entrada,
+                    'tokens_salida': tokens_salida,
+                    'expira_en': timezone.now() + ttl,
+                },
+            )
+    except DatabaseError:
+        logger.exception('IAKasu: no se pudo guardar la respuesta en caché')
+
+
+def registrar_uso(modulo: str, modelo: str, **campos):
+    """Agrega una fila a la bitácora UsoIA (tokens, latencia, caché, error)."""
+    if campos.get('error'):
+        campos['error'] = str(campos['error'])[:300]
+    try:
+        with transaction.atomic():
+            UsoIA.objects.create(modulo=modulo or 'general', modelo=modelo, **campos)
+    except DatabaseError:
+        logger.exception('IAKasu: no se pudo registrar el uso de IA')
+
+
+def purgar(ahora=None) -> tuple:
+    """
+    Borra respuestas expiradas y filas de UsoIA más viejas que
+    IA_USO_RETENCION_DIAS. Retorna (respuestas_borradas, usos_borrados).
+    """
+    ahora = ahora or timezone.now()
+    respuestas, _ = RespuestaIA.objects.filter(expira_en__lte=ahora).delete()
+    limite = ahora - timedelta(days=getattr(settings, 'IA_USO_RETENCION_DIAS', 365))
+    usos, _ = UsoIA.objects.filter(creado_en__lt=limite).delete()
+    return respuestas, usos
@@ -0,0 +1,247 @@
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from config.services import claude_service, externos
+from config.services.claude_service import ClaudeService, Modelo
+
+from . import lotes
+from .lotes import ClienteLotesMemoria
+from .models import LoteIA, RespuestaIA, SolicitudIA, UsoIA
+from .services import clave_prompt, purgar
+
+_cliente_real = claude_service._cliente
+
+
+def _respuesta(texto='Análisis de prueba', entrada=120, salida=40):
+    return SimpleNamespace(
+        content=[SimpleNamespace(text=texto)],
+        usage=SimpleNamespace(input_tokens=entrada, output_tokens=salida, cache_read_input_tokens=80),
+    )
+
+
+@override_settings(ANTHROPIC_API_KEY='k', IA_HABILITADA=True, IA_CACHE_TTL_HORAS=24)
+class ClaudeServiceCacheTests(TestCase):
+    def setUp(self):
+        externos.reiniciar()
+        claude_service.reiniciar()
+        self.cliente = MagicMock()
+        self.cliente.messages.create.return_value = _respuesta()
+        parche = patch('config.services.claude_service._cliente', return_value=self.cliente)
+        parche.start()
+        self.addCleanup(parche.stop)
+        self.addCleanup(claude_service.reiniciar)
+
+    def test_mismo_prompt_se_sirve_desde_cache(self):
+        claude = ClaudeService(modulo='combustible')
+
+        primero = claude.completar('Unidad ECO-1: 400 L', sistema='Analista', modelo=Modelo.SONNET)
+        segundo = claude.completar('Unidad ECO-1: 400 L', sistema='Analista', modelo=Modelo.SONNET)
+
+        self.assertEqual(primero, segundo)
+        self.assertEqual(self.cliente.messages.create.call_count, 1)
+        usos = list(UsoIA.objects.order_by('id'))
+        self.assertEqual([u.desde_cache for u in usos], [False, True])
+        self.assertEqual((usos[0].tokens_entrada, usos[0].tokens_salida, usos[0].tokens_cache_lectura), (120, 40, 80))
+        self.assertEqual(usos[1].tokens_entrada, 0)
+        self.assertEqual(RespuestaIA.objects.get().usos, 1)
+
+    def test_prompt_distinto_o_modelo_distinto_llama_a_claude(self):
+        claude = ClaudeService(modulo='reportes')
+
+        claude.completar('Resumen A')
+        claude.completar('Resumen B')
+        claude.completar('Resumen A', modelo=Modelo.SONNET)
+
+        self.assertEqual(self.cliente.messages.create.call_count, 3)
+
+    def test_respuesta_expirada_se_regenera(self):
+        claude = ClaudeService()
+        claude.completar('Resumen')
+        RespuestaIA.objects.update(expira_en=timezone.now() - timedelta(seconds=1))
+
+        claude.completar('Resumen')
+
+        self.assertEqual(self.cliente.messages.create.call_count, 2)
+        self.assertGreater(RespuestaIA.objects.get().expira_en, timezone.now())
+
+    def test_usar_cache_false_fuerza_llamada(self):
+        claude = ClaudeService()
+        claude.completar('Resumen')
+        claude.completar('Resumen', usar_cache=False)
+
+        self.assertEqual(self.cliente.messages.create.call_count, 2)
+
+    def test_error_no_se_cachea_y_queda_en_la_bitacora(self):
+        self.cliente.messages.create.side_effect = RuntimeError('timeout')
+        claude = ClaudeService(modulo='combustible')
+
+        self.assertEqual(claude.completar('Resumen'), '')
+
+        self.assertFalse(RespuestaIA.objects.exists())
+        uso = UsoIA.objects.get()
+        self.assertFalse(uso.exito)
+        self.assertIn('timeout', uso.error)
+
+    @override_settings(IA_MAX_CONCURRENCIA=1, IA_ESPERA_MAX_SEGUNDOS=0.01)
+    def test_sin_turno_en_el_semaforo_no_llama(self):
+        claude_service.reiniciar()
+        semaforo = claude_service._semaforo_llamadas()
+        semaforo.acquire()
+        try:
+            texto = ClaudeService().completar('Resumen')
+        finally:
+            semaforo.release()
+
+        self.assertEqual(texto, '')
+        self.cliente.messages.create.assert_not_called()
+        self.assertEqual(UsoIA.objects.get().error, 'Sin turno en el semáforo')
+
+    def test_bloqueo_es_por_clave_y_se_libera_al_terminar(self):
+        claude = ClaudeService()
+        clave_b = clave_prompt(Modelo.HAIKU, 600, '', 'Resumen B')
+
+        # Un prompt en curso no detiene a otro distinto
+        with claude_service._bloqueo_clave(clave_b):
+            self.assertEqual(claude.completar('Resumen A'), 'Análisis de prueba')
+
+        self.assertEqual(claude_service._bloqueos_clave, {})
+
+    def test_cliente_compartido_por_proceso(self):
+        with patch('anthropic.Anthropic') as MockAnthropic:
+            self.assertIs(_cliente_real('k'), _cliente_real('k'))
+        self.assertEqual(MockAnthropic.call_count, 1)
+
+
+class PurgaYAdminTests(TestCase):
+    def test_purgar_borra_expiradas_y_uso_viejo(self):
+        ahora = timezone.now()
+        RespuestaIA.objects.create(clave='a' * 64, modelo='m', texto='vieja', expira_en=ahora - timedelta(hours=1))
+        RespuestaIA.objects.create(clave='b' * 64, modelo='m', texto='vigente', expira_en=ahora + timedelta(hours=1))
+        viejo = UsoIA.objects.create(modulo='reportes', modelo='m')
+        UsoIA.objects.filter(pk=viejo.pk).update(creado_en=ahora - timedelta(days=400))
+        UsoIA.objects.create(modulo='reportes', modelo='m')
+
+        self.assertEqual(purgar(ahora), (1, 1))
+        self.assertEqual(RespuestaIA.objects.get().texto, 'vigente')
+
+    def test_clave_prompt_depende_de_todos_los_parametros(self):
+        base = clave_prompt('m', 300, 'sis', 'p')
+        self.assertEqual(base, clave_prompt('m', 300, 'sis', 'p'))
+        self.assertNotEqual(base, clave_prompt('m', 350, 'sis', 'p'))
+        self.assertNotEqual(base, clave_prompt('m', 300, 'otro', 'p'))
+
+    def test_admin_muestra_resumen_por_modulo(self):
+        UsoIA.objects.create(modulo='combustible', modelo='m', tokens_entrada=100, tokens_salida=20, latencia_ms=900)
+        UsoIA.objects.create(modulo='combustible', modelo='m', desde_cache=True)
+        UsoIA.objects.create(modulo='reportes', modelo='m', tokens_entrada=50, exito=False)
+        admin = get_user_model().objects.create_superuser('admin', 'a@kasu.mx', 'x')
+        self.client.force_login(admin)
+
+        respuesta = self.client.get(reverse('admin:ia_usoia_changelist'))
+
+        self.assertEqual(respuesta.status_code, 200)
+        resumen = {fila['modulo']: fila for fila in respuesta.context['resumen_modulos']}
+        self.assertEqual(resumen['combustible']['aciertos_cache'], 1)
+        self.assertEqual(resumen['combustible']['latencia_promedio_ms'], 900)
+        self.assertEqual(resumen['reportes']['errores'], 1)
+        self.assertEqual(respuesta.context['resumen_total']['tokens_entrada'], 150)
+
+
+APLICADOS = []
+
+
+def aplicar_prueba(objeto_id, texto):
+    APLICADOS.append((objeto_id, texto))
+
+
+@override_settings(IA_HABILITADA=True, IA_LOTES_CLIENTE='modulos.ia.lotes.ClienteLotesMemoria')
+class ModoLoteTests(TestCase):
+    APLICAR = 'modulos.ia.tests.aplicar_prueba'
+
+    def setUp(self):
+        APLICADOS.clear()
+        ClienteLotesMemoria.lotes.clear()
+
+    def test_encolar_no_duplica_la_misma_solicitud(self):
+        self.assertEqual(lotes.encolar('reportes', self.APLICAR, 5, prompt='Resumen'), '')
+        lotes.encolar('reportes', self.APLICAR, 5, prompt='Resumen')
+
+        self.assertEqual(SolicitudIA.objects.count(), 1)
+
+    def test_envia_en_un_lote_y_adjunta_al_terminar(self):
+        lotes.encolar('reportes', self.APLICAR, 1, prompt='Resumen A')
+        lotes.encolar('combustible', self.APLICAR, 2, prompt='Carga B', modelo=Modelo.SONNET)
+
+        self.assertEqual(lotes.procesar_lotes(), {'enviadas': 2, 'lotes_terminados': 0})
+        lote = LoteIA.objects.get()
+        self.assertEqual(lote.solicitudes.filter(estado='ENVIADA').count(), 2)
+        self.assertEqual(APLICADOS, [])
+
+        self.assertEqual(lotes.procesar_lotes(), {'enviadas': 0, 'lotes_terminados': 1})
+
+        lote.refresh_from_db()
+        self.assertEqual((lote.estado, lote.completadas, lote.errores), ('TERMINADO', 2, 0))
+        self.assertEqual(sorted(APLICADOS), [('1', '[lote] Resumen A'), ('2', '[lote] Carga B')])
+        self.assertEqual(RespuestaIA.objects.count(), 2)
+        self.assertEqual(UsoIA.objects.filter(en_lote=True).count(), 2)
+
+    def test_resultado_con_error_no_se_adjunta(self):
+        lotes.encolar('reportes', self.APLICAR, 1, prompt='_fallar')
+        lotes.procesar_lotes()
+        lotes.procesar_lotes()
+
+        solicitud = SolicitudIA.objects.get()
+        self.assertEqual(solicitud.estado, 'ERROR')
+        self.assertIn('falla simulada', solicitud.error)
+        self.assertEqual(APLICADOS, [])
+        self.assertFalse(UsoIA.objects.get().exito)
+
+    def test_respuesta_en_cache_se_adjunta_sin_lote(self):
+        lotes.encolar('reportes', self.APLICAR, 1, prompt='Resumen')
+        lotes.procesar_lotes()
+        lotes.procesar_lotes()
+        APLICADOS.clear()
+
+        texto = lotes.encolar('reportes', self.APLICAR, 2, prompt='Resumen')
+
+        self.assertEqual(texto, '[lote] Resumen')
+        self.assertEqual(APLICADOS, [(2, '[lote] Resumen')])
+        self.assertEqual(lotes.procesar_lotes(), {'enviadas': 0, 'lotes_terminados': 0})
+
+    @override_settings(IA_MODO_LOTE=['combustible'])
+    def test_interpretacion_de_carga_se_encola_en_modo_lote(self):
+        from modulos.combustible.ia_service import AnalizadorCombustible
+
+        carga = MagicMock(pk=42, cantidad_litros=400, kilometraje_actual=1000)
+        carga.fecha_hora_inicio = timezone.now()
+        with patch('config.services.claude_service.ClaudeService') as MockClaude:
+            texto = AnalizadorCombustible().generar_interpretacion(
+                carga, [{'tipo_alerta': 'CONSUMO_ATIPICO', 'mensaje': 'Carga alta'}], 'CRITICO', {},
+            )
+
+        self.assertEqual(texto, '')
+        MockClaude.assert_not_called()
+        solicitud = SolicitudIA.objects.get()
+        self.assertEqual(
+            (solicitud.modulo, solicitud.objeto_id, solicitud.aplicar_con),
+            ('combustible', '42', 'modulos.combustible.ia_service.aplicar_interpretacion'),
+        )
+
+    def test_prompts_identicos_viajan_una_vez_en_el_lote(self):
+        lotes.encolar('reportes', self.APLICAR, 1, prompt='Resumen semanal')
+        lotes.encolar('reportes', self.APLICAR, 2, prompt='Resumen semanal')
+
+        lotes.procesar_lotes()
+        lote_id = LoteIA.objects.get().lote_id
+        self.assertEqual(len(ClienteLotesMemoria.lotes[lote_id]), 1)
+        lotes.procesar_lotes()
+
+        self.assertEqual(sorted(o for o, _ in APLICADOS), ['1', '2'])
+        self.assertEqual(LoteIA.objects.get().completadas, 2)
+        self.assertEqual(UsoIA.objects.filter(en_lote=True).count(), 1)
@@ -1,6 +1,5 @@
-import os
-
 from django.contrib import messages
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db.models import Q
@@ -212,7 +211,7 @@ class EnviarABitacoraView(LoginRequiredMixin, View):
         bitacora.save()
 
         if bitacora.cp_destino:
-            api_key = os.environ.get('GOOGLE_MAPS_API_KEY')
+            api_key = settings.GOOGLE_MAPS_API_KEY
             if api_key:
                 bitacora.calcular_distancia_google(api_key)
 
@@ -0,0 +1,173 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.template.loader import render_to_string
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
+
+from . import instrumentacion, perfilado
+from .models import MuestraRequest, PerfilRequest
+
+
+@admin.register(MuestraRequest)
+class MuestraRequestAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/monitoreo/muestrarequest/change_list.html'
+
+    list_display = [
+        'fecha', 'metodo', 'ruta', 'status', 'duracion_ms', 'consultas', 'sql_ms',
+        'externo_ms', 'consultas_repetidas', 'usuario',
+    ]
+    list_filter = ['metodo', 'status']
+    search_fields = ['ruta']
+    readonly_fields = [
+        'fecha', 'ruta', 'metodo', 'status', 'duracion_ms', 'consultas', 'sql_ms',
+        'externo_ms', 'consultas_repetidas', 'duplicadas', 'usuario',
+    ]
+    date_hierarchy = 'fecha'
+    actions = ['purgar_viejas']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_view_permission(self, request, obj=None):
+        return request.user.is_superuser
+
+    def has_delete_permission(self, request, obj=None):
+        return request.user.is_superuser
+
+    def has_module_perms(self, request):
+        return request.user.is_superuser
+
+    @admin.action(description='Purgar muestras fuera de retención')
+    def purgar_viejas(self, request, queryset):
+        borradas = instrumentacion.purgar()
+        messages.success(request, f'{borradas} muestra(s) borradas.')
+
+    # ─── Top de rutas ──────────────────────────────────────────────────────────
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                'rutas/',
+                self.admin_site.admin_view(self.rutas_view),
+                name='monitoreo_muestrarequest_rutas',
+            ),
+        ]
+        return custom_urls + urls
+
+    def rutas_view(self, request):
+        if not request.user.is_superuser:
+            raise PermissionDenied
+        try:
+            dias = max(1, min(int(request.GET.get('dias', 7)), 90))
+        except ValueError:
+            dias = 7
+        desde = timezone.now() - timedelta(days=dias)
+
+        return render(
+            request,
+            'admin/monitoreo/rutas.html',
+            {
+                **self.admin_site.each_context(request),
+                'title': 'Rutas más costosas',
+                'opts': self.model._meta,
+                'dias': dias,
+                'rutas_memoria': instrumentacion.resumir(instrumentacion.recientes()),
+                'rutas_muestreadas': list(MuestraRequest.objects.filter(fecha__gte=desde).resumen_por_ruta()[:25]),
+            },
+        )
+
+
+@admin.register(PerfilRequest)
+class PerfilRequestAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'metodo', 'url', 'status', 'duracion_ms', 'consultas', 'sql_ms', 'usuario', 'truncado']
+    list_filter = ['metodo', 'truncado']
+    search_fields = ['ruta', 'url']
+    fieldsets = [
+        (None, {'fields': ['fecha', 'metodo', 'url', 'ruta', 'status', 'usuario']}),
+        ('Tiempos', {'fields': ['duracion_ms', 'consultas', 'sql_ms', 'tamano_bytes', 'truncado', 'descarga']}),
+        ('Árbol de llamadas', {'fields': ['grafica_flama']}),
+        ('Funciones con más tiempo propio', {'fields': ['tabla_resumen']}),
+        ('Traza SQL', {'fields': ['tabla_sql']}),
+    ]
+    readonly_fields = [
+        'fecha', 'metodo', 'url', 'ruta', 'status', 'usuario', 'duracion_ms', 'consultas', 'sql_ms',
+        'tamano_bytes', 'truncado', 'descarga', 'grafica_flama', 'tabla_resumen', 'tabla_sql',
+    ]
+    date_hierarchy = 'fecha'
+    actions = ['purgar_viejos']
+
+    def get_queryset(self, request):
+        # El pstats completo solo se lee al descargarlo
+        return super().get_queryset(request).defer('datos')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_view_permission(self, request, obj=None):
+        return request.user.is_superuser
+
+    def has_delete_permission(self, request, obj=None):
+        return request.user.is_superuser
+
+    def has_module_perms(self, request):
+        return request.user.is_superuser
+
+    @admin.display(description='Flama')
+    def grafica_flama(self, obj):
+        return render_to_string('admin/monitoreo/perfilrequest/flama.html', {'filas': obj.flama})
+
+    @admin.display(description='Resumen')
+    def tabla_resumen(self, obj):
+        return render_to_string('admin/monitoreo/perfilrequest/resumen.html', {'filas': obj.resumen})
+
+    @admin.display(description='Consultas')
+    def tabla_sql(self, obj):
+        return render_to_string('admin/monitoreo/perfilrequest/sql.html', {'consultas': obj.trazas_sql})
+
+    @admin.display(description='pstats')
+    def descarga(self, obj):
+        if not obj.pk or obj.tamano_bytes == 0:
+            return '—'
+        if obj.tamano_bytes > getattr(settings, 'PERFILADO_MAX_KB', 2048) * 1024:
+            return 'Descartado por tamaño (PERFILADO_MAX_KB)'
+        url = reverse('admin:monitoreo_perfilrequest_descargar', args=[obj.pk])
+        return format_html('<a href="{}">Descargar perfil_{}.prof</a> (pstats / snakeviz)', url, obj.pk)
+
+    @admin.action(description='Purgar perfiles fuera de retención')
+    def purgar_viejos(self, request, queryset):
+        borrados = perfilado.purgar()
+        messages.success(request, f'{borrados} perfil(es) borrados.')
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                '<int:pk>/descargar/',
+                self.admin_site.admin_view(self.descargar_view),
+                name='monitoreo_perfilrequest_descargar',
+            ),
+        ]
+        return custom_urls + urls
+
+    def descargar_view(self, request, pk):
+        if not request.user.is_superuser:
+            raise PermissionDenied
+        registro = get_object_or_404(PerfilRequest, pk=pk)
+        if not registro.datos:
+            raise Http404('El perfil no conserva el pstats completo.')
+        respuesta = HttpResponse(bytes(registro.datos), content_type='application/octet-stream')
+        respuesta['Content-Disposition'] = f'attachment; filename="perfil_{registro.pk}.prof"'
+        return respuesta
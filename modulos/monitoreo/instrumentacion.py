@@ -0,0 +1,238 @@
+"""
+Medición por petición: SQL, servicios externos, latencia y detección de N+1.
+
+InstrumentacionMiddleware abre una Medicion por petición en un thread-local.
+Mientras la vista corre:
+
+  - cada consulta SQL pasa por `connection.execute_wrapper` (todas las
+    conexiones) y suma su tiempo; el texto SQL —con los parámetros aún
+    separados— se cuenta en un Counter, que es lo único que se hace por
+    consulta;
+  - `config.services.externos.protegido` suma aquí la duración de cada
+    llamada a Google, Twilio, WAHA o Anthropic (registrar_externo).
+
+Al terminar, los textos SQL se normalizan a una huella (literales y listas
+IN colapsados) y las huellas que se repiten INSTRUMENTACION_UMBRAL_N1 veces o
+más se reportan como N+1. La muestra va a un buffer circular en memoria
+(INSTRUMENTACION_BUFFER por proceso), a MuestraRequest con probabilidad
+INSTRUMENTACION_MUESTREO (las lentas siempre) y, si supera
+INSTRUMENTACION_UMBRAL_LENTO_MS, a una línea de log estructurada.
+
+Con INSTRUMENTACION_ACTIVA=False el middleware se descarta al arrancar
+(MiddlewareNotUsed) y registrar_externo es un getattr sobre el thread-local.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_estado = threading.local()
+_buffer_lock = threading.Lock()
+_buffer = None
+
+_VALOR = r"(?:%s|\?|\d+(?:\.\d+)?|'[^']*')"
+_RE_IN = re.compile(rf'\bIN\s*\(\s*{_VALOR}(?:\s*,\s*{_VALOR})*\s*\)', re.IGNORECASE)
+_RE_CADENA = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r'\b\d+(?:\.\d+)?\b')
+_RE_ESPACIOS = re.compile(r'\s+')
+
+
+def huella(sql: str) -> str:
+    """SQL normalizado: literales → ?, listas IN (…) de cualquier largo → IN (…)."""
+    normal = _RE_IN.sub('IN (…)', sql)
+    normal = _RE_CADENA.sub('?', normal)
+    normal = _RE_NUMERO.sub('?', normal)
+    return _RE_ESPACIOS.sub(' ', normal).strip()
+
+
+def _hash(texto: str) -> str:
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()[:12]
+
+
+class Medicion:
+    """Acumuladores de una petición en curso."""
+
+    __slots__ = ('inicio', 'consultas', 'sql_segundos', 'externo_segundos', 'textos')
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.sql_segundos = 0.0
+        self.externo_segundos = 0.0
+        self.textos = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_segundos += time.perf_counter() - inicio
+            self.consultas += 1
+            self.textos[sql] += 1
+
+    def repetidas(self, umbral: int) -> list:
+        """[{'huella', 'sql', 'veces'}] de las huellas con `umbral` repeticiones o más."""
+        por_huella = Counter()
+        ejemplo = {}
+        for texto, veces in self.textos.items():
+            normal = huella(texto)
+            por_huella[normal] += veces
+            ejemplo.setdefault(normal, texto)
+        return [
+            {'huella': _hash(normal), 'sql': ejemplo[normal][:500], 'veces': veces}
+            for normal, veces in por_huella.most_common()
+            if veces >= umbral
+        ]
+
+
+def ruta(request) -> str:
+    """Patrón de URL resuelto ('/combustible/<int:pk>/'), no la ruta concreta."""
+    coincidencia = getattr(request, 'resolver_match', None)
+    if coincidencia is None:
+        return '<sin resolver>'
+    return '/' + coincidencia.route
+
+
+def medicion_actual():
+    return getattr(_estado, 'medicion', None)
+
+
+def registrar_externo(segundos: float):
+    """Suma la duración de una llamada a un servicio externo a la petición en curso."""
+    medicion = getattr(_estado, 'medicion', None)
+    if medicion is not None:
+        medicion.externo_segundos += segundos
+
+
+def medir_sql(medicion: Medicion) -> ExitStack:
+    """Context manager que envuelve todas las conexiones con `medicion`."""
+    pila = ExitStack()
+    for conexion in connections.all():
+        pila.enter_context(conexion.execute_wrapper(medicion))
+    return pila
+
+
+def iniciar() -> Medicion:
+    medicion = Medicion()
+    _estado.medicion = medicion
+    return medicion
+
+
+def terminar():
+    _estado.medicion = None
+
+
+def _buffer_actual() -> deque:
+    global _buffer
+    tamano = getattr(settings, 'INSTRUMENTACION_BUFFER', 500)
+    if _buffer is None or _buffer.maxlen != tamano:
+        _buffer = deque(_buffer or (), maxlen=tamano)
+    return _buffer
+
+
+def recientes() -> list:
+    """Copia de las muestras del buffer de este proceso, de la más vieja a la más nueva."""
+    with _buffer_lock:
+        return list(_buffer_actual())
+
+
+def vaciar_buffer():
+    with _buffer_lock:
+        _buffer_actual().clear()
+
+
+def construir_muestra(medicion: Medicion, ruta: str, metodo: str, status: int, usuario_id=None) -> dict:
+    repetidas = medicion.repetidas(getattr(settings, 'INSTRUMENTACION_UMBRAL_N1', 5))
+    return {
+        'fecha': timezone.now(),
+        'ruta': ruta[:255],
+        'metodo': metodo,
+        'status': status,
+        'duracion_ms': round((time.perf_counter() - medicion.inicio) * 1000),
+        'consultas': medicion.consultas,
+        'sql_ms': round(medicion.sql_segundos * 1000),
+        'externo_ms': round(medicion.externo_segundos * 1000),
+        'consultas_repetidas': sum(r['veces'] for r in repetidas),
+        'duplicadas': repetidas[:5],
+        'usuario_id': usuario_id,
+    }
+
+
+def registrar(muestra: dict):
+    """Buffer en memoria, log de petición lenta y, si toca, fila en MuestraRequest."""
+    with _buffer_lock:
+        _buffer_actual().append(muestra)
+
+    lenta = muestra['duracion_ms'] >= getattr(settings, 'INSTRUMENTACION_UMBRAL_LENTO_MS', 1000)
+    if lenta:
+        campos = {
+            clave: muestra[clave]
+            for clave in ('ruta', 'metodo', 'status', 'duracion_ms', 'consultas', 'sql_ms', 'externo_ms',
+                          'consultas_repetidas', 'usuario_id')
+        }
+        campos['n1'] = [r['huella'] for r in muestra['duplicadas']]
+        logger.warning('peticion_lenta %s', json.dumps(campos, ensure_ascii=False), extra={'peticion': campos})
+
+    muestreo = getattr(settings, 'INSTRUMENTACION_MUESTREO', 0.0)
+    if muestreo > 0 and (lenta or random.random() < muestreo):
+        try:
+            from .models import MuestraRequest
+            MuestraRequest.objects.create(**muestra)
+        except Exception:
+            logger.exception('No se pudo guardar la muestra de %s', muestra['ruta'])
+
+
+def resumir(muestras, limite: int = 25) -> list:
+    """Top de rutas por tiempo total a partir de muestras en memoria (con p95)."""
+    por_ruta = {}
+    for muestra in muestras:
+        por_ruta.setdefault(muestra['ruta'], []).append(muestra)
+
+    filas = []
+    for ruta, grupo in por_ruta.items():
+        duraciones = sorted(m['duracion_ms'] for m in grupo)
+        n = len(grupo)
+        peor_n1 = max(
+            (r for m in grupo for r in m['duplicadas']), key=lambda r: r['veces'], default=None
+        )
+        filas.append({
+            'ruta': ruta,
+            'peticiones': n,
+            'duracion_total_ms': sum(duraciones),
+            'duracion_promedio_ms': sum(duraciones) / n,
+            'duracion_p95_ms': duraciones[max(0, math.ceil(0.95 * n) - 1)],
+            'duracion_max_ms': duraciones[-1],
+            'consultas_promedio': sum(m['consultas'] for m in grupo) / n,
+            'consultas_max': max(m['consultas'] for m in grupo),
+            'sql_promedio_ms': sum(m['sql_ms'] for m in grupo) / n,
+            'externo_promedio_ms': sum(m['externo_ms'] for m in grupo) / n,
+            'con_n1': sum(1 for m in grupo if m['consultas_repetidas']),
+            'peor_n1': peor_n1,
+        })
+    filas.sort(key=lambda f: f['duracion_total_ms'], reverse=True)
+    return filas[:limite]
+
+
+def purgar(ahora=None) -> int:
+    """Borra las MuestraRequest más viejas que INSTRUMENTACION_RETENCION_DIAS."""
+    from datetime import timedelta
+
+    from .models import MuestraRequest
+
+    ahora = ahora or timezone.now()
+    limite = ahora - timedelta(days=getattr(settings, 'INSTRUMENTACION_RETENCION_DIAS', 14))
+    borradas, _ = MuestraRequest.objects.filter(fecha__lt=limite).delete()
+    return borradas
@@ -0,0 +1,307 @@
+"""
+Métricas en formato de exposición de Prometheus (texto 0.0.4) para `/metrics`.
+
+Registro en memoria del proceso (un worker de gunicorn con varios hilos): cada
+métrica guarda sus series en un dict protegido por su propio lock, así que
+incrementar u observar cuesta un bisect y un par de sumas bajo lock. Las
+etiquetas se pasan en orden posicional (sin kwargs) por el mismo motivo.
+
+Métricas de eventos (se actualizan donde ocurre el evento):
+
+    bitacora_http_peticion_segundos{ruta,metodo}      histograma (MetricasMiddleware)
+    bitacora_http_respuestas_total{ruta,metodo,status}
+    bitacora_http_en_curso                            peticiones atendiéndose ahora
+    bitacora_http_sql_segundos{ruta}                  tiempo SQL por petición
+    bitacora_db_consultas_total
+    bitacora_externo_segundos{servicio}               externos.protegido y storage de Spaces
+    bitacora_externo_errores_total{servicio}
+    bitacora_externo_rechazos_total{servicio}         circuito abierto
+    bitacora_ocr_segundos{motor}                      vision | tesseract
+    bitacora_ia_analisis_segundos{modulo}
+    bitacora_reporte_segundos{tipo,etapa}             etapas del motor de reportes
+    bitacora_reportes_total{tipo,resultado}
+
+Métricas calculadas al momento del scrape (colectores; ver `colector`):
+alertas abiertas, colas de notificaciones e IA y estado de los circuitos.
+
+Uso:
+    from modulos.monitoreo import metricas
+
+    with metricas.cronometrar(metricas.OCR_SEGUNDOS, 'vision'):
+        ...
+"""
+
+import functools
+import logging
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.db.models import Count
+
+logger = logging.getLogger(__name__)
+
+# Límites de los histogramas (segundos)
+BUCKETS_PETICION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_LENTOS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_registro = []
+_colectores = []
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _etiquetas(nombres, valores, extra=()) -> str:
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    pares += [f'{n}="{v}"' for n, v in extra]
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _numero(valor) -> str:
+    if valor == math.inf:
+        return '+Inf'
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    tipo = ''
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._series = {}
+        self._lock = threading.Lock()
+        _registro.append(self)
+
+    def _encabezado(self) -> list:
+        return [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} {self.tipo}']
+
+    def reiniciar(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Contador(_Metrica):
+    tipo = 'counter'
+
+    def inc(self, *etiquetas, valor=1):
+        with self._lock:
+            self._series[etiquetas] = self._series.get(etiquetas, 0) + valor
+
+    def valor(self, *etiquetas):
+        return self._series.get(etiquetas, 0)
+
+    def exponer(self) -> list:
+        with self._lock:
+            series = list(self._series.items())
+        return self._encabezado() + [
+            f'{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(v)}' for clave, v in sorted(series)
+        ]
+
+
+class Indicador(Contador):
+    """Gauge: puede subir y bajar."""
+
+    tipo = 'gauge'
+
+    def dec(self, *etiquetas, valor=1):
+        self.inc(*etiquetas, valor=-valor)
+
+    def fijar(self, *etiquetas, valor):
+        with self._lock:
+            self._series[etiquetas] = valor
+
+
+class Histograma(_Metrica):
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_PETICION):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(buckets)
+
+    def observar(self, valor: float, *etiquetas):
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(etiquetas)
+            if serie is None:
+                # [conteo por bucket (no acumulado)..., +Inf], suma
+                serie = self._series[etiquetas] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def conteo(self, *etiquetas) -> int:
+        serie = self._series.get(etiquetas)
+        return sum(serie[0]) if serie else 0
+
+    def exponer(self) -> list:
+        with self._lock:
+            series = [(clave, list(conteos), suma) for clave, (conteos, suma) in self._series.items()]
+        lineas = self._encabezado()
+        for clave, conteos, suma in sorted(series):
+            acumulado = 0
+            for limite, n in zip(self.buckets + (math.inf,), conteos):
+                acumulado += n
+                etiquetas = _etiquetas(self.etiquetas, clave, [('le', _numero(limite))])
+                lineas.append(f'{self.nombre}_bucket{etiquetas} {acumulado}')
+            etiquetas = _etiquetas(self.etiquetas, clave)
+            lineas.append(f'{self.nombre}_sum{etiquetas} {_numero(round(suma, 6))}')
+            lineas.append(f'{self.nombre}_count{etiquetas} {acumulado}')
+        return lineas
+
+
+@contextmanager
+def cronometrar(histograma: Histograma, *etiquetas, errores: Contador = None):
+    """Observa la duración del bloque; si lanza excepción y hay `errores`, lo incrementa."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        if errores is not None:
+            errores.inc(*etiquetas)
+        raise
+    finally:
+        histograma.observar(time.perf_counter() - inicio, *etiquetas)
+
+
+def medido(histograma: Histograma, *etiquetas):
+    """Decorador: observa la duración de cada llamada a la función."""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with cronometrar(histograma, *etiquetas):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def colector(funcion):
+    """
+    Registra `funcion() -> [(nombre, tipo, ayuda, etiquetas, [(valores, numero), ...])]`,
+    evaluada en cada scrape. Un colector que falla no tumba el endpoint.
+    """
+    _colectores.append(funcion)
+    return funcion
+
+
+# ─── Métricas de eventos ─────────────────────────────────────────────────────
+
+HTTP_SEGUNDOS = Histograma(
+    'bitacora_http_peticion_segundos', 'Duración de las peticiones HTTP por ruta.', ('ruta', 'metodo'),
+)
+HTTP_RESPUESTAS = Contador(
+    'bitacora_http_respuestas_total', 'Respuestas HTTP por ruta, método y status.', ('ruta', 'metodo', 'status'),
+)
+HTTP_EN_CURSO = Indicador('bitacora_http_en_curso', 'Peticiones HTTP atendiéndose en este momento.')
+HTTP_SQL_SEGUNDOS = Histograma(
+    'bitacora_http_sql_segundos', 'Tiempo en consultas SQL por petición HTTP.', ('ruta',),
+)
+DB_CONSULTAS = Contador('bitacora_db_consultas_total', 'Consultas SQL ejecutadas durante peticiones HTTP.')
+
+EXTERNO_SEGUNDOS = Histograma(
+    'bitacora_externo_segundos', 'Latencia de llamadas a servicios externos.', ('servicio',), BUCKETS_LENTOS,
+)
+EXTERNO_ERRORES = Contador(
+    'bitacora_externo_errores_total', 'Llamadas a servicios externos que fallaron.', ('servicio',),
+)
+EXTERNO_RECHAZOS = Contador(
+    'bitacora_externo_rechazos_total', 'Llamadas rechazadas por circuito abierto.', ('servicio',),
+)
+
+OCR_SEGUNDOS = Histograma(
+    'bitacora_ocr_segundos', 'Duración de la lectura OCR de candados.', ('motor',), BUCKETS_LENTOS,
+)
+IA_ANALISIS_SEGUNDOS = Histograma(
+    'bitacora_ia_analisis_segundos', 'Duración de los análisis de IAKasu.', ('modulo',), BUCKETS_LENTOS,
+)
+REPORTE_SEGUNDOS = Histograma(
+    'bitacora_reporte_segundos', 'Duración de cada etapa de generación de reportes.', ('tipo', 'etapa'),
+    BUCKETS_LENTOS,
+)
+REPORTES = Contador(
+    'bitacora_reportes_total', 'Reportes generados por tipo y resultado.', ('tipo', 'resultado'),
+)
+
+
+def exponer() -> str:
+    """Texto completo para `/metrics`."""
+    lineas = []
+    for metrica in _registro:
+        lineas += metrica.exponer()
+    for funcion in _colectores:
+        try:
+            familias = funcion()
+        except Exception:
+            logger.exception('Colector de métricas %s falló', funcion.__name__)
+            continue
+        for nombre, tipo, ayuda, etiquetas, series in familias:
+            lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} {tipo}']
+            lineas += [f'{nombre}{_etiquetas(etiquetas, valores)} {_numero(n)}' for valores, n in series]
+    return '\n'.join(lineas) + '\n'
+
+
+def reiniciar():
+    """Vacía todas las series (pruebas)."""
+    for metrica in _registro:
+        metrica.reiniciar()
+
+
+# ─── Colectores (al momento del scrape) ──────────────────────────────────────
+
+@colector
+def _alertas_abiertas():
+    from modulos.almacen.models import AlertaStock
+    from modulos.combustible.models import AlertaCombustible
+
+    combustible = (
+        AlertaCombustible.objects.filter(resuelta=False)
+        .values_list('tipo_alerta').annotate(n=Count('id')).order_by('tipo_alerta')
+    )
+    stock = (
+        AlertaStock.objects.filter(resuelta=False)
+        .values_list('tipo_alerta').annotate(n=Count('id')).order_by('tipo_alerta')
+    )
+    return [
+        ('bitacora_alertas_abiertas', 'gauge', 'Alertas sin resolver por módulo y tipo.', ('modulo', 'tipo'),
+         [(('combustible', tipo), n) for tipo, n in combustible] + [(('almacen', tipo), n) for tipo, n in stock]),
+    ]
+
+
+@colector
+def _colas():
+    from modulos.ia.models import SolicitudIA
+    from modulos.notificaciones.models import NotificacionSaliente
+
+    notificaciones = (
+        NotificacionSaliente.objects.filter(estado__in=['PENDIENTE', 'REINTENTO', 'ENVIANDO'])
+        .values_list('canal', 'estado').annotate(n=Count('id')).order_by('canal', 'estado')
+    )
+    ia = (
+        SolicitudIA.objects.filter(estado__in=['PENDIENTE', 'ENVIADA'])
+        .values_list('modulo', 'estado').annotate(n=Count('id')).order_by('modulo', 'estado')
+    )
+    return [
+        ('bitacora_notificaciones_en_cola', 'gauge', 'Notificaciones del outbox aún no entregadas.',
+         ('canal', 'estado'), [((canal, estado), n) for canal, estado, n in notificaciones]),
+        ('bitacora_ia_solicitudes_en_cola', 'gauge', 'Prompts de IA en modo lote sin resolver.',
+         ('modulo', 'estado'), [((modulo, estado), n) for modulo, estado, n in ia]),
+    ]
+
+
+@colector
+def _circuitos():
+    from config.services.externos import metricas as metricas_externos
+
+    estados = ('CERRADO', 'SEMI_ABIERTO', 'ABIERTO')
+    return [
+        ('bitacora_externo_circuito_abierto', 'gauge',
+         'Estado del circuit breaker por servicio (0 cerrado, 1 semiabierto, 2 abierto).', ('servicio',),
+         [((servicio,), estados.index(m['circuito']) if m['circuito'] in estados else -1)
+          for servicio, m in sorted(metricas_externos().items())]),
+    ]
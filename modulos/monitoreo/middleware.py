@@ -0,0 +1,118 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import instrumentacion, metricas, perfilado
+
+
+class _TiempoSQL:
+    """execute_wrapper mínimo: solo cuenta consultas y suma su duración."""
+
+    __slots__ = ('consultas', 'segundos')
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos += time.perf_counter() - inicio
+            self.consultas += 1
+
+
+class MetricasMiddleware:
+    """
+    Alimenta las métricas HTTP de /metrics (modulos.monitoreo.metricas):
+    latencia por ruta, respuestas por status, peticiones en curso y tiempo SQL.
+    Va primero en MIDDLEWARE. Con METRICAS_HABILITADAS=False se descarta al arrancar.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICAS_HABILITADAS', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.excluir = tuple(getattr(settings, 'METRICAS_EXCLUIR', ()))
+
+    def __call__(self, request):
+        if self.excluir and request.path.startswith(self.excluir):
+            return self.get_response(request)
+
+        sql = _TiempoSQL()
+        metricas.HTTP_EN_CURSO.inc()
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as pila:
+                for conexion in connections.all():
+                    pila.enter_context(conexion.execute_wrapper(sql))
+                response = self.get_response(request)
+        finally:
+            metricas.HTTP_EN_CURSO.dec()
+        duracion = time.perf_counter() - inicio
+
+        ruta = instrumentacion.ruta(request)
+        metricas.HTTP_SEGUNDOS.observar(duracion, ruta, request.method)
+        metricas.HTTP_RESPUESTAS.inc(ruta, request.method, str(response.status_code))
+        metricas.HTTP_SQL_SEGUNDOS.observar(sql.segundos, ruta)
+        if sql.consultas:
+            metricas.DB_CONSULTAS.inc(valor=sql.consultas)
+        return response
+
+
+class InstrumentacionMiddleware:
+    """
+    Mide cada petición (SQL, servicios externos, latencia, N+1); ver
+    modulos.monitoreo.instrumentacion. Con INSTRUMENTACION_ACTIVA=False Django
+    lo saca de la cadena al arrancar y no cuesta nada por petición.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTACION_ACTIVA', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.excluir = tuple(getattr(settings, 'INSTRUMENTACION_EXCLUIR', ()))
+
+    def __call__(self, request):
+        if self.excluir and request.path.startswith(self.excluir):
+            return self.get_response(request)
+
+        medicion = instrumentacion.iniciar()
+        try:
+            with instrumentacion.medir_sql(medicion):
+                response = self.get_response(request)
+        finally:
+            instrumentacion.terminar()
+
+        usuario = getattr(request, 'user', None)
+        instrumentacion.registrar(instrumentacion.construir_muestra(
+            medicion,
+            ruta=instrumentacion.ruta(request),
+            metodo=request.method,
+            status=response.status_code,
+            usuario_id=usuario.pk if usuario is not None and usuario.is_authenticated else None,
+        ))
+        return response
+
+
+class PerfiladoMiddleware:
+    """
+    Perfila con cProfile la petición de un superusuario que trae ?_perfil=1
+    o el header X-Perfil: 1; ver modulos.monitoreo.perfilado. Va después de
+    AuthenticationMiddleware. Para el resto de las peticiones solo revisa el
+    parámetro y el header.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERFILADO_HABILITADO', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if perfilado.solicitado(request) and request.user.is_superuser:
+            return perfilado.perfilar(request, self.get_response)
+        return self.get_response(request)
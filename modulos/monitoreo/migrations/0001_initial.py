@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MuestraRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(db_index=True, verbose_name='Fecha')),
+                ('ruta', models.CharField(max_length=255, verbose_name='Ruta')),
+                ('metodo', models.CharField(max_length=10, verbose_name='Método')),
+                ('status', models.PositiveSmallIntegerField(verbose_name='Status')),
+                ('duracion_ms', models.PositiveIntegerField(verbose_name='Duración (ms)')),
+                ('consultas', models.PositiveIntegerField(verbose_name='Consultas SQL')),
+                ('sql_ms', models.PositiveIntegerField(verbose_name='Tiempo SQL (ms)')),
+                ('externo_ms', models.PositiveIntegerField(default=0, verbose_name='Servicios externos (ms)')),
+                ('consultas_repetidas', models.PositiveIntegerField(default=0, help_text='Consultas cuya huella se repitió INSTRUMENTACION_UMBRAL_N1 veces o más', verbose_name='Consultas repetidas (N+1)')),
+                ('duplicadas', models.JSONField(blank=True, default=list, verbose_name='Huellas repetidas')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Muestra de petición',
+                'verbose_name_plural': 'Muestras de peticiones',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['ruta', '-fecha'], name='monitoreo_ruta_fecha_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoreo', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerfilRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(db_index=True, verbose_name='Fecha')),
+                ('ruta', models.CharField(max_length=255, verbose_name='Ruta')),
+                ('url', models.CharField(max_length=500, verbose_name='URL')),
+                ('metodo', models.CharField(max_length=10, verbose_name='Método')),
+                ('status', models.PositiveSmallIntegerField(verbose_name='Status')),
+                ('duracion_ms', models.PositiveIntegerField(verbose_name='Duración (ms)')),
+                ('consultas', models.PositiveIntegerField(verbose_name='Consultas SQL')),
+                ('sql_ms', models.PositiveIntegerField(verbose_name='Tiempo SQL (ms)')),
+                ('resumen', models.JSONField(blank=True, default=list, verbose_name='Funciones con más tiempo propio')),
+                ('flama', models.JSONField(blank=True, default=list, verbose_name='Árbol de llamadas')),
+                ('trazas_sql', models.JSONField(blank=True, default=list, verbose_name='Traza SQL')),
+                ('datos', models.BinaryField(blank=True, default=b'', verbose_name='pstats (marshal)')),
+                ('tamano_bytes', models.PositiveIntegerField(default=0, verbose_name='Tamaño del perfil (bytes)')),
+                ('truncado', models.BooleanField(default=False, help_text='Se descartó el pstats (PERFILADO_MAX_KB) o se cortó la traza SQL (PERFILADO_MAX_CONSULTAS)', verbose_name='Truncado')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Perfil de petición',
+                'verbose_name_plural': 'Perfiles de peticiones',
+                'ordering': ['-fecha'],
+            },
+        ),
+    ]
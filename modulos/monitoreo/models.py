@@ -0,0 +1,111 @@
+from django.conf import settings
+from django.db import models
+from django.db.models import Avg, Count, Max, Q, Sum
+
+
+class MuestraRequestQuerySet(models.QuerySet):
+
+    def resumen_por_ruta(self):
+        """Peticiones, latencia, SQL y N+1 agrupados por ruta, de la más costosa a la menos."""
+        return (
+            self.values('ruta')
+            .annotate(
+                peticiones=Count('id'),
+                duracion_total_ms=Sum('duracion_ms'),
+                duracion_promedio_ms=Avg('duracion_ms'),
+                duracion_max_ms=Max('duracion_ms'),
+                consultas_promedio=Avg('consultas'),
+                consultas_max=Max('consultas'),
+                sql_promedio_ms=Avg('sql_ms'),
+                externo_promedio_ms=Avg('externo_ms'),
+                con_n1=Count('id', filter=Q(consultas_repetidas__gt=0)),
+            )
+            .order_by('-duracion_total_ms')
+        )
+
+
+class MuestraRequest(models.Model):
+    """
+    Medición de una petición HTTP tomada por InstrumentacionMiddleware.
+
+    Solo se guarda una fracción de las peticiones (INSTRUMENTACION_MUESTREO)
+    más todas las lentas; el resto vive únicamente en el buffer en memoria.
+    """
+
+    fecha = models.DateTimeField(db_index=True, verbose_name='Fecha')
+    ruta = models.CharField(max_length=255, verbose_name='Ruta')
+    metodo = models.CharField(max_length=10, verbose_name='Método')
+    status = models.PositiveSmallIntegerField(verbose_name='Status')
+    duracion_ms = models.PositiveIntegerField(verbose_name='Duración (ms)')
+    consultas = models.PositiveIntegerField(verbose_name='Consultas SQL')
+    sql_ms = models.PositiveIntegerField(verbose_name='Tiempo SQL (ms)')
+    externo_ms = models.PositiveIntegerField(default=0, verbose_name='Servicios externos (ms)')
+    consultas_repetidas = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Consultas repetidas (N+1)',
+        help_text='Consultas cuya huella se repitió INSTRUMENTACION_UMBRAL_N1 veces o más',
+    )
+    duplicadas = models.JSONField(default=list, blank=True, verbose_name='Huellas repetidas')
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Usuario',
+    )
+
+    objects = MuestraRequestQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Muestra de petición'
+        verbose_name_plural = 'Muestras de peticiones'
+        ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['ruta', '-fecha'], name='monitoreo_ruta_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.metodo} {self.ruta} · {self.duracion_ms} ms"
+
+
+class PerfilRequest(models.Model):
+    """
+    Perfil cProfile de una petición pedida con ?_perfil=1 por un superusuario
+    (ver modulos.monitoreo.perfilado).
+    """
+
+    fecha = models.DateTimeField(db_index=True, verbose_name='Fecha')
+    ruta = models.CharField(max_length=255, verbose_name='Ruta')
+    url = models.CharField(max_length=500, verbose_name='URL')
+    metodo = models.CharField(max_length=10, verbose_name='Método')
+    status = models.PositiveSmallIntegerField(verbose_name='Status')
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Usuario',
+    )
+    duracion_ms = models.PositiveIntegerField(verbose_name='Duración (ms)')
+    consultas = models.PositiveIntegerField(verbose_name='Consultas SQL')
+    sql_ms = models.PositiveIntegerField(verbose_name='Tiempo SQL (ms)')
+    resumen = models.JSONField(default=list, blank=True, verbose_name='Funciones con más tiempo propio')
+    flama = models.JSONField(default=list, blank=True, verbose_name='Árbol de llamadas')
+    trazas_sql = models.JSONField(default=list, blank=True, verbose_name='Traza SQL')
+    datos = models.BinaryField(blank=True, default=b'', verbose_name='pstats (marshal)')
+    tamano_bytes = models.PositiveIntegerField(default=0, verbose_name='Tamaño del perfil (bytes)')
+    truncado = models.BooleanField(
+        default=False,
+        verbose_name='Truncado',
+        help_text='Se descartó el pstats (PERFILADO_MAX_KB) o se cortó la traza SQL (PERFILADO_MAX_CONSULTAS)',
+    )
+
+    class Meta:
+        verbose_name = 'Perfil de petición'
+        verbose_name_plural = 'Perfiles de peticiones'
+        ordering = ['-fecha']
+
+    def __str__(self):
+        return f"{self.metodo} {self.url} · {self.duracion_ms} ms"
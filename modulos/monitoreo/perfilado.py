@@ -0,0 +1,229 @@
+"""
+Perfilado bajo demanda de una petición, solo para superusuarios.
+
+Un superusuario agrega `?_perfil=1` a la URL (o el header `X-Perfil: 1`) y
+PerfiladoMiddleware ejecuta esa petición bajo cProfile, con una traza de las
+consultas SQL. El resultado queda en PerfilRequest:
+
+    resumen      funciones con más tiempo propio (ncalls, tottime, cumtime)
+    flama        árbol de llamadas aplanado para el admin (estilo flame graph)
+    trazas_sql   consultas en orden de ejecución con su duración
+    datos        pstats serializado (marshal), para snakeviz / pstats.Stats
+
+La respuesta lleva el header `X-Perfil-Id` con el id del registro.
+
+Límites: una sola petición se perfila a la vez por proceso (cProfile no
+admite perfiladores simultáneos; si hay uno activo, la petición corre normal);
+`datos` se descarta si pasa de PERFILADO_MAX_KB y la traza SQL se corta en
+PERFILADO_MAX_CONSULTAS. `purgar()` borra los perfiles fuera de
+PERFILADO_RETENCION_DIAS y los que excedan PERFILADO_MAX_PERFILES.
+"""
+
+import cProfile
+import logging
+import marshal
+import pstats
+import threading
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+
+PARAMETRO = '_perfil'
+HEADER = 'HTTP_X_PERFIL'
+
+# Nodos del árbol por debajo de esta fracción del total no se muestran
+FRACCION_MINIMA = 0.01
+PROFUNDIDAD_MAXIMA = 40
+MAXIMO_NODOS = 1000
+
+
+def solicitado(request) -> bool:
+    return PARAMETRO in request.GET or request.META.get(HEADER) == '1'
+
+
+class TrazaSQL:
+    """execute_wrapper que guarda cada consulta (texto y ms) hasta `maximo`."""
+
+    def __init__(self, maximo: int):
+        self.maximo = maximo
+        self.consultas = []
+        self.total = 0
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.total += 1
+            self.segundos += duracion
+            if len(self.consultas) < self.maximo:
+                self.consultas.append({'sql': sql[:2000], 'ms': round(duracion * 1000, 2)})
+
+
+def _etiqueta(funcion) -> str:
+    archivo, linea, nombre = funcion
+    if archivo == '~':
+        return nombre  # built-in: '<built-in method ...>'
+    base = str(settings.BASE_DIR) + '/'
+    if archivo.startswith(base):
+        archivo = archivo[len(base):]
+    elif 'site-packages/' in archivo:
+        archivo = archivo.split('site-packages/', 1)[1]
+    return f'{archivo}:{linea}({nombre})'
+
+
+def resumen(estadisticas: pstats.Stats, limite: int = 40) -> list:
+    """Funciones con más tiempo propio."""
+    filas = [
+        {
+            'funcion': _etiqueta(funcion),
+            'llamadas': nc,
+            'propio_ms': round(tt * 1000, 2),
+            'acumulado_ms': round(ct * 1000, 2),
+        }
+        for funcion, (cc, nc, tt, ct, callers) in estadisticas.stats.items()
+    ]
+    filas.sort(key=lambda f: f['propio_ms'], reverse=True)
+    return filas[:limite]
+
+
+def flama(estadisticas: pstats.Stats) -> list:
+    """
+    Árbol de llamadas aplanado en preorden: [{'nivel', 'funcion', 'ms', 'pct'}].
+
+    cProfile solo guarda aristas llamador → llamado, no pilas completas: el
+    tiempo de cada hijo se reparte en proporción a lo que el padre aportó al
+    acumulado de esa función. Así cada nivel suma a lo más el total y el árbol
+    queda acotado (nodos ≥ FRACCION_MINIMA, a lo más MAXIMO_NODOS).
+    """
+    llamados = {}
+    raices = []
+    for funcion, (cc, nc, tt, ct, callers) in estadisticas.stats.items():
+        if not callers:
+            raices.append((funcion, ct))
+        for llamador, (_, _, _, ct_arista) in callers.items():
+            llamados.setdefault(llamador, []).append((funcion, ct_arista))
+
+    total = sum(ct for _, ct in raices) or 1e-9
+    minimo = total * FRACCION_MINIMA
+    filas = []
+
+    def visitar(funcion, segundos, nivel, camino):
+        if len(filas) >= MAXIMO_NODOS:
+            return
+        filas.append({
+            'nivel': nivel,
+            'funcion': _etiqueta(funcion),
+            'ms': round(segundos * 1000, 2),
+            'pct': round(100 * segundos / total, 1),
+        })
+        acumulado = estadisticas.stats[funcion][3]
+        if nivel >= PROFUNDIDAD_MAXIMA or not acumulado:
+            return
+        proporcion = min(1.0, segundos / acumulado)
+        hijos = sorted(llamados.get(funcion, ()), key=lambda h: h[1], reverse=True)
+        for hijo, ct in hijos:
+            ct *= proporcion
+            if ct >= minimo and hijo not in camino:
+                visitar(hijo, ct, nivel + 1, camino | {hijo})
+
+    for raiz, ct in sorted(raices, key=lambda r: r[1], reverse=True):
+        if ct >= minimo:
+            visitar(raiz, ct, 0, {raiz})
+    return filas
+
+
+def perfilar(request, get_response):
+    """
+    Ejecuta get_response(request) bajo cProfile y guarda el PerfilRequest.
+    Retorna la respuesta; si ya hay un perfilado en curso, la petición corre sin perfilar.
+    """
+    if not _lock.acquire(blocking=False):
+        response = get_response(request)
+        response['X-Perfil-Id'] = 'ocupado'
+        return response
+
+    try:
+        traza = TrazaSQL(getattr(settings, 'PERFILADO_MAX_CONSULTAS', 1000))
+        perfil = cProfile.Profile()
+        inicio = time.perf_counter()
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(traza))
+            perfil.enable()
+            try:
+                response = get_response(request)
+            finally:
+                perfil.disable()
+        duracion = time.perf_counter() - inicio
+    finally:
+        _lock.release()
+
+    try:
+        registro = guardar(request, response, perfil, traza, duracion)
+        response['X-Perfil-Id'] = str(registro.pk)
+    except Exception:
+        logger.exception('No se pudo guardar el perfil de %s', request.path)
+    return response
+
+
+def guardar(request, response, perfil, traza, duracion):
+    from .instrumentacion import ruta
+    from .models import PerfilRequest
+
+    estadisticas = pstats.Stats(perfil)
+    datos = marshal.dumps(estadisticas.stats)
+    tamano = len(datos)
+    truncado = tamano > getattr(settings, 'PERFILADO_MAX_KB', 2048) * 1024
+
+    return PerfilRequest.objects.create(
+        fecha=timezone.now(),
+        ruta=ruta(request),
+        url=request.get_full_path()[:500],
+        metodo=request.method,
+        status=response.status_code,
+        usuario=request.user,
+        duracion_ms=round(duracion * 1000),
+        consultas=traza.total,
+        sql_ms=round(traza.segundos * 1000),
+        resumen=resumen(estadisticas),
+        flama=flama(estadisticas),
+        trazas_sql=traza.consultas,
+        datos=b'' if truncado else datos,
+        tamano_bytes=tamano,
+        truncado=truncado or traza.total > len(traza.consultas),
+    )
+
+
+def cargar(registro) -> pstats.Stats:
+    """pstats.Stats a partir de un PerfilRequest guardado (sin archivo intermedio)."""
+    estadisticas = pstats.Stats()
+    estadisticas.stats = marshal.loads(bytes(registro.datos))
+    estadisticas.get_top_level_stats()
+    return estadisticas
+
+
+def purgar(ahora=None) -> int:
+    """Borra perfiles fuera de retención y los más viejos por encima de PERFILADO_MAX_PERFILES."""
+    from .models import PerfilRequest
+
+    ahora = ahora or timezone.now()
+    limite = ahora - timedelta(days=getattr(settings, 'PERFILADO_RETENCION_DIAS', 7))
+    borrados, _ = PerfilRequest.objects.filter(fecha__lt=limite).delete()
+
+    maximo = getattr(settings, 'PERFILADO_MAX_PERFILES', 200)
+    sobrantes = list(PerfilRequest.objects.order_by('-fecha').values_list('pk', flat=True)[maximo:])
+    if sobrantes:
+        extra, _ = PerfilRequest.objects.filter(pk__in=sobrantes).delete()
+        borrados += extra
+    return borrados
@@ -0,0 +1,355 @@
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import include, path, reverse
+from django.utils import timezone
+
+from config.services import externos
+
+from . import instrumentacion, metricas, perfilado
+from .middleware import InstrumentacionMiddleware, MetricasMiddleware
+from .models import MuestraRequest, PerfilRequest
+
+User = get_user_model()
+
+
+def _vista_n1(request, pk):
+    # Una consulta por usuario: el patrón N+1 que se quiere detectar
+    for user_id in User.objects.values_list('id', flat=True):
+        User.objects.filter(pk=user_id).exists()
+    return HttpResponse('ok')
+
+
+def _vista_externa(request):
+    with externos.protegido('google_maps'):
+        pass
+    return HttpResponse('ok')
+
+
+urlpatterns = [
+    path('n1/<int:pk>/', _vista_n1),
+    path('externa/', _vista_externa),
+    path('', include('config.urls')),
+]
+
+ACTIVA = dict(
+    INSTRUMENTACION_ACTIVA=True,
+    INSTRUMENTACION_MUESTREO=0.0,
+    INSTRUMENTACION_UMBRAL_N1=5,
+    INSTRUMENTACION_UMBRAL_LENTO_MS=10_000,
+    ROOT_URLCONF='modulos.monitoreo.tests',
+)
+
+
+class HuellaTests(TestCase):
+    def test_literales_y_listas_in_se_normalizan(self):
+        a = instrumentacion.huella("SELECT * FROM t WHERE id IN (%s, %s, %s) AND nombre = 'x' LIMIT 21")
+        b = instrumentacion.huella("SELECT *  FROM t WHERE id IN (%s) AND nombre = 'otro' LIMIT 5")
+        self.assertEqual(a, b)
+        self.assertIn('IN (…)', a)
+
+
+@override_settings(**ACTIVA)
+class InstrumentacionMiddlewareTests(TestCase):
+    def setUp(self):
+        instrumentacion.vaciar_buffer()
+        externos.reiniciar()
+        for i in range(8):
+            User.objects.create_user(username=f'usuario{i}', password='x')
+
+    def test_cuenta_consultas_y_detecta_n1(self):
+        respuesta = self.client.get('/n1/3/')
+        self.assertEqual(respuesta.status_code, 200)
+
+        muestra = instrumentacion.recientes()[-1]
+        self.assertEqual(muestra['ruta'], '/n1/<int:pk>/')
+        self.assertEqual(muestra['metodo'], 'GET')
+        self.assertEqual(muestra['consultas'], 9)
+        self.assertEqual(muestra['consultas_repetidas'], 8)
+        self.assertEqual(len(muestra['duplicadas']), 1)
+        self.assertEqual(muestra['duplicadas'][0]['veces'], 8)
+        self.assertIsNone(muestra['usuario_id'])
+
+    def test_sin_repeticiones_no_hay_n1(self):
+        with self.settings(INSTRUMENTACION_UMBRAL_N1=20):
+            self.client.get('/n1/1/')
+        muestra = instrumentacion.recientes()[-1]
+        self.assertEqual(muestra['consultas_repetidas'], 0)
+        self.assertEqual(muestra['duplicadas'], [])
+
+    def test_suma_tiempo_de_servicios_externos(self):
+        with patch('config.services.externos.time.monotonic', side_effect=[100.0, 100.25]):
+            self.client.get('/externa/')
+        self.assertEqual(instrumentacion.recientes()[-1]['externo_ms'], 250)
+        # Fuera de una petición no se acumula nada
+        self.assertIsNone(instrumentacion.medicion_actual())
+
+    def test_muestreo_guarda_en_tabla(self):
+        with self.settings(INSTRUMENTACION_MUESTREO=1.0):
+            self.client.get('/n1/2/')
+        muestra = MuestraRequest.objects.get()
+        self.assertEqual(muestra.ruta, '/n1/<int:pk>/')
+        self.assertEqual(muestra.consultas_repetidas, 8)
+
+    def test_peticion_lenta_se_registra_y_siempre_se_guarda(self):
+        with self.settings(INSTRUMENTACION_UMBRAL_LENTO_MS=0, INSTRUMENTACION_MUESTREO=0.0001), \
+                patch('modulos.monitoreo.instrumentacion.random.random', return_value=0.99), \
+                self.assertLogs('modulos.monitoreo.instrumentacion', level='WARNING') as logs:
+            self.client.get('/n1/1/')
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('peticion_lenta', logs.output[0])
+        self.assertEqual(logs.records[0].peticion['ruta'], '/n1/<int:pk>/')
+        self.assertEqual(MuestraRequest.objects.count(), 1)
+
+    def test_buffer_circular(self):
+        with self.settings(INSTRUMENTACION_BUFFER=3):
+            for _ in range(5):
+                self.client.get('/externa/')
+            self.assertEqual(len(instrumentacion.recientes()), 3)
+
+    def test_ruta_excluida_no_se_mide(self):
+        with self.settings(INSTRUMENTACION_EXCLUIR=['/externa/']):
+            self.client.get('/externa/')
+        self.assertEqual(instrumentacion.recientes(), [])
+
+
+class InstrumentacionDesactivadaTests(TestCase):
+    @override_settings(INSTRUMENTACION_ACTIVA=False)
+    def test_middleware_se_descarta(self):
+        from django.core.exceptions import MiddlewareNotUsed
+        with self.assertRaises(MiddlewareNotUsed):
+            InstrumentacionMiddleware(lambda request: HttpResponse())
+
+    @override_settings(INSTRUMENTACION_ACTIVA=False, ROOT_URLCONF='modulos.monitoreo.tests')
+    def test_no_envuelve_conexiones(self):
+        instrumentacion.vaciar_buffer()
+        self.client.get('/externa/')
+        self.assertEqual(instrumentacion.recientes(), [])
+        self.assertEqual(connection.execute_wrappers, [])
+
+
+@override_settings(INSTRUMENTACION_MUESTREO=0.0)
+class RutasAdminTests(TestCase):
+    def setUp(self):
+        instrumentacion.vaciar_buffer()
+        ahora = timezone.now()
+        base = dict(metodo='GET', status=200, sql_ms=5, externo_ms=0)
+        MuestraRequest.objects.create(fecha=ahora, ruta='/lenta/', duracion_ms=900, consultas=120,
+                                      consultas_repetidas=100, **base)
+        MuestraRequest.objects.create(fecha=ahora, ruta='/lenta/', duracion_ms=700, consultas=110, **base)
+        MuestraRequest.objects.create(fecha=ahora, ruta='/rapida/', duracion_ms=20, consultas=3, **base)
+        MuestraRequest.objects.create(fecha=ahora - timedelta(days=30), ruta='/vieja/', duracion_ms=5000,
+                                      consultas=1, **base)
+        instrumentacion.registrar(dict(
+            fecha=ahora, ruta='/memoria/', metodo='GET', status=200, duracion_ms=50, consultas=2,
+            sql_ms=1, externo_ms=0, consultas_repetidas=0, duplicadas=[], usuario_id=None,
+        ))
+
+    def test_resumen_por_ruta_ordena_por_tiempo_total(self):
+        filas = list(MuestraRequest.objects.filter(fecha__gte=timezone.now() - timedelta(days=7)).resumen_por_ruta())
+        self.assertEqual([f['ruta'] for f in filas], ['/lenta/', '/rapida/'])
+        self.assertEqual(filas[0]['peticiones'], 2)
+        self.assertEqual(filas[0]['duracion_total_ms'], 1600)
+        self.assertEqual(filas[0]['con_n1'], 1)
+
+    def test_pagina_solo_para_superusuario(self):
+        url = reverse('admin:monitoreo_muestrarequest_rutas')
+        staff = User.objects.create_user('staff', password='x', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        admin = User.objects.create_superuser('admin', 'a@x.com', 'x')
+        self.client.force_login(admin)
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([f['ruta'] for f in respuesta.context['rutas_muestreadas']], ['/lenta/', '/rapida/'])
+        self.assertEqual([f['ruta'] for f in respuesta.context['rutas_memoria']], ['/memoria/'])
+        self.assertContains(respuesta, '/lenta/')
+
+    def test_purgar_respeta_retencion(self):
+        with self.settings(INSTRUMENTACION_RETENCION_DIAS=14):
+            self.assertEqual(instrumentacion.purgar(), 1)
+        self.assertFalse(MuestraRequest.objects.filter(ruta='/vieja/').exists())
+
+
+@override_settings(ROOT_URLCONF='modulos.monitoreo.tests', PERFILADO_HABILITADO=True)
+class PerfiladoTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'a@x.com', 'x')
+        for i in range(3):
+            User.objects.create_user(username=f'usuario{i}', password='x')
+
+    def test_superusuario_con_parametro_genera_perfil(self):
+        self.client.force_login(self.admin)
+        respuesta = self.client.get('/n1/1/', {'_perfil': '1'})
+        self.assertEqual(respuesta.status_code, 200)
+
+        perfil = PerfilRequest.objects.get()
+        self.assertEqual(respuesta['X-Perfil-Id'], str(perfil.pk))
+        self.assertEqual(perfil.ruta, '/n1/<int:pk>/')
+        self.assertEqual(perfil.usuario, self.admin)
+        self.assertGreaterEqual(perfil.consultas, 5)
+        self.assertEqual(len(perfil.trazas_sql), perfil.consultas)
+        self.assertTrue(any('_vista_n1' in fila['funcion'] for fila in perfil.flama))
+        self.assertTrue(perfil.resumen)
+        self.assertIn((__file__, _vista_n1.__code__.co_firstlineno, '_vista_n1'), perfilado.cargar(perfil).stats)
+
+    def test_header_tambien_activa(self):
+        self.client.force_login(self.admin)
+        self.client.get('/externa/', HTTP_X_PERFIL='1')
+        self.assertEqual(PerfilRequest.objects.count(), 1)
+
+    def test_no_superusuario_no_perfila(self):
+        staff = User.objects.create_user('staff', password='x', is_staff=True)
+        self.client.force_login(staff)
+        respuesta = self.client.get('/n1/1/', {'_perfil': '1'})
+        self.assertNotIn('X-Perfil-Id', respuesta)
+        self.assertFalse(PerfilRequest.objects.exists())
+
+    def test_tope_de_tamano_y_consultas(self):
+        self.client.force_login(self.admin)
+        with self.settings(PERFILADO_MAX_KB=0, PERFILADO_MAX_CONSULTAS=2):
+            self.client.get('/n1/1/', {'_perfil': '1'})
+        perfil = PerfilRequest.objects.get()
+        self.assertTrue(perfil.truncado)
+        self.assertEqual(bytes(perfil.datos), b'')
+        self.assertGreater(perfil.tamano_bytes, 0)
+        self.assertEqual(len(perfil.trazas_sql), 2)
+        self.assertTrue(perfil.flama)
+
+    def test_admin_muestra_flama_y_descarga(self):
+        self.client.force_login(self.admin)
+        self.client.get('/n1/1/', {'_perfil': '1'})
+        perfil = PerfilRequest.objects.get()
+
+        detalle = self.client.get(reverse('admin:monitoreo_perfilrequest_change', args=[perfil.pk]))
+        self.assertContains(detalle, '_vista_n1')
+        descarga = self.client.get(reverse('admin:monitoreo_perfilrequest_descargar', args=[perfil.pk]))
+        self.assertEqual(descarga.status_code, 200)
+        self.assertEqual(bytes(descarga.content), bytes(PerfilRequest.objects.get().datos))
+
+    def test_purgar_por_retencion_y_maximo(self):
+        base = dict(ruta='/x/', url='/x/', metodo='GET', status=200, duracion_ms=1, consultas=0, sql_ms=0)
+        ahora = timezone.now()
+        PerfilRequest.objects.create(fecha=ahora - timedelta(days=30), **base)
+        for i in range(4):
+            PerfilRequest.objects.create(fecha=ahora - timedelta(minutes=i), **base)
+        with self.settings(PERFILADO_RETENCION_DIAS=7, PERFILADO_MAX_PERFILES=3):
+            self.assertEqual(perfilado.purgar(), 2)
+        self.assertEqual(PerfilRequest.objects.count(), 3)
+
+
+class RegistroMetricasTests(TestCase):
+    def test_formato_de_histograma_y_contador(self):
+        histograma = metricas.Histograma('prueba_segundos', 'Ayuda.', ('ruta',), buckets=(0.1, 1.0))
+        contador = metricas.Contador('prueba_total', 'Ayuda.', ('ruta',))
+        try:
+            histograma.observar(0.05, '/a/')
+            histograma.observar(0.1, '/a/')
+            histograma.observar(3.0, '/a/')
+            contador.inc('/"b"/')
+            texto = '\n'.join(histograma.exponer() + contador.exponer())
+        finally:
+            metricas._registro.remove(histograma)
+            metricas._registro.remove(contador)
+
+        self.assertIn('# TYPE prueba_segundos histogram', texto)
+        self.assertIn('prueba_segundos_bucket{ruta="/a/",le="0.1"} 2', texto)
+        self.assertIn('prueba_segundos_bucket{ruta="/a/",le="1"} 2', texto)
+        self.assertIn('prueba_segundos_bucket{ruta="/a/",le="+Inf"} 3', texto)
+        self.assertIn('prueba_segundos_count{ruta="/a/"} 3', texto)
+        self.assertIn('prueba_segundos_sum{ruta="/a/"} 3.15', texto)
+        self.assertIn('prueba_total{ruta="/\\"b\\"/"} 1', texto)
+
+    def test_cronometrar_cuenta_errores(self):
+        metricas.reiniciar()
+        with self.assertRaises(ValueError):
+            with metricas.cronometrar(metricas.OCR_SEGUNDOS, 'vision', errores=metricas.EXTERNO_ERRORES):
+                raise ValueError
+        self.assertEqual(metricas.OCR_SEGUNDOS.conteo('vision'), 1)
+        self.assertEqual(metricas.EXTERNO_ERRORES.valor('vision'), 1)
+
+    def test_seguro_entre_hilos(self):
+        import threading
+
+        metricas.reiniciar()
+
+        def trabajar():
+            for _ in range(2000):
+                metricas.HTTP_SEGUNDOS.observar(0.01, '/x/', 'GET')
+                metricas.DB_CONSULTAS.inc()
+
+        hilos = [threading.Thread(target=trabajar) for _ in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(metricas.HTTP_SEGUNDOS.conteo('/x/', 'GET'), 8000)
+        self.assertEqual(metricas.DB_CONSULTAS.valor(), 8000)
+
+
+@override_settings(ROOT_URLCONF='modulos.monitoreo.tests', METRICAS_HABILITADAS=True, METRICAS_TOKEN='secreto')
+class MetricasEndpointTests(TestCase):
+    def setUp(self):
+        metricas.reiniciar()
+        externos.reiniciar()
+        User.objects.create_user(username='usuario', password='x')
+
+    def test_peticiones_por_ruta_y_sql(self):
+        self.client.get('/n1/7/')
+        self.client.get('/n1/8/')
+        self.assertEqual(metricas.HTTP_SEGUNDOS.conteo('/n1/<int:pk>/', 'GET'), 2)
+        self.assertEqual(metricas.HTTP_RESPUESTAS.valor('/n1/<int:pk>/', 'GET', '200'), 2)
+        self.assertEqual(metricas.HTTP_SQL_SEGUNDOS.conteo('/n1/<int:pk>/'), 2)
+        self.assertEqual(metricas.DB_CONSULTAS.valor(), 4)
+        self.assertEqual(metricas.HTTP_EN_CURSO.valor(), 0)
+
+    def test_servicios_externos(self):
+        self.client.get('/externa/')
+        self.assertEqual(metricas.EXTERNO_SEGUNDOS.conteo('google_maps'), 1)
+
+    def test_endpoint_con_token(self):
+        self.client.get('/externa/')
+        respuesta = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta['Content-Type'].startswith('text/plain; version=0.0.4'))
+        texto = respuesta.content.decode()
+        self.assertIn('bitacora_http_peticion_segundos_count{ruta="/externa/",metodo="GET"} 1', texto)
+        self.assertIn('# TYPE bitacora_alertas_abiertas gauge', texto)
+        self.assertIn('# TYPE bitacora_notificaciones_en_cola gauge', texto)
+        self.assertIn('bitacora_externo_circuito_abierto{servicio="google_maps"} 0', texto)
+        # /metrics no se mide a sí mismo
+        self.assertNotIn('ruta="/metrics"', texto)
+
+    def test_endpoint_sin_token_ni_superusuario(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer otro').status_code, 403)
+        self.client.force_login(User.objects.create_superuser('admin', 'a@x.com', 'x'))
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    def test_costo_por_peticion_menor_a_50_microsegundos(self):
+        from django.http import HttpRequest
+        from django.urls import resolve
+
+        request = HttpRequest()
+        request.method = 'GET'
+        request.path = '/externa/'
+        request.resolver_match = resolve('/externa/')
+        respuesta = HttpResponse()
+        directo = lambda req: respuesta  # noqa: E731
+        medido = MetricasMiddleware(directo)
+
+        def costo(funcion, veces=5000):
+            inicio = time.perf_counter()
+            for _ in range(veces):
+                funcion(request)
+            return (time.perf_counter() - inicio) / veces
+
+        costo(medido, 500)  # calentamiento
+        extra = min(costo(medido) - costo(directo) for _ in range(3))
+        self.assertLess(extra, 50e-6)
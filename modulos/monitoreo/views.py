@@ -0,0 +1,21 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from . import metricas
+
+
+def metricas_prometheus(request):
+    """
+    /metrics en formato de texto de Prometheus.
+
+    Con METRICAS_TOKEN definido se exige `Authorization: Bearer <token>`
+    (el scraper no tiene sesión); un superusuario con sesión siempre puede verlo.
+    """
+    token = getattr(settings, 'METRICAS_TOKEN', '')
+    autorizacion = request.META.get('HTTP_AUTHORIZATION', '')
+    por_token = bool(token) and hmac.compare_digest(autorizacion, f'Bearer {token}')
+    if not por_token and not request.user.is_superuser:
+        return HttpResponseForbidden('Se requiere METRICAS_TOKEN o sesión de superusuario.')
+    return HttpResponse(metricas.exponer(), content_type='text/plain; version=0.0.4; charset=utf-8')
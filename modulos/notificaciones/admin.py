@@ -0,0 +1,54 @@
+from django.contrib import admin, messages
+
+from .models import NotificacionSaliente, SesionWhatsApp
+from .monitor import verificar_sesion
+from .services import reintentar
+
+
+@admin.register(NotificacionSaliente)
+class NotificacionSalienteAdmin(admin.ModelAdmin):
+    list_display = [
+        'id', 'canal', 'destinatario', 'asunto', 'estado', 'intentos',
+        'modelo', 'objeto_id', 'creada_en', 'enviada_en',
+    ]
+    list_filter = ['estado', 'canal', 'modelo']
+    search_fields = ['destinatario', 'asunto', 'clave_dedup', 'objeto_id']
+    readonly_fields = [
+        'canal', 'destinatario', 'asunto', 'payload', 'clave_dedup', 'modelo', 'objeto_id',
+        'estado', 'intentos', 'proximo_intento', 'ultimo_error', 'enviada_en',
+        'creada_en', 'actualizada_en',
+    ]
+    date_hierarchy = 'creada_en'
+    actions = ['reintentar_seleccionadas']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Reintentar notificaciones seleccionadas')
+    def reintentar_seleccionadas(self, request, queryset):
+        total = reintentar(queryset)
+        messages.success(request, f'{total} notificación(es) devueltas a la cola.')
+
+
+@admin.register(SesionWhatsApp)
+class SesionWhatsAppAdmin(admin.ModelAdmin):
+    list_display = [
+        'sesion', 'estado', 'lista', 'verificada_en', 'lista_desde',
+        'reinicio_solicitado_en', 'reinicios_consecutivos',
+    ]
+    readonly_fields = [
+        'sesion', 'estado', 'lista', 'verificada_en', 'lista_desde',
+        'reinicio_solicitado_en', 'reinicios_consecutivos', 'ultimo_error',
+    ]
+    actions = ['verificar_ahora']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Verificar sesión ahora')
+    def verificar_ahora(self, request, queryset):
+        sesion = verificar_sesion()
+        if sesion is None:
+            messages.warning(request, 'WAHA no está configurado (WA_API_URL / WA_API_KEY / WA_SESSION_ID).')
+        else:
+            messages.success(request, f'Sesión {sesion.sesion}: {sesion.estado}.')
@@ -0,0 +1,102 @@
+"""
+Canales de entrega del outbox de notificaciones.
+
+Cada canal sabe entregar el `payload` de una NotificacionSaliente por un
+medio concreto. La clase de cada canal se configura en
+settings.NOTIFICACIONES_CANALES (ruta importable), igual que EMAIL_BACKEND,
+para que las pruebas usen CanalMemoria sin tocar Twilio, WAHA ni SMTP.
+
+Un canal señala un fallo lanzando cualquier excepción desde `enviar()`;
+el worker la registra y programa el reintento.
+"""
+
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Canal:
+    """Interfaz base de un canal de entrega."""
+
+    def __init__(self, codigo: str = ''):
+        self.codigo = codigo
+
+    def disponible(self) -> bool:
+        """False difiere todo el lote del canal sin consumir intentos."""
+        return True
+
+    def enviar(self, payload: dict, destinatario: str) -> None:
+        raise NotImplementedError
+
+
+class CanalTwilioWhatsApp(Canal):
+    """Plantillas WhatsApp (Content API) vía Twilio."""
+
+    def disponible(self):
+        from config.services.externos import breaker
+        return not breaker('twilio').abierto()
+
+    def enviar(self, payload, destinatario):
+        from config.services import twilio_service
+
+        twilio_service.crear_mensaje_wa(
+            from_=settings.TWILIO_WHATSAPP_FROM,
+            to=payload['to'],
+            content_sid=payload['content_sid'],
+            content_variables=json.dumps(payload['variables'], ensure_ascii=False),
+        )
+
+
+class CanalWahaWhatsApp(Canal):
+    """Mensajes de texto libre vía WAHA (WhatsApp HTTP API)."""
+
+    def disponible(self):
+        # Estado cacheado por el monitor de salud; no consulta WAHA
+        from config.services.externos import breaker
+        from .monitor import sesion_lista
+        return sesion_lista() and not breaker('waha').abierto()
+
+    def enviar(self, payload, destinatario):
+        from config.services.whatsapp_service import enviar_texto
+        enviar_texto(destinatario, payload['texto'])
+
+
+class CanalEmail(Canal):
+    """Correo electrónico con el EMAIL_BACKEND configurado (SendGrid SMTP)."""
+
+    def enviar(self, payload, destinatario):
+        msg = EmailMultiAlternatives(
+            subject=payload['asunto'],
+            body=payload['cuerpo'],
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=payload['destinatarios'],
+        )
+        if payload.get('html'):
+            msg.attach_alternative(payload['html'], 'text/html')
+        for adjunto in payload.get('adjuntos', []):
+            with import_string(adjunto['storage'])().open(adjunto['archivo'], 'rb') as archivo:
+                msg.attach(adjunto['nombre'], archivo.read(), adjunto['tipo'])
+        msg.send(fail_silently=False)
+
+
+class CanalMemoria(Canal):
+    """
+    Canal local para pruebas: guarda cada entrega en `CanalMemoria.bandeja`.
+
+    Si el payload trae `'_fallar': True` lanza error, para ejercitar reintentos.
+    """
+
+    bandeja = []
+    _lock = threading.Lock()
+
+    def enviar(self, payload, destinatario):
+        if payload.get('_fallar'):
+            raise RuntimeError('Fallo simulado por CanalMemoria')
+        with self._lock:
+            self.bandeja.append({'canal': self.codigo, 'destinatario': destinatario, 'payload': payload})
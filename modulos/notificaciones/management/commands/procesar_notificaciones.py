@@ -0,0 +1,38 @@
+"""
+Management command: procesar_notificaciones
+
+Entrega las notificaciones pendientes del outbox (WhatsApp Twilio, WAHA, email).
+El scheduler lo ejecuta periódicamente; también puede correrse a mano:
+
+    python manage.py procesar_notificaciones
+    python manage.py procesar_notificaciones --continuo   # ciclo hasta Ctrl+C
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from modulos.notificaciones.services import procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = 'Entrega las notificaciones pendientes del outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limite', type=int, default=100, help='Máximo de notificaciones por lote')
+        parser.add_argument(
+            '--continuo', action='store_true',
+            help='Procesa lotes indefinidamente, esperando --intervalo segundos entre ciclos',
+        )
+        parser.add_argument('--intervalo', type=int, default=10, help='Segundos entre ciclos (con --continuo)')
+
+    def handle(self, *args, **options):
+        while True:
+            conteo = procesar_pendientes(limite=options['limite'])
+            self.stdout.write(
+                f"Enviadas: {conteo['enviadas']}  Reintento: {conteo['reintento']}  "
+                f"Fallidas: {conteo['fallidas']}  Diferidas: {conteo['diferidas']}"
+            )
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
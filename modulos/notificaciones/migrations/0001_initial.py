@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacionSaliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('canal', models.CharField(choices=[('TWILIO_WA', 'WhatsApp (Twilio)'), ('WAHA_WA', 'WhatsApp (WAHA)'), ('EMAIL', 'Correo electrónico')], max_length=20, verbose_name='Canal')),
+                ('destinatario', models.CharField(max_length=300, verbose_name='Destinatario')),
+                ('asunto', models.CharField(blank=True, max_length=300, verbose_name='Asunto / resumen')),
+                ('payload', models.JSONField(default=dict, help_text='Datos específicos del canal (variables de plantilla, texto, cuerpo del correo)', verbose_name='Contenido')),
+                ('clave_dedup', models.CharField(blank=True, max_length=200, null=True, unique=True, verbose_name='Clave de deduplicación')),
+                ('modelo', models.CharField(blank=True, max_length=100, verbose_name='Modelo origen')),
+                ('objeto_id', models.CharField(blank=True, max_length=100, verbose_name='ID origen')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('ENVIANDO', 'Enviando'), ('ENVIADA', 'Enviada'), ('REINTENTO', 'Error — se reintentará'), ('FALLIDA', 'Fallida')], default='PENDIENTE', max_length=10, verbose_name='Estado')),
+                ('intentos', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próximo intento')),
+                ('ultimo_error', models.TextField(blank=True, verbose_name='Último error')),
+                ('enviada_en', models.DateTimeField(blank=True, null=True, verbose_name='Enviada en')),
+                ('creada_en', models.DateTimeField(auto_now_add=True, verbose_name='Creada en')),
+                ('actualizada_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Notificación saliente',
+                'verbose_name_plural': 'Notificaciones salientes',
+                'ordering': ['-creada_en'],
+                'indexes': [models.Index(fields=['estado', 'proximo_intento'], name='notificacio_estado_ed0a4e_idx'), models.Index(fields=['modelo', 'objeto_id'], name='notificacio_modelo_f72cfa_idx'), models.Index(fields=['-creada_en'], name='notificacio_creada__a6e914_idx')],
+            },
+        ),
+    ]
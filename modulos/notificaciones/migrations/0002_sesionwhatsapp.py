@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notificaciones', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SesionWhatsApp',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sesion', models.CharField(max_length=100, unique=True, verbose_name='Sesión WAHA')),
+                ('estado', models.CharField(default='unknown', max_length=30, verbose_name='Estado reportado')),
+                ('lista', models.BooleanField(default=False, verbose_name='Lista para enviar')),
+                ('verificada_en', models.DateTimeField(blank=True, null=True, verbose_name='Última verificación')),
+                ('lista_desde', models.DateTimeField(blank=True, null=True, verbose_name='Activa desde')),
+                ('reinicio_solicitado_en', models.DateTimeField(blank=True, null=True, verbose_name='Último reinicio solicitado')),
+                ('reinicios_consecutivos', models.PositiveSmallIntegerField(default=0, verbose_name='Reinicios consecutivos')),
+                ('ultimo_error', models.TextField(blank=True, verbose_name='Último error')),
+            ],
+            options={
+                'verbose_name': 'Sesión WhatsApp (WAHA)',
+                'verbose_name_plural': 'Sesiones WhatsApp (WAHA)',
+            },
+        ),
+    ]
@@ -0,0 +1,108 @@
+from django.db import models
+from django.utils import timezone
+
+
+class NotificacionSalienteQuerySet(models.QuerySet):
+
+    def de_objeto(self, obj):
+        """Notificaciones asociadas a un objeto de negocio (bitácora, carga, orden...)."""
+        return self.filter(modelo=obj._meta.label, objeto_id=str(obj.pk))
+
+    def listas_para_envio(self, ahora=None):
+        ahora = ahora or timezone.now()
+        return self.filter(
+            estado__in=['PENDIENTE', 'REINTENTO'],
+            proximo_intento__lte=ahora,
+        )
+
+
+class NotificacionSaliente(models.Model):
+    """
+    Outbox de notificaciones (WhatsApp Twilio, WhatsApp WAHA, email).
+
+    Se escribe en la misma transacción que el cambio de negocio que la origina;
+    el worker de `modulos.notificaciones.services` la entrega fuera del request.
+    """
+
+    CANAL_CHOICES = [
+        ('TWILIO_WA', 'WhatsApp (Twilio)'),
+        ('WAHA_WA',   'WhatsApp (WAHA)'),
+        ('EMAIL',     'Correo electrónico'),
+    ]
+
+    ESTADO_CHOICES = [
+        ('PENDIENTE', 'Pendiente'),
+        ('ENVIANDO',  'Enviando'),
+        ('ENVIADA',   'Enviada'),
+        ('REINTENTO', 'Error — se reintentará'),
+        ('FALLIDA',   'Fallida'),
+    ]
+
+    canal = models.CharField(max_length=20, choices=CANAL_CHOICES, verbose_name='Canal')
+    destinatario = models.CharField(max_length=300, verbose_name='Destinatario')
+    asunto = models.CharField(max_length=300, blank=True, verbose_name='Asunto / resumen')
+    payload = models.JSONField(
+        default=dict,
+        verbose_name='Contenido',
+        help_text='Datos específicos del canal (variables de plantilla, texto, cuerpo del correo)',
+    )
+    clave_dedup = models.CharField(
+        max_length=200,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name='Clave de deduplicación',
+    )
+
+    # Objeto de negocio que originó la notificación (bitácora, carga, orden...)
+    modelo = models.CharField(max_length=100, blank=True, verbose_name='Modelo origen')
+    objeto_id = models.CharField(max_length=100, blank=True, verbose_name='ID origen')
+
+    estado = models.CharField(
+        max_length=10, choices=ESTADO_CHOICES, default='PENDIENTE', verbose_name='Estado'
+    )
+    intentos = models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')
+    proximo_intento = models.DateTimeField(default=timezone.now, verbose_name='Próximo intento')
+    ultimo_error = models.TextField(blank=True, verbose_name='Último error')
+    enviada_en = models.DateTimeField(null=True, blank=True, verbose_name='Enviada en')
+    creada_en = models.DateTimeField(auto_now_add=True, verbose_name='Creada en')
+    actualizada_en = models.DateTimeField(auto_now=True)
+
+    objects = NotificacionSalienteQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Notificación saliente'
+        verbose_name_plural = 'Notificaciones salientes'
+        ordering = ['-creada_en']
+        indexes = [
+            models.Index(fields=['estado', 'proximo_intento']),
+            models.Index(fields=['modelo', 'objeto_id']),
+            models.Index(fields=['-creada_en']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_canal_display()} → {self.destinatario} ({self.get_estado_display()})"
+
+
+class SesionWhatsApp(models.Model):
+    """
+    Último estado conocido de la sesión WAHA, mantenido por el monitor de salud.
+
+    Los envíos no consultan WAHA: leen este registro (vía caché) en O(1).
+    """
+
+    sesion = models.CharField(max_length=100, unique=True, verbose_name='Sesión WAHA')
+    estado = models.CharField(max_length=30, default='unknown', verbose_name='Estado reportado')
+    lista = models.BooleanField(default=False, verbose_name='Lista para enviar')
+    verificada_en = models.DateTimeField(null=True, blank=True, verbose_name='Última verificación')
+    lista_desde = models.DateTimeField(null=True, blank=True, verbose_name='Activa desde')
+    reinicio_solicitado_en = models.DateTimeField(null=True, blank=True, verbose_name='Último reinicio solicitado')
+    reinicios_consecutivos = models.PositiveSmallIntegerField(default=0, verbose_name='Reinicios consecutivos')
+    ultimo_error = models.TextField(blank=True, verbose_name='Último error')
+
+    class Meta:
+        verbose_name = 'Sesión WhatsApp (WAHA)'
+        verbose_name_plural = 'Sesiones WhatsApp (WAHA)'
+
+    def __str__(self):
+        return f"{self.sesion}: {self.estado}"
@@ -0,0 +1,146 @@
+"""
+Monitor de salud de la sesión WAHA (WhatsApp HTTP API).
+
+El scheduler llama a `verificar_sesion()` cada WA_MONITOR_INTERVALO_SEGUNDOS:
+consulta el estado de la sesión, lo guarda en SesionWhatsApp y en la caché, y
+si la sesión está caída solicita el reinicio (con backoff entre intentos) sin
+esperar a que termine; el siguiente ciclo verá el resultado.
+
+Los envíos solo leen el estado cacheado con `sesion_lista()` — nunca consultan
+WAHA ni duermen dentro del request. Si la sesión no está lista, el mensaje se
+queda en el outbox hasta que el monitor la vea activa de nuevo.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import NotificacionSaliente, SesionWhatsApp
+
+logger = logging.getLogger(__name__)
+
+# Estados que indican sesión activa (varía según versión de WAHA)
+ESTADOS_ACTIVOS = {'ready', 'working'}
+# Estados que se pueden reiniciar
+ESTADOS_REINICIABLES = {'disconnected', 'stopped', 'failed'}
+# Estados transitorios — no tocar
+ESTADOS_TRANSITORIOS = {'initializing', 'authenticating', 'qr_ready', 'starting', 'scan_qr_code'}
+
+_SIN_REGISTRO = {}
+
+
+def _clave_cache(sesion: str) -> str:
+    return f"notificaciones:waha:{sesion}"
+
+
+def _ttl_cache() -> int:
+    return 2 * getattr(settings, 'WA_MONITOR_INTERVALO_SEGUNDOS', 30)
+
+
+def _esta_lista(estado: str) -> bool:
+    """
+    Igual que el antiguo _ensure_session_ready: 'unknown' o estados no
+    catalogados se tratan como disponibles (el error real saldrá en el envío).
+    """
+    return estado not in ESTADOS_TRANSITORIOS and estado not in ESTADOS_REINICIABLES
+
+
+def _a_cache(sesion: SesionWhatsApp) -> dict:
+    return {
+        'estado': sesion.estado,
+        'lista': sesion.lista,
+        'verificada_en': sesion.verificada_en,
+    }
+
+
+def estado_sesion() -> dict | None:
+    """Último estado conocido de la sesión configurada (caché → tabla). None si nunca se verificó."""
+    nombre = getattr(settings, 'WA_SESSION_ID', '')
+    clave = _clave_cache(nombre)
+    estado = cache.get(clave)
+    if estado is None:
+        sesion = SesionWhatsApp.objects.filter(sesion=nombre).first()
+        estado = _a_cache(sesion) if sesion else _SIN_REGISTRO
+        cache.set(clave, estado, _ttl_cache())
+    return estado or None
+
+
+def sesion_lista() -> bool:
+    """True si se puede enviar por WAHA según el último estado conocido."""
+    estado = estado_sesion()
+    return estado is None or estado['lista']
+
+
+def _espera_reinicio(reinicios: int) -> timedelta:
+    base = getattr(settings, 'WA_MONITOR_REINICIO_BASE_SEGUNDOS', 60)
+    maximo = getattr(settings, 'WA_MONITOR_REINICIO_MAX_SEGUNDOS', 900)
+    return timedelta(seconds=min(base * (2 ** reinicios), maximo))
+
+
+def _liberar_diferidas(ahora) -> int:
+    """Adelanta los mensajes WAHA que el worker difirió por sesión no disponible."""
+    from .services import despertar_worker
+
+    liberadas = NotificacionSaliente.objects.filter(
+        canal='WAHA_WA',
+        estado='REINTENTO',
+        proximo_intento__gt=ahora,
+        ultimo_error__startswith='Canal WAHA_WA no disponible',
+    ).update(proximo_intento=ahora)
+    if liberadas:
+        despertar_worker()
+    return liberadas
+
+
+def verificar_sesion() -> SesionWhatsApp | None:
+    """
+    Un ciclo del monitor: consulta WAHA, persiste el estado y, si hace falta,
+    solicita el reinicio de la sesión. Devuelve el registro actualizado.
+    """
+    from config.services import whatsapp_service
+
+    nombre = getattr(settings, 'WA_SESSION_ID', '')
+    if not (getattr(settings, 'WA_API_URL', '') and getattr(settings, 'WA_API_KEY', '') and nombre):
+        return None
+
+    estado = whatsapp_service._session_status()
+    ahora = timezone.now()
+
+    sesion, _ = SesionWhatsApp.objects.get_or_create(sesion=nombre)
+    estaba_lista = sesion.lista
+    sesion.estado = estado
+    sesion.lista = _esta_lista(estado)
+    sesion.verificada_en = ahora
+
+    if sesion.lista:
+        if not estaba_lista or sesion.lista_desde is None:
+            sesion.lista_desde = ahora
+        if estado in ESTADOS_ACTIVOS:
+            sesion.reinicios_consecutivos = 0
+            sesion.ultimo_error = ''
+    else:
+        sesion.lista_desde = None
+        if estado in ESTADOS_REINICIABLES:
+            ultimo = sesion.reinicio_solicitado_en
+            if ultimo is None or ahora - ultimo >= _espera_reinicio(sesion.reinicios_consecutivos):
+                logger.warning("Sesión WhatsApp %s — solicitando reinicio.", estado)
+                try:
+                    whatsapp_service.iniciar_sesion()
+                except whatsapp_service.WhatsAppError as exc:
+                    sesion.ultimo_error = str(exc)[:2000]
+                    logger.error("Error al iniciar sesión WhatsApp: %s", exc)
+                sesion.reinicio_solicitado_en = ahora
+                sesion.reinicios_consecutivos += 1
+        else:
+            logger.warning("Sesión WhatsApp en estado transitorio '%s'.", estado)
+
+    sesion.save()
+    cache.set(_clave_cache(nombre), _a_cache(sesion), _ttl_cache())
+
+    if sesion.lista and not estaba_lista:
+        logger.info("Sesión WhatsApp activa (%s).", estado)
+        _liberar_diferidas(ahora)
+    return sesion
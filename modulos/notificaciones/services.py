@@ -0,0 +1,362 @@
+"""
+Outbox de notificaciones: encolado transaccional y worker de entrega.
+
+Los módulos de negocio llaman a `encolar()` (o a los atajos `encolar_email`
+y `encolar_whatsapp`) dentro de la misma transacción que el cambio que
+origina el aviso. La entrega real a Twilio / WAHA / SMTP ocurre después, en
+`procesar_pendientes()`, que se ejecuta:
+
+  - desde el scheduler de APScheduler cada NOTIFICACIONES_INTERVALO_SEGUNDOS,
+  - con `python manage.py procesar_notificaciones`,
+  - y en un hilo de fondo justo después del commit (entrega inmediata).
+
+Cada canal tiene su propio pool de hilos (concurrencia) y un limitador de
+tasa por minuto; los fallos se reintentan con backoff exponencial hasta
+NOTIFICACIONES_MAX_INTENTOS.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import NotificacionSaliente
+
+logger = logging.getLogger(__name__)
+
+_CANALES_DEFAULT = {
+    'TWILIO_WA': {
+        'BACKEND': 'modulos.notificaciones.canales.CanalTwilioWhatsApp',
+        'CONCURRENCIA': 2,
+        'POR_MINUTO': 60,
+    },
+    'WAHA_WA': {
+        'BACKEND': 'modulos.notificaciones.canales.CanalWahaWhatsApp',
+        'CONCURRENCIA': 1,
+        'POR_MINUTO': 20,
+    },
+    'EMAIL': {
+        'BACKEND': 'modulos.notificaciones.canales.CanalEmail',
+        'CONCURRENCIA': 2,
+        'POR_MINUTO': 120,
+    },
+}
+
+# Un registro en ENVIANDO más viejo que esto se considera huérfano (worker caído)
+_ENVIANDO_HUERFANO_MINUTOS = 10
+
+
+def _config(nombre, default):
+    return getattr(settings, nombre, default)
+
+
+def _config_canal(canal: str) -> dict:
+    canales = _config('NOTIFICACIONES_CANALES', _CANALES_DEFAULT)
+    return {**_CANALES_DEFAULT.get(canal, {}), **canales.get(canal, {})}
+
+
+def obtener_canal(canal: str):
+    """Instancia la clase de canal configurada para `canal`."""
+    clase = import_string(_config_canal(canal)['BACKEND'])
+    return clase(canal)
+
+
+# ---------------------------------------------------------------------------
+# Limitador de tasa (token bucket por canal, compartido en el proceso)
+# ---------------------------------------------------------------------------
+
+class LimitadorTasa:
+    """Token bucket: permite `por_minuto` entregas por minuto con ráfaga igual a la concurrencia."""
+
+    def __init__(self, por_minuto: int, rafaga: int = 1):
+        self.intervalo = 60.0 / por_minuto if por_minuto else 0.0
+        self.capacidad = max(1, rafaga)
+        self.tokens = float(self.capacidad)
+        self.ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self) -> None:
+        if not self.intervalo:
+            return
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self.tokens = min(
+                    self.capacidad, self.tokens + (ahora - self.ultimo) / self.intervalo
+                )
+                self.ultimo = ahora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                espera = (1 - self.tokens) * self.intervalo
+            time.sleep(espera)
+
+
+_limitadores = {}
+_limitadores_lock = threading.Lock()
+
+
+def _limitador(canal: str) -> LimitadorTasa:
+    config = _config_canal(canal)
+    clave = (canal, config.get('POR_MINUTO'), config.get('CONCURRENCIA'))
+    with _limitadores_lock:
+        if clave not in _limitadores:
+            _limitadores[clave] = LimitadorTasa(
+                config.get('POR_MINUTO') or 0, config.get('CONCURRENCIA') or 1
+            )
+        return _limitadores[clave]
+
+
+# ---------------------------------------------------------------------------
+# Encolado
+# ---------------------------------------------------------------------------
+
+def clave_dedup(*partes, ventana: int | None = None) -> str:
+    """
+    Arma una clave de deduplicación a partir de `partes`.
+
+    Con `ventana` (segundos) la clave cambia cada ventana: útil para envíos
+    manuales, donde un doble clic no debe duplicar pero un reenvío posterior sí.
+    """
+    piezas = [str(p) for p in partes]
+    if ventana:
+        piezas.append(f"t{int(time.time() // ventana)}")
+    clave = ':'.join(piezas)
+    if len(clave) > 200:
+        clave = f"{clave[:150]}:{hashlib.sha256(clave.encode()).hexdigest()[:40]}"
+    return clave
+
+
+def encolar(canal: str, destinatario: str, payload: dict, *, asunto: str = '',
+            clave_dedup: str | None = None, origen=None):
+    """
+    Registra una notificación en el outbox.
+
+    Debe llamarse dentro de la transacción del cambio de negocio: si esa
+    transacción hace rollback, la notificación tampoco existe.
+
+    Returns:
+        (NotificacionSaliente, creada). `creada` es False si la clave de
+        deduplicación ya estaba registrada.
+    """
+    campos = {
+        'canal': canal,
+        'destinatario': destinatario[:300],
+        'asunto': asunto[:300],
+        'payload': payload,
+    }
+    if origen is not None:
+        campos['modelo'] = origen._meta.label
+        campos['objeto_id'] = str(origen.pk)
+
+    if clave_dedup:
+        notificacion, creada = NotificacionSaliente.objects.get_or_create(
+            clave_dedup=clave_dedup, defaults=campos,
+        )
+    else:
+        notificacion, creada = NotificacionSaliente.objects.create(**campos), True
+
+    if creada and _config('NOTIFICACIONES_ENTREGA_INMEDIATA', True):
+        transaction.on_commit(despertar_worker)
+    return notificacion, creada
+
+
+def encolar_email(destinatarios: list, asunto: str, cuerpo: str, html: str = '', *,
+                  adjuntos: list | None = None, clave_dedup: str | None = None, origen=None):
+    """
+    Atajo para encolar un correo (un solo registro con todos los destinatarios).
+
+    `adjuntos` son referencias a archivos ya guardados, no su contenido:
+    [{'storage': ruta importable de una función que devuelve el storage,
+      'archivo': nombre en ese storage, 'nombre': nombre del adjunto, 'tipo': mimetype}].
+    CanalEmail los lee al momento de entregar.
+    """
+    destinatarios = [d for d in destinatarios if d]
+    if not destinatarios:
+        return None, False
+    payload = {'asunto': asunto, 'cuerpo': cuerpo, 'destinatarios': destinatarios}
+    if html:
+        payload['html'] = html
+    if adjuntos:
+        payload['adjuntos'] = adjuntos
+    return encolar(
+        'EMAIL', ', '.join(destinatarios), payload,
+        asunto=asunto, clave_dedup=clave_dedup, origen=origen,
+    )
+
+
+def encolar_whatsapp(texto: str, numeros: list | None = None, *, asunto: str = '',
+                     clave_dedup: str | None = None, origen=None) -> list:
+    """
+    Encola un mensaje WAHA por cada número (o por cada WA_ALLOWED_NUMBERS si None).
+
+    Returns la lista de NotificacionSaliente creadas.
+    """
+    if numeros is None:
+        numeros = _config('WA_ALLOWED_NUMBERS', [])
+    creadas = []
+    for numero in numeros:
+        clave = f"{clave_dedup}:{numero}" if clave_dedup else None
+        notificacion, creada = encolar(
+            'WAHA_WA', numero, {'texto': texto},
+            asunto=asunto, clave_dedup=clave, origen=origen,
+        )
+        if creada:
+            creadas.append(notificacion)
+    return creadas
+
+
+# ---------------------------------------------------------------------------
+# Worker de entrega
+# ---------------------------------------------------------------------------
+
+def _espera_reintento(intentos: int) -> timedelta:
+    base = _config('NOTIFICACIONES_REINTENTO_BASE_SEGUNDOS', 30)
+    maximo = _config('NOTIFICACIONES_REINTENTO_MAX_SEGUNDOS', 3600)
+    return timedelta(seconds=min(base * (2 ** max(intentos - 1, 0)), maximo))
+
+
+def _reclamar_lote(limite: int) -> list:
+    """Marca como ENVIANDO hasta `limite` notificaciones listas y las devuelve."""
+    ahora = timezone.now()
+
+    NotificacionSaliente.objects.filter(
+        estado='ENVIANDO',
+        actualizada_en__lt=ahora - timedelta(minutes=_ENVIANDO_HUERFANO_MINUTOS),
+    ).update(estado='REINTENTO', proximo_intento=ahora)
+
+    with transaction.atomic():
+        qs = NotificacionSaliente.objects.listas_para_envio(ahora).order_by('proximo_intento')
+        if connection.features.has_select_for_update_skip_locked:
+            qs = qs.select_for_update(skip_locked=True)
+        lote = list(qs[:limite])
+        NotificacionSaliente.objects.filter(pk__in=[n.pk for n in lote]).update(
+            estado='ENVIANDO', actualizada_en=ahora,
+        )
+    return lote
+
+
+def _entregar(canal_obj, notificacion):
+    """Ejecutado en el pool del canal. Devuelve (notificacion, error | None)."""
+    try:
+        _limitador(notificacion.canal).adquirir()
+        canal_obj.enviar(notificacion.payload, notificacion.destinatario)
+        return notificacion, None
+    except Exception as exc:
+        return notificacion, exc
+
+
+def procesar_pendientes(limite: int = 100) -> dict:
+    """
+    Entrega un lote de notificaciones pendientes.
+
+    Returns dict con los conteos 'enviadas', 'reintento', 'fallidas' y 'diferidas'.
+    """
+    conteo = {'enviadas': 0, 'reintento': 0, 'fallidas': 0, 'diferidas': 0}
+    lote = _reclamar_lote(limite)
+    if not lote:
+        return conteo
+
+    por_canal = {}
+    for notificacion in lote:
+        por_canal.setdefault(notificacion.canal, []).append(notificacion)
+
+    pools, futuros = [], []
+    ahora = timezone.now()
+    for canal, notificaciones in por_canal.items():
+        try:
+            canal_obj = obtener_canal(canal)
+            disponible = canal_obj.disponible()
+        except Exception:
+            logger.exception("Notificaciones: canal %s no se pudo inicializar", canal)
+            disponible = False
+
+        if not disponible:
+            espera = _config('NOTIFICACIONES_ESPERA_CANAL_NO_DISPONIBLE_SEGUNDOS', 60)
+            NotificacionSaliente.objects.filter(pk__in=[n.pk for n in notificaciones]).update(
+                estado='REINTENTO',
+                proximo_intento=ahora + timedelta(seconds=espera),
+                ultimo_error=f'Canal {canal} no disponible',
+            )
+            conteo['diferidas'] += len(notificaciones)
+            continue
+
+        pool = ThreadPoolExecutor(
+            max_workers=_config_canal(canal).get('CONCURRENCIA') or 1,
+            thread_name_prefix=f'notif-{canal.lower()}',
+        )
+        pools.append(pool)
+        futuros += [pool.submit(_entregar, canal_obj, n) for n in notificaciones]
+
+    max_intentos = _config('NOTIFICACIONES_MAX_INTENTOS', 6)
+    for futuro in futuros:
+        notificacion, error = futuro.result()
+        notificacion.intentos += 1
+        if error is None:
+            notificacion.estado = 'ENVIADA'
+            notificacion.enviada_en = timezone.now()
+            notificacion.ultimo_error = ''
+            conteo['enviadas'] += 1
+        elif notificacion.intentos >= max_intentos:
+            notificacion.estado = 'FALLIDA'
+            notificacion.ultimo_error = str(error)[:2000]
+            conteo['fallidas'] += 1
+            logger.error(
+                "Notificaciones: #%s (%s → %s) falló definitivamente: %s",
+                notificacion.pk, notificacion.canal, notificacion.destinatario, error,
+            )
+        else:
+            notificacion.estado = 'REINTENTO'
+            notificacion.ultimo_error = str(error)[:2000]
+            notificacion.proximo_intento = timezone.now() + _espera_reintento(notificacion.intentos)
+            conteo['reintento'] += 1
+            logger.warning(
+                "Notificaciones: #%s (%s → %s) intento %s falló: %s",
+                notificacion.pk, notificacion.canal, notificacion.destinatario,
+                notificacion.intentos, error,
+            )
+        notificacion.save(update_fields=[
+            'estado', 'intentos', 'enviada_en', 'ultimo_error', 'proximo_intento', 'actualizada_en',
+        ])
+
+    for pool in pools:
+        pool.shutdown(wait=True)
+
+    logger.info("Notificaciones: lote procesado %s", conteo)
+    return conteo
+
+
+def reintentar(notificaciones) -> int:
+    """Vuelve a poner en cola notificaciones FALLIDA/REINTENTO (acción del admin)."""
+    return notificaciones.filter(estado__in=['FALLIDA', 'REINTENTO']).update(
+        estado='PENDIENTE', intentos=0, proximo_intento=timezone.now(),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Entrega inmediata en segundo plano
+# ---------------------------------------------------------------------------
+
+_ejecutor_fondo = ThreadPoolExecutor(max_workers=1, thread_name_prefix='notif-worker')
+
+
+def _procesar_en_fondo():
+    try:
+        procesar_pendientes()
+    except Exception:
+        logger.exception("Notificaciones: error en el worker de fondo")
+    finally:
+        close_old_connections()
+        connection.close()
+
+
+def despertar_worker() -> None:
+    """Dispara un ciclo del worker fuera del hilo del request (tras el commit)."""
+    _ejecutor_fondo.submit(_procesar_en_fondo)
@@ -0,0 +1,214 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .canales import CanalMemoria
+from .models import NotificacionSaliente, SesionWhatsApp
+from .monitor import sesion_lista, verificar_sesion
+from .services import (
+    LimitadorTasa,
+    clave_dedup,
+    encolar,
+    encolar_email,
+    encolar_whatsapp,
+    procesar_pendientes,
+    reintentar,
+)
+
+CANALES_MEMORIA = {
+    'TWILIO_WA': {'BACKEND': 'modulos.notificaciones.canales.CanalMemoria', 'CONCURRENCIA': 2, 'POR_MINUTO': 0},
+    'WAHA_WA': {'BACKEND': 'modulos.notificaciones.canales.CanalMemoria', 'CONCURRENCIA': 1, 'POR_MINUTO': 0},
+    'EMAIL': {'BACKEND': 'modulos.notificaciones.canales.CanalMemoria', 'CONCURRENCIA': 2, 'POR_MINUTO': 0},
+}
+
+
+class CanalNoDisponible(CanalMemoria):
+    def disponible(self):
+        return False
+
+
+@override_settings(NOTIFICACIONES_CANALES=CANALES_MEMORIA, NOTIFICACIONES_MAX_INTENTOS=3)
+class OutboxTests(TestCase):
+    def setUp(self):
+        CanalMemoria.bandeja.clear()
+
+    def test_encolar_no_envia_hasta_que_corre_el_worker(self):
+        encolar_email(['a@kasu.mx'], 'Asunto', 'Cuerpo')
+
+        self.assertEqual(CanalMemoria.bandeja, [])
+        conteo = procesar_pendientes()
+
+        self.assertEqual(conteo['enviadas'], 1)
+        self.assertEqual(CanalMemoria.bandeja[0]['payload']['destinatarios'], ['a@kasu.mx'])
+        notificacion = NotificacionSaliente.objects.get()
+        self.assertEqual(notificacion.estado, 'ENVIADA')
+        self.assertIsNotNone(notificacion.enviada_en)
+
+    def test_rollback_de_la_transaccion_descarta_la_notificacion(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                encolar_email(['a@kasu.mx'], 'Asunto', 'Cuerpo')
+                raise RuntimeError('falla el cambio de negocio')
+
+        self.assertFalse(NotificacionSaliente.objects.exists())
+
+    def test_clave_dedup_repetida_no_duplica(self):
+        _, creada_1 = encolar('EMAIL', 'a@kasu.mx', {}, clave_dedup='x:1')
+        _, creada_2 = encolar('EMAIL', 'a@kasu.mx', {}, clave_dedup='x:1')
+
+        self.assertTrue(creada_1)
+        self.assertFalse(creada_2)
+        self.assertEqual(NotificacionSaliente.objects.count(), 1)
+
+    def test_clave_dedup_con_ventana_cambia_entre_ventanas(self):
+        with patch('modulos.notificaciones.services.time.time', return_value=1000):
+            a = clave_dedup('bitacora', 1, ventana=300)
+        with patch('modulos.notificaciones.services.time.time', return_value=1100):
+            b = clave_dedup('bitacora', 1, ventana=300)
+        with patch('modulos.notificaciones.services.time.time', return_value=1300):
+            c = clave_dedup('bitacora', 1, ventana=300)
+
+        self.assertEqual(a, b)
+        self.assertNotEqual(b, c)
+
+    @override_settings(WA_ALLOWED_NUMBERS=['5215550000001', '5215550000002'])
+    def test_encolar_whatsapp_crea_una_por_numero(self):
+        creadas = encolar_whatsapp('Hola', clave_dedup='alerta:1')
+        encolar_whatsapp('Hola', clave_dedup='alerta:1')
+
+        self.assertEqual(len(creadas), 2)
+        self.assertEqual(NotificacionSaliente.objects.filter(canal='WAHA_WA').count(), 2)
+
+    def test_fallo_programa_reintento_con_backoff_y_luego_fallida(self):
+        encolar('EMAIL', 'a@kasu.mx', {'_fallar': True})
+
+        conteo = procesar_pendientes()
+        notificacion = NotificacionSaliente.objects.get()
+        self.assertEqual(conteo['reintento'], 1)
+        self.assertEqual(notificacion.estado, 'REINTENTO')
+        self.assertGreater(notificacion.proximo_intento, timezone.now())
+        self.assertIn('Fallo simulado', notificacion.ultimo_error)
+
+        # Antes de vencer la espera no se vuelve a intentar
+        self.assertEqual(procesar_pendientes()['reintento'], 0)
+
+        for _ in range(2):
+            NotificacionSaliente.objects.update(proximo_intento=timezone.now() - timedelta(seconds=1))
+            procesar_pendientes()
+
+        notificacion.refresh_from_db()
+        self.assertEqual(notificacion.estado, 'FALLIDA')
+        self.assertEqual(notificacion.intentos, 3)
+
+    def test_canal_no_disponible_difiere_sin_consumir_intentos(self):
+        canales = {**CANALES_MEMORIA, 'WAHA_WA': {
+            'BACKEND': 'modulos.notificaciones.tests.CanalNoDisponible', 'CONCURRENCIA': 1,
+        }}
+        encolar('WAHA_WA', '5215550000001', {'texto': 'Hola'})
+
+        with override_settings(NOTIFICACIONES_CANALES=canales):
+            conteo = procesar_pendientes()
+
+        notificacion = NotificacionSaliente.objects.get()
+        self.assertEqual(conteo['diferidas'], 1)
+        self.assertEqual(notificacion.estado, 'REINTENTO')
+        self.assertEqual(notificacion.intentos, 0)
+
+    def test_reintentar_devuelve_fallidas_a_la_cola(self):
+        notificacion, _ = encolar('EMAIL', 'a@kasu.mx', {})
+        NotificacionSaliente.objects.update(estado='FALLIDA', intentos=3)
+
+        self.assertEqual(reintentar(NotificacionSaliente.objects.all()), 1)
+        notificacion.refresh_from_db()
+        self.assertEqual(notificacion.estado, 'PENDIENTE')
+        self.assertEqual(notificacion.intentos, 0)
+
+    def test_lote_de_varios_canales_se_entrega_completo(self):
+        for i in range(5):
+            encolar('TWILIO_WA', f'whatsapp:+52155500000{i}', {'i': i})
+            encolar('EMAIL', f'c{i}@kasu.mx', {'i': i})
+
+        conteo = procesar_pendientes()
+
+        self.assertEqual(conteo['enviadas'], 10)
+        self.assertEqual(len(CanalMemoria.bandeja), 10)
+        self.assertFalse(NotificacionSaliente.objects.exclude(estado='ENVIADA').exists())
+
+
+class LimitadorTasaTests(TestCase):
+    def test_respeta_rafaga_y_espera_el_intervalo(self):
+        reloj = [0.0]
+        esperas = []
+
+        def dormir(segundos):
+            esperas.append(segundos)
+            reloj[0] += segundos
+
+        with patch('modulos.notificaciones.services.time.monotonic', side_effect=lambda: reloj[0]), \
+                patch('modulos.notificaciones.services.time.sleep', side_effect=dormir):
+            limitador = LimitadorTasa(por_minuto=60, rafaga=2)
+            limitador.adquirir()
+            limitador.adquirir()
+            self.assertEqual(esperas, [])
+            limitador.adquirir()
+
+        self.assertAlmostEqual(sum(esperas), 1.0)
+
+
+@override_settings(
+    WA_API_URL='http://waha.local', WA_API_KEY='k', WA_SESSION_ID='default',
+    WA_ALLOWED_NUMBERS=['5215550000001'], NOTIFICACIONES_ENTREGA_INMEDIATA=False,
+)
+class MonitorSesionWhatsAppTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @patch('config.services.whatsapp_service.solicitar')
+    def test_sin_verificacion_previa_se_considera_lista_sin_llamar_waha(self, mock_solicitar):
+        self.assertTrue(sesion_lista())
+        mock_solicitar.assert_not_called()
+
+    @patch('config.services.whatsapp_service.iniciar_sesion')
+    @patch('config.services.whatsapp_service._session_status', return_value='stopped')
+    def test_sesion_caida_solicita_reinicio_con_backoff(self, _status, mock_iniciar):
+        verificar_sesion()
+        verificar_sesion()
+
+        # El segundo ciclo cae dentro de la espera: no vuelve a reiniciar
+        mock_iniciar.assert_called_once()
+        sesion = SesionWhatsApp.objects.get()
+        self.assertFalse(sesion.lista)
+        self.assertEqual(sesion.reinicios_consecutivos, 1)
+        self.assertFalse(sesion_lista())
+
+    @patch('config.services.whatsapp_service.solicitar')
+    @patch('config.services.whatsapp_service._session_status', return_value='stopped')
+    def test_enviar_mensaje_encola_si_la_sesion_no_esta_lista(self, _status, mock_solicitar):
+        from config.services.whatsapp_service import enviar_mensaje
+
+        with patch('config.services.whatsapp_service.iniciar_sesion'):
+            verificar_sesion()
+        self.assertTrue(enviar_mensaje('Reporte diario'))
+
+        mock_solicitar.assert_not_called()
+        self.assertEqual(NotificacionSaliente.objects.filter(canal='WAHA_WA').count(), 1)
+
+    def test_al_reconectar_libera_los_mensajes_diferidos(self):
+        with patch('config.services.whatsapp_service._session_status', return_value='stopped'), \
+                patch('config.services.whatsapp_service.iniciar_sesion'):
+            verificar_sesion()
+        encolar('WAHA_WA', '5215550000001', {'texto': 'Hola'})
+        self.assertEqual(procesar_pendientes()['diferidas'], 1)
+
+        with patch('config.services.whatsapp_service._session_status', return_value='working'), \
+                patch('modulos.notificaciones.services.despertar_worker') as mock_despertar:
+            verificar_sesion()
+
+        mock_despertar.assert_called_once()
+        self.assertTrue(sesion_lista())
+        notificacion = NotificacionSaliente.objects.get()
+        self.assertLessEqual(notificacion.proximo_intento, timezone.now())
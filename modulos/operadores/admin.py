@@ -1,5 +1,8 @@
 from django.contrib import admin
 from django.utils.html import format_html
+
+from config import referencias
+
 from .models import Operador
 
 
@@ -79,13 +82,16 @@ class OperadorAdmin(admin.ModelAdmin):
     def activar_operadores(self, request, queryset):
         """Activa los operadores seleccionados"""
         updated = queryset.update(activo=True, fecha_baja=None)
+        # update() no dispara señales: las listas cacheadas de operadores se invalidan aquí
+        referencias.invalidar(Operador)
         self.message_user(request, f'{updated} operadores activados.')
     activar_operadores.short_description = 'Activar operadores seleccionados'
     
     def desactivar_operadores(self, request, queryset):
         """Desactiva los operadores seleccionados"""
         from django.utils import timezone
-        updated = queryset.update(activo=False, fecha_baja=timezone.now().date())
+        updated = queryset.update(activo=False, fecha_baja=timezone.localdate())
+        referencias.invalidar(Operador)
         self.message_user(request, f'{updated} operadores desactivados.')
     desactivar_operadores.short_description = 'Desactivar operadores seleccionados'
     
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Avg, Sum
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 
@@ -89,14 +90,12 @@ class Operador(models.Model):
     
     def horas_trabajadas_periodo(self, fecha_inicio, fecha_fin):
         """Calcula horas trabajadas en un período"""
-        viajes = self.bitacoras.filter(
+        total_horas = self.bitacoras.filter(
             fecha_salida__gte=fecha_inicio,
             fecha_llegada__lte=fecha_fin,
             fecha_llegada__isnull=False
-        )
-        
-        total_horas = sum(v.horas_viaje for v in viajes)
-        return round(total_horas, 2)
+        ).aggregate(total=Sum('duracion_horas'))['total']
+        return round(float(total_horas or 0), 2)
     
     def viajes_completados(self):
         """Retorna el número de viajes completados"""
@@ -104,13 +103,9 @@ class Operador(models.Model):
     
     def promedio_rendimiento(self):
         """Calcula el rendimiento promedio de combustible"""
-        viajes = self.bitacoras.filter(
+        promedio = self.bitacoras.filter(
             fecha_llegada__isnull=False,
-            diesel_cargado__gt=0
-        )
-        
-        if not viajes.exists():
-            return 0
-        
-        rendimientos = [v.rendimiento_combustible for v in viajes if v.rendimiento_combustible > 0]
-        return round(sum(rendimientos) / len(rendimientos), 2) if rendimientos else 0
\ No newline at end of file
+            diesel_cargado__gt=0,
+            rendimiento_km_lt__gt=0
+        ).aggregate(promedio=Avg('rendimiento_km_lt'))['promedio']
+        return round(float(promedio), 2) if promedio else 0
\ No newline at end of file
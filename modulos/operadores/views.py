@@ -4,7 +4,10 @@ from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy, reverse
 from django.db.models import Q, Count
+from django.utils import timezone
 from .models import Operador
+from modulos.reportes import kpis
+from modulos.reportes.models import KPIOperadorMensual
 from .forms import OperadorForm
 
 
@@ -18,7 +21,7 @@ class OperadorListView(LoginRequiredMixin, ListView):
 
     def get_queryset(self):
         queryset = Operador.objects.select_related('unidad_asignada').annotate(
-            total_viajes=Count('bitacoras')
+            **kpis.totales(KPIOperadorMensual, 'operador', total_viajes='viajes')
         )
 
         # Filtro por búsqueda
@@ -50,8 +53,8 @@ class OperadorListView(LoginRequiredMixin, ListView):
         context['operadores_activos'] = Operador.objects.filter(activo=True).count()
         context['tipos_choices'] = Operador.TIPO_CHOICES
 
-        # Queryset ya filtrado (el que pasó por búsqueda/tipo/activo)
-        qs = self.get_queryset()
+        # object_list ya es el queryset filtrado (búsqueda/tipo/activo) y evaluado por ListView
+        qs = context['operadores']
 
         # Agrupar por tipo, análogo a grupos_flota en UnidadListView
         grupos_operadores = {}
@@ -80,17 +83,20 @@ class OperadorDetailView(LoginRequiredMixin, DetailView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        operador = self.get_object()
-        
+        operador = self.object
+
         # Obtener últimos viajes
         context['ultimos_viajes'] = operador.bitacoras.select_related(
             'unidad'
         ).order_by('-fecha_salida')[:10]
-        
-        # Estadísticas
-        context['viajes_completados'] = operador.viajes_completados()
-        context['rendimiento_promedio'] = operador.promedio_rendimiento()
-        
+
+        # Estadísticas desde los KPIs mensuales del operador
+        filas_kpi = list(operador.kpis_mensuales.all())
+        historico = kpis.resumir(filas_kpi, ('viajes_completados', 'rendimiento_suma', 'viajes_con_rendimiento'))
+        context['viajes_completados'] = historico['viajes_completados']
+        context['rendimiento_promedio'] = historico['rendimiento_promedio']
+        context['kpis_mensuales'] = filas_kpi[:12]
+
         return context
 
 
@@ -151,14 +157,23 @@ class OperadorDeleteView(LoginRequiredMixin, DeleteView):
 # Vista funcional para dashboard
 def operador_dashboard(request):
     """Dashboard de operadores con estadísticas generales"""
+    conteos = Operador.objects.aggregate(
+        total=Count('id'),
+        activos=Count('id', filter=Q(activo=True)),
+        **{tipo: Count('id', filter=Q(tipo=tipo)) for tipo, _ in Operador.TIPO_CHOICES},
+    )
+    # Ranking del mes en curso: una fila KPI por operador con viajes en el mes
+    mes_actual = timezone.localdate().replace(day=1)
+    ranking = KPIOperadorMensual.objects.filter(mes=mes_actual).select_related('operador').order_by(
+        '-kilometros', '-viajes'
+    )[:10]
     context = {
-        'total_operadores': Operador.objects.count(),
-        'operadores_activos': Operador.objects.filter(activo=True).count(),
-        'operadores_inactivos': Operador.objects.filter(activo=False).count(),
-        'operadores_por_tipo': {
-            tipo[0]: Operador.objects.filter(tipo=tipo[0]).count()
-            for tipo in Operador.TIPO_CHOICES
-        },
+        'total_operadores': conteos['total'],
+        'operadores_activos': conteos['activos'],
+        'operadores_inactivos': conteos['total'] - conteos['activos'],
+        'operadores_por_tipo': {tipo: conteos[tipo] for tipo, _ in Operador.TIPO_CHOICES},
         'operadores_recientes': Operador.objects.order_by('-created_at')[:5],
+        'ranking_mes': ranking,
+        'mes_actual': mes_actual,
     }
     return render(request, 'operadores/operador_dashboard.html', context)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ConfiguracionReporte, ReporteGenerado
+from .models import ConfiguracionReporte, KPIOperadorMensual, KPIUnidadMensual, ReporteGenerado
 
 
 @admin.register(ConfiguracionReporte)
@@ -17,13 +17,52 @@ class ConfiguracionReporteAdmin(admin.ModelAdmin):
 
 @admin.register(ReporteGenerado)
 class ReporteGeneradoAdmin(admin.ModelAdmin):
-    list_display = ['configuracion', 'fecha_generacion', 'periodo_inicio', 'periodo_fin', 'estado']
+    list_display = ['configuracion', 'fecha_generacion', 'periodo_inicio', 'periodo_fin', 'estado', 'duracion']
     list_filter = ['estado', 'configuracion__modulo']
     readonly_fields = [
         'configuracion', 'fecha_generacion', 'periodo_inicio', 'periodo_fin',
-        'estado', 'destinatarios_enviados', 'resumen', 'mensaje_error',
+        'estado', 'destinatarios_enviados', 'resumen', 'mensaje_error', 'tiempos',
+        'dataset_archivo', 'dataset_hash', 'dataset_bytes', 'excel_archivo', 'excel_hash',
     ]
     date_hierarchy = 'fecha_generacion'
 
     def has_add_permission(self, request):
         return False
+
+    @admin.display(description='Duración')
+    def duracion(self, obj):
+        total = (obj.tiempos or {}).get('total')
+        return f'{total / 1000:.1f} s' if total is not None else '—'
+
+
+class _KPIMensualAdmin(admin.ModelAdmin):
+    """Solo lectura: lo escribe reportes.kpis."""
+    date_hierarchy = 'mes'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(KPIOperadorMensual)
+class KPIOperadorMensualAdmin(_KPIMensualAdmin):
+    list_display = [
+        'mes', 'operador', 'viajes', 'viajes_completados', 'kilometros', 'horas',
+        'rendimiento_promedio', 'ingreso', 'viajes_bajo_rendimiento', 'actualizado_en'
+    ]
+    list_filter = ['mes', 'operador__tipo']
+    search_fields = ['operador__nombre']
+    list_select_related = ['operador']
+
+
+@admin.register(KPIUnidadMensual)
+class KPIUnidadMensualAdmin(_KPIMensualAdmin):
+    list_display = [
+        'mes', 'unidad', 'viajes', 'kilometros', 'litros_cargados', 'costo_combustible',
+        'costo_taller', 'ingreso', 'alertas', 'dias_taller', 'actualizado_en'
+    ]
+    list_filter = ['mes', 'unidad__tipo']
+    search_fields = ['unidad__numero_economico', 'unidad__placa']
+    list_select_related = ['unidad']
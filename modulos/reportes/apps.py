@@ -7,7 +7,15 @@ _SKIP_COMMANDS = {
     'migrate', 'makemigrations', 'createsuperuser', 'collectstatic',
     'test', 'shell', 'dbshell', 'check', 'loaddata', 'dumpdata',
     'generar_reportes', 'inspectdb', 'showmigrations', 'sqlmigrate',
-    'flush', 'help',
+    'flush', 'help', 'procesar_notificaciones', 'fake_externals',
+    'procesar_lotes_ia',
+    # Benchmark: los jobs de intervalo (outbox, WAHA) sesgarían p50/p95
+    'bench', 'seed_benchmark',
+    # Procesos batch que rehacen tablas derivadas
+    'reconstruir_hechos_combustible', 'reconstruir_indice_candados',
+    'reconstruir_kpis_mensuales', 'reconstruir_saldo_tanque',
+    'recalcular_precios', 'recalcular_mantenimiento',
+    'verificar_costos_ordenes', 'cruzar_diesel_distancia',
 }
 
 
@@ -17,7 +25,9 @@ class ReportesConfig(AppConfig):
     verbose_name = 'Reportes Programados'
 
     def ready(self):
-        """Inicia el BackgroundScheduler cuando arranca el servidor web."""
+        """Conecta las señales de KPIs e inicia el BackgroundScheduler cuando arranca el servidor web."""
+        import modulos.reportes.signals  # noqa: F401
+
         # Evitar iniciar en management commands que no son el servidor
         if len(sys.argv) > 1 and sys.argv[1] in _SKIP_COMMANDS:
             return
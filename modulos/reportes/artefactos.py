@@ -0,0 +1,201 @@
+"""
+Artefactos persistidos de cada ReporteGenerado: dataset completo y Excel.
+
+El dataset del generador se guarda como JSON-lines comprimido con gzip:
+
+    {"tipo": "meta", "datos": {...claves escalares y dicts...}}
+    {"tipo": "fila", "lista": "filas", "fila": {...}}
+    {"tipo": "fila", "lista": "tablas/Asignaciones", "fila": {...}}
+
+Los nombres se derivan del sha256 del contenido (datasets/<hash>.jsonl.gz,
+excel/<hash>.xlsx): los reportes de un mismo grupo (tipo_reporte, periodo)
+comparten el archivo, y reenviar o previsualizar lee lo que se envió en su
+momento en lugar de volver a consultar la BD.
+
+Almacenamiento: ReportesStorage (Spaces) si USE_SPACES; si no, MEDIA_ROOT/reportes.
+Retención: REPORTES_ARTEFACTOS_RETENCION_DIAS (`purgar_artefactos`).
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def almacenamiento():
+    """Storage de artefactos de reportes (Spaces en producción, disco local en desarrollo)."""
+    if getattr(settings, 'USE_SPACES', False):
+        from config.storage_backends import ReportesStorage
+        return ReportesStorage()
+    return FileSystemStorage(location=str(settings.MEDIA_ROOT / 'reportes'))
+
+
+# ---------------------------------------------------------------------------
+# Serialización del dataset
+# ---------------------------------------------------------------------------
+
+def _es_lista_de_filas(valor) -> bool:
+    return isinstance(valor, list) and all(isinstance(f, dict) for f in valor)
+
+
+def _lineas_dataset(datos: dict):
+    meta = {}
+    listas = []
+    for clave, valor in datos.items():
+        if clave == 'tablas' and isinstance(valor, dict):
+            listas += [(f'tablas/{nombre}', filas) for nombre, filas in valor.items()]
+        elif _es_lista_de_filas(valor) and valor:
+            listas.append((clave, valor))
+        else:
+            meta[clave] = valor
+    yield {'tipo': 'meta', 'datos': meta, 'listas': [nombre for nombre, _ in listas]}
+    for nombre, filas in listas:
+        for fila in filas:
+            yield {'tipo': 'fila', 'lista': nombre, 'fila': fila}
+
+
+def serializar_dataset(datos: dict) -> bytes:
+    """datos del generador → JSON-lines (sin comprimir)."""
+    return b''.join(
+        json.dumps(linea, cls=DjangoJSONEncoder, ensure_ascii=False).encode('utf-8') + b'\n'
+        for linea in _lineas_dataset(datos)
+    )
+
+
+def _iterar_lineas(nombre: str):
+    with almacenamiento().open(nombre, 'rb') as archivo:
+        with gzip.GzipFile(fileobj=archivo) as descomprimido:
+            for linea in io.TextIOWrapper(descomprimido, encoding='utf-8'):
+                if linea.strip():
+                    yield json.loads(linea)
+
+
+def cargar_dataset(reporte):
+    """Reconstruye el dict `datos` tal como se envió, o None si no hay dataset guardado."""
+    if not reporte.dataset_archivo:
+        return None
+    datos = {}
+    for linea in _iterar_lineas(reporte.dataset_archivo):
+        if linea['tipo'] == 'meta':
+            datos.update(linea['datos'])
+            for nombre in linea.get('listas', []):
+                if nombre.startswith('tablas/'):
+                    datos.setdefault('tablas', {})[nombre[len('tablas/'):]] = []
+                else:
+                    datos[nombre] = []
+            continue
+        nombre = linea['lista']
+        if nombre.startswith('tablas/'):
+            datos['tablas'][nombre[len('tablas/'):]].append(linea['fila'])
+        else:
+            datos[nombre].append(linea['fila'])
+    return datos
+
+
+def vista_previa(reporte, limite: int = 20) -> dict:
+    """
+    Primeras `limite` filas de cada lista del dataset, leyendo el archivo en
+    streaming (no descomprime más de lo necesario). {nombre_lista: [filas]}.
+    """
+    if not reporte.dataset_archivo:
+        return {}
+    previa = {}
+    pendientes = None
+    for linea in _iterar_lineas(reporte.dataset_archivo):
+        if linea['tipo'] == 'meta':
+            pendientes = set(linea.get('listas', []))
+            previa = {nombre.replace('tablas/', ''): [] for nombre in linea.get('listas', [])}
+            continue
+        nombre = linea['lista']
+        filas = previa[nombre.replace('tablas/', '')]
+        if len(filas) < limite:
+            filas.append(linea['fila'])
+        elif nombre in pendientes:
+            pendientes.discard(nombre)
+            if not pendientes:
+                break
+    return previa
+
+
+# ---------------------------------------------------------------------------
+# Guardado y retención
+# ---------------------------------------------------------------------------
+
+def _guardar(storage, nombre: str, contenido: bytes) -> str:
+    # Direccionado por contenido: si ya existe, es idéntico
+    if storage.exists(nombre):
+        return nombre
+    return storage.save(nombre, ContentFile(contenido))
+
+
+def guardar(datos: dict, excel_bytes: bytes = None) -> dict:
+    """
+    Guarda dataset (y Excel si se generó). Retorna los campos para ReporteGenerado:
+    dataset_archivo, dataset_hash, dataset_bytes, excel_archivo, excel_hash.
+    """
+    storage = almacenamiento()
+    crudo = serializar_dataset(datos)
+    dataset_hash = hashlib.sha256(crudo).hexdigest()
+    comprimido = gzip.compress(crudo, mtime=0)
+    campos = {
+        'dataset_archivo': _guardar(storage, f'datasets/{dataset_hash}.jsonl.gz', comprimido),
+        'dataset_hash': dataset_hash,
+        'dataset_bytes': len(comprimido),
+    }
+    if excel_bytes:
+        excel_hash = hashlib.sha256(excel_bytes).hexdigest()
+        campos['excel_archivo'] = _guardar(storage, f'excel/{excel_hash}.xlsx', excel_bytes)
+        campos['excel_hash'] = excel_hash
+    return campos
+
+
+def abrir(nombre: str):
+    """Archivo del storage abierto en binario, para FileResponse."""
+    return almacenamiento().open(nombre, 'rb')
+
+
+def purgar_artefactos(ahora=None) -> int:
+    """
+    Quita los artefactos de reportes más viejos que REPORTES_ARTEFACTOS_RETENCION_DIAS.
+    Un archivo se borra solo si ningún reporte vigente lo sigue usando.
+    Retorna el número de archivos borrados.
+    """
+    from modulos.reportes.models import ReporteGenerado
+
+    ahora = ahora or timezone.now()
+    limite = ahora - timedelta(days=getattr(settings, 'REPORTES_ARTEFACTOS_RETENCION_DIAS', 180))
+    viejos = ReporteGenerado.objects.filter(fecha_generacion__lt=limite).filter(
+        ~Q(dataset_archivo='') | ~Q(excel_archivo='')
+    )
+    candidatos = set()
+    for dataset, excel in viejos.values_list('dataset_archivo', 'excel_archivo'):
+        candidatos.update(n for n in (dataset, excel) if n)
+    viejos.update(dataset_archivo='', dataset_hash='', dataset_bytes=0, excel_archivo='', excel_hash='')
+
+    en_uso = set(
+        ReporteGenerado.objects.filter(Q(dataset_archivo__in=candidatos) | Q(excel_archivo__in=candidatos))
+        .values_list('dataset_archivo', 'excel_archivo')
+        .iterator()
+    )
+    en_uso = {n for par in en_uso for n in par}
+
+    storage = almacenamiento()
+    borrados = 0
+    for nombre in candidatos - en_uso:
+        try:
+            storage.delete(nombre)
+            borrados += 1
+        except Exception:
+            logger.exception("No se pudo borrar el artefacto de reporte %s", nombre)
+    return borrados
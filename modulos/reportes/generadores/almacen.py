@@ -144,7 +144,7 @@ def generar_movimientos(periodo_inicio: date, periodo_fin: date) -> dict:
 
     movimientos = (
         MovimientoAlmacen.objects
-        .filter(fecha_movimiento__date__gte=periodo_inicio, fecha_movimiento__date__lte=periodo_fin)
+        .filter(fecha_movimiento__desde_dia=periodo_inicio, fecha_movimiento__hasta_dia=periodo_fin)
         .select_related('producto_almacen', 'usuario')
         .order_by('-fecha_movimiento')
     )
@@ -167,8 +167,8 @@ def generar_movimientos(periodo_inicio: date, periodo_fin: date) -> dict:
         MovimientoAlmacen.objects
         .filter(
             tipo='SALIDA',
-            fecha_movimiento__date__gte=periodo_inicio,
-            fecha_movimiento__date__lte=periodo_fin,
+            fecha_movimiento__desde_dia=periodo_inicio,
+            fecha_movimiento__hasta_dia=periodo_fin,
         )
         .values('producto_almacen__sku', 'producto_almacen__descripcion')
         .annotate(num_salidas=Count('id'))
@@ -187,8 +187,8 @@ def generar_movimientos(periodo_inicio: date, periodo_fin: date) -> dict:
     con_movimiento_ids = list(
         MovimientoAlmacen.objects
         .filter(
-            fecha_movimiento__date__gte=periodo_inicio,
-            fecha_movimiento__date__lte=periodo_fin,
+            fecha_movimiento__desde_dia=periodo_inicio,
+            fecha_movimiento__hasta_dia=periodo_fin,
         )
         .values_list('producto_almacen_id', flat=True)
         .distinct()
@@ -244,12 +244,12 @@ def generar_analisis_integral(periodo_inicio: date, periodo_fin: date) -> dict:
     # --- Asignaciones directas (AsignacionDirectaAlmacen + AsignacionSalida) ---
     directas_qs = (
         AsignacionDirectaAlmacen.objects
-        .filter(fecha_asignacion__date__gte=periodo_inicio, fecha_asignacion__date__lte=periodo_fin)
+        .filter(fecha_asignacion__desde_dia=periodo_inicio, fecha_asignacion__hasta_dia=periodo_fin)
         .select_related('producto', 'unidad', 'entregado_por')
     )
     salidas_qs = (
         AsignacionSalida.objects
-        .filter(creado_en__date__gte=periodo_inicio, creado_en__date__lte=periodo_fin)
+        .filter(creado_en__desde_dia=periodo_inicio, creado_en__hasta_dia=periodo_fin)
         .select_related('unidad', 'equipo', 'dolly', 'caja_seca', 'entregado_por')
         .prefetch_related('items__producto')
     )
@@ -295,7 +295,7 @@ def generar_analisis_integral(periodo_inicio: date, periodo_fin: date) -> dict:
     # --- Entradas (EntradaAlmacen) ---
     entradas_qs = (
         EntradaAlmacen.objects
-        .filter(fecha_entrada__date__gte=periodo_inicio, fecha_entrada__date__lte=periodo_fin)
+        .filter(fecha_entrada__desde_dia=periodo_inicio, fecha_entrada__hasta_dia=periodo_fin)
         .select_related('recibido_por')
     )
     entradas = []
@@ -317,7 +317,7 @@ def generar_analisis_integral(periodo_inicio: date, periodo_fin: date) -> dict:
     # --- Auditoría (AuditoriaAlmacen) ---
     auditoria_qs = (
         AuditoriaAlmacen.objects
-        .filter(fecha__date__gte=periodo_inicio, fecha__date__lte=periodo_fin)
+        .filter(fecha__desde_dia=periodo_inicio, fecha__hasta_dia=periodo_fin)
         .select_related('usuario')
     )
     accion_a_campo = {
@@ -2,7 +2,7 @@
 
 from datetime import date
 from django.utils import timezone
-from django.db.models import Sum, Count, Avg, Prefetch
+from django.db.models import Sum, Avg, Prefetch
 
 
 def generar_cargas_periodo(periodo_inicio: date, periodo_fin: date) -> dict:
@@ -13,8 +13,8 @@ def generar_cargas_periodo(periodo_inicio: date, periodo_fin: date) -> dict:
     cargas = (
         CargaCombustible.objects
         .filter(
-            fecha_hora_inicio__date__gte=periodo_inicio,
-            fecha_hora_inicio__date__lte=periodo_fin,
+            fecha_hora_inicio__desde_dia=periodo_inicio,
+            fecha_hora_inicio__hasta_dia=periodo_fin,
             estado='COMPLETADO',
         )
         .select_related('unidad', 'despachador')
@@ -82,19 +82,15 @@ def generar_cargas_periodo(periodo_inicio: date, periodo_fin: date) -> dict:
 
 def generar_consumo_por_unidad(periodo_inicio: date, periodo_fin: date) -> dict:
     """Reporte de consumo total de combustible agrupado por unidad."""
-    from modulos.combustible.models import CargaCombustible
+    from modulos.combustible.models import FactCombustibleDiario
 
     datos = (
-        CargaCombustible.objects
-        .filter(
-            fecha_hora_inicio__date__gte=periodo_inicio,
-            fecha_hora_inicio__date__lte=periodo_fin,
-            estado='COMPLETADO',
-        )
+        FactCombustibleDiario.objects
+        .filter(fecha__gte=periodo_inicio, fecha__lte=periodo_fin, cargas__gt=0)
         .values('unidad__numero_economico', 'unidad__placa')
         .annotate(
-            total_litros=Sum('cantidad_litros'),
-            num_cargas=Count('id'),
+            total_litros=Sum('litros'),
+            num_cargas=Sum('cargas'),
         )
         .order_by('-total_litros')
     )
@@ -132,8 +128,8 @@ def generar_alertas_candado(periodo_inicio: date, periodo_fin: date) -> dict:
     alertas = (
         AlertaCombustible.objects
         .filter(
-            fecha_generacion__date__gte=periodo_inicio,
-            fecha_generacion__date__lte=periodo_fin,
+            fecha_generacion__desde_dia=periodo_inicio,
+            fecha_generacion__hasta_dia=periodo_fin,
         )
         .select_related('carga__unidad', 'resuelta_por')
         .order_by('-fecha_generacion')
@@ -183,40 +183,16 @@ def _prompt_unidades_balanza_utilidad(resumen: dict, datos: dict, periodo_inicio
     return prompt, 500
 
 
-def generar_narrativa(
+def construir_prompt(
     tipo_reporte: str,
     resumen: dict,
     periodo_inicio: str,
     periodo_fin: str,
     datos: dict = None,
-) -> str:
-    """
-    Genera un párrafo ejecutivo en lenguaje natural usando Claude.
-
-    Args:
-        tipo_reporte:  Clave del tipo de reporte (ej. 'COMBUSTIBLE_ALERTAS').
-        resumen:       Dict con los KPIs numéricos del reporte.
-        periodo_inicio: Fecha de inicio del período en formato 'YYYY-MM-DD'.
-        periodo_fin:    Fecha de fin del período en formato 'YYYY-MM-DD'.
-        datos:         Dict completo del generador (necesario para tipos con listas).
-
-    Returns:
-        Texto de la narrativa, o '' si IA está deshabilitada o la llamada falla.
-    """
-    if not getattr(settings, 'IA_HABILITADA', True):
-        return ''
-
-    if not resumen:
-        return ''
+) -> tuple:
+    """Prompt, max_tokens y modelo según el tipo de reporte."""
+    from config.services.claude_service import Modelo
 
-    try:
-        from config.services.claude_service import ClaudeService, Modelo
-        claude = ClaudeService()
-    except (ValueError, ImportError):
-        logger.warning("IAKasu narrativa: ClaudeService no disponible, omitiendo narrativa.")
-        return ''
-
-    # Prompt y parámetros según el tipo de reporte
     if tipo_reporte == 'ALMACEN_MOVIMIENTOS':
         prompt, max_tokens = _prompt_almacen_movimientos(
             resumen, datos or {}, periodo_inicio, periodo_fin
@@ -246,6 +222,73 @@ def generar_narrativa(
         )
         max_tokens = 350
         modelo = Modelo.HAIKU
+    return prompt, max_tokens, modelo
+
+
+def aplicar_narrativa(reporte_id, texto: str) -> None:
+    """Adjunta la narrativa resuelta en lote al ReporteGenerado."""
+    from modulos.reportes.models import ReporteGenerado
+
+    ReporteGenerado.objects.filter(pk=reporte_id, narrativa_ia='').update(narrativa_ia=texto)
+
+
+def encolar_narrativa(reporte, datos: dict) -> str:
+    """
+    Modo lote ('reportes' en IA_MODO_LOTE): encola la narrativa del reporte
+    ya guardado. Retorna el texto si estaba en caché, '' si quedó en cola.
+    """
+    resumen = datos.get('resumen', {})
+    if not getattr(settings, 'IA_HABILITADA', True) or not resumen:
+        return ''
+
+    from modulos.ia import lotes
+
+    prompt, max_tokens, modelo = construir_prompt(
+        reporte.configuracion.tipo_reporte, resumen,
+        str(reporte.periodo_inicio), str(reporte.periodo_fin), datos,
+    )
+    return lotes.encolar(
+        'reportes', 'modulos.reportes.generadores.narrativa.aplicar_narrativa', reporte.pk,
+        prompt=prompt, sistema=SISTEMA_NARRATIVA, modelo=modelo, max_tokens=max_tokens,
+    )
+
+
+def generar_narrativa(
+    tipo_reporte: str,
+    resumen: dict,
+    periodo_inicio: str,
+    periodo_fin: str,
+    datos: dict = None,
+) -> str:
+    """
+    Genera un párrafo ejecutivo en lenguaje natural usando Claude.
+
+    Args:
+        tipo_reporte:  Clave del tipo de reporte (ej. 'COMBUSTIBLE_ALERTAS').
+        resumen:       Dict con los KPIs numéricos del reporte.
+        periodo_inicio: Fecha de inicio del período en formato 'YYYY-MM-DD'.
+        periodo_fin:    Fecha de fin del período en formato 'YYYY-MM-DD'.
+        datos:         Dict completo del generador (necesario para tipos con listas).
+
+    Returns:
+        Texto de la narrativa, o '' si IA está deshabilitada o la llamada falla.
+    """
+    if not getattr(settings, 'IA_HABILITADA', True):
+        return ''
+
+    if not resumen:
+        return ''
+
+    try:
+        from config.services.claude_service import ClaudeService
+        claude = ClaudeService(modulo='reportes')
+    except (ValueError, ImportError):
+        logger.warning("IAKasu narrativa: ClaudeService no disponible, omitiendo narrativa.")
+        return ''
+
+    prompt, max_tokens, modelo = construir_prompt(
+        tipo_reporte, resumen, periodo_inicio, periodo_fin, datos,
+    )
 
     try:
         return claude.completar(
@@ -0,0 +1,271 @@
+"""
+Mantenimiento de KPIOperadorMensual y KPIUnidadMensual.
+
+Igual que la tabla de hechos de combustible, cada celda (mes, operador) o
+(mes, unidad) se recalcula completa desde sus fuentes cuando una de ellas
+cambia —es idempotente aunque la misma bitácora o carga se guarde varias
+veces—, y `reconstruir()` rehace un rango de meses con consultas agrupadas
+por TruncMonth (una por fuente). Lo usa el comando `reconstruir_kpis_mensuales`
+y el job nocturno del scheduler, que rehace el mes en curso para que las
+órdenes abiertas sigan sumando días en taller.
+
+Atribución al mes local (America/Mexico_City):
+
+    viajes           fecha_salida de la bitácora
+    combustible      fecha_hora_inicio de la carga (solo COMPLETADO) y sus alertas
+    órdenes creadas  fecha_creacion
+    costo de taller  fecha_finalizacion de las órdenes COMPLETADA (costo_total_real)
+    días en taller   fecha_inicio_real → fecha_finalizacion (o ahora), repartidos por mes
+"""
+
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DateField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from config.fechas import a_fecha, inicio_dia, rango_dias
+
+from .models import KPIOperadorMensual, KPIUnidadMensual
+
+logger = logging.getLogger(__name__)
+
+_CON_RENDIMIENTO = Q(fecha_llegada__isnull=False, rendimiento_km_lt__gt=0)
+
+MEDIDAS_VIAJES = {
+    'viajes': Count('id'),
+    'viajes_completados': Count('id', filter=Q(fecha_llegada__isnull=False)),
+    'kilometros': Sum('km_recorridos'),
+    'horas': Sum('duracion_horas'),
+    'diesel_bitacoras': Sum('diesel_cargado'),
+    'rendimiento_suma': Sum('rendimiento_km_lt', filter=_CON_RENDIMIENTO),
+    'viajes_con_rendimiento': Count('id', filter=_CON_RENDIMIENTO),
+    'viajes_bajo_rendimiento': Count('id', filter=Q(bajo_rendimiento=True)),
+    'ingreso': Sum('ingreso_calculado', filter=Q(completado=True)),
+}
+
+MEDIDAS_CARGAS = {
+    'cargas': Count('id'),
+    'litros_cargados': Sum('cantidad_litros'),
+    'costo_combustible': Sum('costo_calculado'),
+}
+
+CAMPOS_OPERADOR = tuple(MEDIDAS_VIAJES)
+CAMPOS_UNIDAD = CAMPOS_OPERADOR + tuple(MEDIDAS_CARGAS) + (
+    'alertas', 'ordenes_taller', 'costo_taller', 'dias_taller',
+)
+
+
+# ─── Meses ───────────────────────────────────────────────────────────────────
+
+def mes_de(valor):
+    """Primer día del mes local de una fecha o datetime (None si no hay)."""
+    fecha = a_fecha(valor)
+    return fecha.replace(day=1) if fecha else None
+
+
+def mes_siguiente(mes):
+    return (mes.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _fin_de_mes(mes):
+    return mes_siguiente(mes) - timedelta(days=1)
+
+
+def repartir_por_mes(inicio, fin):
+    """[(mes, días)] del intervalo aware [inicio, fin) cortado en los límites de mes locales."""
+    tramos = []
+    mes = mes_de(inicio)
+    while inicio < fin:
+        corte = min(fin, inicio_dia(mes_siguiente(mes)))
+        tramos.append((mes, (corte - inicio).total_seconds() / 86400))
+        inicio, mes = corte, mes_siguiente(mes)
+    return tramos
+
+
+def meses_orden(fecha_creacion, fecha_inicio_real, fecha_finalizacion) -> set:
+    """Meses cuyas celdas de unidad dependen de una orden de trabajo."""
+    meses = {mes_de(fecha_creacion), mes_de(fecha_finalizacion)}
+    if fecha_inicio_real:
+        meses.update(mes for mes, _ in repartir_por_mes(fecha_inicio_real, fecha_finalizacion or timezone.now()))
+    meses.discard(None)
+    return meses
+
+
+# ─── Agregación ──────────────────────────────────────────────────────────────
+
+def _por_mes(qs, campo_fecha, campo_clave, medidas):
+    """((mes, id), {medida: valor}) por cada grupo de `qs`."""
+    filas = (
+        qs.annotate(mes=TruncMonth(campo_fecha, output_field=DateField()))
+        .values('mes', campo_clave)
+        .annotate(**medidas)
+        .order_by()
+    )
+    for fila in filas:
+        yield (fila.pop('mes'), fila.pop(campo_clave)), fila
+
+
+def _acumular(celdas, campos, clave, valores):
+    celda = celdas.get(clave)
+    if celda is None:
+        celda = celdas[clave] = dict.fromkeys(campos, 0)
+    for campo, valor in valores.items():
+        if valor is not None:
+            celda[campo] += valor
+
+
+def _rango(campo, desde, hasta) -> Q:
+    return rango_dias(campo, desde, _fin_de_mes(hasta) if hasta else None)
+
+
+def _celdas_operadores(desde=None, hasta=None, operador_id=None) -> dict:
+    from modulos.bitacoras.models import BitacoraViaje
+
+    bitacoras = BitacoraViaje.objects.filter(_rango('fecha_salida', desde, hasta))
+    if operador_id is not None:
+        bitacoras = bitacoras.filter(operador_id=operador_id)
+
+    celdas = {}
+    for clave, valores in _por_mes(bitacoras, 'fecha_salida', 'operador_id', MEDIDAS_VIAJES):
+        _acumular(celdas, CAMPOS_OPERADOR, clave, valores)
+    return celdas
+
+
+def _celdas_unidades(desde=None, hasta=None, unidad_id=None) -> dict:
+    from modulos.bitacoras.models import BitacoraViaje
+    from modulos.combustible.models import AlertaCombustible, CargaCombustible
+    from modulos.taller.models import OrdenTrabajo
+
+    filtro = {} if unidad_id is None else {'unidad_id': unidad_id}
+    bitacoras = BitacoraViaje.objects.filter(_rango('fecha_salida', desde, hasta), **filtro)
+    cargas = CargaCombustible.objects.filter(
+        _rango('fecha_hora_inicio', desde, hasta), estado='COMPLETADO', **filtro,
+    )
+    alertas = AlertaCombustible.objects.filter(
+        _rango('carga__fecha_hora_inicio', desde, hasta),
+        **{f'carga__{campo}': valor for campo, valor in filtro.items()},
+    )
+    ordenes = OrdenTrabajo.objects.filter(**filtro)
+
+    celdas = {}
+    fuentes = [
+        (bitacoras, 'fecha_salida', 'unidad_id', MEDIDAS_VIAJES),
+        (cargas, 'fecha_hora_inicio', 'unidad_id', MEDIDAS_CARGAS),
+        (alertas, 'carga__fecha_hora_inicio', 'carga__unidad_id', {'alertas': Count('id')}),
+        (ordenes.filter(_rango('fecha_creacion', desde, hasta)), 'fecha_creacion', 'unidad_id',
+         {'ordenes_taller': Count('id')}),
+        (ordenes.filter(_rango('fecha_finalizacion', desde, hasta), estado='COMPLETADA'),
+         'fecha_finalizacion', 'unidad_id', {'costo_taller': Sum('costo_total_real')}),
+    ]
+    for qs, campo_fecha, campo_clave, medidas in fuentes:
+        for clave, valores in _por_mes(qs, campo_fecha, campo_clave, medidas):
+            _acumular(celdas, CAMPOS_UNIDAD, clave, valores)
+
+    # Días en taller: cada orden iniciada se reparte entre los meses que abarca
+    en_taller = ordenes.filter(fecha_inicio_real__isnull=False).exclude(estado='CANCELADA')
+    if hasta:
+        en_taller = en_taller.filter(fecha_inicio_real__lt=inicio_dia(mes_siguiente(hasta)))
+    if desde:
+        en_taller = en_taller.filter(
+            Q(fecha_finalizacion__isnull=True) | Q(fecha_finalizacion__gte=inicio_dia(desde))
+        )
+    ahora = timezone.now()
+    dias = {}
+    for unidad, inicio, fin in en_taller.values_list('unidad_id', 'fecha_inicio_real', 'fecha_finalizacion'):
+        for mes, n in repartir_por_mes(inicio, fin or ahora):
+            if (desde is None or mes >= desde) and (hasta is None or mes <= hasta):
+                dias[(mes, unidad)] = dias.get((mes, unidad), 0) + n
+    for clave, n in dias.items():
+        _acumular(celdas, CAMPOS_UNIDAD, clave, {'dias_taller': Decimal(str(round(n, 2)))})
+    return celdas
+
+
+# ─── Lectura ─────────────────────────────────────────────────────────────────
+
+def totales(modelo, campo, **medidas):
+    """
+    Anotaciones {alias: suma histórica de la medida} para el queryset del
+    padre, p. ej. Unidad.objects.annotate(**totales(KPIUnidadMensual, 'unidad', total_viajes='viajes')).
+    """
+    def suma(medida):
+        filas = modelo.objects.filter(**{campo: OuterRef('pk')}).order_by().values(campo)
+        return Coalesce(Subquery(filas.annotate(total=Sum(medida)).values('total')[:1]), 0)
+    return {alias: suma(medida) for alias, medida in medidas.items()}
+
+
+def resumir(filas, campos) -> dict:
+    """Suma `campos` sobre filas KPI ya cargadas; agrega rendimiento_promedio."""
+    resumen = {campo: sum(getattr(fila, campo) for fila in filas) for campo in campos}
+    con_rendimiento = resumen.get('viajes_con_rendimiento')
+    resumen['rendimiento_promedio'] = (
+        round(float(resumen['rendimiento_suma']) / con_rendimiento, 2) if con_rendimiento else 0
+    )
+    return resumen
+
+
+# ─── Celdas ──────────────────────────────────────────────────────────────────
+
+def _guardar_celda(modelo, campo, pk, mes, campos):
+    if campos is None:
+        modelo.objects.filter(mes=mes, **{campo: pk}).delete()
+        return None
+    fila, _ = modelo.objects.update_or_create(mes=mes, defaults=campos, **{campo: pk})
+    return fila
+
+
+def recalcular_operador(operador_id, mes):
+    """Recalcula (o borra, si quedó vacía) la celda (mes, operador)."""
+    celdas = _celdas_operadores(mes, mes, operador_id=operador_id)
+    return _guardar_celda(KPIOperadorMensual, 'operador_id', operador_id, mes, celdas.get((mes, operador_id)))
+
+
+def recalcular_unidad(unidad_id, mes):
+    """Recalcula (o borra, si quedó vacía) la celda (mes, unidad)."""
+    celdas = _celdas_unidades(mes, mes, unidad_id=unidad_id)
+    return _guardar_celda(KPIUnidadMensual, 'unidad_id', unidad_id, mes, celdas.get((mes, unidad_id)))
+
+
+def recalcular(operadores=(), unidades=()):
+    """Recalcula las celdas dadas como pares (id, mes); ignora las que tengan None."""
+    for operador_id, mes in set(operadores):
+        if operador_id and mes:
+            recalcular_operador(operador_id, mes)
+    for unidad_id, mes in set(unidades):
+        if unidad_id and mes:
+            recalcular_unidad(unidad_id, mes)
+
+
+def reconstruir(desde=None, hasta=None):
+    """
+    Reconstruye ambas tablas para los meses de [desde, hasta] (fechas
+    cualesquiera dentro del mes; None = sin límite). Retorna
+    (filas de operadores, filas de unidades).
+    """
+    desde, hasta = mes_de(desde), mes_de(hasta)
+    operadores = _celdas_operadores(desde, hasta)
+    unidades = _celdas_unidades(desde, hasta)
+
+    with transaction.atomic():
+        for modelo, celdas, campo in (
+            (KPIOperadorMensual, operadores, 'operador_id'),
+            (KPIUnidadMensual, unidades, 'unidad_id'),
+        ):
+            filas = modelo.objects.all()
+            if desde:
+                filas = filas.filter(mes__gte=desde)
+            if hasta:
+                filas = filas.filter(mes__lte=hasta)
+            filas.delete()
+            modelo.objects.bulk_create(
+                [modelo(mes=mes, **{campo: pk}, **campos) for (mes, pk), campos in celdas.items()],
+                batch_size=1000,
+            )
+    logger.info(
+        "KPIs mensuales: %d operador(es)-mes y %d unidad(es)-mes reconstruidos (%s → %s)",
+        len(operadores), len(unidades), desde, hasta,
+    )
+    return len(operadores), len(unidades)
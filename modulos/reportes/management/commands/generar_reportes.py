@@ -9,224 +9,30 @@ Diseñado para correr vía cron (GitHub Actions, DigitalOcean Scheduler, etc.):
 Flags opcionales:
     --forzar-id <id>   Ejecuta un reporte específico sin importar si es_debido()
     --dry-run          Muestra qué reportes se ejecutarían sin enviar correos
+    --hilos <n>        Grupos de reportes en paralelo (0 = secuencial)
+    --timeout <seg>    Tiempo máximo por grupo de reportes
+
+La generación, narrativa, Excel y envíos corren en modulos/reportes/motor.py.
 """
 
 import logging
-from datetime import date, timedelta
-from io import BytesIO
-
-import openpyxl
-from openpyxl.styles import Alignment, Font, PatternFill
-from openpyxl.styles.colors import Color
 
 from django.core.management.base import BaseCommand
-from django.core.mail import EmailMultiAlternatives
 from django.db import transaction
-from django.template.loader import render_to_string
 from django.utils import timezone
-from django.conf import settings
 
-from modulos.reportes.models import ConfiguracionReporte, ReporteGenerado
-from modulos.reportes.generadores import almacen as gen_almacen
-from config.services.whatsapp_service import enviar_mensaje as _wa_enviar
-from modulos.reportes.generadores import combustible as gen_combustible
-from modulos.reportes.generadores import unidades as gen_unidades
-from modulos.reportes.generadores import flota as gen_flota
-from modulos.reportes.generadores.narrativa import generar_narrativa
+from modulos.reportes.models import ConfiguracionReporte
+from modulos.reportes.motor import (  # noqa: F401 — reexportados para reenviar_reporte_wa y tests
+    GENERADORES,
+    _enviar_email,
+    _enviar_whatsapp_reporte,
+    _generar_excel,
+    _periodo,
+    ejecutar,
+)
 
 logger = logging.getLogger(__name__)
 
-GENERADORES = {
-    **gen_almacen.GENERADORES,
-    **gen_combustible.GENERADORES,
-    **gen_unidades.GENERADORES,
-    **gen_flota.GENERADORES,
-}
-
-
-def _periodo(frecuencia: str, dia_semana, dia_mes):
-    """Calcula (periodo_inicio, periodo_fin) según la frecuencia del reporte."""
-    hoy = timezone.now().date()
-    if frecuencia == 'DIARIO':
-        inicio = hoy - timedelta(days=1)
-        fin = hoy - timedelta(days=1)
-    elif frecuencia == 'SEMANAL':
-        fin = hoy - timedelta(days=1)
-        inicio = fin - timedelta(days=6)
-    else:  # MENSUAL
-        fin = hoy - timedelta(days=1)
-        inicio = date(hoy.year, hoy.month, 1) - timedelta(days=1)
-        inicio = date(inicio.year, inicio.month, 1)
-    return inicio, fin
-
-
-def _escribir_hoja_detalle(ws, filas: list) -> None:
-    """Escribe encabezados y filas de detalle en una hoja, con auto-ajuste de columnas."""
-    if not filas:
-        return
-
-    headers = list(filas[0].keys())
-    fill_azul = PatternFill(start_color='1D4ED8', end_color='1D4ED8', fill_type='solid')
-    font_blanco_bold = Font(bold=True, color='FFFFFF')
-
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header.replace('_', ' ').title())
-        cell.font = font_blanco_bold
-        cell.fill = fill_azul
-        cell.alignment = Alignment(horizontal='center')
-
-    # Detectar qué columnas son de foto (contienen URLs)
-    foto_headers = {h for h in headers if h.startswith('foto_')}
-    font_link = Font(color='1D4ED8', underline='single')
-
-    for row_idx, fila in enumerate(filas, 2):
-        for col_idx, header in enumerate(headers, 1):
-            valor = fila.get(header) or ''
-            cell = ws.cell(row=row_idx, column=col_idx)
-            if header in foto_headers and valor:
-                cell.value = 'Ver foto'
-                cell.hyperlink = valor
-                cell.font = font_link
-            else:
-                cell.value = valor if valor != '' else None
-
-    # Ajustar ancho de columnas (fotos fijas en 12)
-    for col in ws.columns:
-        header_cell = col[0]
-        letter = header_cell.column_letter
-        if header_cell.value and str(header_cell.value).lower().startswith('foto'):
-            ws.column_dimensions[letter].width = 12
-        else:
-            max_len = max((len(str(cell.value or '')) for cell in col), default=8)
-            ws.column_dimensions[letter].width = min(max_len + 4, 40)
-
-
-def _generar_excel(datos: dict) -> bytes:
-    """Genera un archivo Excel con el detalle del período reportado."""
-    wb = openpyxl.Workbook()
-
-    tablas = datos.get('tablas')
-    if tablas:
-        wb.remove(wb.active)
-        for nombre_hoja, filas in tablas.items():
-            ws = wb.create_sheet(nombre_hoja.replace('/', '-').replace('\\', '-')[:31])
-            _escribir_hoja_detalle(ws, filas)
-    else:
-        ws = wb.active
-        titulo_hoja = datos.get('titulo', 'Reporte').replace('/', '-').replace('\\', '-')[:31]
-        ws.title = titulo_hoja
-        _escribir_hoja_detalle(ws, datos.get('filas', []))
-
-    # --- Hoja de resumen ---
-    ws_res = wb.create_sheet('Resumen')
-    ws_res['A1'] = 'Métrica'
-    ws_res['B1'] = 'Valor'
-    ws_res['A1'].font = Font(bold=True)
-    ws_res['B1'].font = Font(bold=True)
-    for idx, (k, v) in enumerate(datos.get('resumen', {}).items(), 2):
-        ws_res.cell(row=idx, column=1, value=k.replace('_', ' ').title())
-        ws_res.cell(row=idx, column=2, value=str(v) if isinstance(v, (list, dict)) else v)
-    ws_res.column_dimensions['A'].width = 30
-    ws_res.column_dimensions['B'].width = 20
-
-    buf = BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    return buf.getvalue()
-
-
-def _enviar_email(config: ConfiguracionReporte, datos: dict, dry_run: bool,
-                  excel_bytes: bytes = None, narrativa: str = '') -> list:
-    """Envía el reporte por correo. Devuelve lista de destinatarios enviados."""
-    destinatarios = config.get_destinatarios_list()
-    if not destinatarios:
-        logger.warning("Reporte %s sin destinatarios", config.nombre)
-        return []
-
-    if dry_run:
-        logger.info("[DRY-RUN] Enviaría a: %s", ", ".join(destinatarios))
-        return destinatarios
-
-    asunto = f"[BitacoraKasu] {datos['titulo']}"
-    texto_plano = f"{datos['titulo']}\n\nGenerado: {datos['generado_en']}\n\n"
-    if narrativa:
-        texto_plano += f"Análisis IAKasu:\n{narrativa}\n\n"
-    texto_plano += "Resumen:\n"
-    for k, v in datos.get('resumen', {}).items():
-        texto_plano += f"  {k}: {v}\n"
-
-    html = render_to_string(
-        'reportes/email/reporte_base.html',
-        {'datos': datos, 'config': config, 'narrativa': narrativa},
-    )
-
-    msg = EmailMultiAlternatives(
-        subject=asunto,
-        body=texto_plano,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        to=destinatarios,
-    )
-    msg.attach_alternative(html, 'text/html')
-
-    if excel_bytes:
-        nombre_excel = (
-            f"reporte_{datos.get('tipo', 'reporte')}_"
-            f"{datos['periodo_inicio']}_{datos['periodo_fin']}.xlsx"
-        )
-        msg.attach(
-            nombre_excel,
-            excel_bytes,
-            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        )
-
-    msg.send(fail_silently=False)
-    return destinatarios
-
-
-def _enviar_whatsapp_reporte(config: ConfiguracionReporte, datos: dict,
-                             narrativa: str = '', dry_run: bool = False) -> None:
-    """Envía un resumen de texto del reporte a WA_ALLOWED_NUMBERS."""
-    if not getattr(settings, 'WA_REPORTES_ENABLED', False):
-        return
-    if not getattr(settings, 'WA_ALLOWED_NUMBERS', []):
-        return
-    if dry_run:
-        logger.info("[DRY-RUN] WhatsApp: enviaría reporte '%s'", config.nombre)
-        return
-
-    try:
-        frecuencia_label = {
-            'DIARIO': 'Diario', 'SEMANAL': 'Semanal', 'MENSUAL': 'Mensual',
-        }.get(config.frecuencia, config.frecuencia)
-
-        lineas = [
-            f"📊 *Reporte {frecuencia_label} — BitacoraKasu*",
-            f"*{datos.get('titulo', config.nombre)}*",
-            f"Período: {datos.get('periodo_inicio', '')} → {datos.get('periodo_fin', '')}",
-            "",
-        ]
-
-        resumen = datos.get('resumen', {})
-        if resumen:
-            lineas.append("*Resumen:*")
-            for k, v in resumen.items():
-                etiqueta = k.replace('_', ' ').title()
-                lineas.append(f"  • {etiqueta}: {v}")
-            lineas.append("")
-
-        if narrativa:
-            # Truncar a 600 chars para no saturar el mensaje
-            narrativa_corta = narrativa[:600] + ('…' if len(narrativa) > 600 else '')
-            lineas += ["*Análisis IAKasu:*", narrativa_corta, ""]
-
-        lineas.append("_BitacoraKasu — Sistema de Gestión de Flota_")
-
-        _wa_enviar('\n'.join(lineas))
-        logger.info("WhatsApp: reporte '%s' enviado.", config.nombre)
-
-    except Exception as exc:
-        logger.exception("WhatsApp: error enviando reporte '%s' — %s", config.nombre, exc)
-
 
 class Command(BaseCommand):
     help = 'Ejecuta los reportes programados pendientes y los envía por correo.'
@@ -243,6 +49,16 @@ class Command(BaseCommand):
             action='store_true',
             help='Muestra qué se ejecutaría sin enviar correos ni guardar historial',
         )
+        parser.add_argument(
+            '--hilos',
+            type=int,
+            help='Grupos (tipo_reporte, periodo) en paralelo; 0 = secuencial (default: REPORTES_MAX_HILOS)',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            help='Segundos máximos por grupo de reportes (default: REPORTES_TIMEOUT_SEGUNDOS)',
+        )
 
     def handle(self, *args, **options):
         forzar_id = options.get('forzar_id')
@@ -255,6 +71,7 @@ class Command(BaseCommand):
 
         ejecutados = 0
         errores = 0
+        trabajos = []
 
         for config in configs:
             # Lock distribuido: solo una instancia/proceso ejecuta cada reporte.
@@ -288,53 +105,19 @@ class Command(BaseCommand):
                 continue
 
             self.stdout.write(f"  RUN   {config.nombre} ({periodo_inicio} → {periodo_fin})")
+            trabajos.append((config, periodo_inicio, periodo_fin))
 
-            try:
-                datos = generador(periodo_inicio, periodo_fin)
-
-                narrativa = generar_narrativa(
-                    tipo_reporte=config.tipo_reporte,
-                    resumen=datos.get('resumen', {}),
-                    periodo_inicio=str(periodo_inicio),
-                    periodo_fin=str(periodo_fin),
-                    datos=datos,
-                )
-                if narrativa:
-                    self.stdout.write(f"  IA    Narrativa generada para {config.nombre}")
-
-                excel_bytes = _generar_excel(datos) if config.adjuntar_excel else None
-                enviados = _enviar_email(
-                    config, datos, dry_run,
-                    excel_bytes=excel_bytes,
-                    narrativa=narrativa,
-                )
-                _enviar_whatsapp_reporte(config, datos, narrativa=narrativa, dry_run=dry_run)
-
-                if not dry_run:
-                    ReporteGenerado.objects.create(
-                        configuracion=config,
-                        periodo_inicio=periodo_inicio,
-                        periodo_fin=periodo_fin,
-                        estado='GENERADO',
-                        destinatarios_enviados=', '.join(enviados),
-                        resumen=datos.get('resumen', {}),
-                        narrativa_ia=narrativa,
-                    )
-
-                ejecutados += 1
-                self.stdout.write(self.style.SUCCESS(f"  OK    {config.nombre}"))
-
-            except Exception as exc:
-                logger.exception("Error generando reporte %s", config.nombre)
+        for config, reporte, error, tiempos in ejecutar(
+            trabajos, dry_run=dry_run, hilos=options.get('hilos'), timeout=options.get('timeout'),
+        ):
+            if error is not None:
                 errores += 1
-                if not dry_run:
-                    ReporteGenerado.objects.create(
-                        configuracion=config,
-                        periodo_inicio=periodo_inicio,
-                        periodo_fin=periodo_fin,
-                        estado='ERROR',
-                        mensaje_error=str(exc),
-                    )
-                self.stderr.write(self.style.ERROR(f"  FAIL  {config.nombre}: {exc}"))
+                self.stderr.write(self.style.ERROR(f"  FAIL  {config.nombre}: {error}"))
+                continue
+            if reporte is not None and reporte.narrativa_ia:
+                self.stdout.write(f"  IA    Narrativa generada para {config.nombre}")
+            ejecutados += 1
+            etapas = '  '.join(f"{k}={v}" for k, v in tiempos.items() if k != 'configs_en_grupo')
+            self.stdout.write(self.style.SUCCESS(f"  OK    {config.nombre}  [{etapas}]"))
 
         self.stdout.write(f"\nEjecutados: {ejecutados}  Errores: {errores}")
@@ -0,0 +1,47 @@
+"""
+Management command para reconstruir KPIOperadorMensual y KPIUnidadMensual
+desde bitácoras, cargas de combustible y órdenes de taller.
+
+Uso:
+    python manage.py reconstruir_kpis_mensuales
+    python manage.py reconstruir_kpis_mensuales --desde 2025-01-01
+    python manage.py reconstruir_kpis_mensuales --desde 2025-01-01 --hasta 2025-06-30
+
+Las fechas se redondean al mes que las contiene. Las señales mantienen las
+tablas al día; el rebuild es para la carga inicial, para cambios hechos con
+.update() o importaciones masivas.
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from modulos.reportes.kpis import reconstruir
+
+
+def _fecha(valor):
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Formato de fecha inválido: '{valor}'. Use YYYY-MM-DD (ej: 2025-01-01)")
+
+
+class Command(BaseCommand):
+    help = "Reconstruye los KPIs mensuales por operador y por unidad"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=str, metavar='YYYY-MM-DD', help='Fecha dentro del primer mes a reconstruir.')
+        parser.add_argument('--hasta', type=str, metavar='YYYY-MM-DD', help='Fecha dentro del último mes a reconstruir.')
+
+    def handle(self, *args, **options):
+        desde, hasta = _fecha(options['desde']), _fecha(options['hasta'])
+        if desde and hasta and desde > hasta:
+            raise CommandError("--desde no puede ser posterior a --hasta.")
+
+        operadores, unidades = reconstruir(desde, hasta)
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {operadores} fila(s) de KPIOperadorMensual y {unidades} de KPIUnidadMensual "
+            f"reconstruida(s) ({desde or 'inicio'} → {hasta or 'hoy'})."
+        ))
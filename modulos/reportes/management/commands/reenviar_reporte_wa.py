@@ -8,7 +8,7 @@ Modos de uso:
   # Listar reportes disponibles con sus IDs
   python manage.py reenviar_reporte_wa --listar
 
-  # Reenviar desde datos ya guardados (ReporteGenerado ID)
+  # Reenviar desde el dataset guardado (ReporteGenerado ID); sin artefacto usa el resumen
   python manage.py reenviar_reporte_wa --reporte-id 12
 
   # Regenerar datos frescos y enviar solo por WhatsApp
@@ -23,6 +23,7 @@ import logging
 from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
 
+from modulos.reportes import artefactos
 from modulos.reportes.models import ConfiguracionReporte, ReporteGenerado
 from modulos.reportes.generadores import almacen as gen_almacen
 from modulos.reportes.generadores import combustible as gen_combustible
@@ -163,7 +164,9 @@ class Command(BaseCommand):
 
         config = reporte.configuracion
 
-        datos = {
+        # El dataset persistido es exactamente lo que se envió; los reportes
+        # anteriores a los artefactos solo tienen el resumen.
+        datos = artefactos.cargar_dataset(reporte) or {
             'titulo': config.nombre,
             'periodo_inicio': str(reporte.periodo_inicio),
             'periodo_fin': str(reporte.periodo_fin),
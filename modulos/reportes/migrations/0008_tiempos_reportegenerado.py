@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0007_alter_configuracionreporte_tipo_reporte'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportegenerado',
+            name='tiempos',
+            field=models.JSONField(blank=True, default=dict, help_text='datos, narrativa, excel, email, whatsapp y total, medidos por el motor de reportes', verbose_name='Tiempos por etapa (ms)'),
+        ),
+    ]
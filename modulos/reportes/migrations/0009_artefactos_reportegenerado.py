@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0008_tiempos_reportegenerado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportegenerado',
+            name='dataset_archivo',
+            field=models.CharField(blank=True, help_text='JSON-lines comprimido con el dataset completo que se envió', max_length=255, verbose_name='Dataset'),
+        ),
+        migrations.AddField(
+            model_name='reportegenerado',
+            name='dataset_bytes',
+            field=models.PositiveIntegerField(default=0, verbose_name='Tamaño del dataset (bytes)'),
+        ),
+        migrations.AddField(
+            model_name='reportegenerado',
+            name='dataset_hash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='sha256 del dataset'),
+        ),
+        migrations.AddField(
+            model_name='reportegenerado',
+            name='excel_archivo',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Excel'),
+        ),
+        migrations.AddField(
+            model_name='reportegenerado',
+            name='excel_hash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='sha256 del Excel'),
+        ),
+    ]
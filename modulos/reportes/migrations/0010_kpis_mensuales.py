@@ -0,0 +1,168 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:34
+
+from datetime import timedelta
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from config.fechas import a_fecha, inicio_dia
+
+
+def _mes_siguiente(mes):
+    return (mes.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def llenar_kpis(apps, schema_editor):
+    """Todos los meses con historia, igual que `reconstruir_kpis_mensuales` sin rango."""
+    BitacoraViaje = apps.get_model('bitacoras', 'BitacoraViaje')
+    CargaCombustible = apps.get_model('combustible', 'CargaCombustible')
+    AlertaCombustible = apps.get_model('combustible', 'AlertaCombustible')
+    OrdenTrabajo = apps.get_model('taller', 'OrdenTrabajo')
+    KPIOperadorMensual = apps.get_model('reportes', 'KPIOperadorMensual')
+    KPIUnidadMensual = apps.get_model('reportes', 'KPIUnidadMensual')
+
+    con_rendimiento = Q(fecha_llegada__isnull=False, rendimiento_km_lt__gt=0)
+    medidas_viajes = {
+        'viajes': Count('id'),
+        'viajes_completados': Count('id', filter=Q(fecha_llegada__isnull=False)),
+        'kilometros': Sum('km_recorridos'),
+        'horas': Sum('duracion_horas'),
+        'diesel_bitacoras': Sum('diesel_cargado'),
+        'rendimiento_suma': Sum('rendimiento_km_lt', filter=con_rendimiento),
+        'viajes_con_rendimiento': Count('id', filter=con_rendimiento),
+        'viajes_bajo_rendimiento': Count('id', filter=Q(bajo_rendimiento=True)),
+        'ingreso': Sum('ingreso_calculado', filter=Q(completado=True)),
+    }
+    campos_operador = tuple(medidas_viajes)
+    campos_unidad = campos_operador + (
+        'cargas', 'litros_cargados', 'costo_combustible', 'alertas', 'ordenes_taller', 'costo_taller', 'dias_taller',
+    )
+
+    def acumular(celdas, campos, qs, campo_fecha, campo_clave, medidas):
+        filas = (
+            qs.annotate(mes=TruncMonth(campo_fecha, output_field=DateField()))
+            .values('mes', campo_clave).annotate(**medidas).order_by()
+        )
+        for fila in filas:
+            clave = (fila.pop('mes'), fila.pop(campo_clave))
+            celda = celdas.setdefault(clave, dict.fromkeys(campos, 0))
+            for campo, valor in fila.items():
+                if valor is not None:
+                    celda[campo] += valor
+
+    operadores, unidades = {}, {}
+    acumular(operadores, campos_operador, BitacoraViaje.objects.all(), 'fecha_salida', 'operador_id', medidas_viajes)
+    for qs, campo_fecha, campo_clave, medidas in (
+        (BitacoraViaje.objects.all(), 'fecha_salida', 'unidad_id', medidas_viajes),
+        (CargaCombustible.objects.filter(estado='COMPLETADO'), 'fecha_hora_inicio', 'unidad_id', {
+            'cargas': Count('id'), 'litros_cargados': Sum('cantidad_litros'), 'costo_combustible': Sum('costo_calculado'),
+        }),
+        (AlertaCombustible.objects.all(), 'carga__fecha_hora_inicio', 'carga__unidad_id', {'alertas': Count('id')}),
+        (OrdenTrabajo.objects.all(), 'fecha_creacion', 'unidad_id', {'ordenes_taller': Count('id')}),
+        (OrdenTrabajo.objects.filter(estado='COMPLETADA', fecha_finalizacion__isnull=False), 'fecha_finalizacion',
+         'unidad_id', {'costo_taller': Sum('costo_total_real')}),
+    ):
+        acumular(unidades, campos_unidad, qs, campo_fecha, campo_clave, medidas)
+
+    # Días en taller: cada orden iniciada se reparte entre los meses locales que abarca
+    ahora = timezone.now()
+    dias = {}
+    en_taller = (
+        OrdenTrabajo.objects.filter(fecha_inicio_real__isnull=False).exclude(estado='CANCELADA')
+        .values_list('unidad_id', 'fecha_inicio_real', 'fecha_finalizacion')
+    )
+    for unidad_id, inicio, fin in en_taller:
+        fin, mes = fin or ahora, a_fecha(inicio).replace(day=1)
+        while inicio < fin:
+            corte = min(fin, inicio_dia(_mes_siguiente(mes)))
+            dias[(mes, unidad_id)] = dias.get((mes, unidad_id), 0) + (corte - inicio).total_seconds() / 86400
+            inicio, mes = corte, _mes_siguiente(mes)
+    for clave, n in dias.items():
+        celda = unidades.setdefault(clave, dict.fromkeys(campos_unidad, 0))
+        celda['dias_taller'] += Decimal(str(round(n, 2)))
+
+    KPIOperadorMensual.objects.bulk_create(
+        [KPIOperadorMensual(mes=mes, operador_id=pk, **campos) for (mes, pk), campos in operadores.items()],
+        batch_size=1000,
+    )
+    KPIUnidadMensual.objects.bulk_create(
+        [KPIUnidadMensual(mes=mes, unidad_id=pk, **campos) for (mes, pk), campos in unidades.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bitacoras', '0010_metricas_generadas'),
+        ('combustible', '0012_cargacombustible_costo_calculado'),
+        ('operadores', '0001_initial'),
+        ('reportes', '0009_artefactos_reportegenerado'),
+        ('taller', '0004_ordentrabajo_costos_desnormalizados'),
+        ('unidades', '0002_unidad_control_combustible_total'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KPIOperadorMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes', verbose_name='Mes')),
+                ('viajes', models.PositiveIntegerField(default=0, verbose_name='Viajes')),
+                ('viajes_completados', models.PositiveIntegerField(default=0, help_text='Con fecha de llegada', verbose_name='Viajes completados')),
+                ('kilometros', models.IntegerField(default=0, verbose_name='Kilómetros')),
+                ('horas', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Horas de viaje')),
+                ('diesel_bitacoras', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Diésel en bitácoras (L)')),
+                ('rendimiento_suma', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Suma de rendimientos (km/L)')),
+                ('viajes_con_rendimiento', models.PositiveIntegerField(default=0, verbose_name='Viajes con rendimiento')),
+                ('viajes_bajo_rendimiento', models.PositiveIntegerField(default=0, verbose_name='Viajes con bajo rendimiento')),
+                ('ingreso', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Ingreso')),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('operador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='kpis_mensuales', to='operadores.operador', verbose_name='Operador')),
+            ],
+            options={
+                'verbose_name': 'KPI mensual de operador',
+                'verbose_name_plural': 'KPIs mensuales de operadores',
+                'ordering': ['-mes'],
+                'indexes': [models.Index(fields=['mes', '-kilometros'], name='reportes_kp_mes_597e98_idx')],
+                'constraints': [models.UniqueConstraint(fields=('operador', 'mes'), name='kpi_operador_mensual_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='KPIUnidadMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes', verbose_name='Mes')),
+                ('viajes', models.PositiveIntegerField(default=0, verbose_name='Viajes')),
+                ('viajes_completados', models.PositiveIntegerField(default=0, help_text='Con fecha de llegada', verbose_name='Viajes completados')),
+                ('kilometros', models.IntegerField(default=0, verbose_name='Kilómetros')),
+                ('horas', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Horas de viaje')),
+                ('diesel_bitacoras', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Diésel en bitácoras (L)')),
+                ('rendimiento_suma', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Suma de rendimientos (km/L)')),
+                ('viajes_con_rendimiento', models.PositiveIntegerField(default=0, verbose_name='Viajes con rendimiento')),
+                ('viajes_bajo_rendimiento', models.PositiveIntegerField(default=0, verbose_name='Viajes con bajo rendimiento')),
+                ('ingreso', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Ingreso')),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('cargas', models.PositiveIntegerField(default=0, verbose_name='Cargas completadas')),
+                ('litros_cargados', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Litros cargados')),
+                ('costo_combustible', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Costo de combustible')),
+                ('alertas', models.PositiveIntegerField(default=0, verbose_name='Alertas de combustible')),
+                ('ordenes_taller', models.PositiveIntegerField(default=0, verbose_name='Órdenes de taller creadas')),
+                ('costo_taller', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Costo de taller')),
+                ('dias_taller', models.DecimalField(decimal_places=2, default=0, max_digits=6, verbose_name='Días en taller')),
+                ('unidad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='kpis_mensuales', to='unidades.unidad', verbose_name='Unidad')),
+            ],
+            options={
+                'verbose_name': 'KPI mensual de unidad',
+                'verbose_name_plural': 'KPIs mensuales de unidades',
+                'ordering': ['-mes'],
+                'indexes': [models.Index(fields=['mes', '-kilometros'], name='reportes_kp_mes_a9f7a1_idx')],
+                'constraints': [models.UniqueConstraint(fields=('unidad', 'mes'), name='kpi_unidad_mensual_unico')],
+            },
+        ),
+        migrations.RunPython(llenar_kpis, migrations.RunPython.noop),
+    ]
@@ -172,6 +172,23 @@ class ReporteGenerado(models.Model):
         help_text='Párrafo ejecutivo generado automáticamente por IAKasu (Claude Haiku)'
     )
     mensaje_error = models.TextField(blank=True, verbose_name='Error')
+    tiempos = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Tiempos por etapa (ms)',
+        help_text='datos, narrativa, excel, email, whatsapp y total, medidos por el motor de reportes'
+    )
+
+    # Artefactos persistidos (modulos.reportes.artefactos) — nombres en el storage de reportes
+    dataset_archivo = models.CharField(
+        max_length=255, blank=True,
+        verbose_name='Dataset',
+        help_text='JSON-lines comprimido con el dataset completo que se envió'
+    )
+    dataset_hash = models.CharField(max_length=64, blank=True, verbose_name='sha256 del dataset')
+    dataset_bytes = models.PositiveIntegerField(default=0, verbose_name='Tamaño del dataset (bytes)')
+    excel_archivo = models.CharField(max_length=255, blank=True, verbose_name='Excel')
+    excel_hash = models.CharField(max_length=64, blank=True, verbose_name='sha256 del Excel')
 
     class Meta:
         verbose_name = 'Reporte Generado'
@@ -187,3 +204,120 @@ class ReporteGenerado(models.Model):
             f"{self.configuracion.nombre} — "
             f"{self.fecha_generacion.strftime('%d/%m/%Y %H:%M')}"
         )
+
+
+class _KPIViajesMensual(models.Model):
+    """
+    Medidas de bitácoras compartidas por KPIOperadorMensual y KPIUnidadMensual.
+
+    Un viaje cuenta en el mes local (America/Mexico_City) de su fecha_salida.
+    """
+
+    mes = models.DateField(verbose_name='Mes', help_text='Primer día del mes')
+
+    viajes = models.PositiveIntegerField(default=0, verbose_name='Viajes')
+    viajes_completados = models.PositiveIntegerField(
+        default=0, verbose_name='Viajes completados', help_text='Con fecha de llegada'
+    )
+    kilometros = models.IntegerField(default=0, verbose_name='Kilómetros')
+    horas = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='Horas de viaje')
+    diesel_bitacoras = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, verbose_name='Diésel en bitácoras (L)'
+    )
+    rendimiento_suma = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, verbose_name='Suma de rendimientos (km/L)'
+    )
+    viajes_con_rendimiento = models.PositiveIntegerField(default=0, verbose_name='Viajes con rendimiento')
+    viajes_bajo_rendimiento = models.PositiveIntegerField(default=0, verbose_name='Viajes con bajo rendimiento')
+    ingreso = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Ingreso')
+
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def rendimiento_promedio(self):
+        """Promedio de rendimiento_km_lt de los viajes del mes (igual que promedio_rendimiento())."""
+        if not self.viajes_con_rendimiento:
+            return 0
+        return round(float(self.rendimiento_suma) / self.viajes_con_rendimiento, 2)
+
+
+class KPIOperadorMensual(_KPIViajesMensual):
+    """
+    Rollup mensual por operador: una fila por (mes, operador) con sus viajes.
+
+    Lo mantiene modulos.reportes.kpis al guardar o borrar bitácoras y se
+    reconstruye con `python manage.py reconstruir_kpis_mensuales`.
+    """
+
+    operador = models.ForeignKey(
+        'operadores.Operador',
+        on_delete=models.CASCADE,
+        related_name='kpis_mensuales',
+        verbose_name='Operador'
+    )
+
+    class Meta:
+        verbose_name = 'KPI mensual de operador'
+        verbose_name_plural = 'KPIs mensuales de operadores'
+        ordering = ['-mes']
+        constraints = [
+            models.UniqueConstraint(fields=['operador', 'mes'], name='kpi_operador_mensual_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['mes', '-kilometros']),
+        ]
+
+    def __str__(self):
+        return f"{self.mes:%Y-%m} · operador {self.operador_id}"
+
+
+class KPIUnidadMensual(_KPIViajesMensual):
+    """
+    Rollup mensual por unidad: viajes, combustible y taller en una fila por (mes, unidad).
+
+    Combustible: cargas COMPLETADO en el mes de fecha_hora_inicio y las
+    alertas de esas cargas. Taller: órdenes creadas en el mes, costo real de
+    las COMPLETADA en el mes de fecha_finalizacion y días en taller de cada
+    orden (fecha_inicio_real → fecha_finalizacion, o ahora si sigue abierta)
+    repartidos entre los meses que abarca.
+
+    Lo mantiene modulos.reportes.kpis con las señales de BitacoraViaje,
+    CargaCombustible, AlertaCombustible, OrdenTrabajo y PiezaRequerida.
+    """
+
+    unidad = models.ForeignKey(
+        'unidades.Unidad',
+        on_delete=models.CASCADE,
+        related_name='kpis_mensuales',
+        verbose_name='Unidad'
+    )
+
+    cargas = models.PositiveIntegerField(default=0, verbose_name='Cargas completadas')
+    litros_cargados = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='Litros cargados')
+    costo_combustible = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Costo de combustible')
+    alertas = models.PositiveIntegerField(default=0, verbose_name='Alertas de combustible')
+
+    ordenes_taller = models.PositiveIntegerField(default=0, verbose_name='Órdenes de taller creadas')
+    costo_taller = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Costo de taller')
+    dias_taller = models.DecimalField(max_digits=6, decimal_places=2, default=0, verbose_name='Días en taller')
+
+    class Meta:
+        verbose_name = 'KPI mensual de unidad'
+        verbose_name_plural = 'KPIs mensuales de unidades'
+        ordering = ['-mes']
+        constraints = [
+            models.UniqueConstraint(fields=['unidad', 'mes'], name='kpi_unidad_mensual_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['mes', '-kilometros']),
+        ]
+
+    def __str__(self):
+        return f"{self.mes:%Y-%m} · unidad {self.unidad_id}"
+
+    @property
+    def costo_total(self):
+        return self.costo_combustible + self.costo_taller
@@ -0,0 +1,546 @@
+"""
+Motor de ejecución de reportes programados.
+
+`generar_reportes` reclama las configuraciones debidas y delega aquí:
+
+  1. Agrupa las configuraciones por (tipo_reporte, periodo): el dataset del
+     generador se calcula una sola vez por grupo, aunque haya varias
+     configuraciones (p. ej. una por grupo de destinatarios).
+  2. Ejecuta los grupos en un pool de REPORTES_MAX_HILOS hilos. Un grupo que
+     excede REPORTES_TIMEOUT_SEGUNDOS se marca como error y ya no inicia
+     envíos; los que estaban en curso terminan y quedan en su ReporteGenerado.
+  3. Dentro del grupo, la narrativa IA y el Excel se calculan en paralelo, y los
+     envíos (correo + WhatsApp) de cada configuración también.
+  4. El dataset y el Excel del grupo se guardan como artefactos (ver
+     modulos.reportes.artefactos) mientras salen los envíos; reenviar,
+     previsualizar y descargar leen de ahí sin recalcular.
+  5. Los tiempos de cada etapa (ms) quedan en ReporteGenerado.tiempos.
+
+Aquí viven también los helpers de Excel, correo y WhatsApp que usan
+generar_reportes y reenviar_reporte_wa.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import date, timedelta
+from io import BytesIO
+
+import openpyxl
+from openpyxl.styles import Alignment, Font, PatternFill
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db import close_old_connections, connection
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from config.services.whatsapp_service import enviar_mensaje as _wa_enviar
+from modulos.ia.lotes import en_modo_lote
+from modulos.monitoreo import metricas
+from modulos.reportes import artefactos
+from modulos.reportes.generadores import almacen as gen_almacen
+from modulos.reportes.generadores import combustible as gen_combustible
+from modulos.reportes.generadores import flota as gen_flota
+from modulos.reportes.generadores import unidades as gen_unidades
+from modulos.reportes.generadores.narrativa import encolar_narrativa, generar_narrativa
+from modulos.reportes.models import ConfiguracionReporte, ReporteGenerado
+
+logger = logging.getLogger(__name__)
+
+GENERADORES = {
+    **gen_almacen.GENERADORES,
+    **gen_combustible.GENERADORES,
+    **gen_unidades.GENERADORES,
+    **gen_flota.GENERADORES,
+}
+
+
+def _periodo(frecuencia: str, dia_semana, dia_mes):
+    """Calcula (periodo_inicio, periodo_fin) según la frecuencia del reporte."""
+    hoy = timezone.now().date()
+    if frecuencia == 'DIARIO':
+        inicio = hoy - timedelta(days=1)
+        fin = hoy - timedelta(days=1)
+    elif frecuencia == 'SEMANAL':
+        fin = hoy - timedelta(days=1)
+        inicio = fin - timedelta(days=6)
+    else:  # MENSUAL
+        fin = hoy - timedelta(days=1)
+        inicio = date(hoy.year, hoy.month, 1) - timedelta(days=1)
+        inicio = date(inicio.year, inicio.month, 1)
+    return inicio, fin
+
+
+def _escribir_hoja_detalle(ws, filas: list) -> None:
+    """Escribe encabezados y filas de detalle en una hoja, con auto-ajuste de columnas."""
+    if not filas:
+        return
+
+    headers = list(filas[0].keys())
+    fill_azul = PatternFill(start_color='1D4ED8', end_color='1D4ED8', fill_type='solid')
+    font_blanco_bold = Font(bold=True, color='FFFFFF')
+
+    for col, header in enumerate(headers, 1):
+        cell = ws.cell(row=1, column=col, value=header.replace('_', ' ').title())
+        cell.font = font_blanco_bold
+        cell.fill = fill_azul
+        cell.alignment = Alignment(horizontal='center')
+
+    # Detectar qué columnas son de foto (contienen URLs)
+    foto_headers = {h for h in headers if h.startswith('foto_')}
+    font_link = Font(color='1D4ED8', underline='single')
+
+    for row_idx, fila in enumerate(filas, 2):
+        for col_idx, header in enumerate(headers, 1):
+            valor = fila.get(header) or ''
+            cell = ws.cell(row=row_idx, column=col_idx)
+            if header in foto_headers and valor:
+                cell.value = 'Ver foto'
+                cell.hyperlink = valor
+                cell.font = font_link
+            else:
+                cell.value = valor if valor != '' else None
+
+    # Ajustar ancho de columnas (fotos fijas en 12)
+    for col in ws.columns:
+        header_cell = col[0]
+        letter = header_cell.column_letter
+        if header_cell.value and str(header_cell.value).lower().startswith('foto'):
+            ws.column_dimensions[letter].width = 12
+        else:
+            max_len = max((len(str(cell.value or '')) for cell in col), default=8)
+            ws.column_dimensions[letter].width = min(max_len + 4, 40)
+
+
+def _generar_excel(datos: dict) -> bytes:
+    """Genera un archivo Excel con el detalle del período reportado."""
+    wb = openpyxl.Workbook()
+
+    tablas = datos.get('tablas')
+    if tablas:
+        wb.remove(wb.active)
+        for nombre_hoja, filas in tablas.items():
+            ws = wb.create_sheet(nombre_hoja.replace('/', '-').replace('\\', '-')[:31])
+            _escribir_hoja_detalle(ws, filas)
+    else:
+        ws = wb.active
+        titulo_hoja = datos.get('titulo', 'Reporte').replace('/', '-').replace('\\', '-')[:31]
+        ws.title = titulo_hoja
+        _escribir_hoja_detalle(ws, datos.get('filas', []))
+
+    # --- Hoja de resumen ---
+    ws_res = wb.create_sheet('Resumen')
+    ws_res['A1'] = 'Métrica'
+    ws_res['B1'] = 'Valor'
+    ws_res['A1'].font = Font(bold=True)
+    ws_res['B1'].font = Font(bold=True)
+    for idx, (k, v) in enumerate(datos.get('resumen', {}).items(), 2):
+        ws_res.cell(row=idx, column=1, value=k.replace('_', ' ').title())
+        ws_res.cell(row=idx, column=2, value=str(v) if isinstance(v, (list, dict)) else v)
+    ws_res.column_dimensions['A'].width = 30
+    ws_res.column_dimensions['B'].width = 20
+
+    buf = BytesIO()
+    wb.save(buf)
+    buf.seek(0)
+    return buf.getvalue()
+
+
+XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def nombre_excel(datos: dict) -> str:
+    return f"reporte_{datos.get('tipo', 'reporte')}_{datos['periodo_inicio']}_{datos['periodo_fin']}.xlsx"
+
+
+def contenido_email(config: ConfiguracionReporte, datos: dict, narrativa: str = '') -> tuple:
+    """(asunto, texto_plano, html) del correo del reporte."""
+    asunto = f"[BitacoraKasu] {datos['titulo']}"
+    texto_plano = f"{datos['titulo']}\n\nGenerado: {datos['generado_en']}\n\n"
+    if narrativa:
+        texto_plano += f"Análisis IAKasu:\n{narrativa}\n\n"
+    texto_plano += "Resumen:\n"
+    for k, v in datos.get('resumen', {}).items():
+        texto_plano += f"  {k}: {v}\n"
+
+    html = render_to_string(
+        'reportes/email/reporte_base.html',
+        {'datos': datos, 'config': config, 'narrativa': narrativa},
+    )
+    return asunto, texto_plano, html
+
+
+def texto_whatsapp(config: ConfiguracionReporte, datos: dict, narrativa: str = '') -> str:
+    """Resumen de texto del reporte para WhatsApp."""
+    frecuencia_label = {
+        'DIARIO': 'Diario', 'SEMANAL': 'Semanal', 'MENSUAL': 'Mensual',
+    }.get(config.frecuencia, config.frecuencia)
+
+    lineas = [
+        f"📊 *Reporte {frecuencia_label} — BitacoraKasu*",
+        f"*{datos.get('titulo', config.nombre)}*",
+        f"Período: {datos.get('periodo_inicio', '')} → {datos.get('periodo_fin', '')}",
+        "",
+    ]
+
+    resumen = datos.get('resumen', {})
+    if resumen:
+        lineas.append("*Resumen:*")
+        for k, v in resumen.items():
+            etiqueta = k.replace('_', ' ').title()
+            lineas.append(f"  • {etiqueta}: {v}")
+        lineas.append("")
+
+    if narrativa:
+        # Truncar a 600 chars para no saturar el mensaje
+        narrativa_corta = narrativa[:600] + ('…' if len(narrativa) > 600 else '')
+        lineas += ["*Análisis IAKasu:*", narrativa_corta, ""]
+
+    lineas.append("_BitacoraKasu — Sistema de Gestión de Flota_")
+    return '\n'.join(lineas)
+
+
+def whatsapp_habilitado() -> bool:
+    return bool(getattr(settings, 'WA_REPORTES_ENABLED', False) and getattr(settings, 'WA_ALLOWED_NUMBERS', []))
+
+
+def _enviar_email(config: ConfiguracionReporte, datos: dict, dry_run: bool,
+                  excel_bytes: bytes = None, narrativa: str = '') -> list:
+    """Envía el reporte por correo. Devuelve lista de destinatarios enviados."""
+    destinatarios = config.get_destinatarios_list()
+    if not destinatarios:
+        logger.warning("Reporte %s sin destinatarios", config.nombre)
+        return []
+
+    if dry_run:
+        logger.info("[DRY-RUN] Enviaría a: %s", ", ".join(destinatarios))
+        return destinatarios
+
+    asunto, texto_plano, html = contenido_email(config, datos, narrativa)
+    msg = EmailMultiAlternatives(
+        subject=asunto,
+        body=texto_plano,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=destinatarios,
+    )
+    msg.attach_alternative(html, 'text/html')
+
+    if excel_bytes:
+        msg.attach(nombre_excel(datos), excel_bytes, XLSX)
+
+    msg.send(fail_silently=False)
+    return destinatarios
+
+
+def _enviar_whatsapp_reporte(config: ConfiguracionReporte, datos: dict,
+                             narrativa: str = '', dry_run: bool = False) -> None:
+    """Envía un resumen de texto del reporte a WA_ALLOWED_NUMBERS."""
+    if not whatsapp_habilitado():
+        return
+    if dry_run:
+        logger.info("[DRY-RUN] WhatsApp: enviaría reporte '%s'", config.nombre)
+        return
+
+    try:
+        _wa_enviar(texto_whatsapp(config, datos, narrativa))
+        logger.info("WhatsApp: reporte '%s' enviado.", config.nombre)
+
+    except Exception as exc:
+        logger.exception("WhatsApp: error enviando reporte '%s' — %s", config.nombre, exc)
+
+
+# ---------------------------------------------------------------------------
+# Motor de ejecución
+# ---------------------------------------------------------------------------
+
+def _ms(inicio: float) -> int:
+    return int((time.monotonic() - inicio) * 1000)
+
+
+def _en_hilo(funcion, *args):
+    """Envoltura para tareas del pool: cierra la conexión a BD del hilo al terminar."""
+    try:
+        return funcion(*args)
+    finally:
+        close_old_connections()
+        connection.close()
+
+
+def _lanzar(etapas, funcion, *args) -> Future:
+    """Envía `funcion` al pool de etapas, o la ejecuta en línea si no hay pool."""
+    if etapas is not None:
+        return etapas.submit(_en_hilo, funcion, *args)
+    futuro = Future()
+    try:
+        futuro.set_result(funcion(*args))
+    except Exception as exc:
+        futuro.set_exception(exc)
+    return futuro
+
+
+class GrupoReporte:
+    """Configuraciones debidas que comparten (tipo_reporte, periodo) y, por tanto, dataset."""
+
+    def __init__(self, tipo_reporte: str, periodo_inicio: date, periodo_fin: date):
+        self.tipo_reporte = tipo_reporte
+        self.periodo_inicio = periodo_inicio
+        self.periodo_fin = periodo_fin
+        self.configs = []
+        self.datos = None
+        self.narrativa = ''
+        self.artefactos = {}  # campos dataset_*/excel_* para ReporteGenerado
+        self.tiempos = {}
+        self.envios = {}      # config.pk → (destinatarios, tiempos) | Exception
+        self.error = None
+        self.iniciado_en = None
+        self.cancelado = threading.Event()
+        self._candado = threading.Condition()
+        self._en_curso = 0
+
+    def __str__(self):
+        return f"{self.tipo_reporte} {self.periodo_inicio} → {self.periodo_fin}"
+
+    @contextmanager
+    def enviando(self):
+        """Marca un envío en curso; cede False si el grupo ya se canceló y no debe salir nada más."""
+        with self._candado:
+            seguir = not self.cancelado.is_set()
+            if seguir:
+                self._en_curso += 1
+        try:
+            yield seguir
+        finally:
+            if seguir:
+                with self._candado:
+                    self._en_curso -= 1
+                    self._candado.notify_all()
+
+    def cancelar(self, error: Exception) -> None:
+        """Ya no inicia envíos; espera a que terminen los que están en curso para registrarlos."""
+        with self._candado:
+            self.cancelado.set()
+            self.error = error
+            self._candado.wait_for(lambda: not self._en_curso)
+
+
+def agrupar(trabajos) -> list:
+    """[(config, periodo_inicio, periodo_fin), ...] → [GrupoReporte, ...] en orden de llegada."""
+    grupos = {}
+    for config, periodo_inicio, periodo_fin in trabajos:
+        clave = (config.tipo_reporte, periodo_inicio, periodo_fin)
+        if clave not in grupos:
+            grupos[clave] = GrupoReporte(*clave)
+        grupos[clave].configs.append(config)
+    return list(grupos.values())
+
+
+def _etapa_narrativa(grupo: GrupoReporte) -> str:
+    return generar_narrativa(
+        tipo_reporte=grupo.tipo_reporte,
+        resumen=grupo.datos.get('resumen', {}),
+        periodo_inicio=str(grupo.periodo_inicio),
+        periodo_fin=str(grupo.periodo_fin),
+        datos=grupo.datos,
+    )
+
+
+def _etapa_envio(grupo: GrupoReporte, config, excel_bytes, dry_run) -> None:
+    """Correo y luego WhatsApp, cada uno solo si el grupo no se ha cancelado. Lo enviado queda en grupo.envios."""
+    tiempos = {}
+    with grupo.enviando() as seguir:
+        if not seguir:
+            return
+        inicio = time.monotonic()
+        try:
+            enviados = _enviar_email(
+                config, grupo.datos, dry_run, excel_bytes=excel_bytes, narrativa=grupo.narrativa,
+            )
+        except Exception as exc:
+            logger.exception("Error enviando reporte (config %s)", config.pk)
+            grupo.envios[config.pk] = exc
+            return
+        tiempos['email'] = _ms(inicio)
+        grupo.envios[config.pk] = (enviados, tiempos)
+    with grupo.enviando() as seguir:
+        if not seguir:
+            return
+        inicio = time.monotonic()
+        _enviar_whatsapp_reporte(config, grupo.datos, narrativa=grupo.narrativa, dry_run=dry_run)
+        tiempos['whatsapp'] = _ms(inicio)
+
+
+def _cronometrar(tiempos: dict, nombre: str, funcion, *args):
+    inicio = time.monotonic()
+    try:
+        return funcion(*args)
+    finally:
+        tiempos[nombre] = _ms(inicio)
+
+
+def ejecutar_grupo(grupo: GrupoReporte, dry_run: bool = False, etapas: ThreadPoolExecutor = None) -> None:
+    """Dataset una vez; narrativa y Excel en paralelo; luego artefactos y envíos de cada configuración."""
+    grupo.iniciado_en = time.monotonic()
+    generador = GENERADORES[grupo.tipo_reporte]
+
+    grupo.datos = _cronometrar(grupo.tiempos, 'datos', generador, grupo.periodo_inicio, grupo.periodo_fin)
+
+    # En modo lote la narrativa se adjunta al ReporteGenerado cuando termina el lote
+    futuro_narrativa = None
+    if not en_modo_lote('reportes'):
+        futuro_narrativa = _lanzar(etapas, _cronometrar, grupo.tiempos, 'narrativa', _etapa_narrativa, grupo)
+    # El Excel se persiste como artefacto aunque ninguna configuración lo adjunte
+    futuro_excel = None
+    if not dry_run or any(c.adjuntar_excel for c in grupo.configs):
+        futuro_excel = _lanzar(etapas, _cronometrar, grupo.tiempos, 'excel', _generar_excel, grupo.datos)
+
+    grupo.narrativa = futuro_narrativa.result() if futuro_narrativa else ''
+    excel_bytes = futuro_excel.result() if futuro_excel else None
+
+    if grupo.cancelado.is_set():
+        return
+
+    futuro_artefactos = None
+    if not dry_run:
+        futuro_artefactos = _lanzar(
+            etapas, _cronometrar, grupo.tiempos, 'artefactos', artefactos.guardar, grupo.datos, excel_bytes,
+        )
+    futuros = [
+        _lanzar(etapas, _etapa_envio, grupo, config, excel_bytes if config.adjuntar_excel else None, dry_run)
+        for config in grupo.configs
+    ]
+    for futuro in futuros:
+        futuro.result()
+    if futuro_artefactos:
+        try:
+            grupo.artefactos = futuro_artefactos.result()
+        except Exception:
+            # Sin artefacto el reporte sigue siendo válido: reenviar recurre al generador
+            logger.exception("No se pudieron guardar los artefactos del grupo %s", grupo)
+
+
+def ejecutar(trabajos, dry_run: bool = False, hilos: int = None, timeout: float = None) -> list:
+    """
+    Ejecuta los reportes reclamados y guarda un ReporteGenerado por configuración.
+
+    Args:
+        trabajos: [(config, periodo_inicio, periodo_fin), ...]
+        hilos:    Grupos en paralelo (default REPORTES_MAX_HILOS). 0 = todo en línea.
+        timeout:  Segundos máximos por grupo (default REPORTES_TIMEOUT_SEGUNDOS).
+
+    Returns:
+        [(config, ReporteGenerado | None, error | None, tiempos), ...]
+    """
+    if hilos is None:
+        hilos = getattr(settings, 'REPORTES_MAX_HILOS', 3)
+    if timeout is None:
+        timeout = getattr(settings, 'REPORTES_TIMEOUT_SEGUNDOS', 600)
+
+    grupos = agrupar(trabajos)
+    inicio_total = time.monotonic()
+
+    if hilos <= 0:
+        for grupo in grupos:
+            try:
+                ejecutar_grupo(grupo, dry_run)
+            except Exception as exc:
+                logger.exception("Error generando reportes del grupo %s", grupo)
+                grupo.error = exc
+    else:
+        _ejecutar_en_pool(grupos, dry_run, hilos, timeout)
+
+    resultados = []
+    for grupo in grupos:
+        _publicar_metricas(grupo)
+        for config in grupo.configs:
+            resultado = _registrar(grupo, config, dry_run)
+            metricas.REPORTES.inc(grupo.tipo_reporte, 'error' if resultado[2] else 'ok')
+            resultados.append(resultado)
+    logger.info(
+        "generar_reportes: %d configuración(es) en %d grupo(s), %d ms",
+        len(trabajos), len(grupos), _ms(inicio_total),
+    )
+    return resultados
+
+
+def _publicar_metricas(grupo: GrupoReporte) -> None:
+    """Duración de cada etapa del grupo (y el total) en bitacora_reporte_segundos."""
+    for etapa, ms in grupo.tiempos.items():
+        metricas.REPORTE_SEGUNDOS.observar(ms / 1000, grupo.tipo_reporte, etapa)
+    if grupo.iniciado_en:
+        metricas.REPORTE_SEGUNDOS.observar(time.monotonic() - grupo.iniciado_en, grupo.tipo_reporte, 'total')
+
+
+def _ejecutar_en_pool(grupos: list, dry_run: bool, hilos: int, timeout: float) -> None:
+    pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='reportes')
+    # Las etapas nunca esperan a otras etapas: un pool aparte evita bloqueos con los grupos
+    etapas = ThreadPoolExecutor(max_workers=hilos * 2, thread_name_prefix='reportes-etapa')
+    try:
+        futuros = {pool.submit(_en_hilo, ejecutar_grupo, g, dry_run, etapas): g for g in grupos}
+        pendientes = set(futuros)
+        while pendientes:
+            listos, pendientes = wait(pendientes, timeout=0.5, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                grupo = futuros[futuro]
+                try:
+                    futuro.result()
+                except Exception as exc:
+                    logger.exception("Error generando reportes del grupo %s", grupo)
+                    grupo.error = exc
+            for futuro in list(pendientes):
+                grupo = futuros[futuro]
+                if grupo.iniciado_en and time.monotonic() - grupo.iniciado_en > timeout:
+                    # El hilo no se puede interrumpir: se cancela y ya no inicia envíos
+                    grupo.cancelar(TimeoutError(f'Tiempo agotado ({timeout:g} s) generando {grupo}'))
+                    logger.error("generar_reportes: %s", grupo.error)
+                    pendientes.discard(futuro)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        etapas.shutdown(wait=False, cancel_futures=True)
+
+
+def _registrar(grupo: GrupoReporte, config, dry_run: bool) -> tuple:
+    envio = grupo.envios.get(config.pk)
+    error = grupo.error or (envio if isinstance(envio, Exception) else None)
+    if error is None and envio is None:
+        error = RuntimeError('El grupo terminó sin enviar este reporte')
+
+    tiempos = dict(grupo.tiempos)
+    if isinstance(envio, tuple):
+        tiempos.update(envio[1])
+    if grupo.iniciado_en:
+        tiempos['total'] = _ms(grupo.iniciado_en)
+    tiempos['configs_en_grupo'] = len(grupo.configs)
+
+    if dry_run:
+        return config, None, error, tiempos
+
+    if error is not None:
+        reporte = ReporteGenerado.objects.create(
+            configuracion=config,
+            periodo_inicio=grupo.periodo_inicio,
+            periodo_fin=grupo.periodo_fin,
+            estado='ERROR',
+            mensaje_error=str(error),
+            # Un grupo cancelado por tiempo pudo haber enviado el correo antes
+            destinatarios_enviados=', '.join(envio[0]) if isinstance(envio, tuple) else '',
+            tiempos=tiempos,
+        )
+        return config, reporte, error, tiempos
+
+    reporte = ReporteGenerado.objects.create(
+        configuracion=config,
+        periodo_inicio=grupo.periodo_inicio,
+        periodo_fin=grupo.periodo_fin,
+        estado='GENERADO',
+        destinatarios_enviados=', '.join(envio[0]),
+        resumen=grupo.datos.get('resumen', {}),
+        narrativa_ia=grupo.narrativa,
+        tiempos=tiempos,
+        **grupo.artefactos,
+    )
+    if en_modo_lote('reportes'):
+        encolar_narrativa(reporte, grupo.datos)
+    return config, reporte, None, tiempos
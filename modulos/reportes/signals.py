@@ -0,0 +1,143 @@
+"""
+Señales que mantienen KPIOperadorMensual y KPIUnidadMensual (modulos.reportes.kpis).
+
+Cada guardado o borrado recalcula las celdas que tocaba la fila antes y
+después del cambio (una bitácora que cambia de operador o de mes afecta a
+dos). El recálculo corre al confirmar la transacción: así un borrado en
+cascada de la unidad no vuelve a insertar sus celdas.
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from modulos.bitacoras.models import BitacoraViaje
+from modulos.combustible.models import AlertaCombustible, CargaCombustible
+from modulos.taller.models import OrdenTrabajo, PiezaRequerida
+
+from . import kpis
+
+logger = logging.getLogger(__name__)
+
+
+def _recalcular_al_confirmar(operadores=(), unidades=()):
+    operadores, unidades = set(operadores), set(unidades)
+
+    def recalcular():
+        try:
+            kpis.recalcular(operadores, unidades)
+        except Exception:
+            # Los KPIs nunca deben romper el registro de origen; se reparan con el rebuild
+            logger.exception("No se pudieron actualizar los KPIs mensuales %s %s", operadores, unidades)
+
+    transaction.on_commit(recalcular)
+
+
+def _anterior(sender, instance, campos):
+    if not instance.pk:
+        return None
+    return sender.objects.filter(pk=instance.pk).values_list(*campos).first()
+
+
+# ─── Bitácoras ───────────────────────────────────────────────────────────────
+
+_CAMPOS_BITACORA = ('operador_id', 'unidad_id', 'fecha_salida')
+
+
+def _celdas_bitacora(operador_id, unidad_id, fecha_salida):
+    mes = kpis.mes_de(fecha_salida)
+    return [(operador_id, mes)], [(unidad_id, mes)]
+
+
+@receiver(pre_save, sender=BitacoraViaje)
+def recordar_celdas_bitacora(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._kpi_anterior = _anterior(sender, instance, _CAMPOS_BITACORA)
+
+
+@receiver(post_save, sender=BitacoraViaje)
+@receiver(post_delete, sender=BitacoraViaje)
+def actualizar_kpis_bitacora(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    operadores, unidades = _celdas_bitacora(*(getattr(instance, campo) for campo in _CAMPOS_BITACORA))
+    anterior = getattr(instance, '_kpi_anterior', None)
+    if anterior:
+        previos = _celdas_bitacora(*anterior)
+        operadores, unidades = operadores + previos[0], unidades + previos[1]
+    _recalcular_al_confirmar(operadores, unidades)
+
+
+# ─── Combustible ─────────────────────────────────────────────────────────────
+
+_CAMPOS_CARGA = ('unidad_id', 'fecha_hora_inicio')
+
+
+@receiver(pre_save, sender=CargaCombustible)
+def recordar_celda_carga(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._kpi_anterior = _anterior(sender, instance, _CAMPOS_CARGA)
+
+
+@receiver(post_save, sender=CargaCombustible)
+@receiver(post_delete, sender=CargaCombustible)
+def actualizar_kpis_carga(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    celdas = [(instance.unidad_id, kpis.mes_de(instance.fecha_hora_inicio))]
+    anterior = getattr(instance, '_kpi_anterior', None)
+    if anterior:
+        celdas.append((anterior[0], kpis.mes_de(anterior[1])))
+    _recalcular_al_confirmar(unidades=celdas)
+
+
+@receiver(post_save, sender=AlertaCombustible)
+@receiver(post_delete, sender=AlertaCombustible)
+def actualizar_kpis_alerta(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    carga = CargaCombustible.objects.filter(pk=instance.carga_id).values_list(*_CAMPOS_CARGA).first()
+    if carga:
+        _recalcular_al_confirmar(unidades=[(carga[0], kpis.mes_de(carga[1]))])
+
+
+# ─── Taller ──────────────────────────────────────────────────────────────────
+
+_CAMPOS_ORDEN = ('unidad_id', 'fecha_creacion', 'fecha_inicio_real', 'fecha_finalizacion')
+
+
+def _celdas_orden(unidad_id, *fechas):
+    return [(unidad_id, mes) for mes in kpis.meses_orden(*fechas)]
+
+
+@receiver(pre_save, sender=OrdenTrabajo)
+def recordar_celdas_orden(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._kpi_anterior = _anterior(sender, instance, _CAMPOS_ORDEN)
+
+
+@receiver(post_save, sender=OrdenTrabajo)
+@receiver(post_delete, sender=OrdenTrabajo)
+def actualizar_kpis_orden(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    celdas = _celdas_orden(*(getattr(instance, campo) for campo in _CAMPOS_ORDEN))
+    anterior = getattr(instance, '_kpi_anterior', None)
+    if anterior:
+        celdas += _celdas_orden(*anterior)
+    _recalcular_al_confirmar(unidades=celdas)
+
+
+@receiver(post_save, sender=PiezaRequerida)
+@receiver(post_delete, sender=PiezaRequerida)
+def actualizar_kpis_piezas(sender, instance, raw=False, **kwargs):
+    """Las piezas cambian costo_total_real de la orden (con .update(), sin señal de la orden)"""
+    if raw:
+        return
+    orden = OrdenTrabajo.objects.filter(
+        pk=instance.orden_trabajo_id, estado='COMPLETADA'
+    ).values_list('unidad_id', 'fecha_finalizacion').first()
+    if orden:
+        _recalcular_al_confirmar(unidades=[(orden[0], kpis.mes_de(orden[1]))])
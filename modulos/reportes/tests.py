@@ -3,9 +3,11 @@ from decimal import Decimal
 
 from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
 from django.utils import timezone
 
-from modulos.reportes.models import ConfiguracionReporte
+from modulos.reportes import kpis
+from modulos.reportes.models import ConfiguracionReporte, KPIUnidadMensual
 from modulos.reportes.generadores.flota import generar_vigencias_flota
 from modulos.reportes.generadores.almacen import generar_analisis_integral
 from modulos.reportes.generadores.unidades import generar_balanza_utilidad, GENERADORES
@@ -19,7 +21,10 @@ from modulos.almacen.models import (
 from modulos.unidades.models import Unidad
 from modulos.bitacoras.models import BitacoraViaje
 from modulos.combustible.models import Despachador, CargaCombustible
+from modulos.notificaciones.models import NotificacionSaliente
+from modulos.notificaciones.services import procesar_pendientes
 from modulos.operadores.models import Operador
+from modulos.taller.models import OrdenTrabajo
 
 
 class EsDebidoMensualTests(TestCase):
@@ -426,3 +431,363 @@ class PromptBalanzaUtilidadTests(TestCase):
         self.assertIn('Balanza', kwargs['prompt'] if 'prompt' in kwargs else args[0])
         self.assertEqual(kwargs['max_tokens'], 500)
         self.assertIn('salud financiera de la flotilla', kwargs['prompt'] if 'prompt' in kwargs else args[0])
+
+
+class MotorReportesTests(TestCase):
+    """Agrupación por (tipo_reporte, periodo), pool de hilos, timeout y tiempos por etapa."""
+
+    def setUp(self):
+        import threading
+        from unittest.mock import patch
+
+        self.llamadas = []
+        self.liberar = threading.Event()
+        self.liberar.set()
+
+        def generador(tipo):
+            def _generar(inicio, fin):
+                self.llamadas.append(tipo)
+                self.liberar.wait(5)
+                return {
+                    'tipo': tipo, 'titulo': f'Reporte {tipo}',
+                    'periodo_inicio': str(inicio), 'periodo_fin': str(fin),
+                    'generado_en': '2026-07-01T07:00:00',
+                    'resumen': {'total': 1}, 'filas': [{'unidad': 'ECO-1', 'litros': 100}],
+                }
+            return _generar
+
+        parche = patch.dict(
+            'modulos.reportes.motor.GENERADORES',
+            {t: generador(t) for t in ('COMBUSTIBLE_CARGAS', 'FLOTA_VIGENCIAS')},
+        )
+        parche.start()
+        self.addCleanup(parche.stop)
+        import shutil
+        import tempfile
+        from pathlib import Path
+
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, True)
+        ajustes = self.settings(
+            IA_HABILITADA=False, WA_REPORTES_ENABLED=False, USE_SPACES=False, MEDIA_ROOT=Path(media),
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        def config(nombre, tipo, correo, excel=False):
+            return ConfiguracionReporte.objects.create(
+                nombre=nombre, modulo='COMBUSTIBLE', tipo_reporte=tipo, frecuencia='DIARIO',
+                destinatarios=correo, adjuntar_excel=excel,
+            )
+
+        self.periodo = (date(2026, 6, 30), date(2026, 6, 30))
+        self.cargas_a = config('Cargas gerencia', 'COMBUSTIBLE_CARGAS', 'gerencia@kasu.mx', excel=True)
+        self.cargas_b = config('Cargas operación', 'COMBUSTIBLE_CARGAS', 'operacion@kasu.mx')
+        self.flota = config('Vigencias', 'FLOTA_VIGENCIAS', 'flota@kasu.mx')
+        self.trabajos = [(c, *self.periodo) for c in (self.cargas_a, self.cargas_b, self.flota)]
+
+    def test_mismo_tipo_y_periodo_calcula_el_dataset_una_vez(self):
+        from django.core import mail
+        from modulos.reportes.models import ReporteGenerado
+        from modulos.reportes.motor import ejecutar
+
+        resultados = ejecutar(self.trabajos, hilos=2)
+
+        self.assertEqual(sorted(self.llamadas), ['COMBUSTIBLE_CARGAS', 'FLOTA_VIGENCIAS'])
+        self.assertEqual([r[2] for r in resultados], [None, None, None])
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(len(mail.outbox[0].attachments) + len(mail.outbox[1].attachments), 1)
+
+        reporte = ReporteGenerado.objects.get(configuracion=self.cargas_a)
+        self.assertEqual(reporte.estado, 'GENERADO')
+        self.assertEqual(reporte.destinatarios_enviados, 'gerencia@kasu.mx')
+        for etapa in ('datos', 'excel', 'email', 'whatsapp', 'total'):
+            self.assertIn(etapa, reporte.tiempos)
+        self.assertEqual(reporte.tiempos['configs_en_grupo'], 2)
+
+    def test_secuencial_con_cero_hilos(self):
+        from modulos.reportes.models import ReporteGenerado
+        from modulos.reportes.motor import ejecutar
+
+        ejecutar(self.trabajos, hilos=0)
+
+        self.assertEqual(len(self.llamadas), 2)
+        self.assertEqual(ReporteGenerado.objects.filter(estado='GENERADO').count(), 3)
+
+    def test_grupo_que_excede_el_timeout_no_envia(self):
+        from django.core import mail
+        from modulos.reportes.models import ReporteGenerado
+        from modulos.reportes.motor import ejecutar
+
+        self.liberar.clear()
+        try:
+            resultados = ejecutar(self.trabajos, hilos=2, timeout=0.3)
+        finally:
+            self.liberar.set()
+
+        self.assertTrue(all(isinstance(r[2], TimeoutError) for r in resultados))
+        self.assertEqual(ReporteGenerado.objects.filter(estado='ERROR').count(), 3)
+        self.assertIn('Tiempo agotado', ReporteGenerado.objects.first().mensaje_error)
+        self.assertEqual(mail.outbox, [])
+
+    def test_timeout_durante_el_envio_registra_lo_enviado_y_no_sigue(self):
+        import time
+        from unittest.mock import patch
+        from modulos.reportes import motor
+        from modulos.reportes.models import ReporteGenerado
+
+        original = motor._enviar_email
+
+        def enviar(config, *args, **kwargs):
+            if config.pk == self.cargas_a.pk:
+                time.sleep(1)  # el tiempo se agota con este correo en curso
+            return original(config, *args, **kwargs)
+
+        with self.settings(WA_REPORTES_ENABLED=True, WA_ALLOWED_NUMBERS=['5215500000000']), \
+                patch('modulos.reportes.motor._enviar_email', side_effect=enviar), \
+                patch('modulos.reportes.motor._wa_enviar') as wa:
+            motor.ejecutar(self.trabajos, hilos=2, timeout=0.3)
+            wa_al_registrar = wa.call_count
+            time.sleep(0.3)
+
+        reporte = ReporteGenerado.objects.get(configuracion=self.cargas_a)
+        self.assertEqual(reporte.estado, 'ERROR')
+        self.assertIn('Tiempo agotado', reporte.mensaje_error)
+        self.assertEqual(reporte.destinatarios_enviados, 'gerencia@kasu.mx')
+        self.assertIn('email', reporte.tiempos)
+        # Solo los WhatsApp de "Cargas operación" y "Vigencias"; el de "Cargas gerencia" ya no sale
+        self.assertEqual((wa_al_registrar, wa.call_count), (2, 2))
+
+    def test_falla_de_envio_solo_afecta_a_su_configuracion(self):
+        from unittest.mock import patch
+        from modulos.reportes import motor
+        from modulos.reportes.models import ReporteGenerado
+
+        original = motor._enviar_email
+
+        def enviar(config, *args, **kwargs):
+            if config.pk == self.cargas_b.pk:
+                raise ConnectionError('SMTP caído')
+            return original(config, *args, **kwargs)
+
+        with patch('modulos.reportes.motor._enviar_email', side_effect=enviar):
+            motor.ejecutar(self.trabajos, hilos=2)
+
+        estados = dict(ReporteGenerado.objects.values_list('configuracion__nombre', 'estado'))
+        self.assertEqual(
+            estados, {'Cargas gerencia': 'GENERADO', 'Cargas operación': 'ERROR', 'Vigencias': 'GENERADO'}
+        )
+        self.assertEqual(len(self.llamadas), 2)
+
+
+class ArtefactosReporteTests(TestCase):
+    """Dataset y Excel persistidos: reenvío, vista previa y descarga sin volver a generar."""
+
+    setUp = MotorReportesTests.setUp
+
+    def _ejecutar(self):
+        from modulos.reportes.models import ReporteGenerado
+        from modulos.reportes.motor import ejecutar
+
+        ejecutar(self.trabajos, hilos=0)
+        self.llamadas.clear()
+        return {r.configuracion_id: r for r in ReporteGenerado.objects.all()}
+
+    def _login(self):
+        usuario = User.objects.create_user('reportes', 'r@kasu.mx', 'x')
+        self.client.force_login(usuario)
+
+    def test_dataset_y_excel_se_guardan_una_vez_por_grupo(self):
+        from modulos.reportes import artefactos
+
+        reportes = self._ejecutar()
+        a, b, flota = (reportes[c.pk] for c in (self.cargas_a, self.cargas_b, self.flota))
+
+        self.assertTrue(a.dataset_archivo.startswith('datasets/'))
+        self.assertEqual((a.dataset_archivo, a.excel_archivo), (b.dataset_archivo, b.excel_archivo))
+        self.assertNotEqual(a.dataset_hash, flota.dataset_hash)
+        self.assertTrue(flota.excel_archivo, 'El Excel se guarda aunque la configuración no lo adjunte')
+        self.assertIn('artefactos', a.tiempos)
+
+        datos = artefactos.cargar_dataset(a)
+        self.assertEqual(datos['filas'], [{'unidad': 'ECO-1', 'litros': 100}])
+        self.assertEqual(datos['resumen'], {'total': 1})
+
+    def test_dry_run_no_guarda_artefactos(self):
+        from modulos.reportes.motor import ejecutar
+
+        ejecutar(self.trabajos, dry_run=True, hilos=0)
+
+        from django.conf import settings
+
+        self.assertFalse((settings.MEDIA_ROOT / 'reportes').exists())
+
+    def test_detalle_muestra_vista_previa_y_descarga_el_excel(self):
+        from django.urls import reverse
+
+        reporte = self._ejecutar()[self.cargas_a.pk]
+        self._login()
+
+        detalle = self.client.get(reverse('reportes:detalle', args=[reporte.pk]))
+        descarga = self.client.get(reverse('reportes:descargar', args=[reporte.pk, 'excel']))
+
+        self.assertEqual(detalle.context['vista_previa'], {'filas': [{'unidad': 'ECO-1', 'litros': 100}]})
+        self.assertContains(detalle, 'ECO-1')
+        self.assertEqual(descarga.status_code, 200)
+        self.assertTrue(b''.join(descarga.streaming_content).startswith(b'PK'))
+        self.assertEqual(self.llamadas, [])
+        self.assertEqual(self.client.get(reverse('reportes:descargar', args=[reporte.pk, 'pdf'])).status_code, 404)
+
+    def test_reenviar_usa_el_artefacto_sin_regenerar(self):
+        from django.core import mail
+        from django.urls import reverse
+
+        reporte = self._ejecutar()[self.cargas_a.pk]
+        mail.outbox.clear()
+        self._login()
+
+        respuesta = self.client.post(reverse('reportes:reenviar', args=[reporte.pk]))
+        self.client.post(reverse('reportes:reenviar', args=[reporte.pk]))  # doble clic
+
+        self.assertRedirects(respuesta, reverse('reportes:detalle', args=[reporte.pk]))
+        self.assertEqual(self.llamadas, [])
+        # La petición solo encola; el worker entrega con el Excel guardado
+        notificacion = NotificacionSaliente.objects.get(canal='EMAIL')
+        self.assertEqual(notificacion.payload['adjuntos'][0]['archivo'], reporte.excel_archivo)
+        self.assertEqual(mail.outbox, [])
+
+        procesar_pendientes()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['gerencia@kasu.mx'])
+        self.assertEqual(len(mail.outbox[0].attachments), 1)
+        self.assertTrue(mail.outbox[0].attachments[0][1].startswith(b'PK'))
+
+    def test_purgar_respeta_archivos_compartidos_con_reportes_vigentes(self):
+        from modulos.reportes import artefactos
+        from modulos.reportes.models import ReporteGenerado
+
+        reportes = self._ejecutar()
+        viejo, vigente = reportes[self.cargas_a.pk], reportes[self.cargas_b.pk]
+        hace_un_anio = timezone.now() - timedelta(days=365)
+        ReporteGenerado.objects.filter(pk__in=[viejo.pk, reportes[self.flota.pk].pk]).update(
+            fecha_generacion=hace_un_anio,
+        )
+
+        borrados = artefactos.purgar_artefactos()
+
+        self.assertEqual(borrados, 2)  # dataset y Excel de flota; los de cargas siguen en uso
+        viejo.refresh_from_db()
+        self.assertEqual(viejo.dataset_archivo, '')
+        self.assertIsNotNone(artefactos.cargar_dataset(ReporteGenerado.objects.get(pk=vigente.pk)))
+
+
+
+class KPIsMensualesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='kpis')
+        self.unidad = Unidad.objects.create(
+            numero_economico='U-KPI', placa='KPI-001', tipo='FORANEA', año=2022,
+            capacidad_combustible=Decimal('400.00'), rendimiento_esperado=Decimal('2.50'),
+        )
+        self.operador = Operador.objects.create(nombre='Luis Ramos', tipo='FORANEO')
+        self.despachador = Despachador.objects.create(nombre='Ana Ruiz')
+
+    def _aware(self, y, m, d, h=8):
+        return timezone.make_aware(timezone.datetime(y, m, d, h))
+
+    def _viaje(self, salida, km=500, diesel=Decimal('200.00'), horas=10):
+        return BitacoraViaje.objects.create(
+            operador=self.operador, unidad=self.unidad, modalidad='SENCILLO',
+            fecha_carga=salida, fecha_salida=salida, fecha_llegada=salida + timedelta(hours=horas),
+            kilometraje_salida=1000, kilometraje_llegada=1000 + km, diesel_cargado=diesel,
+            destino='Manzanillo', completado=True, ingreso_calculado=Decimal('8000.00'),
+        )
+
+    def _carga(self, inicio, litros, costo):
+        return CargaCombustible.objects.create(
+            despachador=self.despachador, unidad=self.unidad, cantidad_litros=litros,
+            kilometraje_actual=1000, nivel_combustible_inicial='MEDIO', estado_candado_anterior='NORMAL',
+            fecha_hora_inicio=inicio, tipo_flujo='LOCAL', estado='COMPLETADO', costo_calculado=costo,
+        )
+
+    def _orden(self, inicio, fin, costo):
+        orden = OrdenTrabajo.objects.create(
+            unidad=self.unidad, descripcion_problema='Frenos', kilometraje_ingreso=1000,
+            creada_por=self.user, costo_real_mano_obra=costo,
+        )
+        OrdenTrabajo.objects.filter(pk=orden.pk).update(
+            fecha_creacion=inicio, fecha_inicio_real=inicio, fecha_finalizacion=fin, estado='COMPLETADA',
+            costo_total_real=costo,
+        )
+        return orden
+
+    def test_reconstruir_agrupa_por_mes_local(self):
+        self._viaje(self._aware(2026, 6, 10), km=500, diesel=Decimal('200.00'))   # 2.5 km/L
+        self._viaje(self._aware(2026, 6, 30, 22), km=400, diesel=Decimal('200.00'))  # 2.0: ya es julio en UTC
+        self._viaje(self._aware(2026, 7, 5), km=600, diesel=Decimal('200.00'))
+        self._carga(self._aware(2026, 6, 12), Decimal('300.00'), Decimal('7500.00'))
+        # 36 horas en taller, repartidas 1.5 días entre mayo (1 día) y junio (0.5)
+        self._orden(self._aware(2026, 5, 31, 0), self._aware(2026, 6, 1, 12), Decimal('1200.00'))
+
+        self.assertEqual(kpis.reconstruir(), (2, 3))
+
+        junio = KPIUnidadMensual.objects.get(unidad=self.unidad, mes=date(2026, 6, 1))
+        self.assertEqual((junio.viajes, junio.kilometros, junio.viajes_bajo_rendimiento), (2, 900, 1))
+        self.assertEqual(junio.rendimiento_promedio, 2.25)
+        self.assertEqual(junio.horas, Decimal('20.00'))
+        self.assertEqual(junio.ingreso, Decimal('16000.00'))
+        self.assertEqual((junio.cargas, junio.litros_cargados), (1, Decimal('300.00')))
+        self.assertEqual(junio.costo_total, Decimal('8700.00'))
+        self.assertEqual(junio.dias_taller, Decimal('0.50'))
+
+        mayo = KPIUnidadMensual.objects.get(unidad=self.unidad, mes=date(2026, 5, 1))
+        self.assertEqual((mayo.viajes, mayo.ordenes_taller, mayo.dias_taller), (0, 1, Decimal('1.00')))
+        self.assertEqual(
+            list(self.operador.kpis_mensuales.values_list('mes', 'viajes')),
+            [(date(2026, 7, 1), 1), (date(2026, 6, 1), 2)],
+        )
+
+    def test_senales_mueven_la_celda_y_coinciden_con_el_rebuild(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            viaje = self._viaje(self._aware(2026, 6, 10))
+            self._carga(self._aware(2026, 6, 11), Decimal('150.00'), Decimal('3600.00'))
+        self.assertEqual(self.operador.kpis_mensuales.get().mes, date(2026, 6, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            viaje.fecha_salida = self._aware(2026, 8, 2)
+            viaje.fecha_llegada = self._aware(2026, 8, 2, 18)
+            viaje.save()
+        self.assertEqual(list(self.operador.kpis_mensuales.values_list('mes', flat=True)), [date(2026, 8, 1)])
+        junio = KPIUnidadMensual.objects.get(unidad=self.unidad, mes=date(2026, 6, 1))
+        self.assertEqual((junio.viajes, junio.cargas), (0, 1))
+
+        incremental = list(KPIUnidadMensual.objects.order_by('mes').values('mes', 'viajes', 'kilometros', 'litros_cargados'))
+        kpis.reconstruir()
+        self.assertEqual(
+            list(KPIUnidadMensual.objects.order_by('mes').values('mes', 'viajes', 'kilometros', 'litros_cargados')),
+            incremental,
+        )
+
+    def test_vistas_leen_los_kpis(self):
+        mediodia = timezone.localtime().replace(hour=12, minute=0)
+        self._viaje(mediodia - timedelta(hours=10), km=600, diesel=Decimal('200.00'))
+        self._carga(mediodia, Decimal('120.00'), Decimal('2900.00'))
+        kpis.reconstruir()
+        self.client.force_login(self.user)
+
+        detalle = self.client.get(reverse('unidades:detail', args=[self.unidad.pk]))
+        self.assertEqual(detalle.context['viajes_completados'], 1)
+        self.assertEqual(detalle.context['rendimiento_promedio'], 3.0)
+        self.assertEqual(detalle.context['eficiencia'], 120.0)
+        self.assertEqual(detalle.context['cargas_mes_actual'], 1)
+        self.assertEqual(detalle.context['grafico_litros'], '[120.0]')
+
+        lista = self.client.get(reverse('unidades:list'))
+        unidad = lista.context['unidades'][0]
+        self.assertEqual((unidad.total_viajes, unidad.total_cargas, unidad.total_ordenes), (1, 1, 0))
+
+        operador = self.client.get(reverse('operadores:detail', args=[self.operador.pk]))
+        self.assertEqual(operador.context['viajes_completados'], 1)
+        dashboard = self.client.get(reverse('operadores:dashboard'))
+        self.assertEqual([k.operador for k in dashboard.context['ranking_mes']], [self.operador])
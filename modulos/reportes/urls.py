@@ -7,6 +7,8 @@ urlpatterns = [
     # Historial de reportes generados
     path('historial/', views.HistorialReportesView.as_view(), name='historial'),
     path('historial/<int:pk>/', views.DetalleReporteGeneradoView.as_view(), name='detalle'),
+    path('historial/<int:pk>/reenviar/', views.ReenviarReporteView.as_view(), name='reenviar'),
+    path('historial/<int:pk>/descargar/<str:tipo>/', views.DescargarArtefactoView.as_view(), name='descargar'),
 
     # Configuraciones de reportes programados
     path('configuraciones/', views.ConfiguracionListView.as_view(), name='configuracion_list'),
@@ -1,11 +1,20 @@
+import logging
+
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404, redirect
+from django.views import View
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.contrib import messages
 
+from . import artefactos
 from .models import ConfiguracionReporte, ReporteGenerado
 from .forms import ConfiguracionReporteForm
 
+logger = logging.getLogger(__name__)
+
 
 class HistorialReportesView(LoginRequiredMixin, ListView):
     """Lista el historial de reportes generados, del más reciente al más antiguo."""
@@ -34,10 +43,96 @@ class HistorialReportesView(LoginRequiredMixin, ListView):
 
 
 class DetalleReporteGeneradoView(LoginRequiredMixin, DetailView):
-    """Muestra el resumen completo de un reporte generado."""
+    """Muestra el resumen completo de un reporte generado y una vista previa de su dataset."""
     model = ReporteGenerado
     template_name = 'reportes/detalle.html'
     context_object_name = 'reporte'
+    filas_vista_previa = 20
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx['vista_previa'] = {}
+        try:
+            ctx['vista_previa'] = artefactos.vista_previa(self.object, limite=self.filas_vista_previa)
+        except (OSError, ValueError):
+            logger.exception("No se pudo leer el dataset del reporte %s", self.object.pk)
+        ctx['filas_vista_previa'] = self.filas_vista_previa
+        return ctx
+
+
+class DescargarArtefactoView(LoginRequiredMixin, View):
+    """Descarga el Excel o el dataset guardado de un reporte, en streaming desde el storage."""
+
+    TIPOS = {
+        'excel': (
+            'excel_archivo', 'xlsx',
+            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        ),
+        'dataset': ('dataset_archivo', 'jsonl.gz', 'application/gzip'),
+    }
+
+    def get(self, request, pk, tipo):
+        if tipo not in self.TIPOS:
+            raise Http404
+        reporte = get_object_or_404(ReporteGenerado.objects.select_related('configuracion'), pk=pk)
+        campo, extension, content_type = self.TIPOS[tipo]
+        nombre = getattr(reporte, campo)
+        if not nombre:
+            raise Http404('El reporte no tiene este artefacto guardado.')
+        try:
+            archivo = artefactos.abrir(nombre)
+        except (FileNotFoundError, OSError):
+            raise Http404('El artefacto ya no está disponible.')
+        descarga = (
+            f"reporte_{reporte.configuracion.tipo_reporte}_"
+            f"{reporte.periodo_inicio}_{reporte.periodo_fin}.{extension}"
+        )
+        return FileResponse(archivo, as_attachment=True, filename=descarga, content_type=content_type)
+
+
+class ReenviarReporteView(LoginRequiredMixin, View):
+    """
+    Reenvía un reporte a los destinatarios actuales de su configuración usando
+    los artefactos guardados. Solo lo encola en el outbox de notificaciones; el
+    worker entrega el correo (con el Excel guardado) y el WhatsApp.
+    """
+
+    def post(self, request, pk):
+        from modulos.notificaciones.services import clave_dedup, encolar_email, encolar_whatsapp
+
+        from . import motor
+
+        reporte = get_object_or_404(ReporteGenerado.objects.select_related('configuracion'), pk=pk)
+        config = reporte.configuracion
+        datos = artefactos.cargar_dataset(reporte)
+        if datos is None:
+            messages.error(request, 'Este reporte no tiene dataset guardado; no se puede reenviar sin recalcular.')
+            return redirect('reportes:detalle', pk=pk)
+        destinatarios = config.get_destinatarios_list()
+        if not destinatarios:
+            messages.error(request, 'La configuración del reporte no tiene destinatarios.')
+            return redirect('reportes:detalle', pk=pk)
+
+        adjuntos = []
+        if config.adjuntar_excel and reporte.excel_archivo:
+            adjuntos.append({
+                'storage': 'modulos.reportes.artefactos.almacenamiento',
+                'archivo': reporte.excel_archivo,
+                'nombre': motor.nombre_excel(datos),
+                'tipo': motor.XLSX,
+            })
+        asunto, cuerpo, html = motor.contenido_email(config, datos, reporte.narrativa_ia)
+        # Un doble clic no duplica; un reenvío posterior sí sale
+        clave = clave_dedup('reportes', 'reenvio', reporte.pk, ventana=300)
+        with transaction.atomic():
+            encolar_email(destinatarios, asunto, cuerpo, html, adjuntos=adjuntos, clave_dedup=clave, origen=reporte)
+            if motor.whatsapp_habilitado():
+                encolar_whatsapp(
+                    motor.texto_whatsapp(config, datos, reporte.narrativa_ia),
+                    asunto=asunto, clave_dedup=clave, origen=reporte,
+                )
+        messages.success(request, f'Reenvío en cola para {len(destinatarios)} destinatario(s).')
+        return redirect('reportes:detalle', pk=pk)
 
 
 class ConfiguracionListView(LoginRequiredMixin, ListView):
@@ -4,7 +4,8 @@ from django.urls import reverse
 from django.utils.safestring import mark_safe
 from .models import (
     TipoMantenimiento, CategoriaFalla, OrdenTrabajo, PiezaRequerida,
-    SeguimientoOrden, ChecklistMantenimiento, ChecklistOrden, HistorialMantenimiento
+    SeguimientoOrden, ChecklistMantenimiento, ChecklistOrden, HistorialMantenimiento,
+    EstadoMantenimientoUnidad
 )
 
 
@@ -424,4 +425,21 @@ class HistorialMantenimientoAdmin(admin.ModelAdmin):
 
     def kilometros_en_taller_display(self, obj):
         return f"{obj.kilometros_en_taller} km"
-    kilometros_en_taller_display.short_description = 'Kms en Taller'
\ No newline at end of file
+    kilometros_en_taller_display.short_description = 'Kms en Taller'
+
+@admin.register(EstadoMantenimientoUnidad)
+class EstadoMantenimientoUnidadAdmin(admin.ModelAdmin):
+    """Solo lectura: lo escribe taller.mantenimiento."""
+    list_display = [
+        'unidad', 'urgencia', 'razon', 'fecha_ultimo_servicio', 'kilometros_desde_servicio',
+        'fecha_proximo_servicio', 'dias_vencido', 'kilometros_excedidos', 'actualizado'
+    ]
+    list_filter = ['requiere', 'urgencia']
+    search_fields = ['unidad__numero_economico', 'unidad__placa']
+    list_select_related = ['unidad']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
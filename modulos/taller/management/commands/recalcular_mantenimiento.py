@@ -0,0 +1,21 @@
+"""
+Management command para recalcular EstadoMantenimientoUnidad (taller.mantenimiento).
+
+Uso:
+    python manage.py recalcular_mantenimiento
+
+El scheduler lo hace cada noche y las señales al completar órdenes; el
+comando sirve para la carga inicial o después de importar historial.
+"""
+
+from django.core.management.base import BaseCommand
+
+from modulos.taller.mantenimiento import recalcular
+
+
+class Command(BaseCommand):
+    help = "Recalcula el estado de mantenimiento (vencimientos por fecha y kilometraje) de la flota activa"
+
+    def handle(self, *args, **options):
+        filas = recalcular()
+        self.stdout.write(self.style.SUCCESS(f"✓ Estado de mantenimiento recalculado para {filas} unidad(es)."))
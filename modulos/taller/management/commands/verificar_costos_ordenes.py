@@ -0,0 +1,57 @@
+"""
+Management command para verificar los costos desnormalizados de OrdenTrabajo
+(costo_piezas_*, costo_total_*) contra PiezaRequerida y la mano de obra.
+
+Uso:
+    python manage.py verificar_costos_ordenes
+    python manage.py verificar_costos_ordenes --corregir
+
+Las señales mantienen las columnas al día; las diferencias aparecen solo
+si alguien editó piezas con .update() / bulk_create o directo en la BD.
+Sale con error si hay diferencias y no se pidió --corregir.
+"""
+
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from modulos.taller.models import COSTOS_ORDEN, OrdenTrabajo, expresiones_costos
+
+CENTAVO = Decimal('0.01')
+
+
+class Command(BaseCommand):
+    help = "Verifica (y opcionalmente corrige) los costos desnormalizados de las órdenes de trabajo"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corregir', action='store_true', help='Recalcula las órdenes con diferencias.')
+
+    def handle(self, *args, **options):
+        calculados = {f'{campo}_calc': expr for campo, expr in expresiones_costos().items()}
+        ordenes = OrdenTrabajo.objects.annotate(**calculados).values('pk', 'folio', *COSTOS_ORDEN, *calculados)
+
+        desfasadas = []
+        revisadas = 0
+        for orden in ordenes.iterator():
+            revisadas += 1
+            diferencias = [
+                f"{campo}: {orden[campo]} ≠ {Decimal(orden[f'{campo}_calc']).quantize(CENTAVO)}"
+                for campo in COSTOS_ORDEN
+                if Decimal(orden[campo]).quantize(CENTAVO) != Decimal(orden[f'{campo}_calc']).quantize(CENTAVO)
+            ]
+            if diferencias:
+                desfasadas.append(orden['pk'])
+                self.stdout.write(f"  {orden['folio']}: " + '; '.join(diferencias))
+
+        if not desfasadas:
+            self.stdout.write(self.style.SUCCESS(f"✓ {revisadas} orden(es) revisada(s), costos al día."))
+            return
+
+        if options['corregir']:
+            OrdenTrabajo.objects.filter(pk__in=desfasadas).recalcular_costos()
+            self.stdout.write(self.style.SUCCESS(f"✓ {len(desfasadas)} orden(es) recalculada(s)."))
+            return
+
+        raise CommandError(
+            f"{len(desfasadas)} de {revisadas} orden(es) con costos desfasados. Use --corregir para recalcularlas."
+        )
@@ -0,0 +1,142 @@
+"""
+Motor de mantenimiento vencido: EstadoMantenimientoUnidad.
+
+Para todas las unidades activas a la vez (una consulta con subconsultas
+correlacionadas sobre HistorialMantenimiento) obtiene el último servicio,
+su kilometraje y los intervalos del TipoMantenimiento de esa orden
+(kilometraje_sugerido / dias_sugeridos). Con eso calcula:
+
+    kilometros_desde_servicio  kilometraje_actual - km de salida del último servicio
+    fecha_proximo_servicio     la más próxima entre Unidad.proximo_mantenimiento
+                               (o último servicio + dias_sugeridos) y la fecha en
+                               que se alcanza el intervalo de km al ritmo actual
+    dias_vencido / kilometros_excedidos / requiere / urgencia
+
+Sin kilometraje_sugerido en el tipo se usa KM_SERVICIO_DEFAULT. Las señales
+de taller recalculan la unidad al completar una orden; el job nocturno del
+scheduler rehace la tabla completa (el kilometraje avanza con cada viaje).
+"""
+
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from modulos.unidades.models import Unidad
+
+from .models import EstadoMantenimientoUnidad, HistorialMantenimiento
+
+logger = logging.getLogger(__name__)
+
+# Intervalo por kilometraje cuando el tipo del último servicio no define uno
+KM_SERVICIO_DEFAULT = 10000
+# Urgencia ALTA al pasar de este múltiplo del intervalo (15,000 km con el default)
+FACTOR_URGENCIA_ALTA = 1.5
+
+
+def _filas(unidades_qs):
+    """Una fila por unidad con su último servicio e intervalos, en una sola consulta."""
+    ultimo = (
+        HistorialMantenimiento.objects.filter(unidad=OuterRef('pk'))
+        .order_by('-fecha_servicio', '-pk')
+    )
+
+    def del_ultimo(campo):
+        return Subquery(ultimo.values(campo)[:1])
+
+    return unidades_qs.annotate(
+        ultimo_id=del_ultimo('pk'),
+        ultimo_fecha=del_ultimo('fecha_servicio'),
+        ultimo_km=Subquery(
+            ultimo.annotate(km=Coalesce('kilometraje_salida', 'kilometraje_ingreso')).values('km')[:1]
+        ),
+        km_sugerido=del_ultimo('orden_trabajo__tipo_mantenimiento__kilometraje_sugerido'),
+        dias_sugeridos=del_ultimo('orden_trabajo__tipo_mantenimiento__dias_sugeridos'),
+    ).values(
+        'pk', 'kilometraje_actual', 'proximo_mantenimiento',
+        'ultimo_id', 'ultimo_fecha', 'ultimo_km', 'km_sugerido', 'dias_sugeridos',
+    ).order_by()
+
+
+def calcular_estado(fila, hoy) -> dict:
+    """Campos de EstadoMantenimientoUnidad para una fila de `_filas`."""
+    km_actual = fila['kilometraje_actual'] or 0
+    fecha_ultimo = fila['ultimo_fecha']
+    km_ultimo = fila['ultimo_km']
+    intervalo_dias = fila['dias_sugeridos']
+    intervalo_km = fila['km_sugerido'] or (KM_SERVICIO_DEFAULT if fecha_ultimo else None)
+    km_desde = km_actual - km_ultimo if km_ultimo is not None else None
+
+    # Fecha por calendario: la que fijó la última orden, o último servicio + días sugeridos
+    fecha_por_dias = fila['proximo_mantenimiento']
+    if fecha_por_dias is None and fecha_ultimo and intervalo_dias:
+        fecha_por_dias = fecha_ultimo + timedelta(days=intervalo_dias)
+
+    # Fecha por kilometraje: cuándo se llega (o se llegó) al intervalo al ritmo desde el último servicio
+    fecha_por_km = None
+    if intervalo_km and km_desde and km_desde > 0 and fecha_ultimo and fecha_ultimo < hoy:
+        km_por_dia = km_desde / (hoy - fecha_ultimo).days
+        fecha_por_km = fecha_ultimo + timedelta(days=round(intervalo_km / km_por_dia))
+
+    fechas = [f for f in (fecha_por_dias, fecha_por_km) if f]
+    fecha_proximo = min(fechas) if fechas else None
+
+    por_fecha = fecha_por_dias is not None and fecha_por_dias <= hoy
+    por_km = km_desde is not None and intervalo_km is not None and km_desde >= intervalo_km
+
+    razones = []
+    if por_fecha:
+        razones.append('Fecha de mantenimiento vencida')
+    if por_km:
+        razones.append(f'{km_desde:,} km desde último servicio')
+
+    if (por_fecha and fecha_por_dias < hoy) or (por_km and km_desde >= intervalo_km * FACTOR_URGENCIA_ALTA):
+        urgencia = 'ALTA'
+    elif por_fecha or por_km:
+        urgencia = 'MEDIA'
+    else:
+        urgencia = 'OK'
+
+    return {
+        'ultimo_servicio_id': fila['ultimo_id'],
+        'fecha_ultimo_servicio': fecha_ultimo,
+        'kilometraje_ultimo_servicio': km_ultimo,
+        'kilometraje_actual': km_actual,
+        'kilometros_desde_servicio': km_desde,
+        'intervalo_km': intervalo_km,
+        'intervalo_dias': intervalo_dias,
+        'fecha_proximo_servicio': fecha_proximo,
+        'dias_vencido': max(0, (hoy - fecha_proximo).days) if fecha_proximo else 0,
+        'kilometros_excedidos': max(0, km_desde - intervalo_km) if por_km else 0,
+        'requiere': por_fecha or por_km,
+        'urgencia': urgencia,
+        'razon': ' · '.join(razones),
+    }
+
+
+def recalcular(unidad_ids=None) -> int:
+    """
+    Recalcula EstadoMantenimientoUnidad de las unidades dadas (None = toda la
+    flota activa; las inactivas salen de la tabla). Retorna filas escritas.
+    """
+    unidades = Unidad.objects.filter(activa=True)
+    estados = EstadoMantenimientoUnidad.objects.all()
+    if unidad_ids is not None:
+        unidad_ids = list(unidad_ids)
+        unidades = unidades.filter(pk__in=unidad_ids)
+        estados = estados.filter(unidad_id__in=unidad_ids)
+
+    hoy = timezone.localdate()
+    nuevos = [
+        EstadoMantenimientoUnidad(unidad_id=fila['pk'], **calcular_estado(fila, hoy))
+        for fila in _filas(unidades)
+    ]
+    with transaction.atomic():
+        estados.delete()
+        EstadoMantenimientoUnidad.objects.bulk_create(nuevos, batch_size=500)
+    if unidad_ids is None:
+        logger.info("EstadoMantenimientoUnidad: %d unidad(es) recalculada(s)", len(nuevos))
+    return len(nuevos)
@@ -0,0 +1,61 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def llenar_costos(apps, schema_editor):
+    OrdenTrabajo = apps.get_model('taller', 'OrdenTrabajo')
+    PiezaRequerida = apps.get_model('taller', 'PiezaRequerida')
+
+    def suma(subtotal):
+        piezas = (
+            PiezaRequerida.objects.filter(orden_trabajo=OuterRef('pk'))
+            .order_by().values('orden_trabajo')
+            .annotate(total=Sum(subtotal)).values('total')
+        )
+        return Coalesce(
+            Subquery(piezas), Value(Decimal('0')),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        )
+
+    estimado = suma(F('cantidad') * F('costo_estimado'))
+    real = suma(F('cantidad') * Coalesce('costo_real', Value(Decimal('0'))))
+    OrdenTrabajo.objects.update(
+        costo_piezas_estimado=estimado,
+        costo_piezas_real=real,
+        costo_total_estimado=F('costo_estimado_mano_obra') + estimado,
+        costo_total_real=F('costo_real_mano_obra') + real,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taller', '0003_reportefalla'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordentrabajo',
+            name='costo_piezas_estimado',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Σ cantidad × costo estimado de las piezas requeridas', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='ordentrabajo',
+            name='costo_piezas_real',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Σ cantidad × costo real de las piezas requeridas', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='ordentrabajo',
+            name='costo_total_estimado',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Costo total estimado (mano de obra + piezas)', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='ordentrabajo',
+            name='costo_total_real',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Costo total real (mano de obra + piezas)', max_digits=12),
+        ),
+        migrations.RunPython(llenar_costos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def llenar_estados(apps, schema_editor):
+    """Estado inicial de la flota activa, como lo deja el job nocturno (mantenimiento.recalcular)."""
+    from modulos.taller.mantenimiento import calcular_estado
+
+    Unidad = apps.get_model('unidades', 'Unidad')
+    HistorialMantenimiento = apps.get_model('taller', 'HistorialMantenimiento')
+    EstadoMantenimientoUnidad = apps.get_model('taller', 'EstadoMantenimientoUnidad')
+
+    ultimo = HistorialMantenimiento.objects.filter(unidad=OuterRef('pk')).order_by('-fecha_servicio', '-pk')
+
+    def del_ultimo(campo):
+        return Subquery(ultimo.values(campo)[:1])
+
+    filas = Unidad.objects.filter(activa=True).annotate(
+        ultimo_id=del_ultimo('pk'),
+        ultimo_fecha=del_ultimo('fecha_servicio'),
+        ultimo_km=Subquery(
+            ultimo.annotate(km=Coalesce('kilometraje_salida', 'kilometraje_ingreso')).values('km')[:1]
+        ),
+        km_sugerido=del_ultimo('orden_trabajo__tipo_mantenimiento__kilometraje_sugerido'),
+        dias_sugeridos=del_ultimo('orden_trabajo__tipo_mantenimiento__dias_sugeridos'),
+    ).values(
+        'pk', 'kilometraje_actual', 'proximo_mantenimiento',
+        'ultimo_id', 'ultimo_fecha', 'ultimo_km', 'km_sugerido', 'dias_sugeridos',
+    ).order_by()
+
+    hoy = timezone.localdate()
+    EstadoMantenimientoUnidad.objects.bulk_create(
+        [EstadoMantenimientoUnidad(unidad_id=fila['pk'], **calcular_estado(fila, hoy)) for fila in filas],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taller', '0004_ordentrabajo_costos_desnormalizados'),
+        ('unidades', '0002_unidad_control_combustible_total'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadoMantenimientoUnidad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_ultimo_servicio', models.DateField(blank=True, null=True)),
+                ('kilometraje_ultimo_servicio', models.IntegerField(blank=True, null=True)),
+                ('kilometraje_actual', models.IntegerField(default=0)),
+                ('kilometros_desde_servicio', models.IntegerField(blank=True, null=True)),
+                ('intervalo_km', models.IntegerField(blank=True, help_text='TipoMantenimiento.kilometraje_sugerido del último servicio (o el default)', null=True)),
+                ('intervalo_dias', models.IntegerField(blank=True, help_text='TipoMantenimiento.dias_sugeridos del último servicio', null=True)),
+                ('fecha_proximo_servicio', models.DateField(blank=True, help_text='La más próxima entre la fecha por días y la proyectada por kilometraje', null=True)),
+                ('dias_vencido', models.IntegerField(default=0)),
+                ('kilometros_excedidos', models.IntegerField(default=0)),
+                ('requiere', models.BooleanField(db_index=True, default=False)),
+                ('urgencia', models.CharField(choices=[('OK', 'Al día'), ('MEDIA', 'Media'), ('ALTA', 'Alta')], default='OK', max_length=10)),
+                ('razon', models.CharField(blank=True, max_length=200)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('ultimo_servicio', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='taller.historialmantenimiento')),
+                ('unidad', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='estado_mantenimiento', to='unidades.unidad')),
+            ],
+            options={
+                'verbose_name': 'Estado de Mantenimiento',
+                'verbose_name_plural': 'Estados de Mantenimiento',
+                'ordering': ['-requiere', '-dias_vencido', '-kilometros_excedidos'],
+            },
+        ),
+        migrations.RunPython(llenar_estados, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,8 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.utils import timezone
 from modulos.unidades.models import Unidad
@@ -59,6 +63,45 @@ class CategoriaFalla(models.Model):
         return self.nombre
 
 
+COSTOS_PIEZAS = ('costo_piezas_estimado', 'costo_piezas_real')
+COSTOS_ORDEN = (*COSTOS_PIEZAS, 'costo_total_estimado', 'costo_total_real')
+
+
+def _suma_piezas(subtotal):
+    """Subconsulta: suma de `subtotal` sobre las piezas de la orden externa (0 si no tiene)."""
+    suma = (
+        PiezaRequerida.objects.filter(orden_trabajo=OuterRef('pk'))
+        .order_by().values('orden_trabajo')
+        .annotate(total=Sum(subtotal)).values('total')
+    )
+    return Coalesce(
+        Subquery(suma), Value(Decimal('0')),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def expresiones_costos():
+    """
+    Valores de COSTOS_ORDEN calculados en SQL desde PiezaRequerida y la mano de obra.
+    Sirve para .update() (recalcular_costos) y para .annotate() (verificación).
+    """
+    estimado = _suma_piezas(F('cantidad') * F('costo_estimado'))
+    real = _suma_piezas(F('cantidad') * Coalesce('costo_real', Value(Decimal('0'))))
+    return {
+        'costo_piezas_estimado': estimado,
+        'costo_piezas_real': real,
+        'costo_total_estimado': F('costo_estimado_mano_obra') + estimado,
+        'costo_total_real': F('costo_real_mano_obra') + real,
+    }
+
+
+class OrdenTrabajoQuerySet(models.QuerySet):
+
+    def recalcular_costos(self) -> int:
+        """Recalcula las columnas de costo en un solo UPDATE; retorna las órdenes tocadas."""
+        return self.update(**expresiones_costos())
+
+
 class OrdenTrabajo(models.Model):
     """Órdenes de trabajo del taller"""
     ESTADO_CHOICES = [
@@ -166,6 +209,25 @@ class OrdenTrabajo(models.Model):
         help_text="Costo real de mano de obra"
     )
 
+    # Totales desnormalizados: los mantienen las señales de PiezaRequerida
+    # (taller.signals) y OrdenTrabajo.save; ver `verificar_costos_ordenes`
+    costo_piezas_estimado = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, editable=False,
+        help_text="Σ cantidad × costo estimado de las piezas requeridas"
+    )
+    costo_piezas_real = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, editable=False,
+        help_text="Σ cantidad × costo real de las piezas requeridas"
+    )
+    costo_total_estimado = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, editable=False,
+        help_text="Costo total estimado (mano de obra + piezas)"
+    )
+    costo_total_real = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, editable=False,
+        help_text="Costo total real (mano de obra + piezas)"
+    )
+
     # Observaciones
     observaciones = models.TextField(blank=True)
 
@@ -176,6 +238,8 @@ class OrdenTrabajo(models.Model):
         related_name='ordenes_taller_creadas'
     )
 
+    objects = OrdenTrabajoQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Orden de Trabajo"
         verbose_name_plural = "Órdenes de Trabajo"
@@ -222,36 +286,46 @@ class OrdenTrabajo(models.Model):
 
                 self.unidad.save()
 
+        # Las piezas las escriben las señales de PiezaRequerida directo en la BD:
+        # se toman de la fila actual y no viajan en el UPDATE, donde un valor en
+        # memoria pisaría esa escritura. Los totales se calculan antes de guardar
+        # para que los receptores de post_save los vean al día.
+        piezas = None if self._state.adding else (
+            OrdenTrabajo.objects.filter(pk=self.pk).values_list(*COSTOS_PIEZAS).first()
+        )
+        if piezas:
+            self.costo_piezas_estimado, self.costo_piezas_real = piezas
+        self.costo_total_estimado = Decimal(self.costo_estimado_mano_obra or 0) + self.costo_piezas_estimado
+        self.costo_total_real = Decimal(self.costo_real_mano_obra or 0) + self.costo_piezas_real
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.attname for f in self._meta.concrete_fields if not f.primary_key
+            ]
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = [
+                *(c for c in kwargs['update_fields'] if c not in COSTOS_ORDEN),
+                'costo_total_estimado', 'costo_total_real',
+            ]
+
         super().save(*args, **kwargs)
 
+    def recalcular_costos(self):
+        """Recalcula COSTOS_ORDEN en la BD (un UPDATE atómico) y los refresca en memoria."""
+        OrdenTrabajo.objects.filter(pk=self.pk).recalcular_costos()
+        self.refresh_from_db(fields=COSTOS_ORDEN)
+
     def __str__(self):
         return f"{self.folio} - {self.unidad.numero_economico} - {self.get_estado_display()}"
 
     @property
     def costo_total_piezas_estimado(self):
-        """Calcula el costo total estimado de piezas"""
-        return sum(
-            item.cantidad * item.costo_estimado
-            for item in self.piezas_requeridas.all()
-        )
+        """Costo total estimado de piezas (alias de costo_piezas_estimado)"""
+        return self.costo_piezas_estimado
 
     @property
     def costo_total_piezas_real(self):
-        """Calcula el costo total real de piezas"""
-        return sum(
-            item.cantidad * (item.costo_real or 0)
-            for item in self.piezas_requeridas.all()
-        )
-
-    @property
-    def costo_total_estimado(self):
-        """Costo total estimado (mano de obra + piezas)"""
-        return self.costo_estimado_mano_obra + self.costo_total_piezas_estimado
-
-    @property
-    def costo_total_real(self):
-        """Costo total real (mano de obra + piezas)"""
-        return self.costo_real_mano_obra + self.costo_total_piezas_real
+        """Costo total real de piezas (alias de costo_piezas_real)"""
+        return self.costo_piezas_real
 
     @property
     def dias_en_taller(self):
@@ -684,4 +758,61 @@ class HistorialMantenimiento(models.Model):
         """Kilómetros recorridos durante el servicio"""
         if self.kilometraje_salida and self.kilometraje_ingreso:
             return self.kilometraje_salida - self.kilometraje_ingreso
-        return 0
\ No newline at end of file
+        return 0
+
+class EstadoMantenimientoUnidad(models.Model):
+    """
+    Estado de mantenimiento precalculado por unidad activa (taller.mantenimiento).
+    Se recalcula al completar una orden y en el job nocturno del scheduler.
+    """
+    URGENCIA_CHOICES = [
+        ('OK', 'Al día'),
+        ('MEDIA', 'Media'),
+        ('ALTA', 'Alta'),
+    ]
+
+    unidad = models.OneToOneField(
+        Unidad,
+        on_delete=models.CASCADE,
+        related_name='estado_mantenimiento'
+    )
+    ultimo_servicio = models.ForeignKey(
+        HistorialMantenimiento,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    fecha_ultimo_servicio = models.DateField(null=True, blank=True)
+    kilometraje_ultimo_servicio = models.IntegerField(null=True, blank=True)
+    kilometraje_actual = models.IntegerField(default=0)
+    kilometros_desde_servicio = models.IntegerField(null=True, blank=True)
+    intervalo_km = models.IntegerField(
+        null=True,
+        blank=True,
+        help_text="TipoMantenimiento.kilometraje_sugerido del último servicio (o el default)"
+    )
+    intervalo_dias = models.IntegerField(
+        null=True,
+        blank=True,
+        help_text="TipoMantenimiento.dias_sugeridos del último servicio"
+    )
+    fecha_proximo_servicio = models.DateField(
+        null=True,
+        blank=True,
+        help_text="La más próxima entre la fecha por días y la proyectada por kilometraje"
+    )
+    dias_vencido = models.IntegerField(default=0)
+    kilometros_excedidos = models.IntegerField(default=0)
+    requiere = models.BooleanField(default=False, db_index=True)
+    urgencia = models.CharField(max_length=10, choices=URGENCIA_CHOICES, default='OK')
+    razon = models.CharField(max_length=200, blank=True)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Estado de Mantenimiento"
+        verbose_name_plural = "Estados de Mantenimiento"
+        ordering = ['-requiere', '-dias_vencido', '-kilometros_excedidos']
+
+    def __str__(self):
+        return f"{self.unidad.numero_economico} - {self.get_urgencia_display()}"
@@ -3,14 +3,16 @@ Servicios y funciones utilitarias para el módulo de taller
 Incluye lógica de negocio y cálculos relacionados con mantenimiento
 """
 
-from django.db.models import Sum, Avg, Count, Q, Max, Min
+from django.db.models import Sum, Avg, Count, F, Q, Max, Min
 from django.utils import timezone
 from datetime import timedelta, date
 from decimal import Decimal
 
+from config.fechas import rango_dias
+
 from .models import (
     OrdenTrabajo, HistorialMantenimiento, TipoMantenimiento,
-    PiezaRequerida
+    PiezaRequerida, EstadoMantenimientoUnidad
 )
 from modulos.unidades.models import Unidad
 
@@ -24,45 +26,25 @@ class ServicioMantenimiento:
         Retorna unidades que requieren mantenimiento basado en:
         - Fecha de próximo mantenimiento
         - Kilometraje desde último servicio
-        """
-        hoy = timezone.now().date()
-        unidades_mantenimiento = []
-
-        # Unidades con fecha de mantenimiento vencida
-        por_fecha = Unidad.objects.filter(
-            activa=True,
-            proximo_mantenimiento__lte=hoy
-        )
-
-        for unidad in por_fecha:
-            unidades_mantenimiento.append({
-                'unidad': unidad,
-                'razon': 'Fecha de mantenimiento vencida',
-                'urgencia': 'ALTA' if unidad.proximo_mantenimiento < hoy else 'MEDIA',
-                'dias_vencido': (hoy - unidad.proximo_mantenimiento).days if unidad.proximo_mantenimiento else 0
-            })
 
-        # Unidades con kilometraje alto desde último servicio
-        todas_activas = Unidad.objects.filter(activa=True)
-
-        for unidad in todas_activas:
-            ultimo_historial = HistorialMantenimiento.objects.filter(
-                unidad=unidad
-            ).order_by('-fecha_servicio').first()
-
-            if ultimo_historial:
-                km_desde_servicio = unidad.kilometraje_actual - ultimo_historial.kilometraje_salida
-
-                # Si han pasado más de 10,000 km sin servicio
-                if km_desde_servicio >= 10000:
-                    unidades_mantenimiento.append({
-                        'unidad': unidad,
-                        'razon': f'{km_desde_servicio:,} km desde último servicio',
-                        'urgencia': 'ALTA' if km_desde_servicio >= 15000 else 'MEDIA',
-                        'kilometros_desde_servicio': km_desde_servicio
-                    })
-
-        return unidades_mantenimiento
+        Lee EstadoMantenimientoUnidad (ver taller.mantenimiento), que se
+        recalcula al completar órdenes y cada noche.
+        """
+        estados = EstadoMantenimientoUnidad.objects.filter(
+            requiere=True, unidad__activa=True
+        ).select_related('unidad')
+
+        return [
+            {
+                'unidad': estado.unidad,
+                'razon': estado.razon,
+                'urgencia': estado.urgencia,
+                'dias_vencido': estado.dias_vencido,
+                'kilometros_desde_servicio': estado.kilometros_desde_servicio,
+                'fecha_proximo_servicio': estado.fecha_proximo_servicio,
+            }
+            for estado in estados
+        ]
 
     @staticmethod
     def calcular_costo_total_mantenimiento(unidad, fecha_inicio=None, fecha_fin=None):
@@ -91,18 +73,21 @@ class ServicioMantenimiento:
         historial = HistorialMantenimiento.objects.filter(unidad=unidad)
         ordenes = OrdenTrabajo.objects.filter(unidad=unidad)
 
-        # Costos
-        costo_total = historial.aggregate(Sum('costo_total'))['costo_total__sum'] or Decimal('0')
-
-        # Tiempos
-        tiempo_total_dias = historial.aggregate(Sum('tiempo_fuera_servicio_dias'))['tiempo_fuera_servicio_dias__sum'] or 0
-        tiempo_promedio = historial.aggregate(Avg('tiempo_fuera_servicio_dias'))['tiempo_fuera_servicio_dias__avg'] or 0
-
-        # Frecuencia
-        servicios_preventivos = historial.filter(tipo_servicio__icontains='preventivo').count()
-        servicios_correctivos = historial.filter(
-            Q(tipo_servicio__icontains='correctivo') | Q(tipo_servicio__icontains='reparación')
-        ).count()
+        # Costos, tiempos y frecuencia en una sola consulta
+        totales = historial.aggregate(
+            total_servicios=Count('id'),
+            costo_total=Sum('costo_total'),
+            tiempo_total_dias=Sum('tiempo_fuera_servicio_dias'),
+            tiempo_promedio=Avg('tiempo_fuera_servicio_dias'),
+            servicios_preventivos=Count('id', filter=Q(tipo_servicio__icontains='preventivo')),
+            servicios_correctivos=Count('id', filter=(
+                Q(tipo_servicio__icontains='correctivo') | Q(tipo_servicio__icontains='reparación')
+            )),
+        )
+        total_servicios = totales['total_servicios']
+        costo_total = totales['costo_total'] or Decimal('0')
+        tiempo_total_dias = totales['tiempo_total_dias'] or 0
+        tiempo_promedio = totales['tiempo_promedio'] or 0
 
         # Órdenes activas
         ordenes_activas = ordenes.exclude(estado__in=['COMPLETADA', 'CANCELADA']).count()
@@ -111,11 +96,11 @@ class ServicioMantenimiento:
         ultimo_servicio = historial.order_by('-fecha_servicio').first()
 
         return {
-            'total_servicios': historial.count(),
-            'servicios_preventivos': servicios_preventivos,
-            'servicios_correctivos': servicios_correctivos,
+            'total_servicios': total_servicios,
+            'servicios_preventivos': totales['servicios_preventivos'],
+            'servicios_correctivos': totales['servicios_correctivos'],
             'costo_total': costo_total,
-            'costo_promedio_servicio': costo_total / historial.count() if historial.count() > 0 else Decimal('0'),
+            'costo_promedio_servicio': costo_total / total_servicios if total_servicios > 0 else Decimal('0'),
             'tiempo_total_fuera_servicio_dias': tiempo_total_dias,
             'tiempo_promedio_servicio_dias': round(tiempo_promedio, 1),
             'ordenes_activas': ordenes_activas,
@@ -155,27 +140,32 @@ class ServicioMantenimiento:
         y kilometraje promedio
         """
         # Calcular kilometraje promedio mensual
-        historial = HistorialMantenimiento.objects.filter(
-            unidad=unidad
-        ).order_by('fecha_servicio')
+        historial = HistorialMantenimiento.objects.filter(unidad=unidad)
 
-        if historial.count() < 2:
-            return None
+        # Conteo, costo y rango de fechas en una sola consulta
+        resumen = historial.aggregate(
+            servicios=Count('id'),
+            costo_total=Sum('costo_total'),
+            primera_fecha=Min('fecha_servicio'),
+            ultima_fecha=Max('fecha_servicio'),
+        )
 
-        primer_servicio = historial.first()
-        ultimo_servicio = historial.last()
+        if resumen['servicios'] < 2:
+            return None
 
-        dias_transcurridos = (ultimo_servicio.fecha_servicio - primer_servicio.fecha_servicio).days
+        dias_transcurridos = (resumen['ultima_fecha'] - resumen['primera_fecha']).days
 
         if dias_transcurridos == 0:
             return None
 
-        km_recorridos = ultimo_servicio.kilometraje_salida - primer_servicio.kilometraje_ingreso
+        km_inicial = historial.order_by('fecha_servicio', 'pk').values_list('kilometraje_ingreso', flat=True)[0]
+        km_final = historial.order_by('-fecha_servicio', '-pk').values_list('kilometraje_salida', flat=True)[0]
+        km_recorridos = km_final - km_inicial
         km_por_dia = km_recorridos / dias_transcurridos
         km_por_mes = km_por_dia * 30
 
         # Calcular costo promedio mensual
-        costo_total = historial.aggregate(Sum('costo_total'))['costo_total__sum'] or Decimal('0')
+        costo_total = resumen['costo_total'] or Decimal('0')
         meses_transcurridos = dias_transcurridos / 30
         costo_promedio_mensual = costo_total / Decimal(str(meses_transcurridos)) if meses_transcurridos > 0 else Decimal('0')
 
@@ -233,7 +223,7 @@ class ReporteTaller:
 
         # Órdenes del mes
         ordenes = OrdenTrabajo.objects.filter(
-            fecha_creacion__date__range=[fecha_inicio, fecha_fin]
+            rango_dias('fecha_creacion', fecha_inicio, fecha_fin)
         )
 
         # Órdenes completadas
@@ -245,14 +235,12 @@ class ReporteTaller:
         )
 
         # Calcular costo de piezas
-        piezas_usadas = PiezaRequerida.objects.filter(
+        costo_piezas = PiezaRequerida.objects.filter(
             orden_trabajo__in=completadas,
             estado='INSTALADA'
-        )
-
-        costo_piezas = sum(
-            pieza.subtotal_real for pieza in piezas_usadas
-        )
+        ).aggregate(
+            total=Sum(F('cantidad') * F('costo_real'))
+        )['total'] or Decimal('0')
 
         return {
             'periodo': f"{fecha_inicio.strftime('%B %Y')}",
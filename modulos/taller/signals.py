@@ -1,11 +1,11 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from django.core.mail import send_mail
-from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import transaction
 
-from .models import OrdenTrabajo, PiezaRequerida, SeguimientoOrden
+from .models import HistorialMantenimiento, OrdenTrabajo, PiezaRequerida, SeguimientoOrden
 from modulos.compras.models import RecepcionAlmacen, ItemRecepcion
+from modulos.notificaciones.services import clave_dedup, encolar_email
 
 
 @receiver(post_save, sender=OrdenTrabajo)
@@ -18,9 +18,10 @@ def notificar_nueva_orden(sender, instance, created, **kwargs):
         )
 
         if supervisores.exists():
-            send_mail(
-                subject=f'Nueva Orden de Trabajo: {instance.folio}',
-                message=f'''
+            encolar_email(
+                [s.email for s in supervisores if s.email],
+                f'Nueva Orden de Trabajo: {instance.folio}',
+                f'''
                 Se ha creado una nueva orden de trabajo:
 
                 Folio: {instance.folio}
@@ -31,9 +32,8 @@ def notificar_nueva_orden(sender, instance, created, **kwargs):
 
                 Por favor revise y asigne un mecánico.
                 ''',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[s.email for s in supervisores if s.email],
-                fail_silently=True,
+                clave_dedup=f'taller:orden:{instance.pk}:nueva',
+                origen=instance,
             )
 
 
@@ -48,9 +48,10 @@ def notificar_cambio_estado_critico(sender, instance, created, **kwargs):
             )
 
             if supervisores.exists():
-                send_mail(
-                    subject=f'ALERTA: Orden {instance.folio} lleva {instance.dias_en_taller} días en taller',
-                    message=f'''
+                encolar_email(
+                    [s.email for s in supervisores if s.email],
+                    f'ALERTA: Orden {instance.folio} lleva {instance.dias_en_taller} días en taller',
+                    f'''
                     ATENCIÓN: La orden de trabajo {instance.folio} lleva {instance.dias_en_taller} días en taller.
 
                     Unidad: {instance.unidad.numero_economico} - {instance.unidad.placa}
@@ -60,16 +61,16 @@ def notificar_cambio_estado_critico(sender, instance, created, **kwargs):
 
                     Por favor revise el estado de esta orden.
                     ''',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[s.email for s in supervisores if s.email],
-                    fail_silently=True,
+                    clave_dedup=f'taller:orden:{instance.pk}:demora:{instance.dias_en_taller}',
+                    origen=instance,
                 )
 
         # Notificar cuando se completa
         elif instance.estado == 'COMPLETADA' and instance.creada_por:
-            send_mail(
-                subject=f'Orden de Trabajo Completada: {instance.folio}',
-                message=f'''
+            encolar_email(
+                [instance.creada_por.email] if instance.creada_por.email else [],
+                f'Orden de Trabajo Completada: {instance.folio}',
+                f'''
                 La orden de trabajo {instance.folio} ha sido completada.
 
                 Unidad: {instance.unidad.numero_economico} - {instance.unidad.placa}
@@ -80,40 +81,48 @@ def notificar_cambio_estado_critico(sender, instance, created, **kwargs):
 
                 La unidad está lista para volver a operación.
                 ''',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[instance.creada_por.email] if instance.creada_por.email else [],
-                fail_silently=True,
+                clave_dedup=f'taller:orden:{instance.pk}:completada',
+                origen=instance,
             )
 
 
+@receiver(pre_save, sender=OrdenTrabajo)
+def recordar_mecanico_anterior(sender, instance, **kwargs):
+    """Guardar el mecánico que tenía la orden antes de este save (lo compara asignar_mecanico_notificacion)"""
+    instance._mecanico_anterior_id = None
+    if instance.pk:
+        instance._mecanico_anterior_id = OrdenTrabajo.objects.filter(
+            pk=instance.pk
+        ).values_list('mecanico_asignado_id', flat=True).first()
+
+
 @receiver(post_save, sender=OrdenTrabajo)
 def asignar_mecanico_notificacion(sender, instance, created, **kwargs):
     """Notificar al mecánico cuando se le asigna una orden"""
     if not created and instance.mecanico_asignado:
-        # Verificar si se acaba de asignar (comparando con el objeto anterior)
-        try:
-            old_instance = OrdenTrabajo.objects.get(pk=instance.pk)
-            if old_instance.mecanico_asignado != instance.mecanico_asignado:
-                if instance.mecanico_asignado.email:
-                    send_mail(
-                        subject=f'Orden de Trabajo Asignada: {instance.folio}',
-                        message=f'''
-                        Se te ha asignado la siguiente orden de trabajo:
-
-                        Folio: {instance.folio}
-                        Unidad: {instance.unidad.numero_economico} - {instance.unidad.placa}
-                        Prioridad: {instance.get_prioridad_display()}
-                        Problema: {instance.descripcion_problema}
-                        Kilometraje: {instance.kilometraje_ingreso:,} km
-
-                        Por favor revisa los detalles en el sistema.
-                        ''',
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        recipient_list=[instance.mecanico_asignado.email],
-                        fail_silently=True,
-                    )
-        except OrdenTrabajo.DoesNotExist:
-            pass
+        # Verificar si se acaba de asignar (comparando con el mecánico anterior al save)
+        if getattr(instance, '_mecanico_anterior_id', None) != instance.mecanico_asignado_id:
+            if instance.mecanico_asignado.email:
+                encolar_email(
+                    [instance.mecanico_asignado.email],
+                    f'Orden de Trabajo Asignada: {instance.folio}',
+                    f'''
+                    Se te ha asignado la siguiente orden de trabajo:
+
+                    Folio: {instance.folio}
+                    Unidad: {instance.unidad.numero_economico} - {instance.unidad.placa}
+                    Prioridad: {instance.get_prioridad_display()}
+                    Problema: {instance.descripcion_problema}
+                    Kilometraje: {instance.kilometraje_ingreso:,} km
+
+                    Por favor revisa los detalles en el sistema.
+                    ''',
+                    # Con ventana: si la orden se reasigna y vuelve al mismo mecánico, se le avisa de nuevo
+                    clave_dedup=clave_dedup(
+                        'taller', 'orden', instance.pk, 'asignada', instance.mecanico_asignado.pk, ventana=300,
+                    ),
+                    origen=instance,
+                )
 
 
 @receiver(post_save, sender=PiezaRequerida)
@@ -128,6 +137,33 @@ def actualizar_estado_orden_por_piezas(sender, instance, created, **kwargs):
             orden.save()
 
 
+@receiver(post_save, sender=PiezaRequerida)
+@receiver(post_delete, sender=PiezaRequerida)
+def recalcular_costos_orden(sender, instance, **kwargs):
+    """Mantener los costos desnormalizados de la orden al agregar, editar o borrar piezas"""
+    OrdenTrabajo.objects.filter(pk=instance.orden_trabajo_id).recalcular_costos()
+
+
+def _recalcular_estado_al_confirmar(unidad_id):
+    # Tras el commit: si la unidad se está borrando en cascada ya no existe y no se escribe nada
+    from .mantenimiento import recalcular
+    transaction.on_commit(lambda: recalcular([unidad_id]))
+
+
+@receiver(post_save, sender=HistorialMantenimiento)
+@receiver(post_delete, sender=HistorialMantenimiento)
+def recalcular_estado_mantenimiento(sender, instance, **kwargs):
+    """Recalcular el estado de mantenimiento de la unidad al registrar (o borrar) un servicio"""
+    _recalcular_estado_al_confirmar(instance.unidad_id)
+
+
+@receiver(post_save, sender=OrdenTrabajo)
+def recalcular_estado_mantenimiento_orden(sender, instance, created, **kwargs):
+    """Al completar la orden cambian el próximo mantenimiento y el kilometraje de la unidad"""
+    if not created and instance.estado == 'COMPLETADA':
+        _recalcular_estado_al_confirmar(instance.unidad_id)
+
+
 @receiver(post_save, sender=ItemRecepcion)
 def actualizar_piezas_recibidas(sender, instance, created, **kwargs):
     """
@@ -160,9 +196,10 @@ def actualizar_piezas_recibidas(sender, instance, created, **kwargs):
 
                 # Notificar al mecánico
                 if orden.mecanico_asignado and orden.mecanico_asignado.email:
-                    send_mail(
-                        subject=f'Piezas Recibidas: {orden.folio}',
-                        message=f'''
+                    encolar_email(
+                        [orden.mecanico_asignado.email],
+                        f'Piezas Recibidas: {orden.folio}',
+                        f'''
                         Las piezas para la orden {orden.folio} han sido recibidas.
 
                         Unidad: {orden.unidad.numero_economico} - {orden.unidad.placa}
@@ -170,9 +207,8 @@ def actualizar_piezas_recibidas(sender, instance, created, **kwargs):
                         La orden ha sido cambiada a estado "En Reparación".
                         Puedes continuar con el trabajo.
                         ''',
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        recipient_list=[orden.mecanico_asignado.email],
-                        fail_silently=True,
+                        clave_dedup=f'taller:orden:{orden.pk}:piezas_recibidas',
+                        origen=orden,
                     )
 
 
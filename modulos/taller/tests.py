@@ -1,3 +1,185 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from modulos.unidades.models import Unidad
+
+from . import mantenimiento
+from .models import EstadoMantenimientoUnidad, HistorialMantenimiento, OrdenTrabajo, PiezaRequerida, TipoMantenimiento
+from .services import ServicioMantenimiento
+
+
+class CostosOrdenTrabajoTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester')
+        self.unidad = Unidad.objects.create(
+            numero_economico='ECO-001', placa='ABC-123', tipo='LOCAL', año=2020,
+            capacidad_combustible=Decimal('200.00'), rendimiento_esperado=Decimal('3.00'),
+        )
+        self.orden = OrdenTrabajo.objects.create(
+            unidad=self.unidad, descripcion_problema='Falla motor', kilometraje_ingreso=1000,
+            creada_por=self.user, costo_estimado_mano_obra=Decimal('150.00'),
+        )
+
+    def _pieza(self, **kwargs):
+        datos = {'orden_trabajo': self.orden, 'nombre_pieza': 'Filtro', 'cantidad': Decimal('2'),
+                 'costo_estimado': Decimal('80.00'), 'agregada_por': self.user}
+        datos.update(kwargs)
+        return PiezaRequerida.objects.create(**datos)
+
+    def test_orden_nueva_toma_la_mano_de_obra(self):
+        self.orden.refresh_from_db()
+        self.assertEqual(self.orden.costo_total_estimado, Decimal('150.00'))
+        self.assertEqual(self.orden.costo_piezas_estimado, Decimal('0'))
+
+    def test_piezas_actualizan_los_costos_de_la_orden(self):
+        pieza = self._pieza()
+        self._pieza(cantidad=Decimal('1'), costo_estimado=Decimal('40.00'), costo_real=Decimal('45.00'))
+        self.orden.refresh_from_db()
+        self.assertEqual(self.orden.costo_piezas_estimado, Decimal('200.00'))
+        self.assertEqual(self.orden.costo_piezas_real, Decimal('45.00'))
+        self.assertEqual(self.orden.costo_total_estimado, Decimal('350.00'))
+
+        pieza.costo_real = Decimal('90.00')
+        pieza.save()
+        pieza.delete()
+        self.orden.refresh_from_db()
+        self.assertEqual(self.orden.costo_piezas_estimado, Decimal('40.00'))
+        self.assertEqual(self.orden.costo_total_real, Decimal('45.00'))
+
+    def test_guardar_orden_desfasada_no_pisa_las_piezas(self):
+        self._pieza(costo_real=Decimal('100.00'))
+        # self.orden se cargó antes de la pieza: sus costos en memoria están en 0
+        self.orden.completar('Cambio de filtro', Decimal('300.00'), kilometraje_salida=1010)
+        self.orden.refresh_from_db()
+        self.assertEqual(self.orden.costo_piezas_real, Decimal('200.00'))
+        self.assertEqual(self.orden.costo_total_real, Decimal('500.00'))
+
+    def test_guardar_orden_no_escribe_los_costos_de_piezas_en_la_fila(self):
+        self._pieza()
+        self.orden.observaciones = 'Revisada'
+        with CaptureQueriesContext(connection) as consultas:
+            self.orden.save()
+        fila = [q['sql'] for q in consultas if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(fila), 1)
+        self.assertNotIn('costo_piezas', fila[0])
+        # Los totales se calculan con las piezas de la fila antes de guardar
+        self.assertEqual(self.orden.costo_total_estimado, Decimal('310.00'))
+
+    def test_aviso_de_orden_completada_lleva_el_costo_total_al_dia(self):
+        from modulos.notificaciones.models import NotificacionSaliente
+
+        self.user.email = 'jefe@kasu.mx'
+        self.user.save()
+        self._pieza(costo_real=Decimal('100.00'))
+        self.orden.completar('Cambio de filtro', Decimal('300.00'), kilometraje_salida=1010)
+
+        aviso = NotificacionSaliente.objects.get(asunto=f'Orden de Trabajo Completada: {self.orden.folio}')
+        self.assertIn('Costo total: $500.00', aviso.payload['cuerpo'])
+
+    def test_asignar_mecanico_le_avisa_una_sola_vez(self):
+        from modulos.notificaciones.models import NotificacionSaliente
+
+        mecanico = User.objects.create_user('mecanico', 'mecanico@kasu.mx', 'x')
+        self.orden.mecanico_asignado = mecanico
+        self.orden.save()
+        self.orden.observaciones = 'Revisada'
+        self.orden.save()
+
+        avisos = NotificacionSaliente.objects.filter(asunto=f'Orden de Trabajo Asignada: {self.orden.folio}')
+        self.assertEqual(avisos.count(), 1)
+        self.assertEqual(avisos.get().payload['destinatarios'], ['mecanico@kasu.mx'])
+
+    def test_verificar_costos_detecta_y_corrige(self):
+        self._pieza()
+        call_command('verificar_costos_ordenes', stdout=StringIO())
+
+        OrdenTrabajo.objects.filter(pk=self.orden.pk).update(costo_total_estimado=Decimal('1.00'))
+        with self.assertRaises(CommandError):
+            call_command('verificar_costos_ordenes', stdout=StringIO())
+
+        call_command('verificar_costos_ordenes', '--corregir', stdout=StringIO())
+        self.orden.refresh_from_db()
+        self.assertEqual(self.orden.costo_total_estimado, Decimal('310.00'))
+
+
+class EstadoMantenimientoTests(TestCase):
+    HOY = date(2026, 6, 30)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester')
+        self.tipo = TipoMantenimiento.objects.create(
+            nombre='Servicio A', tipo='PREVENTIVO', descripcion='Menor',
+            kilometraje_sugerido=20000, dias_sugeridos=90,
+        )
+
+    def _unidad(self, numero, km, **kwargs):
+        return Unidad.objects.create(
+            numero_economico=numero, placa=numero, tipo='LOCAL', año=2020, kilometraje_actual=km,
+            capacidad_combustible=Decimal('200.00'), rendimiento_esperado=Decimal('3.00'), **kwargs,
+        )
+
+    def _servicio(self, unidad, fecha, km, tipo=None):
+        orden = OrdenTrabajo.objects.create(
+            unidad=unidad, descripcion_problema='Servicio', kilometraje_ingreso=km,
+            creada_por=self.user, tipo_mantenimiento=tipo,
+        )
+        return HistorialMantenimiento.objects.create(
+            unidad=unidad, orden_trabajo=orden, fecha_servicio=fecha, kilometraje_ingreso=km,
+            kilometraje_salida=km, tipo_servicio='Preventivo', descripcion_breve='-', costo_total=Decimal('0'),
+        )
+
+    def _recalcular(self):
+        with patch('modulos.taller.mantenimiento.timezone.localdate', return_value=self.HOY):
+            return mantenimiento.recalcular()
+
+    def test_una_consulta_para_toda_la_flota(self):
+        for i in range(5):
+            unidad = self._unidad(f'U-{i}', 50000)
+            self._servicio(unidad, self.HOY - timedelta(days=10), 45000)
+        with self.assertNumQueries(1):
+            filas = list(mantenimiento._filas(Unidad.objects.filter(activa=True)))
+        self.assertEqual(len(filas), 5)
+
+    def test_vencida_por_kilometraje_con_intervalo_del_tipo(self):
+        unidad = self._unidad('U-KM', 75000)
+        self._servicio(unidad, self.HOY - timedelta(days=40), 40000, tipo=self.tipo)
+        self._recalcular()
+
+        estado = EstadoMantenimientoUnidad.objects.get(unidad=unidad)
+        self.assertTrue(estado.requiere)
+        self.assertEqual(estado.kilometros_desde_servicio, 35000)
+        self.assertEqual(estado.kilometros_excedidos, 15000)
+        self.assertEqual(estado.urgencia, 'ALTA')
+        # 35,000 km en 40 días: los 20,000 se alcanzaron ~23 días después del servicio
+        self.assertEqual(estado.fecha_proximo_servicio, self.HOY - timedelta(days=40) + timedelta(days=23))
+        self.assertEqual(estado.dias_vencido, 17)
+
+    def test_vencida_por_fecha_y_al_dia(self):
+        vencida = self._unidad('U-FECHA', 1000, proximo_mantenimiento=self.HOY - timedelta(days=3))
+        self._unidad('U-OK', 1000, proximo_mantenimiento=self.HOY + timedelta(days=30))
+        self._recalcular()
+
+        estado = EstadoMantenimientoUnidad.objects.get(unidad=vencida)
+        self.assertEqual((estado.requiere, estado.urgencia, estado.dias_vencido), (True, 'ALTA', 3))
+        self.assertEqual(
+            [f['unidad'] for f in ServicioMantenimiento.obtener_unidades_requieren_mantenimiento()], [vencida],
+        )
 
-# Create your tests here.
+    def test_completar_servicio_recalcula_la_unidad(self):
+        unidad = self._unidad('U-SIG', 30000)
+        with self.captureOnCommitCallbacks(execute=True):
+            self._servicio(unidad, timezone.localdate(), 30000, tipo=self.tipo)
+        estado = EstadoMantenimientoUnidad.objects.get(unidad=unidad)
+        self.assertFalse(estado.requiere)
+        self.assertEqual(estado.intervalo_km, 20000)
+        self.assertEqual(estado.fecha_proximo_servicio, timezone.localdate() + timedelta(days=90))
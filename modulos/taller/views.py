@@ -6,12 +6,16 @@ from django.utils import timezone
 from django.http import JsonResponse
 from datetime import timedelta
 
+from config.fechas import en_dia
+from config.referencias import referencia_cacheada
+
 from .models import (
     OrdenTrabajo, PiezaRequerida, TipoMantenimiento,
     CategoriaFalla, SeguimientoOrden, ChecklistMantenimiento,
     ChecklistOrden, HistorialMantenimiento, ReporteFalla
 )
 from modulos.compras.models import Requisicion, ItemRequisicion
+from modulos.unidades import disponibilidad
 from modulos.unidades.models import Unidad
 
 
@@ -50,10 +54,9 @@ def dashboard_taller(request):
     ordenes_criticas_count = ordenes_criticas.count()
     
     # ========== Unidades ==========
-    unidades_en_taller = Unidad.objects.filter(
-        ordenes_trabajo__estado__in=['EN_DIAGNOSTICO', 'EN_REPARACION', 'EN_PRUEBAS']
-    ).distinct()
-    unidades_en_taller_count = unidades_en_taller.count()
+    ids_en_taller = disponibilidad.en_estado(disponibilidad.EN_TALLER)
+    unidades_en_taller = Unidad.objects.filter(pk__in=ids_en_taller)
+    unidades_en_taller_count = len(ids_en_taller)
     
     # ========== Piezas ==========
     piezas_pendientes = PiezaRequerida.objects.filter(
@@ -67,18 +70,18 @@ def dashboard_taller(request):
     
     # ========== Costos ==========
     # Costo total estimado de órdenes activas
-    costo_total_estimado = sum(
-        orden.costo_total_estimado for orden in ordenes_activas
-    )
+    costo_total_estimado = ordenes_activas.aggregate(
+        t=Sum('costo_total_estimado')
+    )['t'] or 0
     
     # Costo total real de órdenes completadas este mes
     ordenes_completadas = OrdenTrabajo.objects.filter(
         estado='COMPLETADA',
         fecha_finalizacion__gte=hace_30_dias
     )
-    costo_total_mes = sum(
-        orden.costo_total_real for orden in ordenes_completadas
-    )
+    costo_total_mes = ordenes_completadas.aggregate(
+        t=Sum('costo_total_real')
+    )['t'] or 0
     
     # ========== Tiempos Promedio ==========
     ordenes_con_tiempo = ordenes_completadas.filter(
@@ -121,9 +124,7 @@ def dashboard_taller(request):
     labels_dias = []
     for i in range(6, -1, -1):
         dia = hoy - timedelta(days=i)
-        count = OrdenTrabajo.objects.filter(
-            fecha_creacion__date=dia
-        ).count()
+        count = OrdenTrabajo.objects.filter(en_dia('fecha_creacion', dia)).count()
         ordenes_por_dia.append(count)
         labels_dias.append(dia.strftime('%d/%m'))
     
@@ -218,7 +219,7 @@ def lista_ordenes(request):
         'ordenes': ordenes,
         'estados': OrdenTrabajo.ESTADO_CHOICES,
         'prioridades': OrdenTrabajo.PRIORIDAD_CHOICES,
-        'unidades': Unidad.objects.filter(activa=True),
+        'unidades': referencia_cacheada(Unidad, {'activa': True}),
     }
 
     return render(request, 'taller/lista_ordenes.html', context)
@@ -290,9 +291,9 @@ def crear_orden(request):
             messages.error(request, f'Error al crear la orden: {str(e)}')
 
     context = {
-        'unidades': Unidad.objects.filter(activa=True),
-        'tipos_mantenimiento': TipoMantenimiento.objects.filter(activo=True),
-        'categorias_falla': CategoriaFalla.objects.filter(activo=True),
+        'unidades': referencia_cacheada(Unidad, {'activa': True}),
+        'tipos_mantenimiento': referencia_cacheada(TipoMantenimiento, {'activo': True}),
+        'categorias_falla': referencia_cacheada(CategoriaFalla, {'activo': True}),
         'prioridades': OrdenTrabajo.PRIORIDAD_CHOICES,
     }
 
@@ -547,7 +548,10 @@ def cambiar_estado_orden(request, folio):
             orden.trabajo_realizado = request.POST.get('trabajo_realizado', '')
             orden.kilometraje_salida = request.POST.get('kilometraje_salida', orden.unidad.kilometraje_actual)
 
-            # Crear historial
+        orden.save()
+
+        if nuevo_estado == 'COMPLETADA':
+            # Crear historial (después de guardar: costo_total_real ya incluye la mano de obra)
             HistorialMantenimiento.objects.create(
                 unidad=orden.unidad,
                 orden_trabajo=orden,
@@ -561,8 +565,6 @@ def cambiar_estado_orden(request, folio):
                 tiempo_fuera_servicio_horas=orden.horas_en_taller
             )
 
-        orden.save()
-
         # Registrar seguimiento
         SeguimientoOrden.objects.create(
             orden_trabajo=orden,
@@ -624,7 +626,7 @@ def api_ordenes_activas(request):
 def reportar_falla(request, unidad_pk):
     """Vista pública (sin login) para que el operador reporte una falla vía QR."""
     unidad = get_object_or_404(Unidad, pk=unidad_pk, activa=True)
-    categorias = CategoriaFalla.objects.filter(activo=True).order_by('nombre')
+    categorias = referencia_cacheada(CategoriaFalla, {'activo': True}, orden=('nombre',))
 
     if request.method == 'POST':
         categoria_id = request.POST.get('categoria_falla') or None
@@ -675,7 +677,7 @@ def bandeja_reportes(request):
     return render(request, 'taller/bandeja_reportes.html', {
         'reportes': reportes,
         'estados': ReporteFalla.ESTADO_CHOICES,
-        'unidades': Unidad.objects.filter(activa=True),
+        'unidades': referencia_cacheada(Unidad, {'activa': True}),
         'nuevos_count': ReporteFalla.objects.filter(estado='NUEVO').count(),
         'mostrando_activos': not estado,
     })
@@ -692,7 +694,7 @@ def detalle_reporte(request, folio):
     )
     from modulos.almacen.models import ProductoAlmacen
     productos_almacen = ProductoAlmacen.objects.filter(activo=True).order_by('descripcion')
-    tipos_mantenimiento = TipoMantenimiento.objects.filter(activo=True)
+    tipos_mantenimiento = referencia_cacheada(TipoMantenimiento, {'activo': True})
 
     return render(request, 'taller/detalle_reporte.html', {
         'reporte': reporte,
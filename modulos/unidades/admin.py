@@ -12,6 +12,9 @@ from decimal import Decimal, InvalidOperation
 import openpyxl
 from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
 
+from config import referencias
+
+from . import disponibilidad
 from .models import Unidad
 from .services import calcular_reporte_utilidad
 
@@ -156,12 +159,17 @@ class UnidadAdmin(admin.ModelAdmin):
     def activar_unidades(self, request, queryset):
         """Activa las unidades seleccionadas"""
         updated = queryset.update(activa=True, fecha_baja=None)
+        # update() no dispara señales: las listas cacheadas y la línea de disponibilidad se invalidan aquí
+        referencias.invalidar(Unidad)
+        disponibilidad.invalidar()
         self.message_user(request, f'{updated} unidades activadas.')
     activar_unidades.short_description = 'Activar unidades seleccionadas'
     
     def desactivar_unidades(self, request, queryset):
         """Desactiva las unidades seleccionadas"""
-        updated = queryset.update(activa=False, fecha_baja=timezone.now().date())
+        updated = queryset.update(activa=False, fecha_baja=timezone.localdate())
+        referencias.invalidar(Unidad)
+        disponibilidad.invalidar()
         self.message_user(request, f'{updated} unidades desactivadas.')
     desactivar_unidades.short_description = 'Desactivar unidades seleccionadas'
 
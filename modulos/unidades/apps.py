@@ -5,3 +5,6 @@ class UnidadesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'modulos.unidades'
     verbose_name = 'Gestión de Unidades'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,189 @@
+"""
+Línea de tiempo de disponibilidad de la flota.
+
+Para todas las unidades a la vez arma intervalos de estado a partir de tres
+fuentes (una consulta cada una):
+
+    EN_VIAJE   bitácoras: fecha_salida → fecha_llegada (abierta si el viaje no
+               ha llegado y no está completado)
+    EN_TALLER  órdenes de trabajo: fecha_inicio_real (o fecha_creacion si ya
+               pasó de PENDIENTE) → fecha_finalizacion (abierta mientras no se
+               complete); las CANCELADA no cuentan
+    INACTIVA   unidades con activa=False: desde fecha_baja (o desde siempre)
+
+y los aplana con un barrido (sweep-line) sobre los eventos ordenados por
+(unidad, instante): en cada tramo gana el estado de mayor prioridad
+(INACTIVA > EN_TALLER > EN_VIAJE). Fuera de los tramos la unidad está
+DISPONIBLE. Consultar un instante es un bisect por unidad.
+
+    from modulos.unidades import disponibilidad
+
+    disponibilidad.disponibles_en(manana_6am)        # {unidad_id, ...}
+    disponibilidad.en_estado('EN_TALLER')            # ahora
+    disponibilidad.estado_en(unidad_id, momento)     # 'EN_VIAJE' | ... | 'DISPONIBLE'
+
+La línea se guarda en la caché de Django (DISPONIBILIDAD_CACHE_SEGUNDOS) y
+cubre desde DISPONIBILIDAD_HISTORIA_DIAS atrás; las señales de unidades la
+invalidan al guardar o borrar unidades, bitácoras y órdenes de trabajo.
+Preguntas por instantes anteriores construyen una línea al vuelo sin caché.
+"""
+
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from config.fechas import inicio_dia
+
+DISPONIBLE = 'DISPONIBLE'
+EN_VIAJE = 'EN_VIAJE'
+EN_TALLER = 'EN_TALLER'
+INACTIVA = 'INACTIVA'
+
+# Menor a mayor prioridad: si dos intervalos se traslapan, gana el último
+PRIORIDAD = (EN_VIAJE, EN_TALLER, INACTIVA)
+
+# Extremos de los intervalos abiertos
+SIEMPRE = datetime.min.replace(tzinfo=dt_timezone.utc)
+NUNCA = datetime.max.replace(tzinfo=dt_timezone.utc)
+
+_CLAVE_CACHE = 'disponibilidad:linea'
+
+
+class LineaTiempo:
+    """Tramos ordenados y sin traslape por unidad: {unidad_id: [(inicio, fin, estado), ...]}."""
+
+    def __init__(self, unidades, tramos, desde):
+        self.unidades = frozenset(unidades)
+        self.desde = desde
+        self.tramos = tramos
+        self._inicios = {unidad: [t[0] for t in lista] for unidad, lista in tramos.items()}
+
+    def estado_en(self, unidad_id, momento) -> str:
+        inicios = self._inicios.get(unidad_id)
+        if not inicios:
+            return DISPONIBLE
+        i = bisect_right(inicios, momento) - 1
+        if i >= 0 and momento < self.tramos[unidad_id][i][1]:
+            return self.tramos[unidad_id][i][2]
+        return DISPONIBLE
+
+    def en_estado(self, estado, momento) -> set:
+        if estado == DISPONIBLE:
+            return {u for u in self.unidades if self.estado_en(u, momento) == DISPONIBLE}
+        return {u for u in self._inicios if self.estado_en(u, momento) == estado}
+
+
+def _intervalos(desde):
+    """
+    (ids de todas las unidades, [(unidad_id, inicio, fin, estado), ...]) de las
+    tres fuentes, sin los intervalos que terminaron antes de `desde`.
+    """
+    from modulos.bitacoras.models import BitacoraViaje
+    from modulos.taller.models import OrdenTrabajo
+
+    from .models import Unidad
+
+    unidades, intervalos = [], []
+    for pk, activa, fecha_baja in Unidad.objects.values_list('pk', 'activa', 'fecha_baja'):
+        unidades.append(pk)
+        if not activa:
+            intervalos.append((pk, inicio_dia(fecha_baja) if fecha_baja else SIEMPRE, NUNCA, INACTIVA))
+
+    viajes = BitacoraViaje.objects.filter(
+        Q(fecha_llegada__gte=desde) | Q(fecha_llegada__isnull=True, completado=False)
+    ).values_list('unidad_id', 'fecha_salida', 'fecha_llegada')
+    for unidad, salida, llegada in viajes:
+        intervalos.append((unidad, salida, llegada or NUNCA, EN_VIAJE))
+
+    ordenes = (
+        OrdenTrabajo.objects.exclude(estado='CANCELADA')
+        .exclude(estado='PENDIENTE', fecha_inicio_real__isnull=True)
+        .filter(Q(fecha_finalizacion__gte=desde) | Q(~Q(estado='COMPLETADA'), fecha_finalizacion__isnull=True))
+        .values_list('unidad_id', 'fecha_inicio_real', 'fecha_creacion', 'fecha_finalizacion')
+    )
+    for unidad, inicio_real, creacion, finalizacion in ordenes:
+        intervalos.append((unidad, inicio_real or creacion, finalizacion or NUNCA, EN_TALLER))
+    return unidades, intervalos
+
+
+def barrer(intervalos) -> dict:
+    """
+    Aplana intervalos (unidad_id, inicio, fin, estado) en tramos sin traslape
+    por unidad, en un solo barrido sobre los eventos ordenados.
+    """
+    nivel = {estado: i for i, estado in enumerate(PRIORIDAD)}
+    eventos = []
+    for unidad, inicio, fin, estado in intervalos:
+        if inicio < fin:
+            eventos.append((unidad, inicio, 1, nivel[estado]))
+            eventos.append((unidad, fin, -1, nivel[estado]))
+    eventos.sort(key=lambda e: (e[0], e[1]))
+
+    tramos = {}
+    unidad_actual = None
+    activos = [0] * len(PRIORIDAD)
+    inicio_tramo = estado_tramo = None
+    for unidad, instante, delta, prioridad in eventos:
+        if unidad != unidad_actual:
+            unidad_actual, activos = unidad, [0] * len(PRIORIDAD)
+            inicio_tramo = estado_tramo = None
+        activos[prioridad] += delta
+        estado = next((PRIORIDAD[i] for i in range(len(PRIORIDAD) - 1, -1, -1) if activos[i] > 0), None)
+        if estado == estado_tramo:
+            continue
+        lista = tramos.setdefault(unidad, [])
+        if estado_tramo is not None and instante > inicio_tramo:
+            if lista and lista[-1][1] == inicio_tramo and lista[-1][2] == estado_tramo:
+                lista[-1] = (lista[-1][0], instante, estado_tramo)
+            else:
+                lista.append((inicio_tramo, instante, estado_tramo))
+        inicio_tramo, estado_tramo = instante, estado
+    return {unidad: lista for unidad, lista in tramos.items() if lista}
+
+
+def construir(desde=None) -> LineaTiempo:
+    """Línea de tiempo de toda la flota desde `desde` (default: DISPONIBILIDAD_HISTORIA_DIAS atrás)."""
+    if desde is None:
+        desde = timezone.now() - timedelta(days=getattr(settings, 'DISPONIBILIDAD_HISTORIA_DIAS', 30))
+    unidades, intervalos = _intervalos(desde)
+    return LineaTiempo(unidades, barrer(intervalos), desde)
+
+
+def linea_de_tiempo() -> LineaTiempo:
+    """La línea cacheada; se reconstruye si no está o si fue invalidada."""
+    linea = cache.get(_CLAVE_CACHE)
+    if linea is None:
+        linea = construir()
+        cache.set(_CLAVE_CACHE, linea, getattr(settings, 'DISPONIBILIDAD_CACHE_SEGUNDOS', 300))
+    return linea
+
+
+def invalidar() -> None:
+    cache.delete(_CLAVE_CACHE)
+
+
+def _linea_para(momento) -> LineaTiempo:
+    linea = linea_de_tiempo()
+    if momento < linea.desde:
+        return construir(desde=momento)
+    return linea
+
+
+def estado_en(unidad_id, momento=None) -> str:
+    momento = momento or timezone.now()
+    return _linea_para(momento).estado_en(unidad_id, momento)
+
+
+def en_estado(estado, momento=None) -> set:
+    """Ids de las unidades en `estado` en el instante dado (default: ahora)."""
+    momento = momento or timezone.now()
+    return _linea_para(momento).en_estado(estado, momento)
+
+
+def disponibles_en(momento=None) -> set:
+    """Ids de las unidades activas sin viaje ni orden de taller en el instante dado (default: ahora)."""
+    return en_estado(DISPONIBLE, momento)
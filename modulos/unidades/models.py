@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Avg
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from decimal import Decimal
@@ -130,16 +131,12 @@ class Unidad(models.Model):
     
     def rendimiento_promedio_real(self):
         """Calcula el rendimiento promedio real basado en bitácoras"""
-        viajes = self.bitacoras.filter(
+        promedio = self.bitacoras.filter(
             fecha_llegada__isnull=False,
-            diesel_cargado__gt=0
-        )
-        
-        if not viajes.exists():
-            return 0
-        
-        rendimientos = [v.rendimiento_combustible for v in viajes if v.rendimiento_combustible > 0]
-        return round(sum(rendimientos) / len(rendimientos), 2) if rendimientos else 0
+            diesel_cargado__gt=0,
+            rendimiento_km_lt__gt=0
+        ).aggregate(promedio=Avg('rendimiento_km_lt'))['promedio']
+        return round(float(promedio), 2) if promedio else 0
     
     def eficiencia_combustible(self):
         """
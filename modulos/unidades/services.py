@@ -34,26 +34,25 @@ def calcular_reporte_utilidad(desde, hasta):
     for unidad in Unidad.objects.filter(activa=True).order_by('numero_economico'):
         ingresos = BitacoraViaje.objects.filter(
             unidad=unidad, completado=True,
-            fecha_llegada__date__gte=desde, fecha_llegada__date__lte=hasta,
+            fecha_llegada__desde_dia=desde, fecha_llegada__hasta_dia=hasta,
         ).aggregate(t=Sum('ingreso_calculado'))['t'] or Decimal('0')
 
         gasto_combustible = CargaCombustible.objects.filter(
             unidad=unidad, estado='COMPLETADO',
-            fecha_hora_inicio__date__gte=desde, fecha_hora_inicio__date__lte=hasta,
+            fecha_hora_inicio__desde_dia=desde, fecha_hora_inicio__hasta_dia=hasta,
         ).aggregate(t=Sum('costo_calculado'))['t'] or Decimal('0')
 
-        ordenes_completadas = OrdenTrabajo.objects.filter(
+        gasto_taller = OrdenTrabajo.objects.filter(
             unidad=unidad, estado='COMPLETADA',
-            fecha_finalizacion__date__gte=desde, fecha_finalizacion__date__lte=hasta,
-        )
-        gasto_taller = sum((orden.costo_total_real for orden in ordenes_completadas), Decimal('0'))
+            fecha_finalizacion__desde_dia=desde, fecha_finalizacion__hasta_dia=hasta,
+        ).aggregate(t=Sum('costo_total_real'))['t'] or Decimal('0')
 
         gasto_consumibles = (
             _suma_cantidad_por_costo(SalidaRapidaConsumible.objects.filter(
-                unidad=unidad, fecha_salida__date__gte=desde, fecha_salida__date__lte=hasta,
+                unidad=unidad, fecha_salida__desde_dia=desde, fecha_salida__hasta_dia=hasta,
             ))
             + _suma_cantidad_por_costo(AsignacionDirectaAlmacen.objects.filter(
-                unidad=unidad, fecha_asignacion__date__gte=desde, fecha_asignacion__date__lte=hasta,
+                unidad=unidad, fecha_asignacion__desde_dia=desde, fecha_asignacion__hasta_dia=hasta,
             ))
             + _suma_cantidad_por_costo(ItemAsignacionSalida.objects.filter(
                 asignacion__tipo_destino='UNIDAD', asignacion__unidad=unidad,
@@ -82,11 +81,11 @@ def calcular_reporte_utilidad(desde, hasta):
     }
 
     bitacoras_excluidas = BitacoraViaje.objects.filter(
-        completado=True, fecha_llegada__date__gte=desde, fecha_llegada__date__lte=hasta,
+        completado=True, fecha_llegada__desde_dia=desde, fecha_llegada__hasta_dia=hasta,
         ingreso_calculado__isnull=True,
     ).count()
     cargas_excluidas = CargaCombustible.objects.filter(
-        estado='COMPLETADO', fecha_hora_inicio__date__gte=desde, fecha_hora_inicio__date__lte=hasta,
+        estado='COMPLETADO', fecha_hora_inicio__desde_dia=desde, fecha_hora_inicio__hasta_dia=hasta,
         costo_calculado__isnull=True,
     ).count()
 
@@ -0,0 +1,29 @@
+"""
+Señales que invalidan la línea de tiempo de disponibilidad
+(modulos.unidades.disponibilidad) cuando cambia una unidad, una bitácora o
+una orden de trabajo.
+
+Se invalida de inmediato y otra vez al confirmar la transacción, para que
+una lectura concurrente no deje en caché el estado anterior al commit.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from modulos.bitacoras.models import BitacoraViaje
+from modulos.taller.models import OrdenTrabajo
+
+from . import disponibilidad
+from .models import Unidad
+
+
+@receiver(post_save, sender=Unidad)
+@receiver(post_delete, sender=Unidad)
+@receiver(post_save, sender=BitacoraViaje)
+@receiver(post_delete, sender=BitacoraViaje)
+@receiver(post_save, sender=OrdenTrabajo)
+@receiver(post_delete, sender=OrdenTrabajo)
+def invalidar_disponibilidad(sender, instance, **kwargs):
+    disponibilidad.invalidar()
+    transaction.on_commit(disponibilidad.invalidar)
@@ -1,7 +1,8 @@
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
 from django.utils import timezone
 
@@ -14,6 +15,7 @@ from modulos.combustible.models import Despachador, CargaCombustible
 from modulos.operadores.models import Operador
 from modulos.taller.models import OrdenTrabajo, PiezaRequerida
 
+from . import disponibilidad
 from .services import calcular_reporte_utilidad
 from .models import Unidad
 
@@ -193,3 +195,109 @@ class CalcularReporteUtilidadTests(TestCase):
 
         self.assertEqual(resultado['totales']['ingresos'], Decimal('3000.00'))
         self.assertEqual(len(resultado['filas']), 2)
+
+
+class AccionesAdminTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_desactivar_invalida_las_listas_cacheadas(self):
+        from django.urls import reverse
+
+        from config.referencias import referencia_cacheada
+
+        unidad = Unidad.objects.create(
+            numero_economico='ECO-BAJA', placa='BAJA', tipo='LOCAL', año=2020,
+            capacidad_combustible=Decimal('200.00'), rendimiento_esperado=Decimal('3.00'),
+        )
+        self.assertIn(unidad, referencia_cacheada(Unidad, {'activa': True}))
+        self.client.force_login(User.objects.create_superuser('admin', 'a@kasu.mx', 'x'))
+
+        self.client.post(reverse('admin:unidades_unidad_changelist'), {
+            'action': 'desactivar_unidades', '_selected_action': [unidad.pk],
+        })
+
+        self.assertNotIn(unidad, referencia_cacheada(Unidad, {'activa': True}))
+
+
+class DisponibilidadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester')
+        self.operador = Operador.objects.create(nombre='Juan Pérez', tipo='FORANEO')
+        self.ahora = timezone.now()
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def _unidad(self, numero, **kwargs):
+        return Unidad.objects.create(
+            numero_economico=numero, placa=numero, tipo='FORANEA', año=2020,
+            capacidad_combustible=Decimal('200.00'), rendimiento_esperado=Decimal('3.00'), **kwargs,
+        )
+
+    def _viaje(self, unidad, salida, llegada=None):
+        return BitacoraViaje.objects.create(
+            operador=self.operador, unidad=unidad, modalidad='SENCILLO', destino='Manzanillo',
+            fecha_carga=salida, fecha_salida=salida, fecha_llegada=llegada,
+        )
+
+    def test_barrido_aplica_prioridad_y_une_tramos(self):
+        t = [_aware(2026, 6, d) for d in range(1, 8)]
+        tramos = disponibilidad.barrer([
+            (1, t[0], t[3], disponibilidad.EN_VIAJE),
+            (1, t[2], t[4], disponibilidad.EN_TALLER),
+            (1, t[4], t[5], disponibilidad.EN_VIAJE),
+            (1, t[5], t[6], disponibilidad.EN_VIAJE),
+            (2, t[1], t[2], disponibilidad.EN_VIAJE),
+        ])
+        self.assertEqual(tramos[1], [
+            (t[0], t[2], disponibilidad.EN_VIAJE),
+            (t[2], t[4], disponibilidad.EN_TALLER),
+            (t[4], t[6], disponibilidad.EN_VIAJE),
+        ])
+        self.assertEqual(tramos[2], [(t[1], t[2], disponibilidad.EN_VIAJE)])
+
+    def test_desactivar_desde_el_admin_invalida_la_linea(self):
+        from django.urls import reverse
+
+        unidad = self._unidad('F-BAJA')
+        self.assertIn(unidad.pk, disponibilidad.disponibles_en())
+        self.client.force_login(User.objects.create_superuser('admin', 'a@kasu.mx', 'x'))
+
+        self.client.post(reverse('admin:unidades_unidad_changelist'), {
+            'action': 'desactivar_unidades', '_selected_action': [unidad.pk],
+        })
+
+        self.assertNotIn(unidad.pk, disponibilidad.disponibles_en())
+
+    def test_disponibles_en_un_instante_futuro(self):
+        en_viaje = self._unidad('F-VIAJE')
+        regresa = self._unidad('F-REGRESA')
+        en_taller = self._unidad('F-TALLER')
+        libre = self._unidad('F-LIBRE')
+        self._unidad('F-BAJA', activa=False)
+        self._viaje(en_viaje, self.ahora - timedelta(hours=5))
+        self._viaje(regresa, self.ahora - timedelta(hours=5), self.ahora + timedelta(hours=10))
+        OrdenTrabajo.objects.create(
+            unidad=en_taller, descripcion_problema='Frenos', kilometraje_ingreso=1000, creada_por=self.user,
+        ).iniciar_diagnostico()
+
+        self.assertEqual(disponibilidad.disponibles_en(), {libre.pk})
+        manana = self.ahora + timedelta(days=1)
+        self.assertEqual(disponibilidad.disponibles_en(manana), {regresa.pk, libre.pk})
+        self.assertEqual(disponibilidad.en_estado(disponibilidad.EN_TALLER, manana), {en_taller.pk})
+        self.assertEqual(disponibilidad.estado_en(en_viaje.pk, manana), disponibilidad.EN_VIAJE)
+
+    def test_guardar_invalida_la_linea_en_cache(self):
+        unidad = self._unidad('F-001')
+        orden = OrdenTrabajo.objects.create(
+            unidad=unidad, descripcion_problema='Frenos', kilometraje_ingreso=1000, creada_por=self.user,
+        )
+        orden.iniciar_diagnostico()
+        self.assertEqual(disponibilidad.disponibles_en(), set())
+
+        with self.assertNumQueries(0):
+            disponibilidad.disponibles_en()
+        with self.captureOnCommitCallbacks(execute=True):
+            orden.completar('Cambio de balatas', Decimal('500.00'), kilometraje_salida=1010)
+        self.assertEqual(disponibilidad.disponibles_en(), {unidad.pk})
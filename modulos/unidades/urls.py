@@ -14,4 +14,7 @@ urlpatterns = [
     path('<int:pk>/editar/', views.UnidadUpdateView.as_view(), name='update'),
     path('<int:pk>/eliminar/', views.UnidadDeleteView.as_view(), name='delete'),
     path('<int:pk>/asignar-pieza/', views.asignar_pieza_unidad, name='asignar_pieza'),
+
+    # API
+    path('api/disponibles/', views.api_disponibles, name='api_disponibles'),
 ]
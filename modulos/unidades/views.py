@@ -5,15 +5,19 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.urls import reverse_lazy, reverse
 from django.db.models import Q, Count, Avg, Sum, Prefetch
-from django.db.models.functions import TruncMonth
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.http import JsonResponse
 from datetime import timedelta
 import json
+from . import disponibilidad
 from .models import Unidad
 from modulos.operadores.models import Operador
 from .forms import UnidadForm, AsignacionDirectaAlmacenForm
 from modulos.taller.models import OrdenTrabajo
 from modulos.almacen.models import SalidaRapidaConsumible, AsignacionDirectaAlmacen, MovimientoAlmacen
+from modulos.reportes import kpis
+from modulos.reportes.models import KPIUnidadMensual
 
 
 class UnidadListView(LoginRequiredMixin, ListView):
@@ -30,10 +34,12 @@ class UnidadListView(LoginRequiredMixin, ListView):
             queryset=Operador.objects.filter(activo=True).order_by('nombre'),
             to_attr='operadores_activos',
         )
+        # Viajes, cargas y órdenes salen de los KPIs mensuales (una docena de filas por unidad y año)
         queryset = Unidad.objects.annotate(
-            total_viajes=Count('bitacoras', distinct=True),
-            total_cargas=Count('cargas_combustible', distinct=True),
-            total_ordenes=Count('ordenes_trabajo', distinct=True),
+            **kpis.totales(
+                KPIUnidadMensual, 'unidad',
+                total_viajes='viajes', total_cargas='cargas', total_ordenes='ordenes_taller',
+            ),
             total_consumibles=Count('consumibles_asignados', distinct=True),
             total_asignaciones=Count('asignaciones_almacen', distinct=True),
         ).prefetch_related(operadores_activos_prefetch).order_by('numero_economico')
@@ -95,74 +101,57 @@ class UnidadDetailView(LoginRequiredMixin, DetailView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        unidad = self.get_object()
-        hoy = timezone.now().date()
-        
+        unidad = self.object
+        hoy = timezone.localdate()
+
         # Obtener últimos viajes
         context['ultimos_viajes'] = unidad.bitacoras.select_related(
             'operador'
         ).order_by('-fecha_salida')[:10]
-        
-        # Estadísticas de viajes
-        context['viajes_completados'] = unidad.viajes_completados()
-        context['rendimiento_promedio'] = unidad.rendimiento_promedio_real()
-        context['eficiencia'] = unidad.eficiencia_combustible()
+
+        # Estadísticas de viajes y combustible desde los KPIs mensuales de la unidad
+        filas_kpi = list(unidad.kpis_mensuales.order_by('mes'))
+        historico = kpis.resumir(filas_kpi, ('viajes_completados', 'rendimiento_suma',
+                                             'viajes_con_rendimiento', 'litros_cargados'))
+        rendimiento = historico['rendimiento_promedio']
+        context['viajes_completados'] = historico['viajes_completados']
+        context['rendimiento_promedio'] = rendimiento
+        context['eficiencia'] = (
+            round(rendimiento / float(unidad.rendimiento_esperado) * 100, 2)
+            if rendimiento and unidad.rendimiento_esperado else 0
+        )
         context['requiere_mantenimiento'] = unidad.requiere_mantenimiento()
-        
+        context['total_litros_cargados'] = historico['litros_cargados']
+
+        # Estadísticas del mes actual
+        mes_actual = next((f for f in filas_kpi if f.mes == hoy.replace(day=1)), None)
+        context['litros_mes_actual'] = mes_actual.litros_cargados if mes_actual else 0
+        context['cargas_mes_actual'] = mes_actual.cargas if mes_actual else 0
+
         # Operadores asignados
         context['operadores_asignados'] = unidad.operadores.filter(activo=True)
-        
+
         # Historial de cargas de combustible
         cargas = unidad.cargas_combustible.select_related(
             'despachador'
         ).order_by('-fecha_hora_inicio')
-        
+
         context['cargas_combustible'] = cargas[:15]  # Últimas 15 cargas
         context['total_cargas'] = cargas.count()
-        
-        # Estadísticas de combustible
-        cargas_completadas = cargas.filter(estado='COMPLETADO')
-        context['total_litros_cargados'] = cargas_completadas.aggregate(
-            total=Sum('cantidad_litros')
-        )['total'] or 0
-        
-        # Estadísticas del mes actual
-        cargas_mes = cargas_completadas.filter(
-            fecha_hora_inicio__year=hoy.year,
-            fecha_hora_inicio__month=hoy.month
-        )
-        context['litros_mes_actual'] = cargas_mes.aggregate(
-            total=Sum('cantidad_litros')
-        )['total'] or 0
-        context['cargas_mes_actual'] = cargas_mes.count()
-        
+
         # Alertas de candado en últimas 10 cargas
         context['alertas_candado_recientes'] = cargas.filter(
             estado_candado_anterior__in=['ALTERADO', 'VIOLADO', 'SIN_CANDADO']
         )[:10]
-        
-        # Datos para gráfico de litros por mes (últimos 12 meses)
-        fecha_inicio = hoy - timedelta(days=365)
-        cargas_por_mes = cargas_completadas.filter(
-            fecha_hora_inicio__gte=fecha_inicio
-        ).annotate(
-            mes=TruncMonth('fecha_hora_inicio')
-        ).values('mes').annotate(
-            total_litros=Sum('cantidad_litros')
-        ).order_by('mes')
-        
-        # Preparar datos para Chart.js
-        meses_labels = []
-        litros_data = []
-        
-        for item in cargas_por_mes:
-            mes_fecha = item['mes']
-            # Formato: "Ene 2024"
-            meses_labels.append(mes_fecha.strftime('%b %Y'))
-            litros_data.append(float(item['total_litros']))
-        
-        context['grafico_meses'] = json.dumps(meses_labels)
-        context['grafico_litros'] = json.dumps(litros_data)
+
+        # Últimos 12 meses: gráfico de litros (Chart.js) y tabla de KPIs
+        desde_mes = (hoy - timedelta(days=365)).replace(day=1)
+        ultimos_12 = [f for f in filas_kpi if f.mes >= desde_mes]
+        context['kpis_mensuales'] = ultimos_12[::-1]
+        con_cargas = [f for f in ultimos_12 if f.cargas]
+        # Formato: "Ene 2024"
+        context['grafico_meses'] = json.dumps([f.mes.strftime('%b %Y') for f in con_cargas])
+        context['grafico_litros'] = json.dumps([float(f.litros_cargados) for f in con_cargas])
 
         # Órdenes de taller
         ordenes_taller = unidad.ordenes_trabajo.select_related(
@@ -311,7 +300,9 @@ def asignar_pieza_unidad(request, pk):
 def unidad_dashboard(request):
     """Dashboard de unidades con estadísticas generales"""
     unidades = Unidad.objects.all()
-    
+    linea = disponibilidad.linea_de_tiempo()
+    ahora = timezone.now()
+
     context = {
         'total_unidades': unidades.count(),
         'unidades_activas': unidades.filter(activa=True).count(),
@@ -321,9 +312,38 @@ def unidad_dashboard(request):
             for tipo in Unidad.TIPO_CHOICES
         },
         'unidades_recientes': unidades.order_by('-created_at')[:5],
-        'unidades_mantenimiento': [
-            u for u in unidades.filter(activa=True) 
-            if u.requiere_mantenimiento()
-        ],
+        'unidades_disponibles': len(linea.en_estado(disponibilidad.DISPONIBLE, ahora)),
+        'unidades_en_viaje': len(linea.en_estado(disponibilidad.EN_VIAJE, ahora)),
+        'unidades_en_taller': len(linea.en_estado(disponibilidad.EN_TALLER, ahora)),
+        # Estado precalculado por taller.mantenimiento (fecha y kilometraje)
+        'unidades_mantenimiento': unidades.filter(
+            activa=True, estado_mantenimiento__requiere=True
+        ).order_by('-estado_mantenimiento__dias_vencido', 'numero_economico'),
     }
     return render(request, 'unidades/unidad_dashboard.html', context)
+
+
+@login_required
+def api_disponibles(request):
+    """
+    Unidades activas libres (sin viaje ni orden de taller) en un instante:
+    ?momento=2026-07-01T06:00 (hora local; default: ahora).
+    """
+    momento = timezone.now()
+    if request.GET.get('momento'):
+        momento = parse_datetime(request.GET['momento'])
+        if momento is None:
+            return JsonResponse({'success': False, 'error': 'Fecha inválida'}, status=400)
+        if timezone.is_naive(momento):
+            momento = timezone.make_aware(momento)
+
+    libres = disponibilidad.disponibles_en(momento)
+    unidades = Unidad.objects.filter(pk__in=libres).order_by('numero_economico')
+    return JsonResponse({
+        'success': True,
+        'momento': momento.isoformat(),
+        'unidades': [
+            {'id': u.pk, 'numero_economico': u.numero_economico, 'tipo': u.tipo}
+            for u in unidades
+        ],
+    })